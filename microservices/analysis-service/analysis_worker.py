@@ -0,0 +1,335 @@
+"""
+Worker assíncrono de análises via Kafka - Analysis Service
+Consome `analysis.requested` no event loop da aplicação, processando várias
+mensagens em paralelo (ordem preservada por símbolo), publica os eventos de
+resultado em lotes e só então comita os offsets (at-least-once).
+
+O cliente kafka-python é síncrono: consumer e producer rodam cada um em uma
+thread dedicada (chamadas sequenciais, nunca concorrentes no mesmo objeto).
+Backpressure: com `max_in_flight` mensagens sem commit, as partições são
+pausadas (o poll continua, mantendo o consumer no grupo) até a fila esvaziar
+pela metade.
+"""
+
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import structlog
+from kafka.structs import OffsetAndMetadata
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = structlog.get_logger()
+
+# Métricas Prometheus
+WORKER_MESSAGES = Counter('analysis_worker_messages_total', 'Consumed analysis requests', ['outcome'])
+WORKER_IN_FLIGHT = Gauge('analysis_worker_in_flight', 'Consumed messages not yet committed')
+WORKER_PAUSED = Gauge('analysis_worker_paused', '1 while consumption is paused by backpressure')
+WORKER_DURATION = Histogram('analysis_worker_processing_seconds', 'Time spent processing one request')
+WORKER_BATCH_SIZE = Histogram('analysis_worker_publish_batch_size', 'Events per producer flush',
+                              buckets=(1, 5, 10, 25, 50, 100, 250, 500))
+WORKER_COMMITS = Counter('analysis_worker_commits_total', 'Offset commits', ['outcome'])
+
+# (tópico, mensagem, chave)
+Event = Tuple[str, Dict[str, Any], Optional[str]]
+
+
+@dataclass
+class WorkerConfig:
+    concurrency: int = 32  # Análises simultâneas
+    max_in_flight: int = 500  # Mensagens consumidas e ainda não comitadas
+    max_poll_records: int = 100
+    poll_timeout_ms: int = 500
+    batch_size: int = 100  # Mensagens por flush do producer
+    linger_ms: int = 20  # Espera máxima para completar um lote
+    publish_timeout: float = 30.0
+    retry_backoff: float = 1.0
+    max_retry_backoff: float = 30.0
+
+    @classmethod
+    def from_env(cls, prefix: str = "ANALYSIS_WORKER_") -> "WorkerConfig":
+        base = cls()
+        return cls(
+            concurrency=int(os.getenv(f"{prefix}CONCURRENCY", base.concurrency)),
+            max_in_flight=int(os.getenv(f"{prefix}MAX_IN_FLIGHT", base.max_in_flight)),
+            max_poll_records=int(os.getenv(f"{prefix}MAX_POLL_RECORDS", base.max_poll_records)),
+            poll_timeout_ms=int(os.getenv(f"{prefix}POLL_TIMEOUT_MS", base.poll_timeout_ms)),
+            batch_size=int(os.getenv(f"{prefix}BATCH_SIZE", base.batch_size)),
+            linger_ms=int(os.getenv(f"{prefix}LINGER_MS", base.linger_ms)),
+            publish_timeout=float(os.getenv(f"{prefix}PUBLISH_TIMEOUT", base.publish_timeout)),
+            retry_backoff=base.retry_backoff,
+            max_retry_backoff=base.max_retry_backoff,
+        )
+
+
+class OffsetTracker:
+    """
+    Offsets consumidos por partição, na ordem de chegada. Mensagens terminam
+    fora de ordem; só o prefixo contíguo concluído pode ser comitado.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Any, Deque[int]] = {}
+        self._done: Dict[Any, Set[int]] = {}
+        self._committable: Dict[Any, int] = {}
+        self.in_flight = 0
+
+    def track(self, tp, offset: int):
+        self._pending.setdefault(tp, deque()).append(offset)
+        self._done.setdefault(tp, set())
+        self.in_flight += 1
+
+    def complete(self, tp, offset: int):
+        if tp not in self._pending:
+            return  # Partição esquecida (rebalance)
+        pending, done = self._pending[tp], self._done[tp]
+        done.add(offset)
+        self.in_flight -= 1
+        while pending and pending[0] in done:
+            done.discard(pending[0])
+            self._committable[tp] = pending.popleft() + 1
+
+    def drain(self) -> Dict[Any, int]:
+        """Próximo offset a consumir por partição (formato do commit do Kafka)"""
+        committable, self._committable = self._committable, {}
+        return committable
+
+    def forget(self, partitions):
+        for tp in partitions:
+            self.in_flight -= len(self._pending.pop(tp, ())) - len(self._done.pop(tp, ()))
+            self._committable.pop(tp, None)
+
+
+class BatchPublisher:
+    """Publica os eventos de várias mensagens por flush, na ordem de chegada"""
+
+    def __init__(self, producer_factory: Callable[[], Any], config: WorkerConfig,
+                 on_published: Callable[[Any, int], None],
+                 enrich: Callable[[Dict[str, Any]], Dict[str, Any]] = lambda message: message):
+        self.producer_factory = producer_factory
+        self.producer = None
+        self.config = config
+        self.on_published = on_published
+        self.enrich = enrich
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=config.max_in_flight)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis-producer")
+
+    async def publish(self, events: List[Event], tp, offset: int):
+        """Enfileirar os eventos de uma mensagem (bloqueia com a fila cheia)"""
+        await self._queue.put((events, tp, offset))
+
+    async def _next_batch(self) -> List[Tuple[List[Event], Any, int]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.config.linger_ms / 1000
+        while len(batch) < self.config.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _send(self, events: List[Event]):
+        """Enviar sem esperar cada confirmação; um flush aguarda o lote todo"""
+        if self.producer is None:
+            self.producer = self.producer_factory()
+        futures = [self.producer.send(topic, value=self.enrich(message), key=key) for topic, message, key in events]
+        self.producer.flush(timeout=self.config.publish_timeout)
+        for future in futures:
+            future.get(timeout=self.config.publish_timeout)  # Propaga falhas de entrega
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            events = [event for item_events, _, _ in batch for event in item_events]
+            backoff = self.config.retry_backoff
+            while events:
+                try:
+                    await loop.run_in_executor(self._executor, self._send, events)
+                    WORKER_BATCH_SIZE.observe(len(events))
+                    break
+                except Exception as e:
+                    # Sem commit enquanto não publicar: reenvio pode duplicar, nunca perder
+                    logger.error("Failed to publish analysis events, retrying", events=len(events),
+                                 error=str(e), retry_in=backoff)
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.config.max_retry_backoff)
+            for _, tp, offset in batch:
+                self.on_published(tp, offset)
+                self._queue.task_done()
+
+    async def join(self):
+        await self._queue.join()
+
+    def close(self):
+        if self.producer is not None:
+            self.producer.flush(timeout=self.config.publish_timeout)
+        self._executor.shutdown(wait=False)
+
+
+class AnalysisWorker:
+    """Consumer Kafka concorrente com ordem por chave e commit após publicação"""
+
+    def __init__(
+        self,
+        consumer_factory: Callable[[], Any],
+        producer_factory: Callable[[], Any],
+        handler: Callable[[Dict[str, Any]], Awaitable[List[Event]]],
+        on_error: Optional[Callable[[Dict[str, Any], Exception], List[Event]]] = None,
+        config: Optional[WorkerConfig] = None,
+        enrich: Callable[[Dict[str, Any]], Dict[str, Any]] = lambda message: message,
+    ):
+        self.consumer_factory = consumer_factory
+        self.consumer = None
+        self.handler = handler
+        self.on_error = on_error
+        self.config = config or WorkerConfig.from_env()
+        self.tracker = OffsetTracker()
+        self.publisher = BatchPublisher(producer_factory, self.config, self._published, enrich)
+        self.paused = False
+        self._slots = asyncio.Semaphore(self.config.concurrency)
+        self._lanes: Dict[str, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis-consumer")
+        self._running: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @staticmethod
+    def ordering_key(record) -> str:
+        """Mensagens de um mesmo símbolo são processadas em ordem"""
+        value = record.value if isinstance(record.value, dict) else {}
+        return record.key or value.get("symbol") or f"{record.topic}:{record.partition}"
+
+    async def _consumer_call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    def _published(self, tp, offset: int):
+        self.tracker.complete(tp, offset)
+        WORKER_IN_FLIGHT.set(self.tracker.in_flight)
+
+    def _dispatch(self, tp, record):
+        key = self.ordering_key(record)
+        task = asyncio.create_task(self._process(tp, record, self._lanes.get(key)))
+        self._lanes[key] = task
+        self._tasks.add(task)
+
+        def done(finished: asyncio.Task):
+            self._tasks.discard(finished)
+            if self._lanes.get(key) is finished:
+                del self._lanes[key]
+
+        task.add_done_callback(done)
+
+    async def _process(self, tp, record, previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.wait([previous])  # Ordem por símbolo; falhas já tratadas lá
+        async with self._slots:
+            with WORKER_DURATION.time():
+                try:
+                    events = await self.handler(record.value)
+                    WORKER_MESSAGES.labels(outcome="processed").inc()
+                except Exception as e:
+                    logger.error("Error processing async analysis", error=str(e), message=record.value)
+                    WORKER_MESSAGES.labels(outcome="failed").inc()
+                    events = self.on_error(record.value, e) if self.on_error else []
+        await self.publisher.publish(events, tp, record.offset)
+
+    def _apply_backpressure(self):
+        if not self.paused and self.tracker.in_flight >= self.config.max_in_flight:
+            self.consumer.pause(*self.consumer.assignment())
+            self.paused = True
+            logger.warning("Analysis worker paused by backpressure", in_flight=self.tracker.in_flight)
+        elif self.paused and self.tracker.in_flight <= self.config.max_in_flight // 2:
+            self.consumer.resume(*self.consumer.paused())
+            self.paused = False
+            logger.info("Analysis worker resumed", in_flight=self.tracker.in_flight)
+        WORKER_PAUSED.set(1 if self.paused else 0)
+
+    async def _poll_once(self):
+        await self._consumer_call(self._apply_backpressure)
+        batches = await self._consumer_call(
+            self.consumer.poll,
+            timeout_ms=self.config.poll_timeout_ms,
+            max_records=self.config.max_poll_records
+        )
+        for tp, records in batches.items():
+            for record in records:
+                self.tracker.track(tp, record.offset)
+                self._dispatch(tp, record)
+        WORKER_IN_FLIGHT.set(self.tracker.in_flight)
+
+    async def commit(self):
+        """Comitar os offsets cujas mensagens já tiveram os resultados publicados"""
+        offsets = self.tracker.drain()
+        if not offsets:
+            return
+        try:
+            await self._consumer_call(
+                self.consumer.commit,
+                {tp: OffsetAndMetadata(offset, "") for tp, offset in offsets.items()}
+            )
+            WORKER_COMMITS.labels(outcome="success").inc()
+        except Exception as e:
+            # Ex.: partição revogada no rebalance; o novo dono reprocessa a partir do último commit
+            logger.error("Offset commit failed", offsets={str(tp): offset for tp, offset in offsets.items()},
+                         error=str(e))
+            WORKER_COMMITS.labels(outcome="error").inc()
+            self.tracker.forget([tp for tp in offsets if tp not in self.consumer.assignment()])
+
+    async def _connect(self):
+        backoff = self.config.retry_backoff
+        while self.consumer is None and not self._stopping:
+            try:
+                self.consumer = await self._consumer_call(self.consumer_factory)
+            except Exception as e:
+                logger.error("Kafka consumer unavailable, retrying", error=str(e), retry_in=backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.config.max_retry_backoff)
+
+    async def run(self):
+        """Laço principal: poll -> despacho concorrente -> commit do que já foi publicado"""
+        await self._connect()
+        if self.consumer is None:
+            return
+        publisher_task = asyncio.create_task(self.publisher.run())
+        logger.info("Analysis worker started", concurrency=self.config.concurrency,
+                    max_in_flight=self.config.max_in_flight)
+        try:
+            while not self._stopping:
+                await self._poll_once()
+                await self.commit()
+            # Drenar: terminar o que foi consumido e comitar antes de sair
+            if self._tasks:
+                await asyncio.wait(list(self._tasks))
+            await self.publisher.join()
+            await self.commit()
+        finally:
+            publisher_task.cancel()
+            await self._consumer_call(self.consumer.close)
+            self.publisher.close()
+            self._executor.shutdown(wait=False)
+            logger.info("Analysis worker stopped")
+
+    def start(self) -> asyncio.Task:
+        self._running = asyncio.create_task(self.run())
+        return self._running
+
+    async def stop(self, timeout: float = 30.0):
+        self._stopping = True
+        if self._running is not None:
+            try:
+                await asyncio.wait_for(self._running, timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Analysis worker did not drain in time")
+                self._running.cancel()
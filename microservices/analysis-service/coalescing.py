@@ -0,0 +1,74 @@
+"""
+Coalescência de requisições duplicadas - Analysis Service
+Chamadas com a mesma chave, concorrentes ou dentro de uma janela curta após
+a conclusão da primeira, compartilham um único resultado. Falhas e resultados
+vazios (None) não ficam na janela: a próxima chamada tenta de novo.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from prometheus_client import Counter
+
+# Métricas Prometheus
+COALESCED_DUPLICATES = Counter('analysis_coalesced_duplicates_total', 'Requests served by a shared result',
+                               ['coalescer', 'type'])
+COALESCED_RESULTS = Counter('analysis_coalesced_results_total', 'Results computed for coalesced requests',
+                            ['coalescer', 'type'])
+
+
+@dataclass
+class _Entry:
+    future: asyncio.Future
+    expires: float = float("inf")  # Em andamento: não expira
+
+
+class Coalescer:
+    """Uma execução por chave; as duplicatas aguardam o mesmo future"""
+
+    def __init__(self, name: str, window: float = 5.0, max_entries: int = 10000):
+        self.name = name
+        self.window = window
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, _Entry] = {}
+
+    def _prune(self, now: float):
+        if len(self._entries) > self.max_entries:
+            for key in [key for key, entry in self._entries.items() if entry.expires <= now]:
+                del self._entries[key]
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]], type: str = "") -> Any:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires > now:
+            COALESCED_DUPLICATES.labels(coalescer=self.name, type=type).inc()
+            return await asyncio.shield(entry.future)
+
+        entry = _Entry(loop.create_future())
+        self._entries[key] = entry
+        self._prune(now)
+        try:
+            result = await factory()
+        except BaseException as e:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            if isinstance(e, asyncio.CancelledError):
+                entry.future.cancel()
+            else:
+                entry.future.set_exception(e)
+                entry.future.exception()  # Marca como consumida se ninguém aguardava
+            raise
+
+        COALESCED_RESULTS.labels(coalescer=self.name, type=type).inc()
+        entry.future.set_result(result)
+        if result is None:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        else:
+            entry.expires = loop.time() + self.window
+        return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,97 @@
+"""
+Comparação entre ações - Analysis Service
+Ranking vetorizado de um indicador com percentis, z-scores e estatísticas
+por setor (pandas), em vez de ordenar e tirar a média em laços Python.
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+SEM_SETOR = "N/A"
+
+
+def _clean(value: Any) -> Optional[float]:
+    """NaN/inf viram None para o JSON"""
+    if value is None:
+        return None
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _describe(values: pd.Series) -> Dict[str, Optional[float]]:
+    return {
+        "media": _clean(values.mean()),
+        "mediana": _clean(values.median()),
+        "desvio_padrao": _clean(values.std()),
+        "minimo": _clean(values.min()),
+        "maximo": _clean(values.max()),
+        "p25": _clean(values.quantile(0.25)),
+        "p75": _clean(values.quantile(0.75)),
+        "quantidade": int(values.count()),
+    }
+
+
+def rank_values(valores: Dict[str, float], setores: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Any]:
+    """
+    Ranking decrescente do indicador. Cada posição traz o percentil (100 =
+    maior valor, empates pela média), o z-score e o percentil dentro do setor;
+    as estatísticas gerais e por setor saem de uma única agregação.
+    """
+    frame = pd.DataFrame({"valor": pd.Series(valores, dtype=np.float64)})
+    frame = frame[np.isfinite(frame["valor"])]
+    if frame.empty:
+        return {"ranking": [], "estatisticas": _describe(frame["valor"]), "estatisticas_setor": {}}
+
+    setores = setores or {}
+    frame["setor"] = [setores.get(symbol) or SEM_SETOR for symbol in frame.index]
+    frame = frame.sort_values("valor", ascending=False, kind="stable")
+
+    std = frame["valor"].std()
+    frame["posicao"] = np.arange(1, len(frame) + 1)
+    frame["percentil"] = frame["valor"].rank(pct=True) * 100
+    frame["zscore"] = (frame["valor"] - frame["valor"].mean()) / std if std > 0 else 0.0
+    frame["percentil_setor"] = frame.groupby("setor")["valor"].rank(pct=True) * 100
+
+    ranking = [
+        {
+            "symbol": symbol,
+            "valor": float(row.valor),
+            "posicao": int(row.posicao),
+            "percentil": float(row.percentil),
+            "zscore": _clean(row.zscore),
+            "setor": row.setor,
+            "percentil_setor": float(row.percentil_setor),
+        }
+        for symbol, row in zip(frame.index, frame.itertuples(index=False))
+    ]
+
+    return {
+        "ranking": ranking,
+        "estatisticas": _describe(frame["valor"]),
+        "estatisticas_setor": {
+            setor: _describe(grupo) for setor, grupo in frame.groupby("setor")["valor"]
+        },
+    }
+
+
+def indicator_field(indicador: str) -> str:
+    """Nome do campo de DadosFinanceiros para o indicador pedido ("P/E" -> "p_e")"""
+    return indicador.lower().replace('/', '_').replace(' ', '_')
+
+
+def indicator_values(dados: Dict[str, Any], indicador: str) -> Dict[str, float]:
+    """Valores numéricos do indicador por símbolo (ausentes ficam de fora)"""
+    field = indicator_field(indicador)
+    valores = {}
+    for symbol, item in dados.items():
+        valor = getattr(item, field, None)
+        if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            valores[symbol] = float(valor)
+    return valores
+
+
+def chunked(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
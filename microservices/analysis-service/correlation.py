@@ -0,0 +1,289 @@
+"""
+Correlação do universo e diversificação - Analysis Service
+A janela móvel de log-retornos guarda Σx e Σxxᵀ; um pregão novo atualiza as
+somas em O(N²) e a matriz de correlação é montada bloco a bloco de linhas,
+então nenhum temporário passa de (bloco x N) mesmo com milhares de ações.
+Pregões sem negociação (fechamento repetido ou antes da listagem) contam
+como retorno zero; a barra parcial de hoje nunca entra na janela.
+
+Agrupamento hierárquico pela distância √((1 − ρ) / 2) com ligação média:
+SciPy quando instalado, sobre o vetor condensado escrito bloco a bloco (sem
+matriz N x N); senão uma implementação NumPy (Lance-Williams, O(n³)) que só
+atende universos de até NUMPY_LINKAGE_MAX ações.
+"""
+
+from collections import deque
+from typing import Callable, Deque, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from risk_engine import finished_sessions
+
+try:
+    from scipy.cluster.hierarchy import fcluster, linkage
+except ImportError:  # Fallback em NumPy puro (adequado a universos menores)
+    linkage = None
+
+TRADING_DAYS = 252
+NUMPY_LINKAGE_MAX = 500  # Sem SciPy a ligação é O(n³): acima disso não agrupa
+
+
+def block_rows(n_assets: int, memory_budget_mb: float, arrays: int = 3) -> int:
+    """Linhas por bloco para que `arrays` temporários (bloco x N, float64) caibam no orçamento"""
+    per_row = arrays * max(n_assets, 1) * 8
+    return max(1, min(n_assets, int(memory_budget_mb * 1024 ** 2 // per_row)))
+
+
+class RollingCorrelation:
+    """Janela móvel de retornos com Σx e Σxxᵀ atualizados em blocos de linhas"""
+
+    def __init__(self, n_assets: int, window: int = TRADING_DAYS, memory_budget_mb: float = 64.0):
+        self.n_assets = n_assets
+        self.window = window
+        self.block = block_rows(n_assets, memory_budget_mb)
+        self.returns: Deque[np.ndarray] = deque()
+        self.updates_since_rebuild = 0
+        self.sum_x = np.zeros(n_assets)
+        self.sum_xx = np.zeros((n_assets, n_assets))
+
+    def __len__(self) -> int:
+        return len(self.returns)
+
+    def _blocks(self):
+        for start in range(0, self.n_assets, self.block):
+            yield slice(start, start + self.block)
+
+    def rebuild(self):
+        """Recalcular as somas da janela inteira (evita acúmulo de erro numérico)"""
+        self.sum_x = np.zeros(self.n_assets)
+        self.sum_xx = np.zeros((self.n_assets, self.n_assets))
+        if self.returns:
+            matrix = np.vstack(self.returns)
+            self.sum_x = matrix.sum(axis=0)
+            for rows in self._blocks():
+                np.matmul(matrix[:, rows].T, matrix, out=self.sum_xx[rows])
+        self.updates_since_rebuild = 0
+
+    def append(self, x) -> None:
+        """Incluir um pregão (e descartar o mais antigo se a janela estiver cheia)"""
+        x = np.nan_to_num(np.asarray(x, dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+        self.returns.append(x)
+        old = self.returns.popleft() if len(self.returns) > self.window else None
+
+        self.sum_x += x
+        if old is not None:
+            self.sum_x -= old
+        for rows in self._blocks():
+            self.sum_xx[rows] += x[rows, None] * x
+            if old is not None:
+                self.sum_xx[rows] -= old[rows, None] * old
+
+        self.updates_since_rebuild += 1
+        if self.updates_since_rebuild >= self.window:
+            self.rebuild()
+
+    def extend(self, rows) -> None:
+        for row in np.atleast_2d(rows):
+            self.append(row)
+
+    def mean(self) -> np.ndarray:
+        return self.sum_x / len(self.returns)
+
+    def std(self) -> np.ndarray:
+        n = len(self.returns)
+        variance = np.diag(self.sum_xx) / n - self.mean() ** 2
+        return np.sqrt(np.maximum(variance, 0.0))
+
+    def correlation(self, rows: Optional[Sequence[int]] = None, dtype=np.float32) -> np.ndarray:
+        """Correlação (linhas pedidas x universo), montada bloco a bloco"""
+        rows = np.arange(self.n_assets) if rows is None else np.asarray(rows, dtype=np.intp)
+        n = len(self.returns)
+        m = self.mean()
+        s = self.std()
+        inv = np.divide(1.0, s, out=np.zeros_like(s), where=s > 0)  # Sem variância: correlação 0
+
+        out = np.empty((len(rows), self.n_assets), dtype=dtype)
+        for start in range(0, len(rows), self.block):
+            idx = rows[start:start + self.block]
+            block = self.sum_xx[idx] / n
+            block -= m[idx, None] * m
+            block *= inv[idx, None]
+            block *= inv
+            np.clip(block, -1.0, 1.0, out=block)
+            out[start:start + len(idx)] = block
+        has_variance = s[rows] > 0
+        out[np.flatnonzero(has_variance), rows[has_variance]] = 1.0
+        return out
+
+
+class UniverseCorrelation:
+    """Correlação móvel de um universo, com o último pregão para encadear as barras novas"""
+
+    def __init__(self, symbols: List[str], rolling: RollingCorrelation,
+                 last_date: pd.Timestamp, last_closes: np.ndarray):
+        self.symbols = symbols
+        self.rolling = rolling
+        self.last_date = last_date
+        self.last_closes = last_closes
+        self._index = {symbol: i for i, symbol in enumerate(symbols)}
+        self._matrix: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_closes(cls, closes: pd.DataFrame, window: int, memory_budget_mb: float = 64.0,
+                    min_coverage: float = 0.8) -> Optional["UniverseCorrelation"]:
+        """
+        Janela inteira a partir dos fechamentos (pregões x ações, união das
+        datas). Ações com menos de `min_coverage` dos pregões ficam de fora.
+        """
+        closes = finished_sessions(closes.sort_index()).iloc[-(window + 1):]
+        closes = closes.loc[:, closes.notna().mean() >= min_coverage].ffill()
+        if closes.shape[1] < 2 or len(closes) < 3:
+            return None
+        rolling = RollingCorrelation(closes.shape[1], window, memory_budget_mb)
+        rolling.extend(np.diff(np.log(closes.to_numpy(dtype=np.float64)), axis=0))
+        return cls(list(closes.columns), rolling, closes.index[-1], closes.iloc[-1].to_numpy(dtype=np.float64))
+
+    def can_chain(self, closes: pd.DataFrame) -> bool:
+        """As barras recentes cobrem o último pregão conhecido (sem lacuna)"""
+        return not closes.empty and closes.index.min() <= self.last_date
+
+    def apply_closes(self, closes: pd.DataFrame) -> int:
+        """Aplicar só os pregões posteriores ao último conhecido; devolve quantos entraram"""
+        closes = finished_sessions(closes.sort_index())
+        novos = closes[closes.index > self.last_date].reindex(columns=self.symbols)
+        if novos.empty:
+            return 0
+        prices = pd.DataFrame(
+            np.vstack([self.last_closes, novos.to_numpy(dtype=np.float64)]), columns=self.symbols
+        ).ffill().to_numpy()
+        self.rolling.extend(np.diff(np.log(prices), axis=0))
+        self.last_date = novos.index[-1]
+        self.last_closes = prices[-1]
+        self._matrix = None
+        return len(novos)
+
+    def indices(self, symbols: Sequence[str]) -> Tuple[List[int], List[str]]:
+        """Posições no universo e os símbolos que não fazem parte dele"""
+        found = [self._index[s] for s in symbols if s in self._index]
+        return found, [s for s in symbols if s not in self._index]
+
+    def matrix(self) -> np.ndarray:
+        """Matriz completa (float32), em cache até o próximo pregão"""
+        if self._matrix is None:
+            self._matrix = self.rolling.correlation()
+        return self._matrix
+
+    def clusters(self, n_clusters: Optional[int] = None, threshold: Optional[float] = 0.5) -> np.ndarray:
+        """Agrupamento do universo; com SciPy a matriz completa nunca é montada"""
+        n = len(self.symbols)
+        if linkage is None or n < 2:
+            return hierarchical_clusters(self.matrix(), n_clusters, threshold)
+        dist = condensed_distance(self.rolling.correlation, n, self.rolling.block)
+        return _cut(linkage(dist, method="average"), n_clusters, threshold)
+
+    def mean_correlation(self, indices: Sequence[int]) -> float:
+        """Correlação média entre pares distintos das ações, bloco a bloco de linhas"""
+        indices = np.asarray(indices, dtype=np.intp)
+        pairs = len(indices) * (len(indices) - 1)
+        if not pairs:
+            return 1.0
+        total = 0.0
+        for start in range(0, len(indices), self.rolling.block):
+            rows = self.rolling.correlation(indices[start:start + self.rolling.block])
+            total += float(rows[:, indices].sum(dtype=np.float64))
+        return (total - len(indices)) / pairs
+
+
+def _distance(corr: np.ndarray) -> np.ndarray:
+    """√((1 − ρ) / 2) em float64, num único temporário do tamanho da entrada"""
+    dist = np.subtract(1.0, corr, dtype=np.float64)
+    dist *= 0.5
+    np.clip(dist, 0.0, 1.0, out=dist)
+    return np.sqrt(dist, out=dist)
+
+
+def correlation_distance(corr: np.ndarray) -> np.ndarray:
+    """Distância métrica √((1 − ρ) / 2), em [0, 1]"""
+    dist = _distance(np.asarray(corr))
+    np.fill_diagonal(dist, 0.0)
+    return dist
+
+
+def condensed_distance(corr_rows: Callable[[np.ndarray], np.ndarray], n_assets: int,
+                       block: int) -> np.ndarray:
+    """
+    Distância no formato condensado do SciPy (pares i < j, linha a linha),
+    escrita direto no vetor: `corr_rows(linhas)` devolve só (bloco x N).
+    """
+    out = np.empty(n_assets * (n_assets - 1) // 2)
+    pos = 0
+    for start in range(0, n_assets, block):
+        rows = np.arange(start, min(start + block, n_assets))
+        for i, corr_row in zip(rows, corr_rows(rows)):
+            size = n_assets - i - 1
+            out[pos:pos + size] = _distance(corr_row[i + 1:])
+            pos += size
+    return out
+
+
+def clustering_limit(configured: int) -> int:
+    """Maior universo agrupável: o limite configurado, ou o do fallback NumPy sem SciPy"""
+    return configured if linkage is not None else min(configured, NUMPY_LINKAGE_MAX)
+
+
+def _average_linkage(dist: np.ndarray, n_clusters: Optional[int], threshold: Optional[float]) -> np.ndarray:
+    """Ligação média aglomerativa: une o par mais próximo até `n_clusters` ou `threshold`"""
+    n = len(dist)
+    d = dist.copy()
+    np.fill_diagonal(d, np.inf)
+    sizes = np.ones(n)
+    labels = np.arange(n)
+    for _ in range(n - (n_clusters or 1)):
+        i, j = divmod(int(np.argmin(d)), n)
+        if threshold is not None and d[i, j] > threshold:
+            break
+        # Lance-Williams: d(k, i∪j) = (nᵢ d(k, i) + nⱼ d(k, j)) / (nᵢ + nⱼ)
+        merged = (sizes[i] * d[i] + sizes[j] * d[j]) / (sizes[i] + sizes[j])
+        d[i], d[:, i] = merged, merged
+        d[i, i] = np.inf
+        d[j], d[:, j] = np.inf, np.inf
+        sizes[i] += sizes[j]
+        labels[labels == j] = i
+    return np.unique(labels, return_inverse=True)[1] + 1
+
+
+def _cut(tree: np.ndarray, n_clusters: Optional[int], threshold: Optional[float]) -> np.ndarray:
+    if n_clusters:
+        return fcluster(tree, n_clusters, criterion="maxclust")
+    return fcluster(tree, threshold, criterion="distance")
+
+
+def hierarchical_clusters(corr: np.ndarray, n_clusters: Optional[int] = None,
+                          threshold: Optional[float] = 0.5) -> np.ndarray:
+    """Rótulo de grupo (1..k) por ação: `n_clusters` grupos ou corte na distância `threshold`"""
+    corr = np.asarray(corr)
+    n = len(corr)
+    if n < 2:
+        return np.ones(n, dtype=int)
+    if linkage is not None:
+        dist = condensed_distance(lambda rows: corr[rows], n, block_rows(n, 64.0, arrays=1))
+        return _cut(linkage(dist, method="average"), n_clusters, threshold)
+    if n > NUMPY_LINKAGE_MAX:
+        raise ValueError(f"Clustering more than {NUMPY_LINKAGE_MAX} symbols requires SciPy")
+    return _average_linkage(correlation_distance(corr), n_clusters, None if n_clusters else threshold)
+
+
+def least_correlated(rows: np.ndarray, weights: np.ndarray, exclude: Sequence[int],
+                     top_n: int = 10) -> List[Tuple[int, float, float]]:
+    """
+    Candidatos menos correlacionados à carteira: (índice, correlação média
+    ponderada pelos pesos, correlação máxima com alguma posição).
+    """
+    weights = np.abs(np.asarray(weights, dtype=np.float64))
+    weights = weights / weights.sum()
+    weighted = weights @ rows.astype(np.float64)
+    maximum = rows.max(axis=0)
+    candidates = np.setdiff1d(np.arange(rows.shape[1]), exclude)
+    order = candidates[np.lexsort((maximum[candidates], weighted[candidates]))][:top_n]
+    return [(int(i), float(weighted[i]), float(maximum[i])) for i in order]
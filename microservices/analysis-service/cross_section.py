@@ -0,0 +1,211 @@
+"""
+Ranks transversais dos indicadores - Analysis Service
+Percentil (posição média nos empates) e z-score de cada ação por indicador,
+no universo e dentro do setor, guardados em arrays densos (ações x
+indicadores): anexar o contexto relativo a uma resposta é uma leitura O(1).
+Ações sem setor conhecido entram só nos ranks do universo (sem ranks de setor).
+
+A reconstrução completa ordena cada coluna uma vez (job periódico). Entre
+reconstruções, um dado novo atualiza as colunas ordenadas e as somas da
+distribuição e recalcula só a linha da ação; as demais linhas envelhecem no
+máximo 1/N por atualização e são refeitas quando as atualizações passam de
+`stale_fraction` do universo.
+"""
+
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SEM_SETOR = "N/A"
+
+
+class Distribution:
+    """Colunas ordenadas e somas (Σx, Σx²) de um grupo de ações"""
+
+    def __init__(self, n_indicators: int):
+        self.sorted: List[np.ndarray] = [np.empty(0) for _ in range(n_indicators)]
+        self.total = np.zeros(n_indicators)
+        self.total_sq = np.zeros(n_indicators)
+
+    @classmethod
+    def from_matrix(cls, values: np.ndarray) -> "Distribution":
+        dist = cls(values.shape[1])
+        for k in range(values.shape[1]):
+            column = values[:, k]
+            dist.sorted[k] = np.sort(column[~np.isnan(column)])
+        dist.total = np.nansum(values, axis=0)
+        dist.total_sq = np.nansum(values ** 2, axis=0)
+        return dist
+
+    def add(self, row: np.ndarray, sign: int):
+        for k in np.flatnonzero(~np.isnan(row)):
+            column = self.sorted[k]
+            if sign > 0:
+                self.sorted[k] = np.insert(column, np.searchsorted(column, row[k]), row[k])
+            else:
+                self.sorted[k] = np.delete(column, np.searchsorted(column, row[k]))
+            self.total[k] += sign * row[k]
+            self.total_sq[k] += sign * row[k] ** 2
+
+    def rank(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Percentil (0-100) e z-score de cada valor contra o grupo; NaN onde ausente"""
+        values = np.atleast_2d(values)
+        pct = np.full(values.shape, np.nan)
+        z = np.full(values.shape, np.nan)
+        for k, column in enumerate(self.sorted):
+            n = len(column)
+            present = ~np.isnan(values[:, k])
+            if not n or not present.any():
+                continue
+            v = values[present, k]
+            below = np.searchsorted(column, v, "left")
+            upto = np.searchsorted(column, v, "right")
+            pct[present, k] = (below + upto) / (2 * n) * 100
+
+            mean = self.total[k] / n
+            std = np.sqrt(max(self.total_sq[k] / n - mean ** 2, 0.0))
+            z[present, k] = (v - mean) / std if std > 1e-12 * max(abs(mean), 1.0) else 0.0
+        return pct, z
+
+
+class CrossSectionIndex:
+    """Percentis e z-scores por indicador, no universo e no setor, indexados por ação"""
+
+    def __init__(self, nomes: Sequence[str], stale_fraction: float = 0.05, capacity: int = 1024):
+        self.nomes = list(nomes)
+        self.stale_fraction = stale_fraction
+        self._row: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self._sector_names: List[str] = []
+        self._sector_code: Dict[str, int] = {}
+        self.values = np.full((capacity, len(self.nomes)), np.nan)
+        self.sectors = np.zeros(capacity, dtype=np.int32)
+        # Resultado: [percentil, z-score, percentil no setor, z-score no setor]
+        self.ranks = np.full((capacity, 4, len(self.nomes)), np.nan, dtype=np.float32)
+        self._overall = Distribution(len(self.nomes))
+        self._by_sector: Dict[int, Distribution] = {}
+        self.stale = 0
+        self.built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def _has_sector(self, code: int) -> bool:
+        return self._sector_names[code] != SEM_SETOR
+
+    def _code(self, setor: Optional[str]) -> int:
+        setor = setor or SEM_SETOR
+        if setor not in self._sector_code:
+            self._sector_code[setor] = len(self._sector_names)
+            self._sector_names.append(setor)
+        return self._sector_code[setor]
+
+    def _new_row(self, symbol: str) -> int:
+        row = len(self._symbols)
+        if row == len(self.values):
+            capacity = 2 * len(self.values)
+            self.values = np.vstack([self.values, np.full_like(self.values, np.nan)])
+            self.sectors = np.concatenate([self.sectors, np.zeros_like(self.sectors)])
+            ranks = np.full((capacity, 4, len(self.nomes)), np.nan, dtype=np.float32)
+            ranks[:row] = self.ranks
+            self.ranks = ranks
+        self._row[symbol] = row
+        self._symbols.append(symbol)
+        return row
+
+    def load(self, rows: Iterable[Tuple[str, Optional[str], np.ndarray]]):
+        """Carga em lote (sem atualização incremental) seguida da reconstrução"""
+        for symbol, setor, values in rows:
+            row = self._row.get(symbol)
+            if row is None:
+                row = self._new_row(symbol)
+            self.values[row] = values
+            self.sectors[row] = self._code(setor)
+        self.rebuild()
+
+    def rebuild(self):
+        """Reordenar todas as colunas e refazer os ranks de todas as ações"""
+        n = len(self._symbols)
+        values = self.values[:n]
+        self._overall = Distribution.from_matrix(values)
+        pct, z = self._overall.rank(values)
+        self.ranks[:n, 0], self.ranks[:n, 1] = pct, z
+
+        self._by_sector = {}
+        codes = self.sectors[:n]
+        for code in np.unique(codes):
+            idx = np.flatnonzero(codes == code)
+            if not self._has_sector(code):
+                self.ranks[idx, 2:] = np.nan
+                continue
+            dist = self._by_sector[int(code)] = Distribution.from_matrix(values[idx])
+            pct, z = dist.rank(values[idx])
+            self.ranks[idx, 2], self.ranks[idx, 3] = pct, z
+
+        self.stale = 0
+        self.built_at = time.time()
+
+    def update(self, symbol: str, setor: Optional[str], values: np.ndarray) -> bool:
+        """Trocar os valores da ação e recalcular a sua linha; False quando nada mudou"""
+        values = np.asarray(values, dtype=np.float64)
+        code = self._code(setor)
+        row = self._row.get(symbol)
+        if row is None:
+            row = self._new_row(symbol)
+        else:
+            old = self.values[row]
+            old_code = int(self.sectors[row])
+            if old_code == code and np.array_equal(old, values, equal_nan=True):
+                return False
+            self._overall.add(old, -1)
+            if self._has_sector(old_code):
+                self._by_sector[old_code].add(old, -1)
+
+        self.values[row] = values
+        self.sectors[row] = code
+        self._overall.add(values, +1)
+        pct, z = self._overall.rank(values)
+        self.ranks[row, 0], self.ranks[row, 1] = pct[0], z[0]
+
+        if self._has_sector(code):
+            sector = self._by_sector.setdefault(code, Distribution(len(self.nomes)))
+            sector.add(values, +1)
+            pct, z = sector.rank(values)
+            self.ranks[row, 2], self.ranks[row, 3] = pct[0], z[0]
+        else:
+            self.ranks[row, 2:] = np.nan
+
+        self.stale += 1
+        if self.stale > self.stale_fraction * len(self._symbols):
+            self.rebuild()
+        return True
+
+    def lookup(self, symbol: str) -> Optional[Dict[str, Dict[str, Optional[float]]]]:
+        """Ranks de cada indicador presente da ação (None se ela não está no índice)"""
+        row = self._row.get(symbol)
+        if row is None:
+            return None
+        ranks = self.ranks[row]
+        saida = {}
+        for k, nome in enumerate(self.nomes):
+            if np.isnan(ranks[0, k]):
+                continue
+            percentil, z_score, percentil_setor, z_score_setor = (
+                None if np.isnan(v) else round(float(v), 2) for v in ranks[:, k]
+            )
+            saida[nome] = {
+                "percentil": percentil,
+                "z_score": z_score,
+                "percentil_setor": percentil_setor,
+                "z_score_setor": z_score_setor,
+            }
+        return saida
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "symbols": len(self._symbols),
+            "setores": len(self._by_sector),
+            "atualizacoes_pendentes": self.stale,
+            "reconstruido_em": self.built_at,
+        }
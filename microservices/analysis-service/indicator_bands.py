@@ -0,0 +1,211 @@
+"""
+Faixas de pontuação dos indicadores fundamentalistas - Analysis Service
+Tabela declarativa: para cada indicador, os limites numéricos das faixas e,
+por faixa, o score e o id da mensagem. A avaliação é uma única operação
+NumPy sobre a matriz (ações x indicadores); o texto das mensagens só é
+resolvido na serialização.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class IndicatorBand:
+    nome: str
+    campo: str  # Atributo de DadosFinanceiros
+    categoria: str
+    limites: Tuple[float, ...]  # Crescentes; len(scores) == len(limites) + 1
+    scores: Tuple[float, ...]
+    mensagens: Tuple[str, ...]
+    # True: o limite pertence à faixa de baixo (x > limite sobe de faixa);
+    # False: pertence à faixa de cima (x < limite fica embaixo)
+    limite_inclusivo: bool = True
+
+
+INDICATOR_BANDS: Tuple[IndicatorBand, ...] = (
+    # Rentabilidade
+    IndicatorBand("ROE", "roe", "rentabilidade", (10, 15, 20), (40, 60, 75, 90),
+                  ("roe.baixo", "roe.razoavel", "roe.bom", "roe.excelente")),
+    IndicatorBand("ROA", "roa", "rentabilidade", (2, 5, 10), (40, 60, 75, 90),
+                  ("roa.baixo", "roa.razoavel", "roa.bom", "roa.excelente")),
+    IndicatorBand("ROIC", "roic", "rentabilidade", (5, 10, 15), (40, 60, 75, 90),
+                  ("roic.baixo", "roic.razoavel", "roic.bom", "roic.excelente")),
+    # Valuation
+    IndicatorBand("P/E", "pe_ratio", "valuation", (10, 15, 25, 35), (60, 80, 60, 40, 25),
+                  ("pe.muito_baixo", "pe.baixo", "pe.razoavel", "pe.alto", "pe.muito_alto"), False),
+    IndicatorBand("P/B", "pb_ratio", "valuation", (1, 1.5, 3), (70, 80, 60, 40),
+                  ("pb.muito_baixo", "pb.baixo", "pb.razoavel", "pb.alto"), False),
+    IndicatorBand("P/S", "ps_ratio", "valuation", (1, 2, 5), (75, 75, 60, 40),
+                  ("ps.muito_baixo", "ps.baixo", "ps.razoavel", "ps.alto"), False),
+    IndicatorBand("EV/EBITDA", "ev_ebitda", "valuation", (8, 12, 20), (80, 60, 40, 25),
+                  ("ev_ebitda.baixo", "ev_ebitda.razoavel", "ev_ebitda.alto", "ev_ebitda.muito_alto"), False),
+    IndicatorBand("PEG", "peg_ratio", "valuation", (0.5, 1, 1.5), (90, 75, 60, 40),
+                  ("peg.excelente", "peg.bom", "peg.razoavel", "peg.alto"), False),
+    # Endividamento
+    IndicatorBand("Debt/Equity", "debt_to_equity", "endividamento", (0.3, 0.6, 1), (90, 75, 50, 25),
+                  ("debt_equity.baixo", "debt_equity.moderado", "debt_equity.alto", "debt_equity.muito_alto"), False),
+    # Liquidez
+    IndicatorBand("Current Ratio", "current_ratio", "liquidez", (1, 1.5, 2), (40, 60, 75, 90),
+                  ("current_ratio.baixo", "current_ratio.razoavel", "current_ratio.bom", "current_ratio.excelente")),
+    IndicatorBand("Quick Ratio", "quick_ratio", "liquidez", (0.8, 1, 1.5), (40, 60, 75, 90),
+                  ("quick_ratio.baixo", "quick_ratio.razoavel", "quick_ratio.bom", "quick_ratio.excelente")),
+    # Dividendos
+    IndicatorBand("Dividend Yield", "dividend_yield", "dividendos", (2, 4, 6), (50, 60, 75, 80),
+                  ("dividend_yield.baixo", "dividend_yield.moderado", "dividend_yield.alto", "dividend_yield.muito_alto")),
+    IndicatorBand("Payout Ratio", "payout_ratio", "dividendos", (30, 60, 80), (55, 75, 60, 35),
+                  ("payout.baixo", "payout.moderado", "payout.alto", "payout.muito_alto"), False),
+)
+
+MENSAGENS: Dict[str, str] = {
+    "roe.excelente": "Excelente - ROE muito alto indica alta rentabilidade",
+    "roe.bom": "Bom - ROE acima da média do mercado",
+    "roe.razoavel": "Razoável - ROE dentro da média",
+    "roe.baixo": "Baixo - ROE abaixo da média, pode indicar ineficiência",
+    "roa.excelente": "Excelente - Empresa muito eficiente no uso dos ativos",
+    "roa.bom": "Bom - Boa eficiência no uso dos ativos",
+    "roa.razoavel": "Razoável - Eficiência moderada",
+    "roa.baixo": "Baixo - Baixa eficiência no uso dos ativos",
+    "roic.excelente": "Excelente - Muito eficiente na geração de valor",
+    "roic.bom": "Bom - Boa geração de valor sobre o capital investido",
+    "roic.razoavel": "Razoável - Geração de valor moderada",
+    "roic.baixo": "Baixo - Baixa geração de valor",
+    "pe.muito_baixo": "Muito baixo - Pode indicar subvalorização ou problemas",
+    "pe.baixo": "Baixo - Potencialmente atrativo",
+    "pe.razoavel": "Razoável - Dentro da média do mercado",
+    "pe.alto": "Alto - Expectativas de crescimento elevadas",
+    "pe.muito_alto": "Muito alto - Pode indicar sobrevalorização",
+    "pb.muito_baixo": "Muito baixo - Negociando abaixo do valor patrimonial",
+    "pb.baixo": "Baixo - Potencialmente atrativo",
+    "pb.razoavel": "Razoável - Dentro da média",
+    "pb.alto": "Alto - Pode indicar sobrevalorização",
+    "ps.muito_baixo": "Muito baixo - Potencialmente subvalorizada",
+    "ps.baixo": "Baixo - Atrativo em relação à receita",
+    "ps.razoavel": "Razoável - Múltiplo moderado",
+    "ps.alto": "Alto - Múltiplo elevado em relação à receita",
+    "ev_ebitda.baixo": "Baixo - Potencialmente atrativo",
+    "ev_ebitda.razoavel": "Razoável - Múltiplo moderado",
+    "ev_ebitda.alto": "Alto - Múltiplo elevado",
+    "ev_ebitda.muito_alto": "Muito alto - Pode indicar sobrevalorização",
+    "peg.excelente": "Excelente - Crescimento a preço muito atrativo",
+    "peg.bom": "Bom - Crescimento a preço razoável",
+    "peg.razoavel": "Razoável - Crescimento a preço justo",
+    "peg.alto": "Alto - Crescimento caro",
+    "debt_equity.baixo": "Baixo - Endividamento muito controlado",
+    "debt_equity.moderado": "Moderado - Endividamento razoável",
+    "debt_equity.alto": "Alto - Endividamento elevado mas controlado",
+    "debt_equity.muito_alto": "Muito alto - Endividamento preocupante",
+    "current_ratio.excelente": "Excelente - Muito boa liquidez corrente",
+    "current_ratio.bom": "Bom - Boa liquidez corrente",
+    "current_ratio.razoavel": "Razoável - Liquidez adequada",
+    "current_ratio.baixo": "Baixo - Liquidez insuficiente",
+    "quick_ratio.excelente": "Excelente - Muito boa liquidez imediata",
+    "quick_ratio.bom": "Bom - Boa liquidez imediata",
+    "quick_ratio.razoavel": "Razoável - Liquidez adequada",
+    "quick_ratio.baixo": "Baixo - Liquidez imediata insuficiente",
+    "dividend_yield.muito_alto": "Muito alto - Excelente para renda, verificar sustentabilidade",
+    "dividend_yield.alto": "Alto - Bom para geração de renda",
+    "dividend_yield.moderado": "Moderado - Dividendos razoáveis",
+    "dividend_yield.baixo": "Baixo - Foco em crescimento, não em renda",
+    "payout.baixo": "Baixo - Empresa retém a maioria dos lucros",
+    "payout.moderado": "Moderado - Equilíbrio entre distribuição e retenção",
+    "payout.alto": "Alto - Distribui a maior parte dos lucros",
+    "payout.muito_alto": "Muito alto - Pode comprometer crescimento futuro",
+}
+
+# Resumo pelo score geral: (score mínimo, texto), do maior para o menor
+RESUMOS: Tuple[Tuple[float, str], ...] = (
+    (80, "Empresa com indicadores fundamentalistas excelentes"),
+    (70, "Empresa com bons indicadores fundamentalistas"),
+    (60, "Empresa com indicadores fundamentalistas razoáveis"),
+    (float("-inf"), "Empresa com indicadores fundamentalistas fracos"),
+)
+
+
+def mensagem(mensagem_id: str) -> str:
+    return MENSAGENS.get(mensagem_id, mensagem_id)
+
+
+def resumo(score_geral: float) -> str:
+    return next(texto for minimo, texto in RESUMOS if score_geral >= minimo)
+
+
+class BandTable:
+    """Tabela de faixas compilada em matrizes (indicadores x faixas)"""
+
+    def __init__(self, bands: Sequence[IndicatorBand] = INDICATOR_BANDS):
+        self.bands = tuple(bands)
+        for band in self.bands:
+            if not (len(band.scores) == len(band.mensagens) == len(band.limites) + 1):
+                raise ValueError(f"Inconsistent bands for {band.nome}")
+
+        width = max(len(band.limites) for band in self.bands)
+        # Limites completados com +inf (nunca ultrapassados)
+        self.limites = np.full((len(self.bands), width), np.inf)
+        self.scores = np.zeros((len(self.bands), width + 1))
+        self.mensagens = np.full((len(self.bands), width + 1), "", dtype=object)
+        for i, band in enumerate(self.bands):
+            self.limites[i, :len(band.limites)] = band.limites
+            self.scores[i, :len(band.scores)] = band.scores
+            self.mensagens[i, :len(band.mensagens)] = band.mensagens
+        self.inclusivo = np.array([band.limite_inclusivo for band in self.bands])
+
+    def values(self, dados: Sequence[Any]) -> np.ndarray:
+        """Matriz (ações x indicadores); ausentes, não finitos e zerados viram NaN"""
+        matrix = np.array(
+            [[getattr(item, band.campo, None) for band in self.bands] for item in dados],
+            dtype=np.float64
+        ).reshape(len(dados), len(self.bands))
+        matrix[matrix == 0] = np.nan  # Zero vem de campo não informado pelo provedor
+        matrix[~np.isfinite(matrix)] = np.nan
+        return matrix
+
+    def evaluate(self, values: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Faixa, score e id da mensagem para cada (ação, indicador), mais o score
+        geral de cada ação (média dos indicadores presentes; 0 sem nenhum).
+        """
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        present = ~np.isnan(values)
+        x = values[:, :, None]
+        # Faixa = quantos limites o valor ultrapassa
+        crossed = np.where(self.inclusivo[None, :, None], x > self.limites, x >= self.limites)
+        bands = crossed.sum(axis=2)
+
+        rows = np.arange(len(self.bands))[None, :]
+        scores = np.where(present, self.scores[rows, bands], np.nan)
+        counts = present.sum(axis=1)
+        totals = np.where(present, scores, 0.0).sum(axis=1)
+        score_geral = np.divide(totals, counts, out=np.zeros(len(values)), where=counts > 0)
+
+        return {
+            "present": present,
+            "bands": bands,
+            "scores": scores,
+            "mensagens": self.mensagens[rows, bands],
+            "score_geral": score_geral,
+        }
+
+    def interpret(self, dados: Sequence[Any]) -> List[Dict[str, Any]]:
+        """Resultado por ação com ids de mensagem (o texto fica para a serialização)"""
+        values = self.values(dados)
+        result = self.evaluate(values)
+        saida = []
+        for n in range(len(dados)):
+            indicadores = [
+                {
+                    "nome": band.nome,
+                    "valor": float(values[n, k]),
+                    "categoria": band.categoria,
+                    "score": float(result["scores"][n, k]),
+                    "mensagem_id": result["mensagens"][n, k],
+                }
+                for k, band in enumerate(self.bands) if result["present"][n, k]
+            ]
+            saida.append({"indicadores": indicadores, "score_geral": float(result["score_geral"][n])})
+        return saida
+
+
+BAND_TABLE = BandTable()
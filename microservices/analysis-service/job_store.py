@@ -0,0 +1,148 @@
+"""
+Estado dos jobs de análise assíncrona - Analysis Service
+Cada `request_id` aponta para um slot de resultado; pedidos idênticos (mesmo
+símbolo e tipo) feitos enquanto um slot está em andamento entram no mesmo
+slot, sem nova mensagem no Kafka. Tudo expira no Redis após `ttl`.
+
+Chaves:
+- job:<request_id>            hash: slot, symbol, analysis_type, user_id, created_at
+- job_slot:<slot>             hash: status, result (JSON), error, updated_at
+- job_slot:<slot>:requests    set: pedidos ligados ao slot ({"request_id", "user_id"})
+- job_inflight:<SÍMBOLO>:<tipo> slot em andamento para o par
+"""
+
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+# Métricas Prometheus
+JOBS_SUBMITTED = Counter('analysis_jobs_submitted_total', 'Async analysis jobs', ['shared'])
+
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL = (COMPLETED, FAILED)
+
+
+class JobStore:
+    """Status por pedido e resultado compartilhado por slot, com long-polling"""
+
+    def __init__(self, redis_client, ttl: int = 3600, inflight_ttl: int = 300):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.inflight_ttl = inflight_ttl  # Limite para um slot travado segurar novos pedidos
+        self._waiters: Dict[str, asyncio.Event] = {}
+
+    @staticmethod
+    def _job_key(request_id: str) -> str:
+        return f"job:{request_id}"
+
+    @staticmethod
+    def _slot_key(slot: str) -> str:
+        return f"job_slot:{slot}"
+
+    @staticmethod
+    def _inflight_key(symbol: str, analysis_type: str) -> str:
+        return f"job_inflight:{symbol.strip().upper()}:{analysis_type}"
+
+    def submit(self, request_id: str, symbol: str, analysis_type: str, user_id: str) -> Tuple[str, bool]:
+        """Registrar o pedido; devolve o slot e se ele já estava em andamento"""
+        now = datetime.utcnow().isoformat()
+        inflight_key = self._inflight_key(symbol, analysis_type)
+        slot, shared = uuid.uuid4().hex, False
+        if not self.redis.set(inflight_key, slot, nx=True, ex=self.inflight_ttl):
+            existing = self.redis.get(inflight_key)
+            if existing and self.redis.hget(self._slot_key(existing), "status") in (QUEUED, PROCESSING):
+                slot, shared = existing, True
+            else:
+                self.redis.set(inflight_key, slot, ex=self.inflight_ttl)
+
+        pipe = self.redis.pipeline()
+        if not shared:
+            pipe.hset(self._slot_key(slot), mapping={"status": QUEUED, "updated_at": now})
+            pipe.expire(self._slot_key(slot), self.ttl)
+        pipe.hset(self._job_key(request_id), mapping={
+            "slot": slot, "symbol": symbol, "analysis_type": analysis_type, "user_id": user_id, "created_at": now
+        })
+        pipe.expire(self._job_key(request_id), self.ttl)
+        pipe.sadd(f"{self._slot_key(slot)}:requests", json.dumps({"request_id": request_id, "user_id": user_id}))
+        pipe.expire(f"{self._slot_key(slot)}:requests", self.ttl)
+        pipe.execute()
+
+        JOBS_SUBMITTED.labels(shared=str(shared).lower()).inc()
+        return slot, shared
+
+    def requests(self, slot: str) -> List[Dict[str, Any]]:
+        """Pedidos ligados ao slot (todos recebem o resultado)"""
+        return [json.loads(member) for member in self.redis.smembers(f"{self._slot_key(slot)}:requests")]
+
+    def _update(self, slot: str, fields: Dict[str, str], symbol: Optional[str] = None,
+                analysis_type: Optional[str] = None):
+        fields = {**fields, "updated_at": datetime.utcnow().isoformat()}
+        pipe = self.redis.pipeline()
+        pipe.hset(self._slot_key(slot), mapping=fields)
+        pipe.expire(self._slot_key(slot), self.ttl)
+        pipe.execute()
+
+        if fields["status"] in TERMINAL:
+            if symbol and analysis_type:
+                inflight_key = self._inflight_key(symbol, analysis_type)
+                if self.redis.get(inflight_key) == slot:
+                    self.redis.delete(inflight_key)
+            event = self._waiters.pop(slot, None)
+            if event is not None:
+                event.set()
+
+    def start(self, slot: str):
+        self._update(slot, {"status": PROCESSING})
+
+    def complete(self, slot: str, result: Dict[str, Any], symbol: str, analysis_type: str):
+        self._update(slot, {"status": COMPLETED, "result": json.dumps(result, default=str)}, symbol, analysis_type)
+
+    def fail(self, slot: str, error: str, symbol: str, analysis_type: str):
+        self._update(slot, {"status": FAILED, "error": error}, symbol, analysis_type)
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        job = self.redis.hgetall(self._job_key(request_id))
+        if not job:
+            return None
+        slot = self.redis.hgetall(self._slot_key(job["slot"]))
+        return {
+            "request_id": request_id,
+            "symbol": job["symbol"],
+            "analysis_type": job["analysis_type"],
+            "status": slot.get("status", FAILED if not slot else QUEUED),
+            "result": json.loads(slot["result"]) if "result" in slot else None,
+            "error": slot.get("error") or (None if slot else "Job result expired"),
+            "created_at": job["created_at"],
+            "updated_at": slot.get("updated_at"),
+            "slot": job["slot"],
+        }
+
+    async def wait(self, request_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Long-polling: devolve assim que o job terminar ou o tempo acabar. Slots
+        concluídos neste processo acordam na hora; os demais (outra réplica)
+        são vistos por leituras espaçadas com backoff.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        delay = 0.05
+        while True:
+            job = self.get(request_id)
+            remaining = deadline - loop.time()
+            if job is None or job["status"] in TERMINAL or remaining <= 0:
+                if job is not None:
+                    self._waiters.pop(job["slot"], None)  # Outros waiters recriam na próxima volta
+                return job
+            event = self._waiters.setdefault(job["slot"], asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), min(delay, remaining))
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, 1.0)
@@ -15,10 +15,12 @@ import structlog
 import time
 import redis
 import json
+import hashlib
 import httpx
 import numpy as np
 import pandas as pd
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any, Tuple
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 import asyncio
@@ -28,6 +30,18 @@ sys.path.append('/app')
 sys.path.append('/app/microservices/shared')
 
 from shared.models.dto import DadosFinanceiros
+from shared.cache.tags import TagIndex, symbol_tag, type_tag
+from shared.models.history_codec import MSGPACK_MEDIA_TYPE, decode_history_msgpack
+from shared.http_client import create_pool
+from risk_engine import RiskEngine, align_closes, benchmark_for, finished_sessions
+from portfolio_risk import RollingCovariance, history_period, new_returns, normalize_weights, portfolio_risk
+from comparison import chunked, indicator_field, indicator_values, rank_values
+from indicator_bands import BAND_TABLE, mensagem, resumo
+from valuation import DCFAssumptions, DCFEngine, value_stocks
+from sector_aggregates import SectorAggregates
+from cross_section import CrossSectionIndex
+from correlation import UniverseCorrelation, clustering_limit, least_correlated
+from token_verifier import TokenVerifier
 
 # Configuração de logging
 structlog.configure(
@@ -63,6 +77,37 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
+# Tags de invalidação (symbol:<SÍMBOLO>, type:<tipo de análise>)
+cache_tags = TagIndex(redis_client)
+
+# Universo de ações publicado por src/database/import_acoes.py no DB do Data Service
+SYMBOL_UNIVERSE_KEY = "symbols:universe"
+SYMBOL_UNIVERSE_TTL = float(os.getenv("SYMBOL_UNIVERSE_TTL", "3600"))
+universe_client = redis.Redis(
+    host=os.getenv("REDIS_HOST", "redis"),
+    port=int(os.getenv("REDIS_PORT", "6379")),
+    db=int(os.getenv("DATA_REDIS_DB", "1")),
+    decode_responses=True
+)
+symbol_universe_cache: Tuple[float, Dict[str, Dict[str, Any]]] = (0.0, {})
+
+def symbol_universe() -> Dict[str, Dict[str, Any]]:
+    """Ações importadas (formato de Acao.to_dict()) por símbolo, relidas a cada SYMBOL_UNIVERSE_TTL"""
+    global symbol_universe_cache
+    loaded_at, universe = symbol_universe_cache
+    if universe and time.time() - loaded_at < SYMBOL_UNIVERSE_TTL:
+        return universe
+    try:
+        raw = universe_client.hgetall(SYMBOL_UNIVERSE_KEY)
+        universe = {symbol.upper(): json.loads(item) for symbol, item in raw.items()}
+        symbol_universe_cache = (time.time(), universe)
+    except Exception as e:
+        logger.error("Symbol universe load failed", error=str(e))
+    return universe
+
+# Pool HTTP para o Data Service (aberto no startup, fechado no shutdown)
+http_pool = create_pool("analysis-service", timeout=15.0)
+
 # FastAPI app
 app = FastAPI(
     title="Agente Investidor - Analysis Service",
@@ -85,6 +130,13 @@ class IndicadorFundamentalista(BaseModel):
     valor: float
     interpretacao: str
     categoria: str  # "rentabilidade", "liquidez", "endividamento", "eficiencia"
+    score: Optional[float] = None
+    mensagem_id: Optional[str] = None
+    # Posição relativa (universo e setor), do índice de ranks transversais
+    percentil: Optional[float] = None
+    z_score: Optional[float] = None
+    percentil_setor: Optional[float] = None
+    z_score_setor: Optional[float] = None
 
 class AnaliseIndicadores(BaseModel):
     symbol: str
@@ -99,6 +151,9 @@ class AnaliseComparativa(BaseModel):
     valores: Dict[str, float]
     ranking: List[Dict[str, Any]]
     media_setor: Optional[float] = None
+    estatisticas: Dict[str, Any] = Field(default_factory=dict)
+    estatisticas_setor: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    ausentes: List[str] = Field(default_factory=list)
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class AnaliseSetorial(BaseModel):
@@ -106,370 +161,319 @@ class AnaliseSetorial(BaseModel):
     symbols: List[str]
     indicadores_medios: Dict[str, float]
     melhores_empresas: List[Dict[str, Any]]
+    indicadores_medianos: Dict[str, float] = Field(default_factory=dict)
+    percentis: Dict[str, Dict[str, float]] = Field(default_factory=dict)
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class AnaliseRisco(BaseModel):
     symbol: str
     volatilidade: float
     beta: float
-    var_95: float  # Value at Risk 95%
+    var_95: float  # Value at Risk 95% (histórico, perda % em 1 dia)
+    var_95_parametrico: Optional[float] = None
+    var_95_monte_carlo: Optional[float] = None
+    cvar_95: Optional[float] = None  # Perda média além do VaR
+    max_drawdown: Optional[float] = None
     sharpe_ratio: Optional[float] = None
+    sortino_ratio: Optional[float] = None
+    benchmark: Optional[str] = None
     classificacao_risco: str  # "Baixo", "Moderado", "Alto"
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+class PosicaoCarteira(BaseModel):
+    symbol: str
+    peso: float
+
+class PortfolioRiskRequest(BaseModel):
+    posicoes: List[PosicaoCarteira]
+    janela: int = Field(252, ge=20, le=1260)  # Pregões usados na covariância
+    confianca: float = Field(0.95, gt=0.5, lt=1.0)
+
+class AnaliseRiscoCarteira(BaseModel):
+    symbols: List[str]
+    pesos: Dict[str, float]
+    volatilidade: float  # Anualizada, %
+    volatilidade_diaria: float
+    var: float  # VaR paramétrico de 1 dia, perda %
+    confianca: float
+    var_componente: Dict[str, float]  # Soma = VaR da carteira
+    contribuicao_marginal: Dict[str, float]
+    contribuicao_risco_pct: Dict[str, float]  # Soma = 100
+    razao_diversificacao: float
+    shrinkage: float  # Intensidade Ledoit-Wolf
+    janela: int
+    observacoes: int
+    ultimo_pregao: str
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class CorrelacaoRequest(BaseModel):
+    symbols: Optional[List[str]] = None  # Universo (padrão: universo configurado)
+    janela: int = Field(252, ge=20, le=1260)
+
+class ClusterRequest(CorrelacaoRequest):
+    n_clusters: Optional[int] = Field(None, ge=1)
+    limiar: float = Field(0.5, gt=0, le=1)  # Corte na distância √((1 − ρ) / 2)
+
+class DiversificacaoRequest(CorrelacaoRequest):
+    posicoes: List[PosicaoCarteira]
+    top_n: int = Field(10, ge=1, le=100)
+
+class MatrizCorrelacao(BaseModel):
+    symbols: List[str]
+    matriz: List[List[float]]
+    janela: int
+    observacoes: int
+    ultimo_pregao: str
+    ausentes: List[str] = Field(default_factory=list)  # Sem histórico suficiente
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class ClusterCorrelacao(BaseModel):
+    id: int
+    symbols: List[str]
+    correlacao_media: float  # Média entre pares do grupo
+
+class ClustersCorrelacao(BaseModel):
+    clusters: List[ClusterCorrelacao]
+    janela: int
+    observacoes: int
+    ultimo_pregao: str
+    ausentes: List[str] = Field(default_factory=list)
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class SugestaoDiversificacao(BaseModel):
+    symbol: str
+    correlacao_media: float  # Ponderada pelos pesos da carteira
+    correlacao_maxima: float
+
+class SugestoesDiversificacao(BaseModel):
+    carteira: List[str]
+    correlacao_media_carteira: float  # Média entre pares das posições
+    sugestoes: List[SugestaoDiversificacao]
+    janela: int
+    observacoes: int
+    ultimo_pregao: str
+    ausentes: List[str] = Field(default_factory=list)
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
 class AnaliseValuation(BaseModel):
     symbol: str
     preco_atual: float
     preco_justo_dcf: Optional[float] = None
     preco_justo_multiplos: Optional[float] = None
     margem_seguranca: Optional[float] = None
+    percentis_dcf: Dict[str, float] = Field(default_factory=dict)
+    probabilidade_subvalorizada: Optional[float] = None
     recomendacao: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 # Calculadora de Indicadores Fundamentalistas
 class CalculadoraIndicadores:
     
+    # Faixas numéricas por indicador (score e mensagem por faixa)
+    tabela = BAND_TABLE
+    
     @staticmethod
     def calcular_todos_indicadores(dados: DadosFinanceiros) -> List[IndicadorFundamentalista]:
         """Calcular todos os indicadores fundamentalistas"""
-        indicadores = []
-        
-        # Indicadores de Rentabilidade
-        if dados.roe:
-            interpretacao = CalculadoraIndicadores._interpretar_roe(dados.roe)
-            indicadores.append(IndicadorFundamentalista(
-                nome="ROE",
-                valor=dados.roe,
-                interpretacao=interpretacao,
-                categoria="rentabilidade"
-            ))
-        
-        if dados.roa:
-            interpretacao = CalculadoraIndicadores._interpretar_roa(dados.roa)
-            indicadores.append(IndicadorFundamentalista(
-                nome="ROA",
-                valor=dados.roa,
-                interpretacao=interpretacao,
-                categoria="rentabilidade"
-            ))
-        
-        if dados.roic:
-            interpretacao = CalculadoraIndicadores._interpretar_roic(dados.roic)
-            indicadores.append(IndicadorFundamentalista(
-                nome="ROIC",
-                valor=dados.roic,
-                interpretacao=interpretacao,
-                categoria="rentabilidade"
-            ))
-        
-        # Indicadores de Valuation
-        if dados.pe_ratio:
-            interpretacao = CalculadoraIndicadores._interpretar_pe(dados.pe_ratio)
-            indicadores.append(IndicadorFundamentalista(
-                nome="P/E",
-                valor=dados.pe_ratio,
-                interpretacao=interpretacao,
-                categoria="valuation"
-            ))
-        
-        if dados.pb_ratio:
-            interpretacao = CalculadoraIndicadores._interpretar_pb(dados.pb_ratio)
-            indicadores.append(IndicadorFundamentalista(
-                nome="P/B",
-                valor=dados.pb_ratio,
-                interpretacao=interpretacao,
-                categoria="valuation"
-            ))
-        
-        if dados.ps_ratio:
-            interpretacao = CalculadoraIndicadores._interpretar_ps(dados.ps_ratio)
-            indicadores.append(IndicadorFundamentalista(
-                nome="P/S",
-                valor=dados.ps_ratio,
-                interpretacao=interpretacao,
-                categoria="valuation"
-            ))
-        
-        if dados.ev_ebitda:
-            interpretacao = CalculadoraIndicadores._interpretar_ev_ebitda(dados.ev_ebitda)
-            indicadores.append(IndicadorFundamentalista(
-                nome="EV/EBITDA",
-                valor=dados.ev_ebitda,
-                interpretacao=interpretacao,
-                categoria="valuation"
-            ))
-        
-        if dados.peg_ratio:
-            interpretacao = CalculadoraIndicadores._interpretar_peg(dados.peg_ratio)
-            indicadores.append(IndicadorFundamentalista(
-                nome="PEG",
-                valor=dados.peg_ratio,
-                interpretacao=interpretacao,
-                categoria="valuation"
-            ))
-        
-        # Indicadores de Endividamento
-        if dados.debt_to_equity:
-            interpretacao = CalculadoraIndicadores._interpretar_debt_equity(dados.debt_to_equity)
-            indicadores.append(IndicadorFundamentalista(
-                nome="Debt/Equity",
-                valor=dados.debt_to_equity,
-                interpretacao=interpretacao,
-                categoria="endividamento"
-            ))
-        
-        # Indicadores de Liquidez
-        if dados.current_ratio:
-            interpretacao = CalculadoraIndicadores._interpretar_current_ratio(dados.current_ratio)
-            indicadores.append(IndicadorFundamentalista(
-                nome="Current Ratio",
-                valor=dados.current_ratio,
-                interpretacao=interpretacao,
-                categoria="liquidez"
-            ))
-        
-        if dados.quick_ratio:
-            interpretacao = CalculadoraIndicadores._interpretar_quick_ratio(dados.quick_ratio)
-            indicadores.append(IndicadorFundamentalista(
-                nome="Quick Ratio",
-                valor=dados.quick_ratio,
-                interpretacao=interpretacao,
-                categoria="liquidez"
-            ))
-        
-        # Indicadores de Dividendos
-        if dados.dividend_yield:
-            interpretacao = CalculadoraIndicadores._interpretar_dividend_yield(dados.dividend_yield)
-            indicadores.append(IndicadorFundamentalista(
-                nome="Dividend Yield",
-                valor=dados.dividend_yield,
-                interpretacao=interpretacao,
-                categoria="dividendos"
-            ))
-        
-        if dados.payout_ratio:
-            interpretacao = CalculadoraIndicadores._interpretar_payout_ratio(dados.payout_ratio)
-            indicadores.append(IndicadorFundamentalista(
-                nome="Payout Ratio",
-                valor=dados.payout_ratio,
-                interpretacao=interpretacao,
-                categoria="dividendos"
-            ))
-        
-        return indicadores
-    
-    @staticmethod
-    def _interpretar_roe(roe: float) -> str:
-        if roe > 20:
-            return "Excelente - ROE muito alto indica alta rentabilidade"
-        elif roe > 15:
-            return "Bom - ROE acima da média do mercado"
-        elif roe > 10:
-            return "Razoável - ROE dentro da média"
-        else:
-            return "Baixo - ROE abaixo da média, pode indicar ineficiência"
-    
-    @staticmethod
-    def _interpretar_roa(roa: float) -> str:
-        if roa > 10:
-            return "Excelente - Empresa muito eficiente no uso dos ativos"
-        elif roa > 5:
-            return "Bom - Boa eficiência no uso dos ativos"
-        elif roa > 2:
-            return "Razoável - Eficiência moderada"
-        else:
-            return "Baixo - Baixa eficiência no uso dos ativos"
-    
-    @staticmethod
-    def _interpretar_roic(roic: float) -> str:
-        if roic > 15:
-            return "Excelente - Muito eficiente na geração de valor"
-        elif roic > 10:
-            return "Bom - Boa geração de valor sobre o capital investido"
-        elif roic > 5:
-            return "Razoável - Geração de valor moderada"
-        else:
-            return "Baixo - Baixa geração de valor"
-    
-    @staticmethod
-    def _interpretar_pe(pe: float) -> str:
-        if pe < 10:
-            return "Muito baixo - Pode indicar subvalorização ou problemas"
-        elif pe < 15:
-            return "Baixo - Potencialmente atrativo"
-        elif pe < 25:
-            return "Razoável - Dentro da média do mercado"
-        elif pe < 35:
-            return "Alto - Expectativas de crescimento elevadas"
-        else:
-            return "Muito alto - Pode indicar sobrevalorização"
-    
-    @staticmethod
-    def _interpretar_pb(pb: float) -> str:
-        if pb < 1:
-            return "Muito baixo - Negociando abaixo do valor patrimonial"
-        elif pb < 1.5:
-            return "Baixo - Potencialmente atrativo"
-        elif pb < 3:
-            return "Razoável - Dentro da média"
-        else:
-            return "Alto - Pode indicar sobrevalorização"
-    
-    @staticmethod
-    def _interpretar_ps(ps: float) -> str:
-        if ps < 1:
-            return "Muito baixo - Potencialmente subvalorizada"
-        elif ps < 2:
-            return "Baixo - Atrativo em relação à receita"
-        elif ps < 5:
-            return "Razoável - Múltiplo moderado"
-        else:
-            return "Alto - Múltiplo elevado em relação à receita"
-    
-    @staticmethod
-    def _interpretar_ev_ebitda(ev_ebitda: float) -> str:
-        if ev_ebitda < 8:
-            return "Baixo - Potencialmente atrativo"
-        elif ev_ebitda < 12:
-            return "Razoável - Múltiplo moderado"
-        elif ev_ebitda < 20:
-            return "Alto - Múltiplo elevado"
-        else:
-            return "Muito alto - Pode indicar sobrevalorização"
-    
-    @staticmethod
-    def _interpretar_peg(peg: float) -> str:
-        if peg < 0.5:
-            return "Excelente - Crescimento a preço muito atrativo"
-        elif peg < 1:
-            return "Bom - Crescimento a preço razoável"
-        elif peg < 1.5:
-            return "Razoável - Crescimento a preço justo"
-        else:
-            return "Alto - Crescimento caro"
-    
-    @staticmethod
-    def _interpretar_debt_equity(debt_equity: float) -> str:
-        if debt_equity < 0.3:
-            return "Baixo - Endividamento muito controlado"
-        elif debt_equity < 0.6:
-            return "Moderado - Endividamento razoável"
-        elif debt_equity < 1:
-            return "Alto - Endividamento elevado mas controlado"
-        else:
-            return "Muito alto - Endividamento preocupante"
-    
-    @staticmethod
-    def _interpretar_current_ratio(current_ratio: float) -> str:
-        if current_ratio > 2:
-            return "Excelente - Muito boa liquidez corrente"
-        elif current_ratio > 1.5:
-            return "Bom - Boa liquidez corrente"
-        elif current_ratio > 1:
-            return "Razoável - Liquidez adequada"
-        else:
-            return "Baixo - Liquidez insuficiente"
-    
-    @staticmethod
-    def _interpretar_quick_ratio(quick_ratio: float) -> str:
-        if quick_ratio > 1.5:
-            return "Excelente - Muito boa liquidez imediata"
-        elif quick_ratio > 1:
-            return "Bom - Boa liquidez imediata"
-        elif quick_ratio > 0.8:
-            return "Razoável - Liquidez adequada"
-        else:
-            return "Baixo - Liquidez imediata insuficiente"
-    
-    @staticmethod
-    def _interpretar_dividend_yield(dividend_yield: float) -> str:
-        if dividend_yield > 6:
-            return "Muito alto - Excelente para renda, verificar sustentabilidade"
-        elif dividend_yield > 4:
-            return "Alto - Bom para geração de renda"
-        elif dividend_yield > 2:
-            return "Moderado - Dividendos razoáveis"
-        else:
-            return "Baixo - Foco em crescimento, não em renda"
+        return CalculadoraIndicadores.analisar_lote([dados])[0].indicadores
     
     @staticmethod
-    def _interpretar_payout_ratio(payout_ratio: float) -> str:
-        if payout_ratio < 30:
-            return "Baixo - Empresa retém a maioria dos lucros"
-        elif payout_ratio < 60:
-            return "Moderado - Equilíbrio entre distribuição e retenção"
-        elif payout_ratio < 80:
-            return "Alto - Distribui a maior parte dos lucros"
-        else:
-            return "Muito alto - Pode comprometer crescimento futuro"
+    def analisar_lote(dados: List[DadosFinanceiros]) -> List[AnaliseIndicadores]:
+        """Pontuar os indicadores de várias ações em uma única avaliação vetorizada"""
+        analises = []
+        for item, resultado in zip(dados, CalculadoraIndicadores.tabela.interpret(dados)):
+            indicadores = [
+                # Texto da interpretação resolvido só na serialização
+                IndicadorFundamentalista(**indicador, interpretacao=mensagem(indicador["mensagem_id"]))
+                for indicador in resultado["indicadores"]
+            ]
+            analises.append(AnaliseIndicadores(
+                symbol=item.symbol,
+                indicadores=indicadores,
+                score_geral=resultado["score_geral"],
+                resumo=resumo(resultado["score_geral"])
+            ))
+        return analises
+
+# Agregados por setor, atualizados a cada dado financeiro recebido do Data Service;
+# contribuições gravadas por ação (hash compartilhado entre réplicas) a cada intervalo
+SECTOR_MEMBERS_KEY = "sector_aggregates:members"
+SECTOR_SYNC_INTERVAL = float(os.getenv("SECTOR_SYNC_SECONDS", "60"))
+sector_aggregates = SectorAggregates(
+    [band.nome for band in BAND_TABLE.bands],
+    top_n=int(os.getenv("SECTOR_TOP_N", "5"))
+)
+
+# Percentis e z-scores por indicador: reconstrução periódica, incremental entre elas
+CROSS_SECTION_REBUILD = float(os.getenv("CROSS_SECTION_REBUILD_SECONDS", "86400"))
+cross_section = CrossSectionIndex(
+    [band.nome for band in BAND_TABLE.bands],
+    stale_fraction=float(os.getenv("CROSS_SECTION_STALE_FRACTION", "0.05"))
+)
+
+def observe_sectors(dados: List[DadosFinanceiros]):
+    """Trocar a contribuição de cada ação nos agregados do seu setor e no índice de ranks"""
+    if not dados:
+        return
+    values = BAND_TABLE.values(dados)
+    scores = BAND_TABLE.evaluate(values)["score_geral"]
+    for item, row, score in zip(dados, values, scores):
+        symbol = item.symbol.upper()
+        # Cotação sem setor (provedor secundário): mantém o último setor conhecido
+        setor = item.sector or sector_aggregates.sector_of(symbol)
+        cross_section.update(symbol, setor, row)
+        if setor:
+            sector_aggregates.update(symbol, setor, row, float(score))
+
+def attach_ranks(analise: AnaliseIndicadores) -> AnaliseIndicadores:
+    """Anexar percentil e z-score (universo e setor) a cada indicador da análise"""
+    ranks = cross_section.lookup(analise.symbol.upper())
+    if ranks:
+        for indicador in analise.indicadores:
+            for campo, valor in ranks.get(indicador.nome, {}).items():
+                setattr(indicador, campo, valor)
+    return analise
+
+cross_section_task: Optional[asyncio.Task] = None
+
+async def rebuild_cross_section_periodically():
+    """
+    Job de reconstrução completa dos ranks (no event loop, junto das
+    atualizações): busca os dados de todo o universo importado, que passam
+    por observe_sectors, e reordena o índice. Roda no startup e a cada
+    CROSS_SECTION_REBUILD segundos.
+    """
+    while True:
+        try:
+            started = time.time()
+            universe = list(symbol_universe())
+            dados = await fetch_financial_data_batch(universe) if universe else {}
+            cross_section.rebuild()
+            logger.info("Cross-section ranks rebuilt", symbols=len(cross_section), fetched=len(dados),
+                        universe=len(universe), duration=time.time() - started)
+        except Exception as e:
+            logger.error("Cross-section rebuild failed", error=str(e))
+        await asyncio.sleep(CROSS_SECTION_REBUILD)
+
+def sync_sector_aggregates() -> List[str]:
+    """
+    Gravar as contribuições alteradas (um campo por ação: réplicas não se
+    sobrescrevem) e aplicar as gravadas pelas outras réplicas. Devolve as
+    ações alteradas pela leitura.
+    """
+    pending = sector_aggregates.pending()
+    try:
+        if pending:
+            pipe = redis_client.pipeline(transaction=False)
+            stored = {symbol: json.dumps(member) for symbol, member in pending.items() if member is not None}
+            removed = [symbol for symbol, member in pending.items() if member is None]
+            if stored:
+                pipe.hset(SECTOR_MEMBERS_KEY, mapping=stored)
+            if removed:
+                pipe.hdel(SECTOR_MEMBERS_KEY, *removed)
+            pipe.execute()
+            sector_aggregates.mark_saved(pending)
+        members = redis_client.hgetall(SECTOR_MEMBERS_KEY)
+        return sector_aggregates.merge({symbol: json.loads(member) for symbol, member in members.items()})
+    except Exception as e:
+        logger.error("Sector aggregates sync failed", error=str(e))
+        return []
+
+sector_sync_task: Optional[asyncio.Task] = None
+
+async def sync_sector_aggregates_periodically():
+    """Persistência periódica dos agregados (o estado sobrevive a quedas do processo)"""
+    while True:
+        await asyncio.sleep(SECTOR_SYNC_INTERVAL)
+        changed = set(sync_sector_aggregates())
+        # Dados vistos por outras réplicas também entram nos ranks
+        for symbol, setor, values in sector_aggregates.members():
+            if symbol in changed:
+                cross_section.update(symbol, setor, values)
+
+# Valuation por DCF Monte Carlo (cenários e memória ajustáveis por ambiente)
+dcf_engine = DCFEngine(DCFAssumptions(
+    simulations=int(os.getenv("DCF_SIMULATIONS", "10000")),
+    memory_budget_mb=float(os.getenv("VALUATION_MEMORY_MB", "64"))
+))
+# Uma simulação por vez: VALUATION_MEMORY_MB é o teto do processo, não de cada requisição
+valuation_slot = asyncio.Semaphore(1)
 
 # Calculadora de Análise de Risco
 class CalculadoraRisco:
     
+    # Motor vetorizado (log-retornos calculados uma única vez por matriz de preços)
+    engine = RiskEngine(simulations=int(os.getenv("RISK_MC_SIMULATIONS", "10000")))
+    
     @staticmethod
-    def calcular_analise_risco(dados: DadosFinanceiros, precos_historicos: List[float] = None) -> AnaliseRisco:
+    def calcular_analise_risco(
+        dados: DadosFinanceiros,
+        precos_historicos: List[float] = None,
+        benchmark: List[float] = None,
+        benchmark_symbol: Optional[str] = None
+    ) -> AnaliseRisco:
         """Calcular análise de risco completa"""
-        
-        # Volatilidade
+        if precos_historicos and len(precos_historicos) >= 3:
+            precos = pd.DataFrame({dados.symbol: precos_historicos})
+            serie_benchmark = None
+            if benchmark and len(benchmark) == len(precos_historicos):
+                serie_benchmark = pd.Series(benchmark)
+            return CalculadoraRisco.calcular_lote(
+                {dados.symbol: dados}, precos, serie_benchmark, benchmark_symbol
+            )[0]
+        
+        # Sem histórico: aproximação a partir dos dados fundamentais
         volatilidade = dados.volatility or 0
-        
-        # Beta
         beta = dados.beta or 1.0
         
-        # VaR 95% (aproximação simples)
-        var_95 = CalculadoraRisco._calcular_var(precos_historicos) if precos_historicos else volatilidade * 1.65
-        
-        # Sharpe Ratio (aproximação)
-        sharpe_ratio = CalculadoraRisco._calcular_sharpe_ratio(dados, precos_historicos)
-        
-        # Classificação de risco
-        classificacao = CalculadoraRisco._classificar_risco(volatilidade, beta)
-        
         return AnaliseRisco(
             symbol=dados.symbol,
             volatilidade=volatilidade,
             beta=beta,
-            var_95=var_95,
-            sharpe_ratio=sharpe_ratio,
-            classificacao_risco=classificacao
+            var_95=volatilidade * 1.65,
+            sharpe_ratio=None,
+            classificacao_risco=CalculadoraRisco._classificar_risco(volatilidade, beta)
         )
     
     @staticmethod
-    def _calcular_var(precos: List[float], confianca: float = 0.95) -> float:
-        """Calcular Value at Risk"""
-        if not precos or len(precos) < 2:
-            return 0
-        
-        returns = []
-        for i in range(1, len(precos)):
-            ret = (precos[i] - precos[i-1]) / precos[i-1]
-            returns.append(ret)
-        
-        returns_array = np.array(returns)
-        return np.percentile(returns_array, (1 - confianca) * 100) * 100
-    
-    @staticmethod
-    def _calcular_sharpe_ratio(dados: DadosFinanceiros, precos: List[float] = None) -> Optional[float]:
-        """Calcular Sharpe Ratio aproximado"""
-        if not precos or len(precos) < 2:
-            return None
-        
-        returns = []
-        for i in range(1, len(precos)):
-            ret = (precos[i] - precos[i-1]) / precos[i-1]
-            returns.append(ret)
-        
-        if not returns:
-            return None
-        
-        returns_array = np.array(returns)
-        excess_return = np.mean(returns_array) - 0.02/252  # Assumindo 2% risk-free anual
-        volatility = np.std(returns_array)
+    def calcular_lote(
+        dados: Dict[str, DadosFinanceiros],
+        precos: pd.DataFrame,
+        benchmark: Optional[pd.Series] = None,
+        benchmark_symbol: Optional[str] = None
+    ) -> List[AnaliseRisco]:
+        """Risco de várias ações em uma única operação matricial (colunas de `precos`)"""
+        metricas = CalculadoraRisco.engine.compute(
+            precos.to_numpy(),
+            benchmark.to_numpy() if benchmark is not None else None
+        )
         
-        if volatility == 0:
-            return None
+        def opcional(valor) -> Optional[float]:
+            return None if np.isnan(valor) else float(valor)
         
-        return (excess_return / volatility) * np.sqrt(252)  # Anualizado
+        resultados = []
+        for i, symbol in enumerate(precos.columns):
+            info = dados.get(symbol)
+            volatilidade = float(metricas["volatility"][i])
+            beta = opcional(metricas["beta"][i])
+            if beta is None:
+                beta = (info.beta if info else None) or 1.0
+            
+            resultados.append(AnaliseRisco(
+                symbol=symbol,
+                volatilidade=volatilidade,
+                beta=beta,
+                var_95=float(metricas["var_historical"][i]),
+                var_95_parametrico=float(metricas["var_parametric"][i]),
+                var_95_monte_carlo=float(metricas["var_monte_carlo"][i]),
+                cvar_95=float(metricas["cvar_historical"][i]),
+                max_drawdown=float(metricas["max_drawdown"][i]),
+                sharpe_ratio=opcional(metricas["sharpe"][i]),
+                sortino_ratio=opcional(metricas["sortino"][i]),
+                benchmark=benchmark_symbol if benchmark is not None else None,
+                classificacao_risco=CalculadoraRisco._classificar_risco(volatilidade, beta)
+            ))
+        return resultados
     
     @staticmethod
     def _classificar_risco(volatilidade: float, beta: float) -> str:
@@ -509,10 +513,10 @@ def get_cache_key(prefix: str, symbol: str, extra: str = None) -> str:
         return f"{prefix}:{symbol}:{extra}"
     return f"{prefix}:{symbol}"
 
-def cache_result(key: str, data: Any, ttl: int = 3600):
-    """Salvar resultado no cache (1 hora default)"""
+def cache_result(key: str, data: Any, ttl: int = 3600, tags: List[str] = ()):
+    """Salvar resultado no cache (1 hora default), registrando as tags de invalidação"""
     try:
-        redis_client.setex(key, ttl, json.dumps(data, default=str))
+        cache_tags.set(key, json.dumps(data, default=str), ttl, tags)
     except Exception as e:
         logger.error("Cache save failed", key=key, error=str(e))
 
@@ -527,20 +531,244 @@ def get_cached_result(key: str) -> Optional[Any]:
         logger.error("Cache read failed", key=key, error=str(e))
         return None
 
-async def fetch_financial_data(symbol: str) -> Optional[DadosFinanceiros]:
-    """Buscar dados financeiros do Data Service"""
+async def fetch_financial_data(symbol: str, client: Optional[httpx.AsyncClient] = None) -> Optional[DadosFinanceiros]:
+    """Buscar dados financeiros do Data Service (reaproveita `client` quando informado)"""
     try:
         data_service_url = os.getenv("DATA_SERVICE_URL", "http://data-service:8002")
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{data_service_url}/stock/{symbol}")
-            if response.status_code == 200:
-                data = response.json()
-                return DadosFinanceiros(**data)
-            return None
+        if client is None:
+            async with http_pool.session() as pooled_client:
+                return await fetch_financial_data(symbol, pooled_client)
+        response = await client.get(f"{data_service_url}/stock/{symbol}")
+        if response.status_code == 200:
+            dados = DadosFinanceiros(**response.json())
+            observe_sectors([dados])
+            return dados
+        return None
     except Exception as e:
         logger.error("Failed to fetch financial data", symbol=symbol, error=str(e))
         return None
 
+BATCH_FETCH_SIZE = int(os.getenv("BATCH_FETCH_SIZE", "50"))
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "10"))
+
+async def fetch_financial_data_batch(symbols: List[str]) -> Dict[str, DadosFinanceiros]:
+    """
+    Dados de várias ações por `/stocks/batch` (blocos concorrentes); os que
+    faltarem são buscados um a um com concorrência limitada, sempre pelo
+    pool de conexões do serviço.
+    """
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+    data_service_url = os.getenv("DATA_SERVICE_URL", "http://data-service:8002")
+    dados: Dict[str, DadosFinanceiros] = {}
+    
+    async with http_pool.session() as client:
+        async def fetch_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+            try:
+                response = await client.get(f"{data_service_url}/stocks/batch", params={"symbols": ",".join(chunk)})
+                if response.status_code == 200:
+                    return response.json().get("stocks", [])
+            except Exception as e:
+                logger.error("Batch financial data fetch failed", symbols=chunk, error=str(e))
+            return []
+        
+        for stocks in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunked(symbols, BATCH_FETCH_SIZE))):
+            for item in stocks:
+                dados[item["symbol"].upper()] = DadosFinanceiros(**item)
+        observe_sectors(list(dados.values()))
+        
+        missing = [symbol for symbol in symbols if symbol not in dados]
+        if missing:
+            semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+            
+            async def fetch_one(symbol: str):
+                async with semaphore:
+                    return symbol, await fetch_financial_data(symbol, client)
+            
+            for symbol, item in await asyncio.gather(*(fetch_one(symbol) for symbol in missing)):
+                if item:
+                    dados[symbol] = item
+    
+    return dados
+
+async def fetch_price_history(client: httpx.AsyncClient, symbol: str, period: str = "1y") -> Optional[pd.Series]:
+    """Fechamentos diários do Data Service (formato binário colunar)"""
+    try:
+        data_service_url = os.getenv("DATA_SERVICE_URL", "http://data-service:8002")
+        response = await client.get(
+            f"{data_service_url}/stock/{symbol}/history",
+            params={"period": period},
+            headers={"Accept": MSGPACK_MEDIA_TYPE}
+        )
+        if response.status_code != 200:
+            return None
+        columns = decode_history_msgpack(response.content)["columns"]
+        # Índice por dia: pregões de mercados diferentes alinham pela data
+        index = pd.DatetimeIndex(columns["date"]).normalize()
+        return pd.Series(columns["close"], index=index, name=symbol)
+    except Exception as e:
+        logger.error("Failed to fetch price history", symbol=symbol, error=str(e))
+        return None
+
+async def fetch_risk_inputs(symbols: List[str], benchmark: str, period: str = "1y"):
+    """Históricos das ações e do benchmark (concorrentes), alinhados por pregão"""
+    async with http_pool.session() as client:
+        series = await asyncio.gather(
+            *(fetch_price_history(client, symbol, period) for symbol in [*symbols, benchmark])
+        )
+    
+    closes = {s: serie for s, serie in zip(symbols, series[:-1]) if serie is not None and len(serie) >= 3}
+    if not closes:
+        return None, None
+    
+    benchmark_closes = series[-1]
+    if benchmark_closes is not None and len(benchmark_closes) >= 3:
+        aligned = align_closes({**closes, benchmark: benchmark_closes})
+        if len(aligned) >= 3:
+            return aligned[list(closes)], aligned[benchmark]
+    
+    aligned = align_closes(closes)
+    return (aligned, None) if len(aligned) >= 3 else (None, None)
+
+async def fetch_aligned_closes(symbols: List[str], period: str) -> Optional[pd.DataFrame]:
+    """
+    Fechamentos de todas as ações nos pregões comuns já encerrados (None se
+    faltar alguma). A barra parcial de hoje nunca entra no estado encadeado:
+    viraria um retorno diário "fechado" e o `last_closes` de onde parte o
+    próximo pregão.
+    """
+    async with http_pool.session() as client:
+        series = await asyncio.gather(*(fetch_price_history(client, symbol, period) for symbol in symbols))
+    if any(serie is None for serie in series):
+        return None
+    aligned = finished_sessions(align_closes(dict(zip(symbols, series))))
+    return aligned if len(aligned) >= 2 else None
+
+COVARIANCE_TTL = 7 * 24 * 3600
+
+async def load_covariance(universe: List[str], window: int):
+    """
+    Covariância móvel do universo (símbolos ordenados), em cache por
+    (universo, janela). Com estado em cache, busca só o último mês e aplica
+    apenas os pregões novos; sem estado, reconstrói a janela inteira.
+    """
+    universe_hash = hashlib.sha1(",".join(universe).encode()).hexdigest()[:16]
+    cache_key = get_cache_key("portfolio_cov", universe_hash, str(window))
+    tags = [type_tag("portfolio_cov"), *(symbol_tag(symbol) for symbol in universe)]
+    state = get_cached_result(cache_key)
+    
+    rolling = None
+    if state:
+        recent = await fetch_aligned_closes(universe, "1mo")
+        last_date = pd.Timestamp(state["last_date"])
+        # Só dá para encadear se o último pregão conhecido estiver coberto
+        if recent is not None and recent.index.min() <= last_date:
+            rolling = RollingCovariance.from_dict(state["covariance"])
+            closes = recent[recent.index > last_date]
+            if closes.empty:
+                return rolling, last_date
+            rolling.extend(new_returns(closes.to_numpy(), np.asarray(state["last_closes"])))
+    
+    if rolling is None:
+        closes = await fetch_aligned_closes(universe, history_period(window))
+        if closes is None or len(closes) < 3:
+            return None, None
+        rolling = RollingCovariance(len(universe), window)
+        rolling.extend(new_returns(closes.to_numpy(), None)[-window:])
+    
+    last_date = closes.index[-1]
+    cache_result(cache_key, {
+        "covariance": rolling.to_dict(),
+        "last_date": last_date.isoformat(),
+        "last_closes": closes.iloc[-1].tolist()
+    }, ttl=COVARIANCE_TTL, tags=tags)
+    return rolling, last_date
+
+# Correlação do universo: estado por (universo, janela) em memória, atualizado por pregão
+CORRELATION_MEMORY_MB = float(os.getenv("CORRELATION_MEMORY_MB", "64"))
+CORRELATION_REFRESH = float(os.getenv("CORRELATION_REFRESH_SECONDS", "3600"))
+CORRELATION_MATRIX_MAX = int(os.getenv("CORRELATION_MATRIX_MAX", "500"))
+CORRELATION_CLUSTER_MAX = int(os.getenv("CORRELATION_CLUSTER_MAX", "3000"))
+CORRELATION_CACHE_ENTRIES = int(os.getenv("CORRELATION_CACHE_ENTRIES", "4"))
+correlation_states: "OrderedDict[Tuple[str, int], Tuple[UniverseCorrelation, float]]" = OrderedDict()
+correlation_locks: Dict[Tuple[str, int], asyncio.Lock] = {}
+
+def correlation_universe(extra: List[str] = ()) -> List[str]:
+    """Universo configurado (CORRELATION_UNIVERSE) ou o universo de ações importado"""
+    configured = [s.strip().upper() for s in os.getenv("CORRELATION_UNIVERSE", "").split(",") if s.strip()]
+    return sorted({*(configured or symbol_universe()), *extra})
+
+async def fetch_universe_closes(symbols: List[str], period: str) -> Optional[pd.DataFrame]:
+    """
+    Fechamentos do universo na união dos pregões, com no máximo
+    FETCH_CONCURRENCY históricos em voo (o pool não estoura com milhares de
+    ações). Ações sem histórico ficam de fora e são registradas no log; as
+    respostas as listam em `ausentes`.
+    """
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+    
+    async with http_pool.session() as client:
+        async def fetch_one(symbol: str) -> Optional[pd.Series]:
+            async with semaphore:
+                return await fetch_price_history(client, symbol, period)
+        
+        series = await asyncio.gather(*(fetch_one(symbol) for symbol in symbols))
+    closes = {
+        symbol: serie[~serie.index.duplicated(keep="last")]
+        for symbol, serie in zip(symbols, series) if serie is not None and len(serie) >= 3
+    }
+    if len(closes) < len(symbols):
+        excluded = [symbol for symbol in symbols if symbol not in closes]
+        logger.warning("Symbols without price history excluded from correlation",
+                       excluded=len(excluded), sample=excluded[:20])
+    return pd.concat(closes, axis=1).sort_index() if closes else None
+
+async def load_correlation(universe: List[str], window: int,
+                           compute: Callable[[UniverseCorrelation], Any]) -> Tuple[Optional[UniverseCorrelation], Any]:
+    """
+    Correlação móvel do universo e o resultado de `compute(estado)`. Dentro do
+    intervalo de atualização usa o estado em memória; depois busca só o último
+    mês e aplica os pregões novos; sem estado (ou com lacuna) reconstrói a
+    janela inteira. Cada endpoint calcula só o que usa (linhas da carteira,
+    vetor condensado) em vez da matriz N x N.
+    """
+    universe_hash = hashlib.sha1(",".join(universe).encode()).hexdigest()[:16]
+    key = (universe_hash, window)
+    async with correlation_locks.setdefault(key, asyncio.Lock()):
+        state, refreshed_at = correlation_states.get(key, (None, 0.0))
+        if state is not None and time.time() - refreshed_at >= CORRELATION_REFRESH:
+            recent = await fetch_universe_closes(state.symbols, "1mo")
+            if recent is not None and state.can_chain(recent):
+                await asyncio.to_thread(state.apply_closes, recent)
+                refreshed_at = time.time()
+            else:
+                state = None
+        
+        if state is None:
+            closes = await fetch_universe_closes(universe, history_period(window))
+            if closes is None:
+                return None, None
+            state = await asyncio.to_thread(UniverseCorrelation.from_closes, closes, window, CORRELATION_MEMORY_MB)
+            if state is None:
+                return None, None
+            refreshed_at = time.time()
+        
+        correlation_states[key] = (state, refreshed_at)
+        correlation_states.move_to_end(key)
+        while len(correlation_states) > CORRELATION_CACHE_ENTRIES:
+            evicted, _ = correlation_states.popitem(last=False)
+            correlation_locks.pop(evicted, None)
+        
+        # Ainda sob o lock: apply_closes altera as somas da janela no lugar
+        return state, await asyncio.to_thread(compute, state)
+
+def correlation_meta(state: UniverseCorrelation, pedidos: List[str]) -> Dict[str, Any]:
+    return {
+        "janela": state.rolling.window,
+        "observacoes": len(state.rolling),
+        "ultimo_pregao": state.last_date.date().isoformat(),
+        "ausentes": state.indices(pedidos)[1]
+    }
+
 # Middleware para métricas
 @app.middleware("http")
 async def metrics_middleware(request, call_next):
@@ -590,62 +818,26 @@ async def analyze_indicators(symbol: str):
         cached_result = get_cached_result(cache_key)
         
         if cached_result:
-            return AnaliseIndicadores(**cached_result)
+            return attach_ranks(AnaliseIndicadores(**cached_result))
         
         # Buscar dados financeiros
         dados = await fetch_financial_data(symbol)
         if not dados:
             raise HTTPException(status_code=404, detail=f"Financial data not found for {symbol}")
         
-        # Calcular indicadores
-        indicadores = CalculadoraIndicadores.calcular_todos_indicadores(dados)
-        
-        # Calcular score geral
-        if indicadores:
-            scores = []
-            for ind in indicadores:
-                # Score baseado na interpretação (simplificado)
-                if "Excelente" in ind.interpretacao:
-                    scores.append(90)
-                elif "Bom" in ind.interpretacao:
-                    scores.append(75)
-                elif "Razoável" in ind.interpretacao:
-                    scores.append(60)
-                elif "Alto" in ind.interpretacao and ind.categoria == "valuation":
-                    scores.append(40)
-                else:
-                    scores.append(50)
-            
-            score_geral = sum(scores) / len(scores)
-        else:
-            score_geral = 0
-        
-        # Criar resumo
-        if score_geral >= 80:
-            resumo = "Empresa com indicadores fundamentalistas excelentes"
-        elif score_geral >= 70:
-            resumo = "Empresa com bons indicadores fundamentalistas"
-        elif score_geral >= 60:
-            resumo = "Empresa com indicadores fundamentalistas razoáveis"
-        else:
-            resumo = "Empresa com indicadores fundamentalistas fracos"
-        
-        resultado = AnaliseIndicadores(
-            symbol=symbol,
-            indicadores=indicadores,
-            score_geral=score_geral,
-            resumo=resumo
-        )
+        # Pontuar indicadores pela tabela de faixas
+        resultado = CalculadoraIndicadores.analisar_lote([dados])[0]
+        resultado.symbol = symbol
         
         # Salvar no cache
-        cache_result(cache_key, resultado.dict())
+        cache_result(cache_key, resultado.dict(), tags=[symbol_tag(symbol), type_tag("indicators")])
         
         # Métricas
         ANALYSIS_COUNT.labels(type="indicators").inc()
-        for ind in indicadores:
+        for ind in resultado.indicadores:
             INDICATOR_USAGE.labels(indicator=ind.nome).inc()
         
-        return resultado
+        return attach_ranks(resultado)
         
     except HTTPException:
         raise
@@ -653,6 +845,41 @@ async def analyze_indicators(symbol: str):
         logger.error("Indicators analysis failed", symbol=symbol, error=str(e))
         raise HTTPException(status_code=500, detail="Analysis failed")
 
+@app.post("/indicators/batch", response_model=List[AnaliseIndicadores])
+async def analyze_indicators_batch(symbols: List[str]):
+    """Indicadores fundamentalistas de várias ações (uma busca em lote, uma avaliação)"""
+    try:
+        dados = await fetch_financial_data_batch(symbols)
+        if not dados:
+            raise HTTPException(status_code=404, detail="Financial data not found for the requested symbols")
+        
+        resultados = CalculadoraIndicadores.analisar_lote(list(dados.values()))
+        
+        for resultado in resultados:
+            cache_result(
+                get_cache_key("indicators", resultado.symbol),
+                resultado.dict(),
+                tags=[symbol_tag(resultado.symbol), type_tag("indicators")]
+            )
+            for ind in resultado.indicadores:
+                INDICATOR_USAGE.labels(indicator=ind.nome).inc()
+        ANALYSIS_COUNT.labels(type="indicators").inc(len(resultados))
+        
+        return [attach_ranks(resultado) for resultado in resultados]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Batch indicators analysis failed", error=str(e))
+        raise HTTPException(status_code=500, detail="Analysis failed")
+
+def risk_from_history(symbol: str, dados: DadosFinanceiros, precos: Optional[pd.DataFrame],
+                      serie_benchmark: Optional[pd.Series], benchmark: str) -> AnaliseRisco:
+    """Análise de risco sobre o histórico (aproximação pelos fundamentos se indisponível)"""
+    if precos is not None:
+        return CalculadoraRisco.calcular_lote({symbol: dados}, precos, serie_benchmark, benchmark)[0]
+    return CalculadoraRisco.calcular_analise_risco(dados)
+
 @app.get("/risk/{symbol}", response_model=AnaliseRisco)
 async def analyze_risk(symbol: str):
     """Analisar risco de uma ação"""
@@ -664,16 +891,19 @@ async def analyze_risk(symbol: str):
         if cached_result:
             return AnaliseRisco(**cached_result)
         
-        # Buscar dados financeiros
-        dados = await fetch_financial_data(symbol)
+        # Buscar dados financeiros e históricos (ação + benchmark) em paralelo
+        benchmark = benchmark_for([symbol])
+        dados, (precos, serie_benchmark) = await asyncio.gather(
+            fetch_financial_data(symbol),
+            fetch_risk_inputs([symbol], benchmark)
+        )
         if not dados:
             raise HTTPException(status_code=404, detail=f"Financial data not found for {symbol}")
         
-        # Calcular análise de risco
-        resultado = CalculadoraRisco.calcular_analise_risco(dados)
+        resultado = risk_from_history(symbol, dados, precos, serie_benchmark, benchmark)
         
         # Salvar no cache
-        cache_result(cache_key, resultado.dict())
+        cache_result(cache_key, resultado.dict(), tags=[symbol_tag(symbol), type_tag("risk")])
         
         # Métricas
         ANALYSIS_COUNT.labels(type="risk").inc()
@@ -686,43 +916,246 @@ async def analyze_risk(symbol: str):
         logger.error("Risk analysis failed", symbol=symbol, error=str(e))
         raise HTTPException(status_code=500, detail="Risk analysis failed")
 
+@app.post("/risk/batch")
+async def analyze_risk_batch(
+    symbols: List[str],
+    benchmark: Optional[str] = None,
+    period: str = Query("1y", description="History period used for the risk metrics")
+):
+    """Analisar o risco de várias ações em uma única passada matricial"""
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No symbols provided")
+    
+    try:
+        benchmark = benchmark or benchmark_for(symbols)
+        precos, serie_benchmark = await fetch_risk_inputs(symbols, benchmark, period)
+        if precos is None:
+            raise HTTPException(status_code=404, detail="No price history found for the symbols")
+        
+        resultados = CalculadoraRisco.calcular_lote({}, precos, serie_benchmark, benchmark)
+        
+        # Métricas
+        ANALYSIS_COUNT.labels(type="risk_batch").inc()
+        
+        return {
+            "results": resultados,
+            "benchmark": benchmark if serie_benchmark is not None else None,
+            "observations": len(precos),
+            "missing": [s for s in symbols if s not in precos.columns]
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Batch risk analysis failed", symbols=symbols, error=str(e))
+        raise HTTPException(status_code=500, detail="Risk analysis failed")
+
+@app.post("/risk/portfolio", response_model=AnaliseRiscoCarteira)
+async def analyze_portfolio_risk(request: PortfolioRiskRequest):
+    """Risco da carteira: volatilidade, VaR por componente e contribuições ao risco"""
+    pesos: Dict[str, float] = {}
+    for posicao in request.posicoes:
+        symbol = posicao.symbol.strip().upper()
+        pesos[symbol] = pesos.get(symbol, 0.0) + posicao.peso
+    if not pesos:
+        raise HTTPException(status_code=400, detail="No holdings provided")
+    
+    try:
+        universe = sorted(pesos)
+        weights = normalize_weights([pesos[symbol] for symbol in universe])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        rolling, last_date = await load_covariance(universe, request.janela)
+        if rolling is None:
+            raise HTTPException(status_code=404, detail="Not enough aligned price history for the holdings")
+        
+        covariance, shrinkage = rolling.shrunk_covariance()
+        risco = portfolio_risk(weights, covariance, rolling.mean(), request.confianca)
+        
+        def por_symbol(valores) -> Dict[str, float]:
+            return {symbol: float(valor) for symbol, valor in zip(universe, valores)}
+        
+        # Métricas
+        ANALYSIS_COUNT.labels(type="portfolio_risk").inc()
+        
+        return AnaliseRiscoCarteira(
+            symbols=universe,
+            pesos=por_symbol(weights),
+            volatilidade=risco["volatility_annual"],
+            volatilidade_diaria=risco["volatility_daily"],
+            var=risco["var"],
+            confianca=request.confianca,
+            var_componente=por_symbol(risco["component_var"]),
+            contribuicao_marginal=por_symbol(risco["marginal_contribution"]),
+            contribuicao_risco_pct=por_symbol(risco["risk_contribution_pct"]),
+            razao_diversificacao=risco["diversification_ratio"],
+            shrinkage=shrinkage,
+            janela=request.janela,
+            observacoes=len(rolling),
+            ultimo_pregao=last_date.date().isoformat()
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Portfolio risk analysis failed", symbols=list(pesos), error=str(e))
+        raise HTTPException(status_code=500, detail="Portfolio risk analysis failed")
+
+@app.post("/correlation/matrix", response_model=MatrizCorrelacao)
+async def correlation_matrix(request: CorrelacaoRequest):
+    """Matriz de correlação dos retornos diários das ações pedidas"""
+    universe = sorted({s.strip().upper() for s in request.symbols or []})
+    if len(universe) < 2:
+        raise HTTPException(status_code=400, detail="At least two symbols are required")
+    if len(universe) > CORRELATION_MATRIX_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {CORRELATION_MATRIX_MAX} symbols per matrix")
+    
+    try:
+        state, matriz = await load_correlation(universe, request.janela, UniverseCorrelation.matrix)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Not enough price history for the symbols")
+        
+        ANALYSIS_COUNT.labels(type="correlation_matrix").inc()
+        return MatrizCorrelacao(
+            symbols=state.symbols,
+            matriz=np.round(matriz.astype(np.float64), 4).tolist(),
+            **correlation_meta(state, universe)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Correlation matrix failed", symbols=universe, error=str(e))
+        raise HTTPException(status_code=500, detail="Correlation analysis failed")
+
+@app.post("/correlation/clusters", response_model=ClustersCorrelacao)
+async def correlation_clusters(request: ClusterRequest):
+    """Agrupamento hierárquico das ações pela correlação dos retornos"""
+    universe = sorted({s.strip().upper() for s in request.symbols}) if request.symbols else correlation_universe()
+    if len(universe) < 2:
+        raise HTTPException(status_code=400, detail="At least two symbols are required")
+    limite = clustering_limit(CORRELATION_CLUSTER_MAX)
+    if len(universe) > limite:
+        raise HTTPException(status_code=400, detail=f"At most {limite} symbols per clustering")
+    
+    def agrupar(state: UniverseCorrelation) -> List[Tuple[np.ndarray, float]]:
+        labels = state.clusters(request.n_clusters, request.limiar)
+        grupos = [np.flatnonzero(labels == label) for label in np.unique(labels)]
+        return [(idx, state.mean_correlation(idx)) for idx in grupos]
+    
+    try:
+        state, grupos = await load_correlation(universe, request.janela, agrupar)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Not enough price history for the symbols")
+        
+        clusters = [
+            ClusterCorrelacao(
+                id=0,
+                symbols=[state.symbols[i] for i in idx],
+                correlacao_media=round(media, 4)
+            )
+            for idx, media in grupos
+        ]
+        # Maiores grupos primeiro
+        clusters.sort(key=lambda cluster: (-len(cluster.symbols), cluster.symbols[0]))
+        for numero, cluster in enumerate(clusters, start=1):
+            cluster.id = numero
+        
+        ANALYSIS_COUNT.labels(type="correlation_clusters").inc()
+        return ClustersCorrelacao(clusters=clusters, **correlation_meta(state, universe))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Correlation clustering failed", symbols=len(universe), error=str(e))
+        raise HTTPException(status_code=500, detail="Correlation analysis failed")
+
+@app.post("/correlation/diversifiers", response_model=SugestoesDiversificacao)
+async def correlation_diversifiers(request: DiversificacaoRequest):
+    """Ações do universo menos correlacionadas com a carteira"""
+    pesos: Dict[str, float] = {}
+    for posicao in request.posicoes:
+        symbol = posicao.symbol.strip().upper()
+        pesos[symbol] = pesos.get(symbol, 0.0) + posicao.peso
+    if not pesos or not any(pesos.values()):
+        raise HTTPException(status_code=400, detail="No holdings provided")
+    
+    candidatos = [s.strip().upper() for s in request.symbols or []]
+    universe = sorted({*candidatos, *pesos}) if candidatos else correlation_universe(list(pesos))
+    if len(universe) <= len(pesos):
+        raise HTTPException(status_code=400, detail="No candidate symbols outside the holdings")
+    
+    try:
+        def linhas_carteira(state: UniverseCorrelation) -> Tuple[List[int], np.ndarray]:
+            holdings, _ = state.indices(sorted(pesos))
+            return holdings, state.rolling.correlation(holdings)
+        
+        state, carteira = await load_correlation(universe, request.janela, linhas_carteira)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Not enough price history for the symbols")
+        
+        holdings, rows = carteira
+        if not holdings:
+            raise HTTPException(status_code=404, detail="Not enough price history for the holdings")
+        weights = np.array([pesos[state.symbols[i]] for i in holdings])
+        
+        bloco = rows[:, holdings].astype(np.float64)
+        pares = len(holdings) * (len(holdings) - 1)
+        media_carteira = float((bloco.sum() - len(holdings)) / pares) if pares else 1.0
+        
+        ANALYSIS_COUNT.labels(type="correlation_diversifiers").inc()
+        return SugestoesDiversificacao(
+            carteira=[state.symbols[i] for i in holdings],
+            correlacao_media_carteira=round(media_carteira, 4),
+            sugestoes=[
+                SugestaoDiversificacao(
+                    symbol=state.symbols[i],
+                    correlacao_media=round(media, 4),
+                    correlacao_maxima=round(maxima, 4)
+                )
+                for i, media, maxima in least_correlated(rows, weights, holdings, request.top_n)
+            ],
+            **correlation_meta(state, sorted(pesos))
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Diversification analysis failed", holdings=list(pesos), error=str(e))
+        raise HTTPException(status_code=500, detail="Correlation analysis failed")
+
 @app.post("/compare", response_model=AnaliseComparativa)
 async def compare_stocks(symbols: List[str], indicador: str):
     """Comparar múltiplas ações por um indicador específico"""
     try:
-        valores = {}
-        
-        for symbol in symbols:
-            dados = await fetch_financial_data(symbol)
-            if not dados:
-                continue
-            
-            # Extrair valor do indicador
-            valor = getattr(dados, indicador.lower().replace('/', '_').replace(' ', '_'), None)
-            if valor is not None:
-                valores[symbol] = valor
+        dados = await fetch_financial_data_batch(symbols)
+        valores = indicator_values(dados, indicador)
         
         if not valores:
             raise HTTPException(status_code=404, detail="No data found for comparison")
         
-        # Criar ranking
-        ranking = []
-        for symbol, valor in sorted(valores.items(), key=lambda x: x[1], reverse=True):
-            ranking.append({
-                "symbol": symbol,
-                "valor": valor,
-                "posicao": len(ranking) + 1
-            })
+        # Ranking, percentis e estatísticas por setor
+        comparacao = rank_values(valores, {symbol: item.sector for symbol, item in dados.items()})
         
-        # Calcular média
-        media_setor = sum(valores.values()) / len(valores)
+        # Média do setor inteiro (agregados) quando as ações são de um mesmo setor
+        setores = {item.sector for symbol, item in dados.items() if symbol in valores}
+        band = next((band for band in BAND_TABLE.bands if band.campo == indicator_field(indicador)), None)
+        media_setor = None
+        if len(setores) == 1 and None not in setores and band is not None:
+            media_setor = sector_aggregates.mean(setores.pop(), band.nome)
         
         resultado = AnaliseComparativa(
             symbols=list(valores.keys()),
             indicador=indicador,
             valores=valores,
-            ranking=ranking,
-            media_setor=media_setor
+            ranking=comparacao["ranking"],
+            media_setor=media_setor if media_setor is not None else comparacao["estatisticas"]["media"],
+            estatisticas=comparacao["estatisticas"],
+            estatisticas_setor=comparacao["estatisticas_setor"],
+            ausentes=[symbol for symbol in dict.fromkeys(s.strip().upper() for s in symbols) if symbol not in valores]
         )
         
         # Métricas
@@ -736,6 +1169,87 @@ async def compare_stocks(symbols: List[str], indicador: str):
         logger.error("Comparison failed", error=str(e))
         raise HTTPException(status_code=500, detail="Comparison failed")
 
+@app.get("/sectors")
+async def list_sectors():
+    """Setores conhecidos e quantidade de ações em cada um"""
+    return {"sectors": sector_aggregates.sectors()}
+
+@app.get("/sectors/{setor}", response_model=AnaliseSetorial)
+async def analyze_sector(setor: str):
+    """Médias, medianas, percentis e melhores empresas do setor (agregados incrementais)"""
+    resumo_setor = sector_aggregates.summary(setor)
+    if resumo_setor is None:
+        raise HTTPException(status_code=404, detail=f"Sector {setor} not found")
+    
+    ANALYSIS_COUNT.labels(type="sector").inc()
+    return AnaliseSetorial(**resumo_setor)
+
+@app.get("/valuation/{symbol}", response_model=AnaliseValuation)
+async def analyze_valuation(symbol: str):
+    """Preço justo por DCF Monte Carlo e por múltiplos, com margem de segurança"""
+    try:
+        symbol = symbol.upper()
+        
+        # Verificar cache
+        cache_key = get_cache_key("valuation", symbol)
+        cached_result = get_cached_result(cache_key)
+        
+        if cached_result:
+            return AnaliseValuation(**cached_result)
+        
+        dados = await fetch_financial_data(symbol)
+        if not dados:
+            raise HTTPException(status_code=404, detail=f"Financial data not found for {symbol}")
+        
+        async with valuation_slot:
+            resultados = await asyncio.to_thread(value_stocks, [dados], dcf_engine)
+        if not resultados:
+            raise HTTPException(status_code=422, detail=f"Current price unavailable for {symbol}")
+        resultado = AnaliseValuation(**{**resultados[0], "symbol": symbol})
+        
+        # Salvar no cache
+        cache_result(cache_key, resultado.dict(), tags=[symbol_tag(symbol), type_tag("valuation")])
+        
+        # Métricas
+        ANALYSIS_COUNT.labels(type="valuation").inc()
+        
+        return resultado
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Valuation failed", symbol=symbol, error=str(e))
+        raise HTTPException(status_code=500, detail="Valuation failed")
+
+@app.post("/valuation/batch", response_model=List[AnaliseValuation])
+async def analyze_valuation_batch(symbols: List[str]):
+    """Valuation de várias ações (uma busca em lote, simulação em blocos de memória limitada)"""
+    try:
+        dados = await fetch_financial_data_batch(symbols)
+        if not dados:
+            raise HTTPException(status_code=404, detail="Financial data not found for the requested symbols")
+        
+        # Simulação fora do event loop (NumPy libera o GIL), uma por vez
+        async with valuation_slot:
+            valores = await asyncio.to_thread(value_stocks, list(dados.values()), dcf_engine)
+        resultados = [AnaliseValuation(**item) for item in valores]
+        
+        for resultado in resultados:
+            cache_result(
+                get_cache_key("valuation", resultado.symbol),
+                resultado.dict(),
+                tags=[symbol_tag(resultado.symbol), type_tag("valuation")]
+            )
+        ANALYSIS_COUNT.labels(type="valuation").inc(len(resultados))
+        
+        return resultados
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Batch valuation failed", error=str(e))
+        raise HTTPException(status_code=500, detail="Valuation failed")
+
 @app.delete("/cache/{symbol}")
 async def clear_cache(symbol: str, analysis_type: Optional[str] = None):
     """Limpar cache de análises"""
@@ -744,9 +1258,7 @@ async def clear_cache(symbol: str, analysis_type: Optional[str] = None):
             key = get_cache_key(analysis_type, symbol)
             cleared = redis_client.delete(key)
         else:
-            pattern = f"*:{symbol}:*"
-            keys = redis_client.keys(pattern)
-            cleared = redis_client.delete(*keys) if keys else 0
+            cleared = cache_tags.invalidate(symbol_tag(symbol))
         
         return {"message": f"Cleared {cleared} cache entries for {symbol}"}
         
@@ -770,190 +1282,268 @@ if __name__ == "__main__":
 
 # Integração com Kafka
 sys.path.append('/app/microservices/shared')
-from shared.messaging import Topics, MessageSchemas, send_message, consume_messages
-import threading
-
-# Consumer para processar análises assíncronas
-def start_kafka_consumer():
-    """Iniciar consumer Kafka em thread separada"""
-    def handle_analysis_request(topic: str, message: Dict[str, Any]):
-        """Processar requisição de análise assíncrona"""
+from shared.messaging import Topics, MessageSchemas, send_message, kafka_client, enrich_message
+from analysis_worker import AnalysisWorker, WorkerConfig
+from coalescing import Coalescer
+from job_store import TERMINAL, JobStore
+
+def analysis_failed_event(message: Dict[str, Any], error: str):
+    """Evento de falha de uma análise assíncrona"""
+    return (Topics.ANALYSIS_FAILED, {
+        "request_id": message.get('request_id'),
+        "symbol": message.get('symbol'),
+        "error": error,
+        "user_id": message.get('user_id')
+    }, message.get('symbol'))
+
+# Status e resultado dos jobs assíncronos (consultados em /analyze/jobs/{request_id})
+job_store = JobStore(redis_client, ttl=int(os.getenv("ANALYSIS_JOB_TTL", "3600")))
+
+def update_job(method: str, message: Dict[str, Any], *args):
+    """Atualizar o slot do job da mensagem (falhas do Redis não interrompem a análise)"""
+    slot = message.get('job_slot')
+    if not slot:
+        return
+    try:
+        getattr(job_store, method)(slot, *args)
+    except Exception as e:
+        logger.error("Job store update failed", slot=slot, error=str(e))
+
+def job_requests(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Pedidos que recebem o resultado da mensagem: todos os ligados ao slot do job"""
+    pedidos = []
+    if message.get('job_slot'):
         try:
-            logger.info("Processing async analysis request", message=message)
-            
-            request_id = message.get('request_id')
-            symbol = message.get('symbol')
-            analysis_type = message.get('analysis_type', 'indicators')
-            user_id = message.get('user_id')
-            
-            if not symbol:
-                logger.error("Missing symbol in analysis request", message=message)
-                return
-            
-            # Buscar dados financeiros
-            dados = asyncio.run(fetch_financial_data(symbol))
-            if not dados:
-                # Enviar evento de falha
-                failure_message = {
-                    "request_id": request_id,
-                    "symbol": symbol,
-                    "error": "Financial data not found",
-                    "user_id": user_id
-                }
-                send_message(Topics.ANALYSIS_FAILED, failure_message, key=symbol)
-                return
-            
-            # Executar análise baseada no tipo
-            resultado = None
-            
-            if analysis_type == 'indicators':
-                # Calcular indicadores
-                indicadores = CalculadoraIndicadores.calcular_todos_indicadores(dados)
-                
-                # Calcular score geral
-                if indicadores:
-                    scores = []
-                    for ind in indicadores:
-                        if "Excelente" in ind.interpretacao:
-                            scores.append(90)
-                        elif "Bom" in ind.interpretacao:
-                            scores.append(75)
-                        elif "Razoável" in ind.interpretacao:
-                            scores.append(60)
-                        elif "Alto" in ind.interpretacao and ind.categoria == "valuation":
-                            scores.append(40)
-                        else:
-                            scores.append(50)
-                    
-                    score_geral = sum(scores) / len(scores)
-                else:
-                    score_geral = 0
-                
-                # Criar resumo
-                if score_geral >= 80:
-                    resumo = "Empresa com indicadores fundamentalistas excelentes"
-                elif score_geral >= 70:
-                    resumo = "Empresa com bons indicadores fundamentalistas"
-                elif score_geral >= 60:
-                    resumo = "Empresa com indicadores fundamentalistas razoáveis"
-                else:
-                    resumo = "Empresa com indicadores fundamentalistas fracos"
-                
-                resultado = {
-                    "type": "indicators",
-                    "symbol": symbol,
-                    "indicadores": [ind.dict() for ind in indicadores],
-                    "score_geral": score_geral,
-                    "resumo": resumo
-                }
-                
-            elif analysis_type == 'risk':
-                # Calcular análise de risco
-                analise_risco = CalculadoraRisco.calcular_analise_risco(dados)
-                resultado = {
-                    "type": "risk",
-                    "symbol": symbol,
-                    **analise_risco.dict()
-                }
-            
-            if resultado:
-                # Enviar resultado
-                success_message = MessageSchemas.analysis_completed(
-                    request_id=request_id,
-                    symbol=symbol,
-                    results={
-                        **resultado,
-                        "user_id": user_id
-                    }
-                )
-                
-                send_message(Topics.ANALYSIS_COMPLETED, success_message, key=symbol)
-                logger.info("Async analysis completed", symbol=symbol, request_id=request_id)
-                
-                # Métricas
-                ANALYSIS_COUNT.labels(type=analysis_type).inc()
-            
+            pedidos = job_store.requests(message['job_slot'])
         except Exception as e:
-            logger.error("Error processing async analysis", error=str(e), message=message)
-            
-            # Enviar evento de falha
-            failure_message = {
-                "request_id": message.get('request_id'),
-                "symbol": message.get('symbol'),
-                "error": str(e),
-                "user_id": message.get('user_id')
-            }
-            send_message(Topics.ANALYSIS_FAILED, failure_message, key=message.get('symbol'))
+            logger.error("Job store read failed", slot=message['job_slot'], error=str(e))
+    return pedidos or [{"request_id": message.get('request_id'), "user_id": message.get('user_id')}]
+
+def analysis_failed_events(message: Dict[str, Any], error: str):
+    """Falha registrada no job e avisada a cada pedido ligado a ele"""
+    update_job("fail", message, error, message.get('symbol') or "", message.get('analysis_type', 'indicators'))
+    return [analysis_failed_event({**message, **pedido}, error) for pedido in job_requests(message)]
+
+# Requisições duplicadas (mesmo símbolo, tipo e versão dos dados) dentro da janela
+COALESCE_WINDOW = float(os.getenv("ANALYSIS_COALESCE_WINDOW", "5"))
+data_coalescer = Coalescer("financial_data", window=COALESCE_WINDOW)
+analysis_coalescer = Coalescer("analysis", window=COALESCE_WINDOW)
+
+def data_version(dados: DadosFinanceiros) -> str:
+    """Identificador do snapshot dos dados (muda a cada atualização do Data Service)"""
+    return hashlib.sha1(dados.json().encode()).hexdigest()[:16]
+
+async def compute_analysis(dados: DadosFinanceiros, symbol: str, analysis_type: str) -> Optional[Dict[str, Any]]:
+    """Executar análise baseada no tipo (None para tipo desconhecido)"""
+    resultado = None
     
-    # Iniciar consumer
-    consume_messages(
-        topics=[Topics.ANALYSIS_REQUESTED],
-        group_id="analysis-service-group",
-        message_handler=handle_analysis_request,
-        auto_offset_reset='latest'
+    if analysis_type == 'indicators':
+        # Pontuar indicadores pela tabela de faixas
+        analise = attach_ranks(CalculadoraIndicadores.analisar_lote([dados])[0])
+        resultado = {
+            "type": "indicators",
+            "symbol": symbol,
+            "indicadores": [ind.dict() for ind in analise.indicadores],
+            "score_geral": analise.score_geral,
+            "resumo": analise.resumo
+        }
+        
+    elif analysis_type == 'risk':
+        # Risco sobre o histórico da ação e do benchmark, como em /risk/{symbol}
+        benchmark = benchmark_for([symbol])
+        precos, serie_benchmark = await fetch_risk_inputs([symbol], benchmark)
+        analise_risco = risk_from_history(symbol, dados, precos, serie_benchmark, benchmark)
+        resultado = {
+            "type": "risk",
+            "symbol": symbol,
+            **analise_risco.dict()
+        }
+    
+    if resultado:
+        # Métricas
+        ANALYSIS_COUNT.labels(type=analysis_type).inc()
+    return resultado
+
+async def process_analysis_request(message: Dict[str, Any]):
+    """Processar requisição de análise assíncrona (eventos a publicar)"""
+    logger.info("Processing async analysis request", message=message)
+    
+    request_id = message.get('request_id')
+    symbol = message.get('symbol')
+    analysis_type = message.get('analysis_type', 'indicators')
+    
+    if not symbol:
+        logger.error("Missing symbol in analysis request", message=message)
+        update_job("fail", message, "Missing symbol", "", analysis_type)
+        return []
+    
+    update_job("start", message)
+    
+    # Buscar dados financeiros (pool HTTP compartilhado do serviço), uma vez por janela
+    key = symbol.strip().upper()
+    dados = await data_coalescer.run(key, lambda: fetch_financial_data(symbol), type=analysis_type)
+    if not dados:
+        return analysis_failed_events(message, "Financial data not found")
+    
+    # Um cálculo por (símbolo, tipo, versão dos dados); o resultado vai para cada request_id
+    resultado = await analysis_coalescer.run(
+        (key, analysis_type, data_version(dados)),
+        lambda: compute_analysis(dados, symbol, analysis_type),
+        type=analysis_type
     )
+    if not resultado:
+        update_job("fail", message, f"Unknown analysis type {analysis_type}", symbol, analysis_type)
+        return []
+    
+    update_job("complete", message, resultado, symbol, analysis_type)
+    logger.info("Async analysis completed", symbol=symbol, request_id=request_id)
+    
+    # Um evento por pedido ligado ao job (pedidos idênticos compartilham o slot)
+    return [
+        (Topics.ANALYSIS_COMPLETED, MessageSchemas.analysis_completed(
+            request_id=pedido["request_id"],
+            symbol=symbol,
+            results={
+                **resultado,
+                "user_id": pedido["user_id"]
+            }
+        ), symbol)
+        for pedido in job_requests(message)
+    ]
+
+# Worker concorrente: ordem por símbolo, eventos em lote, commit após publicar
+analysis_worker = AnalysisWorker(
+    consumer_factory=lambda: kafka_client.create_consumer(
+        [Topics.ANALYSIS_REQUESTED],
+        group_id="analysis-service-group",
+        auto_offset_reset='latest',
+        enable_auto_commit=False
+    ),
+    producer_factory=kafka_client.get_producer,
+    handler=process_analysis_request,
+    on_error=lambda message, error: analysis_failed_events(message, str(error)),
+    config=WorkerConfig.from_env(),
+    enrich=enrich_message
+)
 
 # Endpoint para análise assíncrona
 @app.post("/analyze/async")
 async def analyze_async(symbol: str, analysis_type: str = "indicators", user_id: str = Query(...)):
-    """Solicitar análise assíncrona via Kafka"""
+    """Solicitar análise assíncrona via Kafka (acompanhar em /analyze/jobs/{request_id})"""
     try:
         request_id = f"req_{datetime.utcnow().timestamp()}_{user_id}"
         
-        # Enviar mensagem para Kafka
-        message = {
-            "event_type": "analysis_requested",
-            "request_id": request_id,
-            "user_id": user_id,
-            "symbol": symbol,
-            "analysis_type": analysis_type
-        }
-        
-        success = send_message(Topics.ANALYSIS_REQUESTED, message, key=symbol)
+        # Pedido idêntico em andamento: entra no mesmo slot, sem nova mensagem
+        slot, shared = job_store.submit(request_id, symbol, analysis_type, user_id)
         
-        if success:
-            return {
-                "message": "Analysis request submitted",
+        if not shared:
+            # Enviar mensagem para Kafka
+            message = {
+                "event_type": "analysis_requested",
                 "request_id": request_id,
+                "user_id": user_id,
                 "symbol": symbol,
                 "analysis_type": analysis_type,
-                "status": "processing"
+                "job_slot": slot
             }
-        else:
-            raise HTTPException(status_code=500, detail="Failed to submit analysis request")
             
+            # Envio aguarda a confirmação do broker: fora do event loop
+            success = await asyncio.to_thread(send_message, Topics.ANALYSIS_REQUESTED, message, key=symbol)
+            if not success:
+                job_store.fail(slot, "Failed to submit analysis request", symbol, analysis_type)
+                raise HTTPException(status_code=500, detail="Failed to submit analysis request")
+        
+        return {
+            "message": "Analysis request submitted",
+            "request_id": request_id,
+            "symbol": symbol,
+            "analysis_type": analysis_type,
+            "status": "processing",
+            "shared": shared,
+            "job_url": f"/analyze/jobs/{request_id}"
+        }
+            
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to submit async analysis", symbol=symbol, error=str(e))
         raise HTTPException(status_code=500, detail="Failed to submit analysis request")
 
-# Inicializar consumer Kafka em startup
+@app.get("/analyze/jobs/{request_id}")
+async def get_analysis_job(
+    request_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for the job to finish (long-polling)")
+):
+    """Status e resultado de uma análise assíncrona"""
+    try:
+        job = await job_store.wait(request_id, wait) if wait else job_store.get(request_id)
+    except Exception as e:
+        logger.error("Job lookup failed", request_id=request_id, error=str(e))
+        raise HTTPException(status_code=500, detail="Failed to read job status")
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {request_id} not found or expired")
+    
+    job.pop("slot")
+    job["done"] = job["status"] in TERMINAL
+    return job
+
+# Inicializar worker Kafka em startup
 @app.on_event("startup")
 async def startup_event():
     """Eventos de inicialização"""
     logger.info("Starting Analysis Service")
+    await http_pool.start()
+    sync_sector_aggregates()
+    cross_section.load(sector_aggregates.members())
+    global cross_section_task, sector_sync_task
+    cross_section_task = asyncio.create_task(rebuild_cross_section_periodically())
+    sector_sync_task = asyncio.create_task(sync_sector_aggregates_periodically())
     
-    # Iniciar consumer Kafka em thread separada
-    consumer_thread = threading.Thread(target=start_kafka_consumer, daemon=True)
-    consumer_thread.start()
+    # Iniciar worker Kafka no event loop da aplicação
+    analysis_worker.start()
     
-    logger.info("Kafka consumer started")
+    # Revogações de tokens publicadas pelo Auth Service
+    token_verifier.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Eventos de encerramento"""
     logger.info("Shutting down Analysis Service")
+    # Drenar o worker antes de fechar o pool HTTP que ele usa
+    await analysis_worker.stop()
+    await http_pool.close()
+    token_verifier.stop()
+    if sector_sync_task:
+        sector_sync_task.cancel()
+    sync_sector_aggregates()
+    if cross_section_task:
+        cross_section_task.cancel()
     # kafka_client.close() # This line was removed as kafka_client is not defined
 
 
 # Integração com comunicação entre serviços
 sys.path.append('/app/microservices/shared')
 try:
-    from shared.communication import service_client, validate_user_token, get_stock_data, analyze_stock
+    from shared.communication import service_client, validate_user_token, get_stock_data, analyze_stock_methodologies
     logger.info("Comunicação entre serviços configurada")
 except ImportError as e:
     logger.warning(f"Erro ao importar comunicação: {e}")
     service_client = None
 
+# Validação de tokens: chave distribuída pelo ambiente, revogações pelo Redis do Auth Service
+token_verifier = TokenVerifier(
+    redis_client=redis.Redis(
+        host=os.getenv("REDIS_HOST", "redis"),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        db=int(os.getenv("AUTH_REDIS_DB", "0")),
+        decode_responses=True
+    ),
+    remote_validate=validate_user_token if service_client else None,
+    positive_ttl=float(os.getenv("AUTH_CACHE_TTL", "60")),
+    negative_ttl=float(os.getenv("AUTH_NEGATIVE_CACHE_TTL", "10"))
+)
+
 # Middleware para autenticação
 @app.middleware("http")
 async def auth_middleware(request: Request, call_next):
@@ -976,18 +1566,17 @@ async def auth_middleware(request: Request, call_next):
     token = auth_header.split(" ")[1]
     
     try:
-        # Validar token com serviço de autenticação
-        if service_client:
-            validation_result = await validate_user_token(token)
-            if not validation_result.get("valid"):
-                return JSONResponse(
-                    status_code=401,
-                    content={"detail": "Token inválido"}
-                )
-            
-            # Adicionar informações do usuário ao request
-            request.state.user_id = validation_result.get("user_id")
-            request.state.user_email = validation_result.get("email")
+        # Assinatura conferida localmente; Auth Service só sem PyJWT (ambos com cache)
+        validation = await token_verifier.verify(token)
+        if not validation.valid:
+            return JSONResponse(
+                status_code=401,
+                content={"detail": "Token inválido"}
+            )
+        
+        # Adicionar informações do usuário ao request
+        request.state.user_id = validation.user_id
+        request.state.user_email = validation.email
         
     except Exception as e:
         logger.error(f"Erro na validação do token: {e}")
@@ -1013,27 +1602,29 @@ async def analyze_complete(request: CompleteAnalysisRequest):
         else:
             stock_data = {"symbol": request.symbol}  # Fallback
         
-        results = []
+        # Analisar com todas as metodologias em uma chamada (lotes grandes divididos em chamadas concorrentes)
+        if service_client:
+            lote = await analyze_stock_methodologies(request.symbol, request.methodologies, stock_data)
+        else:
+            lote = {"resultados": {}, "erros": {}}
         
-        # Analisar com múltiplas metodologias
-        for methodology in request.methodologies:
-            try:
-                if service_client:
-                    result = await analyze_stock(request.symbol, methodology, stock_data)
-                    results.append(result)
-                else:
-                    # Fallback local
-                    results.append({
-                        "methodology": methodology,
-                        "score": 50,
-                        "recommendation": "NEUTRO",
-                        "message": "Análise local - dados limitados"
-                    })
-            except Exception as e:
-                logger.warning(f"Erro na análise com {methodology}: {e}")
+        results = []
+        for methodology in dict.fromkeys(request.methodologies):
+            if methodology in lote["resultados"]:
+                results.append({"methodology": methodology, **lote["resultados"][methodology]})
+            elif methodology in lote["erros"]:
+                logger.warning(f"Erro na análise com {methodology}: {lote['erros'][methodology]}")
+                results.append({
+                    "methodology": methodology,
+                    "error": lote["erros"][methodology]
+                })
+            else:
+                # Fallback local
                 results.append({
                     "methodology": methodology,
-                    "error": str(e)
+                    "score": 50,
+                    "recommendation": "NEUTRO",
+                    "message": "Análise local - dados limitados"
                 })
         
         # Calcular score médio
@@ -0,0 +1,198 @@
+"""
+Risco de carteira - Analysis Service
+Covariância com shrinkage de Ledoit-Wolf (alvo: identidade escalada) sobre
+uma janela móvel de log-retornos alinhados. A janela guarda as estatísticas
+suficientes (somas de x, xxᵀ, ‖x‖², ‖x‖⁴ e ‖x‖²x), então um novo pregão
+atualiza a estimativa em O(N²), sem refazer a conta sobre toda a janela.
+"""
+
+from collections import deque
+from statistics import NormalDist
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def history_period(window: int) -> str:
+    """Menor período do Data Service que cobre `window` retornos diários"""
+    for period, bars in (("6mo", 120), ("1y", 245), ("2y", 495), ("5y", 1240)):
+        if window <= bars:
+            return period
+    return "10y"
+
+
+class RollingCovariance:
+    """Janela móvel de retornos com estatísticas suficientes incrementais"""
+
+    def __init__(self, n_assets: int, window: int = TRADING_DAYS):
+        self.n_assets = n_assets
+        self.window = window
+        self.returns: Deque[np.ndarray] = deque()
+        self.updates_since_rebuild = 0
+        self._reset()
+
+    def _reset(self):
+        n = self.n_assets
+        self.sum_x = np.zeros(n)
+        self.sum_xx = np.zeros((n, n))
+        self.sum_sq = 0.0        # Σ ‖x‖²
+        self.sum_sq2 = 0.0       # Σ ‖x‖⁴
+        self.sum_sq_x = np.zeros(n)  # Σ ‖x‖² x
+
+    def __len__(self) -> int:
+        return len(self.returns)
+
+    def _accumulate(self, x: np.ndarray, sign: float):
+        sq = x @ x
+        self.sum_x += sign * x
+        self.sum_xx += sign * np.outer(x, x)
+        self.sum_sq += sign * sq
+        self.sum_sq2 += sign * sq * sq
+        self.sum_sq_x += sign * sq * x
+
+    def rebuild(self):
+        """Recalcular as somas da janela inteira (evita acúmulo de erro numérico)"""
+        self._reset()
+        if self.returns:
+            matrix = np.vstack(self.returns)
+            sq = np.einsum("ij,ij->i", matrix, matrix)
+            self.sum_x = matrix.sum(axis=0)
+            self.sum_xx = matrix.T @ matrix
+            self.sum_sq = float(sq.sum())
+            self.sum_sq2 = float(sq @ sq)
+            self.sum_sq_x = sq @ matrix
+        self.updates_since_rebuild = 0
+
+    def append(self, x) -> None:
+        """Incluir um pregão (e descartar o mais antigo se a janela estiver cheia)"""
+        x = np.asarray(x, dtype=np.float64)
+        self.returns.append(x)
+        self._accumulate(x, 1.0)
+        if len(self.returns) > self.window:
+            self._accumulate(self.returns.popleft(), -1.0)
+
+        self.updates_since_rebuild += 1
+        if self.updates_since_rebuild >= self.window:
+            self.rebuild()
+
+    def extend(self, rows) -> None:
+        for row in np.atleast_2d(rows):
+            self.append(row)
+
+    def mean(self) -> np.ndarray:
+        return self.sum_x / len(self.returns)
+
+    def covariance(self) -> np.ndarray:
+        """Covariância amostral (máxima verossimilhança, como no Ledoit-Wolf)"""
+        n = len(self.returns)
+        m = self.mean()
+        return self.sum_xx / n - np.outer(m, m)
+
+    def shrunk_covariance(self) -> Tuple[np.ndarray, float]:
+        """
+        Ledoit-Wolf (2004) com alvo μI: retorna a matriz encolhida e a
+        intensidade δ. O termo Σ‖y‖⁴ dos retornos centrados sai das somas:
+        ‖x − m‖² = a − 2b + c, com a = ‖x‖², b = x·m, c = ‖m‖².
+        """
+        n = len(self.returns)
+        p = self.n_assets
+        m = self.mean()
+        cov = self.covariance()
+
+        c = m @ m
+        sum_a2 = self.sum_sq2
+        sum_ab = m @ self.sum_sq_x
+        sum_b2 = m @ self.sum_xx @ m
+        sum_a = self.sum_sq
+        sum_b = m @ self.sum_x
+        sum_y4 = (sum_a2 - 4 * sum_ab + 2 * c * sum_a + 4 * sum_b2 - 4 * c * sum_b + n * c * c)
+
+        mu = np.trace(cov) / p
+        delta = (np.sum(cov ** 2) - 2 * mu * np.trace(cov) + p * mu * mu) / p
+        beta = (sum_y4 / n - np.sum(cov ** 2)) / (p * n)
+        beta = min(max(beta, 0.0), delta)
+        shrinkage = beta / delta if delta > 0 else 0.0
+
+        shrunk = (1 - shrinkage) * cov + shrinkage * mu * np.eye(p)
+        return shrunk, float(shrinkage)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Estado serializável (para o cache)"""
+        return {
+            "window": self.window,
+            "returns": np.vstack(self.returns).tolist() if self.returns else [],
+            "sum_x": self.sum_x.tolist(),
+            "sum_xx": self.sum_xx.tolist(),
+            "sum_sq": self.sum_sq,
+            "sum_sq2": self.sum_sq2,
+            "sum_sq_x": self.sum_sq_x.tolist(),
+            "updates_since_rebuild": self.updates_since_rebuild,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "RollingCovariance":
+        returns = np.asarray(state["returns"], dtype=np.float64)
+        rolling = cls(returns.shape[1], state["window"])
+        rolling.returns = deque(returns)
+        rolling.sum_x = np.asarray(state["sum_x"])
+        rolling.sum_xx = np.asarray(state["sum_xx"])
+        rolling.sum_sq = state["sum_sq"]
+        rolling.sum_sq2 = state["sum_sq2"]
+        rolling.sum_sq_x = np.asarray(state["sum_sq_x"])
+        rolling.updates_since_rebuild = state["updates_since_rebuild"]
+        return rolling
+
+
+def portfolio_risk(
+    weights: np.ndarray,
+    covariance: np.ndarray,
+    mean: np.ndarray,
+    confidence: float = 0.95
+) -> Dict[str, Any]:
+    """
+    Decomposição de risco da carteira (diária, em % salvo indicação):
+    volatilidade, VaR paramétrico e VaR por componente (Euler: soma = VaR),
+    contribuições marginais e percentuais ao risco, razão de diversificação.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    sigma_w = covariance @ weights
+    volatility = float(np.sqrt(weights @ sigma_w))
+    if volatility == 0:
+        raise ValueError("Portfolio has zero variance")
+
+    z = -NormalDist().inv_cdf(1 - confidence)
+    marginal = sigma_w / volatility
+    component_risk = weights * marginal
+    component_var = weights * (z * marginal - mean)
+    asset_vol = np.sqrt(np.diag(covariance))
+
+    return {
+        "volatility_daily": volatility * 100,
+        "volatility_annual": volatility * np.sqrt(TRADING_DAYS) * 100,
+        "var": float(z * volatility - weights @ mean) * 100,
+        "component_var": component_var * 100,
+        "marginal_contribution": marginal * 100,
+        "risk_contribution_pct": component_risk / volatility * 100,
+        "diversification_ratio": float(np.abs(weights) @ asset_vol / volatility),
+    }
+
+
+def normalize_weights(weights: List[float]) -> np.ndarray:
+    """Pesos somando 1 (pela exposição líquida; carteiras vendidas usam a bruta)"""
+    weights = np.asarray(weights, dtype=np.float64)
+    total = weights.sum()
+    if abs(total) < 1e-12:
+        total = np.abs(weights).sum()
+    if total == 0:
+        raise ValueError("Weights must not all be zero")
+    return weights / total
+
+
+def new_returns(closes: np.ndarray, last_closes: Optional[np.ndarray]) -> np.ndarray:
+    """Log-retornos das barras novas, encadeados a partir do último fechamento conhecido"""
+    closes = np.asarray(closes, dtype=np.float64)
+    if last_closes is not None:
+        closes = np.vstack([last_closes, closes])
+    return np.diff(np.log(closes), axis=0)
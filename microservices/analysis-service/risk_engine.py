@@ -0,0 +1,164 @@
+"""
+Motor de risco vetorizado - Analysis Service
+Calcula os log-retornos uma única vez (NumPy) e deriva deles VaR histórico,
+paramétrico e Monte Carlo, CVaR, drawdown máximo, Sharpe, Sortino e beta
+contra um benchmark. Os preços entram como matriz (pregões x ativos), então
+uma ação ou um lote inteiro são a mesma operação matricial.
+
+Convenção: VaR, CVaR e drawdown são perdas positivas em % (horizonte de 1 dia
+para VaR/CVaR); volatilidade anualizada em %.
+"""
+
+from statistics import NormalDist
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.02  # Taxa livre de risco anual usada no Sharpe/Sortino
+
+# Benchmarks por mercado
+BENCHMARK_B3 = "^BVSP"
+BENCHMARK_US = "^GSPC"
+
+
+def benchmark_for(symbols) -> str:
+    """Ibovespa para carteiras só da B3, S&P 500 nos demais casos"""
+    return BENCHMARK_B3 if all(s.upper().endswith(".SA") for s in symbols) else BENCHMARK_US
+
+
+def log_returns(prices: np.ndarray) -> np.ndarray:
+    """Log-retornos por coluna: (T, N) -> (T-1, N)"""
+    prices = np.asarray(prices, dtype=np.float64)
+    return np.diff(np.log(prices), axis=0)
+
+
+def _loss_pct(log_return: np.ndarray) -> np.ndarray:
+    """Log-retorno (negativo na perda) -> perda simples positiva em %"""
+    return -np.expm1(log_return) * 100
+
+
+def align_closes(closes: Dict[str, pd.Series]) -> pd.DataFrame:
+    """Alinhar séries de fechamento nos pregões comuns a todos os ativos"""
+    frame = pd.concat(closes, axis=1, join="inner").sort_index()
+    return frame.dropna()
+
+
+def finished_sessions(closes: pd.DataFrame, today: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """Só pregões encerrados: a barra de hoje (parcial, ainda em negociação) fica de fora"""
+    today = pd.Timestamp.today().normalize() if today is None else pd.Timestamp(today).normalize()
+    return closes[closes.index < today]
+
+
+class RiskEngine:
+    """Métricas de risco para uma matriz de preços (pregões x ativos)"""
+
+    def __init__(
+        self,
+        confidence: float = 0.95,
+        simulations: int = 10_000,
+        risk_free_rate: float = RISK_FREE_RATE,
+        seed: Optional[int] = None
+    ):
+        self.confidence = confidence
+        self.simulations = simulations
+        self.rf_daily = risk_free_rate / TRADING_DAYS
+        self.rng = np.random.default_rng(seed)
+
+    def historical_var_cvar(self, returns: np.ndarray):
+        """VaR e CVaR pela distribuição empírica dos retornos"""
+        cutoff = np.quantile(returns, 1 - self.confidence, axis=0)
+        tail = np.where(returns <= cutoff, returns, np.nan)
+        return _loss_pct(cutoff), _loss_pct(np.nanmean(tail, axis=0))
+
+    def parametric_var(self, mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+        """VaR normal (variância-covariância)"""
+        z = NormalDist().inv_cdf(1 - self.confidence)
+        return _loss_pct(mean + z * std)
+
+    def monte_carlo_var_cvar(self, returns: np.ndarray, mean: np.ndarray, std: np.ndarray):
+        """
+        VaR/CVaR por simulação com inovações t de Student correlacionadas:
+        graus de liberdade a partir da curtose em excesso de cada ativo
+        (caudas mais pesadas que a normal), correlação pela matriz empírica.
+        """
+        n_assets = returns.shape[1]
+        centered = returns - mean
+        kurtosis = np.mean(centered ** 4, axis=0) / np.maximum(std ** 4, 1e-18) - 3
+        dof = np.where(kurtosis > 0.1, 6 / np.maximum(kurtosis, 0.1) + 4, 200.0)
+
+        correlation = np.corrcoef(returns, rowvar=False).reshape(n_assets, n_assets)
+        correlation = np.nan_to_num(correlation) + np.eye(n_assets) * 1e-12
+        try:
+            cholesky = np.linalg.cholesky(correlation)
+        except np.linalg.LinAlgError:
+            cholesky = np.eye(n_assets)
+
+        normal = self.rng.standard_normal((self.simulations, n_assets)) @ cholesky.T
+        chi2 = self.rng.chisquare(dof, size=(self.simulations, n_assets))
+        # t padronizada (variância 1) escalada pela volatilidade de cada ativo
+        innovations = normal / np.sqrt(chi2 / dof) * np.sqrt((dof - 2) / dof)
+        simulated = mean + innovations * std
+
+        cutoff = np.quantile(simulated, 1 - self.confidence, axis=0)
+        tail = np.where(simulated <= cutoff, simulated, np.nan)
+        return _loss_pct(cutoff), _loss_pct(np.nanmean(tail, axis=0))
+
+    @staticmethod
+    def max_drawdown(prices: np.ndarray) -> np.ndarray:
+        running_max = np.maximum.accumulate(prices, axis=0)
+        return -np.min(prices / running_max - 1, axis=0) * 100
+
+    def sharpe_sortino(self, returns: np.ndarray, mean: np.ndarray, std: np.ndarray):
+        excess = mean - self.rf_daily
+        downside = np.sqrt(np.mean(np.minimum(returns - self.rf_daily, 0) ** 2, axis=0))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sharpe = np.where(std > 0, excess / std * np.sqrt(TRADING_DAYS), np.nan)
+            sortino = np.where(downside > 0, excess / downside * np.sqrt(TRADING_DAYS), np.nan)
+        return sharpe, sortino
+
+    @staticmethod
+    def beta(returns: np.ndarray, benchmark_returns: np.ndarray) -> np.ndarray:
+        """Cov(ativo, benchmark) / Var(benchmark) para todas as colunas de uma vez"""
+        centered = returns - returns.mean(axis=0)
+        bench = benchmark_returns - benchmark_returns.mean()
+        variance = bench @ bench
+        if variance == 0:
+            return np.full(returns.shape[1], np.nan)
+        return centered.T @ bench / variance
+
+    def compute(self, prices, benchmark: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Métricas por ativo para `prices` (T,) ou (T, N), alinhado ao
+        `benchmark` (T,) quando informado. Cada métrica é um array (N,).
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        if prices.ndim == 1:
+            prices = prices[:, None]
+        if prices.shape[0] < 3:
+            raise ValueError("At least 3 prices are required for risk metrics")
+
+        returns = log_returns(prices)
+        mean = returns.mean(axis=0)
+        std = returns.std(axis=0, ddof=1)
+
+        var_hist, cvar_hist = self.historical_var_cvar(returns)
+        var_mc, cvar_mc = self.monte_carlo_var_cvar(returns, mean, std)
+        sharpe, sortino = self.sharpe_sortino(returns, mean, std)
+
+        metrics = {
+            "volatility": std * np.sqrt(TRADING_DAYS) * 100,
+            "var_historical": var_hist,
+            "var_parametric": self.parametric_var(mean, std),
+            "var_monte_carlo": var_mc,
+            "cvar_historical": cvar_hist,
+            "cvar_monte_carlo": cvar_mc,
+            "max_drawdown": self.max_drawdown(prices),
+            "sharpe": sharpe,
+            "sortino": sortino,
+            "beta": np.full(prices.shape[1], np.nan),
+        }
+        if benchmark is not None:
+            metrics["beta"] = self.beta(returns, log_returns(benchmark))
+        return metrics
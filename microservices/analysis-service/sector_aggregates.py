@@ -0,0 +1,251 @@
+"""
+Agregados setoriais incrementais - Analysis Service
+Por setor e indicador: contagem, soma e um sketch de quantis (buckets
+logarítmicos com erro relativo limitado, estilo DDSketch) que aceita inserção
+e remoção. Cada ação guarda a contribuição atual; quando os dados mudam, a
+contribuição antiga sai e a nova entra, sem reprocessar o universo. Médias
+são O(1); medianas e percentis percorrem só os buckets do setor. O ranking
+de melhores empresas é mantido ordenado pelo score geral dos indicadores.
+
+As contribuições alteradas ficam marcadas até serem gravadas, então a
+persistência escreve só o que mudou (um registro por ação) e réplicas não
+sobrescrevem o estado umas das outras.
+"""
+
+import bisect
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+SEM_SETOR = "N/A"
+
+
+class QuantileSketch:
+    """Quantis aproximados (erro relativo `relative_accuracy`) com pesos negativos para remoção"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, weight: int = 1):
+        if value == 0:
+            self.zero += weight
+        else:
+            buckets = self.positive if value > 0 else self.negative
+            key = self._key(abs(value))
+            count = buckets.get(key, 0) + weight
+            if count:
+                buckets[key] = count
+            else:
+                del buckets[key]
+        self.count += weight
+
+    def remove(self, value: float):
+        self.add(value, -1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        # Ordem crescente: negativos de maior magnitude primeiro, zero, positivos
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "positive": self.positive,
+            "negative": self.negative,
+            "zero": self.zero,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(state["relative_accuracy"])
+        sketch.positive = {int(k): v for k, v in state["positive"].items()}
+        sketch.negative = {int(k): v for k, v in state["negative"].items()}
+        sketch.zero = state["zero"]
+        sketch.count = state["count"]
+        return sketch
+
+
+class SectorState:
+    """Soma, contagem e sketch por indicador de um setor, mais o ranking por score"""
+
+    def __init__(self, n_indicators: int, relative_accuracy: float):
+        self.count = np.zeros(n_indicators, dtype=np.int64)
+        self.total = np.zeros(n_indicators)
+        self.sketches = [QuantileSketch(relative_accuracy) for _ in range(n_indicators)]
+        self.ranking: List[Tuple[float, str]] = []  # (-score, símbolo), crescente
+
+    def apply(self, symbol: str, values: np.ndarray, score: float, weight: int):
+        present = np.isfinite(values)
+        self.count[present] += weight
+        self.total[present] += weight * values[present]
+        for k in np.flatnonzero(present):
+            self.sketches[k].add(float(values[k]), weight)
+
+        entry = (-score, symbol)
+        if weight > 0:
+            bisect.insort(self.ranking, entry)
+        else:
+            i = bisect.bisect_left(self.ranking, entry)
+            if i < len(self.ranking) and self.ranking[i] == entry:
+                del self.ranking[i]
+
+    def __len__(self) -> int:
+        return len(self.ranking)
+
+
+class SectorAggregates:
+    """Agregados por setor atualizados a cada novo dado de uma ação"""
+
+    def __init__(self, nomes: Sequence[str], relative_accuracy: float = 0.01, top_n: int = 5):
+        self.nomes = list(nomes)
+        self.relative_accuracy = relative_accuracy
+        self.top_n = top_n
+        self._members: Dict[str, Tuple[str, np.ndarray, float]] = {}
+        self._sectors: Dict[str, SectorState] = {}
+        self._dirty: Set[str] = set()  # Contribuições alteradas e ainda não gravadas
+
+    def _sector(self, setor: str) -> SectorState:
+        if setor not in self._sectors:
+            self._sectors[setor] = SectorState(len(self.nomes), self.relative_accuracy)
+        return self._sectors[setor]
+
+    def update(self, symbol: str, setor: Optional[str], values: np.ndarray, score: float) -> bool:
+        """Trocar a contribuição da ação; False quando nada mudou"""
+        setor = setor or SEM_SETOR
+        values = np.asarray(values, dtype=np.float64)
+        previous = self._members.get(symbol)
+        if previous is not None:
+            old_setor, old_values, old_score = previous
+            if old_setor == setor and old_score == score and np.array_equal(old_values, values, equal_nan=True):
+                return False
+            self.remove(symbol)
+        self._sector(setor).apply(symbol, values, score, +1)
+        self._members[symbol] = (setor, values, score)
+        self._dirty.add(symbol)
+        return True
+
+    def remove(self, symbol: str):
+        previous = self._members.pop(symbol, None)
+        if previous is None:
+            return
+        self._dirty.add(symbol)
+        setor, values, score = previous
+        state = self._sectors[setor]
+        state.apply(symbol, values, score, -1)
+        if not len(state):
+            del self._sectors[setor]
+
+    def sectors(self) -> Dict[str, int]:
+        return {setor: len(state) for setor, state in self._sectors.items()}
+
+    def symbols(self) -> List[str]:
+        return sorted(self._members)
+
+    def members(self) -> Iterator[Tuple[str, str, np.ndarray]]:
+        """Contribuição atual de cada ação: (símbolo, setor, valores)"""
+        return ((symbol, setor, values) for symbol, (setor, values, _) in self._members.items())
+
+    def sector_of(self, symbol: str) -> Optional[str]:
+        member = self._members.get(symbol)
+        return member[0] if member else None
+
+    def mean(self, setor: str, nome: str) -> Optional[float]:
+        state = self._sectors.get(setor)
+        if state is None or nome not in self.nomes:
+            return None
+        k = self.nomes.index(nome)
+        return float(state.total[k] / state.count[k]) if state.count[k] else None
+
+    def summary(self, setor: str, percentis: Sequence[float] = (25, 50, 75)) -> Optional[Dict[str, Any]]:
+        state = self._sectors.get(setor)
+        if state is None:
+            return None
+        medias, medianas, quantis = {}, {}, {}
+        for k, nome in enumerate(self.nomes):
+            if not state.count[k]:
+                continue
+            sketch = state.sketches[k]
+            medias[nome] = float(state.total[k] / state.count[k])
+            medianas[nome] = sketch.quantile(0.5)
+            quantis[nome] = {f"p{p:g}": sketch.quantile(p / 100) for p in percentis}
+        return {
+            "setor": setor,
+            "symbols": sorted(symbol for _, symbol in state.ranking),
+            "indicadores_medios": medias,
+            "indicadores_medianos": medianas,
+            "percentis": quantis,
+            "melhores_empresas": [
+                {"symbol": symbol, "score_geral": -score} for score, symbol in state.ranking[:self.top_n]
+            ],
+        }
+
+    def member_state(self, symbol: str) -> Optional[List[Any]]:
+        """Contribuição serializável da ação: [setor, valores, score] (None se removida)"""
+        member = self._members.get(symbol)
+        if member is None:
+            return None
+        setor, values, score = member
+        return [setor, [None if np.isnan(v) else float(v) for v in values], score]
+
+    def pending(self) -> Dict[str, Optional[List[Any]]]:
+        """Contribuições alteradas desde a última gravação"""
+        return {symbol: self.member_state(symbol) for symbol in self._dirty}
+
+    def mark_saved(self, symbols: Iterable[str]):
+        self._dirty.difference_update(symbols)
+
+    def merge(self, members: Dict[str, List[Any]]) -> List[str]:
+        """
+        Aplicar contribuições gravadas (por esta ou outras réplicas); as
+        alteradas aqui e ainda não gravadas prevalecem. Devolve as ações que
+        mudaram.
+        """
+        changed = []
+        for symbol, (setor, values, score) in members.items():
+            if symbol in self._dirty or len(values) != len(self.nomes):
+                continue
+            if self.update(symbol, setor, np.array(values, dtype=np.float64), score):
+                changed.append(symbol)
+            self._dirty.discard(symbol)
+        return changed
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Estado serializável: as contribuições de cada ação (os agregados são recalculados)"""
+        return {
+            "nomes": self.nomes,
+            "members": {symbol: self.member_state(symbol) for symbol in self._members},
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any], **kwargs) -> "SectorAggregates":
+        aggregates = cls(state["nomes"], **kwargs)
+        aggregates.merge(state["members"])
+        return aggregates
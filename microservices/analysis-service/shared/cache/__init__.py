@@ -1,10 +1,15 @@
 from .redis_manager import RedisManager, CacheConfig, CacheLevel, redis_manager, cached
+from .tags import TagIndex, AsyncTagIndex, symbol_tag, type_tag
 
 __all__ = [
     "RedisManager",
     "CacheConfig", 
     "CacheLevel",
     "redis_manager",
-    "cached"
+    "cached",
+    "TagIndex",
+    "AsyncTagIndex",
+    "symbol_tag",
+    "type_tag"
 ]
 
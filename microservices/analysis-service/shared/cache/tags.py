@@ -0,0 +1,156 @@
+"""
+Invalidação de cache por tags
+Cada escrita registra sua chave em ZSETs de tags (ex.: `symbol:PETR4.SA`,
+`type:history`) com score = instante de expiração da chave, e a invalidação
+remove os membros da tag em lotes pipelined (ZSCAN + UNLINK). Membros cujas
+chaves já expiraram saem a cada escrita e antes de cada varredura
+(ZREMRANGEBYSCORE), então a tag guarda só chaves vivas mesmo sob tráfego
+contínuo. O custo é proporcional aos membros vivos da tag, nunca ao keyspace:
+nenhum caminho de requisição precisa de KEYS ou FLUSHDB.
+"""
+
+import time
+from typing import Callable, Iterable, List, Optional
+
+# Prefixo próprio dos ZSETs (os antigos conjuntos tag:* expiram sozinhos)
+TAG_PREFIX = "tags"
+DEFAULT_TAG_TTL = 7 * 24 * 3600  # Validade padrão de membros sem TTL informado
+DEFAULT_BATCH_SIZE = 500
+
+
+def symbol_tag(symbol: str) -> str:
+    return f"symbol:{symbol.upper()}"
+
+
+def type_tag(kind: str) -> str:
+    return f"type:{kind}"
+
+
+def _text(member) -> str:
+    return member.decode() if isinstance(member, bytes) else member
+
+
+class _BaseTagIndex:
+    def __init__(
+        self,
+        redis_client,
+        prefix: str = TAG_PREFIX,
+        tag_ttl: int = DEFAULT_TAG_TTL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        expand: Optional[Callable[[str], List[str]]] = None
+    ):
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self.tag_ttl = tag_ttl
+        self.batch_size = batch_size
+        # Membro da tag -> chaves Redis a remover (padrão: o próprio membro)
+        self.expand = expand or (lambda member: [member])
+
+    def tag_key(self, tag: str) -> str:
+        return f"{self.prefix}:{tag}"
+
+    def register(self, pipe, key: str, tags: Iterable[str], ttl: Optional[int] = None):
+        """Adicionar ao pipeline os comandos que registram a chave nas tags"""
+        ttl = ttl or self.tag_ttl
+        now = time.time()
+        for tag in tags:
+            tag_key = self.tag_key(tag)
+            pipe.zremrangebyscore(tag_key, "-inf", now)
+            pipe.zadd(tag_key, {key: now + ttl})
+            pipe.expire(tag_key, max(self.tag_ttl, ttl))
+
+    def _keys(self, members: Iterable) -> List[str]:
+        keys = []
+        for member in members:
+            keys.extend(self.expand(_text(member)))
+        return keys
+
+
+class TagIndex(_BaseTagIndex):
+    """Índice de tags sobre um cliente Redis síncrono"""
+
+    def set(self, key: str, value, ttl: int, tags: Iterable[str]) -> None:
+        """SETEX e registro nas tags em uma única ida ao Redis"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.setex(key, ttl, value)
+        self.register(pipe, key, tags, ttl)
+        pipe.execute()
+
+    def tag(self, key: str, tags: Iterable[str], ttl: Optional[int] = None) -> None:
+        """Registrar uma chave já gravada"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self.register(pipe, key, tags, ttl)
+        pipe.execute()
+
+    def _unlink(self, tag_key: str, members: List) -> int:
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.unlink(*self._keys(members))
+        pipe.zrem(tag_key, *members)
+        return pipe.execute()[0]
+
+    def _invalidate_tag(self, tag: str, match: Optional[str]) -> int:
+        tag_key = self.tag_key(tag)
+        deleted = 0
+        batch = []
+        # Membros expirados: as chaves já sumiram pelo TTL
+        self.redis_client.zremrangebyscore(tag_key, "-inf", time.time())
+        for member, _ in self.redis_client.zscan_iter(tag_key, match=match, count=self.batch_size):
+            batch.append(member)
+            if len(batch) >= self.batch_size:
+                deleted += self._unlink(tag_key, batch)
+                batch = []
+        if batch:
+            deleted += self._unlink(tag_key, batch)
+
+        if match is None:
+            self.redis_client.unlink(tag_key)
+        return deleted
+
+    def invalidate(self, *tags: str) -> int:
+        """Remover todas as chaves registradas em qualquer uma das tags"""
+        return sum(self._invalidate_tag(tag, None) for tag in tags)
+
+    def invalidate_matching(self, tag: str, pattern: str) -> int:
+        """Remover as chaves da tag cujo nome casa com o padrão glob (ZSCAN MATCH)"""
+        return self._invalidate_tag(tag, pattern)
+
+
+class AsyncTagIndex(_BaseTagIndex):
+    """Índice de tags sobre um cliente `redis.asyncio`"""
+
+    async def tag(self, key: str, tags: Iterable[str], ttl: Optional[int] = None) -> None:
+        pipe = self.redis_client.pipeline(transaction=False)
+        self.register(pipe, key, tags, ttl)
+        await pipe.execute()
+
+    async def _unlink(self, tag_key: str, members: List) -> int:
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.unlink(*self._keys(members))
+        pipe.zrem(tag_key, *members)
+        return (await pipe.execute())[0]
+
+    async def _invalidate_tag(self, tag: str, match: Optional[str]) -> int:
+        tag_key = self.tag_key(tag)
+        deleted = 0
+        batch = []
+        await self.redis_client.zremrangebyscore(tag_key, "-inf", time.time())
+        async for member, _ in self.redis_client.zscan_iter(tag_key, match=match, count=self.batch_size):
+            batch.append(member)
+            if len(batch) >= self.batch_size:
+                deleted += await self._unlink(tag_key, batch)
+                batch = []
+        if batch:
+            deleted += await self._unlink(tag_key, batch)
+
+        if match is None:
+            await self.redis_client.unlink(tag_key)
+        return deleted
+
+    async def invalidate(self, *tags: str) -> int:
+        total = 0
+        for tag in tags:
+            total += await self._invalidate_tag(tag, None)
+        return total
+
+    async def invalidate_matching(self, tag: str, pattern: str) -> int:
+        return await self._invalidate_tag(tag, pattern)
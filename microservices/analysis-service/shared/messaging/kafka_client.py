@@ -13,6 +13,14 @@ import structlog
 
 logger = structlog.get_logger()
 
+def enrich_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Adicionar metadata de envio (horário e serviço de origem)"""
+    return {
+        **message,
+        'timestamp': datetime.utcnow().isoformat(),
+        'source_service': os.getenv('SERVICE_NAME', 'unknown')
+    }
+
 class KafkaClient:
     """Cliente Kafka para produção e consumo de mensagens"""
     
@@ -42,11 +50,7 @@ class KafkaClient:
             producer = self.get_producer()
             
             # Adicionar metadata
-            enriched_message = {
-                **message,
-                'timestamp': datetime.utcnow().isoformat(),
-                'source_service': os.getenv('SERVICE_NAME', 'unknown')
-            }
+            enriched_message = enrich_message(message)
             
             future = producer.send(topic, value=enriched_message, key=key)
             record_metadata = future.get(timeout=10)
@@ -68,14 +72,15 @@ class KafkaClient:
             return False
     
     def create_consumer(self, topics: List[str], group_id: str, 
-                       auto_offset_reset: str = 'latest') -> KafkaConsumer:
-        """Criar consumer Kafka"""
+                       auto_offset_reset: str = 'latest',
+                       enable_auto_commit: bool = True) -> KafkaConsumer:
+        """Criar consumer Kafka (`enable_auto_commit=False` quando o chamador comita após processar)"""
         consumer = KafkaConsumer(
             *topics,
             bootstrap_servers=self.bootstrap_servers,
             group_id=group_id,
             auto_offset_reset=auto_offset_reset,
-            enable_auto_commit=True,
+            enable_auto_commit=enable_auto_commit,
             auto_commit_interval_ms=1000,
             value_deserializer=lambda m: json.loads(m.decode('utf-8')),
             key_deserializer=lambda k: k.decode('utf-8') if k else None,
@@ -0,0 +1,233 @@
+"""
+Verificação local de tokens JWT - Analysis Service
+A assinatura e a expiração são conferidas localmente com a chave distribuída
+pelo ambiente (a mesma SECRET_KEY do Auth Service para HS256, ou a chave
+pública em JWT_PUBLIC_KEY para RS256). O resultado fica em um cache curto
+por digest do token (positivo e negativo), então o caminho comum não sai do
+processo. Revogações (logout) chegam pelo canal pub/sub do Redis e também
+ficam registradas em `revoked_token:<digest>` até o token expirar.
+
+Sem PyJWT instalado ou sem chave configurada (nunca há chave padrão), a
+validação cai para o Auth Service (ainda com cache).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import structlog
+from prometheus_client import Counter
+
+try:
+    import jwt
+    JWT_AVAILABLE = True
+except ImportError:
+    jwt = None
+    JWT_AVAILABLE = False
+
+logger = structlog.get_logger()
+
+# Métricas Prometheus
+TOKEN_VERIFICATIONS = Counter('auth_token_verifications_total', 'Token verifications', ['source', 'outcome'])
+
+REVOCATION_CHANNEL = "auth:token_revoked"
+REVOKED_KEY_PREFIX = "revoked_token:"
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+@dataclass
+class Validation:
+    valid: bool
+    user_id: Optional[str] = None
+    email: Optional[str] = None
+    expires_at: float = 0.0  # Expiração do próprio token (epoch)
+
+
+class TokenVerifier:
+    """Validação local com cache positivo/negativo e revogação por pub/sub"""
+
+    def __init__(
+        self,
+        key: Optional[str] = None,
+        algorithm: Optional[str] = None,
+        redis_client=None,
+        remote_validate: Optional[Callable[[str], Awaitable[Dict[str, Any]]]] = None,
+        positive_ttl: float = 60.0,
+        negative_ttl: float = 10.0,
+        max_entries: int = 50000,
+        retry_interval: float = 5.0,
+    ):
+        self.algorithm = algorithm or os.getenv("JWT_ALGORITHM", "HS256")
+        self.key = key or os.getenv("JWT_PUBLIC_KEY") or os.getenv("SECRET_KEY")
+        if JWT_AVAILABLE and not self.key:
+            logger.warning("No JWT key configured; local token verification disabled")
+        self.redis = redis_client
+        self.remote_validate = remote_validate
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._cache: Dict[str, tuple] = {}  # digest -> (válido até, Validation)
+        self._revoked: Dict[str, float] = {}  # digest -> expiração do token
+        self._lock = threading.Lock()  # O listener de revogação roda em outra thread
+        self._listener = None
+        self.retry_interval = retry_interval
+        self._retry_task: Optional[asyncio.Task] = None
+
+    @property
+    def local(self) -> bool:
+        """Assinatura conferida no processo (PyJWT e chave explícita)"""
+        return JWT_AVAILABLE and bool(self.key)
+
+    # Cache
+    def _cached(self, digest: str, now: float) -> Optional[Validation]:
+        entry = self._cache.get(digest)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            self._cache.pop(digest, None)
+            return None
+        return entry[1]
+
+    def _store(self, digest: str, validation: Validation, now: float):
+        ttl = self.positive_ttl if validation.valid else self.negative_ttl
+        until = now + ttl
+        if validation.valid and validation.expires_at:
+            until = min(until, validation.expires_at)
+        with self._lock:
+            if len(self._cache) >= self.max_entries:
+                self._prune(now)
+            self._cache[digest] = (until, validation)
+
+    def _prune(self, now: float):
+        for digest in [d for d, (until, _) in self._cache.items() if until <= now]:
+            del self._cache[digest]
+        for digest in [d for d, expires in self._revoked.items() if expires <= now]:
+            del self._revoked[digest]
+        if len(self._cache) >= self.max_entries:
+            self._cache.clear()
+
+    # Revogação
+    def revoke(self, digest: str, expires_at: Optional[float] = None):
+        with self._lock:
+            self._revoked[digest] = expires_at or time.time() + self.positive_ttl
+            self._cache.pop(digest, None)
+
+    def _handle_revocation(self, message):
+        try:
+            data = json.loads(message["data"])
+            self.revoke(data["digest"], data.get("exp"))
+        except Exception as e:
+            logger.error("Invalid revocation message", error=str(e))
+
+    def _subscribe(self) -> bool:
+        try:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{REVOCATION_CHANNEL: self._handle_revocation})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            logger.info("Token revocation listener started", channel=REVOCATION_CHANNEL)
+            return True
+        except Exception as e:
+            logger.error("Token revocation listener failed to start", error=str(e))
+            return False
+
+    async def _retry_subscribe(self):
+        """Tentar de novo com backoff até o Redis voltar"""
+        delay = self.retry_interval
+        while self._listener is None:
+            await asyncio.sleep(delay)
+            if await asyncio.to_thread(self._subscribe):
+                return
+            delay = min(delay * 2, 60.0)
+
+    def start(self):
+        """Assinar o canal de revogações (thread do redis-py); sem Redis, tenta de novo em background"""
+        if self.redis is None or self._listener is not None or self._retry_task is not None:
+            return
+        if self._subscribe():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._retry_task = loop.create_task(self._retry_subscribe())
+
+    def stop(self):
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+            self._retry_task = None
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    async def _is_revoked(self, digest: str) -> bool:
+        if digest in self._revoked:
+            return True
+        if self.redis is None:
+            return False
+        try:
+            # Revogações anteriores ao início da assinatura (cliente síncrono: fora do event loop)
+            return bool(await asyncio.to_thread(self.redis.exists, f"{REVOKED_KEY_PREFIX}{digest}"))
+        except Exception as e:
+            logger.error("Revocation lookup failed", error=str(e))
+            return False
+
+    # Validação
+    def decode(self, token: str) -> Validation:
+        try:
+            payload = jwt.decode(token, self.key, algorithms=[self.algorithm])
+        except jwt.PyJWTError:
+            return Validation(valid=False)
+        email = payload.get("sub")
+        if email is None:
+            return Validation(valid=False)
+        return Validation(
+            valid=True,
+            user_id=payload.get("user_id"),
+            email=email,
+            expires_at=float(payload.get("exp", 0))
+        )
+
+    async def _remote(self, token: str) -> Validation:
+        result = await self.remote_validate(token)
+        user = result.get("user") or {}
+        return Validation(
+            valid=bool(result.get("valid")),
+            user_id=user.get("id", result.get("user_id")),
+            email=user.get("email", result.get("email"))
+        )
+
+    async def verify(self, token: str) -> Validation:
+        now = time.time()
+        digest = token_digest(token)
+        if digest in self._revoked:
+            TOKEN_VERIFICATIONS.labels(source="cache", outcome="revoked").inc()
+            return Validation(valid=False)
+
+        cached = self._cached(digest, now)
+        if cached is not None:
+            TOKEN_VERIFICATIONS.labels(source="cache", outcome="valid" if cached.valid else "invalid").inc()
+            return cached
+
+        if self.local:
+            source, validation = "local", self.decode(token)
+        elif self.remote_validate is not None:
+            source, validation = "remote", await self._remote(token)
+        else:
+            raise RuntimeError("No token validation method available")
+
+        if validation.valid and await self._is_revoked(digest):
+            self.revoke(digest, validation.expires_at)
+            TOKEN_VERIFICATIONS.labels(source=source, outcome="revoked").inc()
+            return Validation(valid=False)
+
+        self._store(digest, validation, now)
+        TOKEN_VERIFICATIONS.labels(source=source, outcome="valid" if validation.valid else "invalid").inc()
+        return validation
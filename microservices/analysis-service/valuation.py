@@ -0,0 +1,220 @@
+"""
+Valuation por DCF Monte Carlo vetorizado - Analysis Service
+Para cada ação, milhares de cenários de crescimento, margem e taxa de desconto
+são descontados em uma única passada NumPy (ações x cenários x anos). Os
+mesmos sorteios normais padrão servem a todas as ações de uma chamada
+(números aleatórios comuns), e o lote é processado em blocos de ações que
+cabem no orçamento de memória. Cada chamada usa um gerador próprio, derivado
+da semente do motor (SeedSequence.spawn): chamadas concorrentes em threads
+não compartilham estado do gerador.
+
+Modelo (valores por ação):
+- fluxo de caixa base: FCF / ações quando disponível, senão lucro (preço / P/L);
+- receita base: preço / P/S quando disponível (margem = fluxo / receita),
+  senão o próprio fluxo base com margem relativa 1;
+- crescimento inicial ~ Normal(crescimento informado, σ), convergindo
+  linearmente ao crescimento da perpetuidade no fim do horizonte;
+- margem ~ Lognormal em torno da margem base;
+- desconto ~ Normal(Rf + β × prêmio de risco, σ), sempre acima da perpetuidade.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+PERCENTIS = (5, 25, 50, 75, 95)
+
+# Múltiplos de referência para o preço justo por múltiplos
+MULTIPLOS_ALVO = {"pe_ratio": 15.0, "pb_ratio": 1.5, "ev_ebitda": 10.0}
+
+
+def calcular_margem_seguranca(preco_atual, valor_intrinseco):
+    """
+    Margem de segurança percentual entre preço atual e valor intrínseco
+    (mesma regra de src/models/finance_utils.py, aceitando arrays; cópia
+    porque src/ não faz parte da imagem do serviço).
+    """
+    preco_atual = np.asarray(preco_atual, dtype=np.float64)
+    valor_intrinseco = np.asarray(valor_intrinseco, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margem = (valor_intrinseco - preco_atual) / valor_intrinseco * 100
+    return np.where(valor_intrinseco > 0, margem, 0.0)
+
+
+def risk_free_for(symbol: str) -> float:
+    """Taxa livre de risco anual: Selic para a B3, Treasury para os demais"""
+    return 0.10 if symbol.upper().endswith(".SA") else 0.04
+
+
+def _positive(value: Optional[float]) -> float:
+    return float(value) if value is not None and np.isfinite(value) and value > 0 else np.nan
+
+
+@dataclass(frozen=True)
+class DCFAssumptions:
+    simulations: int = 10_000
+    horizon: int = 10  # Anos de projeção explícita
+    terminal_growth: float = 0.03
+    default_growth: float = 0.05
+    growth_bounds: tuple = (-0.10, 0.30)
+    growth_sd: float = 0.05
+    margin_sd: float = 0.15  # Desvio do log da margem
+    equity_risk_premium: float = 0.05
+    discount_sd: float = 0.01
+    min_spread: float = 0.02  # Desconto mínimo acima da perpetuidade
+    memory_budget_mb: float = 64.0
+
+
+@dataclass
+class DCFInputs:
+    """Entradas por ação, em arrays alinhados (NaN = indisponível)"""
+    symbols: List[str]
+    price: np.ndarray
+    revenue: np.ndarray  # Receita (ou fluxo) base por ação
+    margin: np.ndarray
+    growth: np.ndarray
+    discount: np.ndarray  # Taxa de desconto esperada
+
+    @classmethod
+    def from_dados(cls, dados: Sequence[Any], assumptions: DCFAssumptions) -> "DCFInputs":
+        n = len(dados)
+        price, revenue, margin, growth, discount = (np.full(n, np.nan) for _ in range(5))
+        for i, item in enumerate(dados):
+            price[i] = _positive(getattr(item, "current_price", None))
+            market_cap = _positive(getattr(item, "market_cap", None))
+            fcf = getattr(item, "free_cash_flow", None)
+            pe = _positive(getattr(item, "pe_ratio", None))
+            ps = _positive(getattr(item, "ps_ratio", None))
+
+            if fcf is not None and fcf > 0 and np.isfinite(market_cap):
+                cash_flow = fcf / (market_cap / price[i])
+            else:
+                cash_flow = price[i] / pe
+            if np.isfinite(ps):
+                revenue[i] = price[i] / ps
+                margin[i] = cash_flow / revenue[i]
+            else:
+                revenue[i], margin[i] = cash_flow, 1.0
+
+            # Crescimento em % (mesma convenção dos indicadores)
+            informed = next((g for g in (getattr(item, "earnings_growth", None), getattr(item, "revenue_growth", None))
+                             if g is not None and np.isfinite(g)), None)
+            growth[i] = np.clip(informed / 100 if informed is not None else assumptions.default_growth,
+                                *assumptions.growth_bounds)
+            beta = getattr(item, "beta", None)
+            beta = beta if beta is not None and np.isfinite(beta) else 1.0
+            discount[i] = risk_free_for(item.symbol) + beta * assumptions.equity_risk_premium
+        return cls([item.symbol for item in dados], price, revenue, margin, growth, discount)
+
+    def valid(self) -> np.ndarray:
+        return np.isfinite(self.price) & np.isfinite(self.revenue) & (self.revenue > 0) & (self.margin > 0)
+
+
+class DCFEngine:
+    """Simulação DCF para um lote de ações sob um orçamento de memória"""
+
+    def __init__(self, assumptions: DCFAssumptions = DCFAssumptions(), seed: Optional[int] = None):
+        self.assumptions = assumptions
+        self._seed = np.random.SeedSequence(seed)
+        self._seed_lock = threading.Lock()
+
+    def _rng(self) -> np.random.Generator:
+        """Gerador independente por chamada (spawn altera a SeedSequence: sob lock)"""
+        with self._seed_lock:
+            (child,) = self._seed.spawn(1)
+        return np.random.default_rng(child)
+
+    def chunk_size(self) -> int:
+        """Ações por bloco: ~4 arrays float64 (cenários x anos) por ação"""
+        a = self.assumptions
+        per_symbol = 4 * a.simulations * a.horizon * 8
+        return max(1, int(a.memory_budget_mb * 1024 ** 2 // per_symbol))
+
+    def simulate(self, inputs: DCFInputs, shocks: np.ndarray) -> np.ndarray:
+        """Preço justo por cenário: (ações, cenários)"""
+        a = self.assumptions
+        years = np.arange(1, a.horizon + 1)
+        fade = (years - 1) / max(a.horizon - 1, 1)
+
+        g0 = np.clip(inputs.growth[:, None] + a.growth_sd * shocks[None, :, 0], *a.growth_bounds)
+        margin = inputs.margin[:, None] * np.exp(a.margin_sd * shocks[None, :, 1] - a.margin_sd ** 2 / 2)
+        rate = np.maximum(inputs.discount[:, None] + a.discount_sd * shocks[None, :, 2],
+                          a.terminal_growth + a.min_spread)
+
+        # Crescimento convergindo para a perpetuidade; fluxos e fatores de desconto por ano
+        growth = g0[:, :, None] * (1 - fade) + a.terminal_growth * fade
+        cash_flows = inputs.revenue[:, None, None] * np.cumprod(1 + growth, axis=2) * margin[:, :, None]
+        discount = (1 + rate[:, :, None]) ** years
+        present_value = (cash_flows / discount).sum(axis=2)
+        terminal = cash_flows[:, :, -1] * (1 + a.terminal_growth) / (rate - a.terminal_growth)
+        return present_value + terminal / discount[:, :, -1]
+
+    def value(self, inputs: DCFInputs) -> Dict[str, np.ndarray]:
+        """Percentis do preço justo e probabilidade de subvalorização por ação"""
+        a = self.assumptions
+        n = len(inputs.symbols)
+        percentis = np.full((n, len(PERCENTIS)), np.nan)
+        prob = np.full(n, np.nan)
+        valid = np.flatnonzero(inputs.valid())
+        shocks = self._rng().standard_normal((a.simulations, 3))
+
+        size = self.chunk_size()
+        for start in range(0, len(valid), size):
+            idx = valid[start:start + size]
+            chunk = DCFInputs(
+                [inputs.symbols[i] for i in idx], inputs.price[idx], inputs.revenue[idx],
+                inputs.margin[idx], inputs.growth[idx], inputs.discount[idx]
+            )
+            values = self.simulate(chunk, shocks)
+            percentis[idx] = np.percentile(values, PERCENTIS, axis=1).T
+            prob[idx] = (values > chunk.price[:, None]).mean(axis=1)
+        return {"percentis": percentis, "probabilidade_subvalorizada": prob}
+
+
+def fair_value_multiples(dados: Any) -> Optional[float]:
+    """Mediana dos preços implícitos pelos múltiplos de referência"""
+    price = _positive(getattr(dados, "current_price", None))
+    implied = [
+        price * alvo / valor
+        for campo, alvo in MULTIPLOS_ALVO.items()
+        if np.isfinite(valor := _positive(getattr(dados, campo, None)))
+    ]
+    return float(np.median(implied)) if implied and np.isfinite(price) else None
+
+
+def recomendacao(margem: Optional[float]) -> str:
+    if margem is None:
+        return "NEUTRO"
+    if margem >= 20:
+        return "COMPRA"
+    if margem <= -20:
+        return "VENDA"
+    return "NEUTRO"
+
+
+def value_stocks(dados: Sequence[Any], engine: DCFEngine) -> List[Dict[str, Any]]:
+    """Valuation de um lote: DCF (percentis), múltiplos e margem de segurança"""
+    inputs = DCFInputs.from_dados(dados, engine.assumptions)
+    result = engine.value(inputs)
+    medianas = result["percentis"][:, PERCENTIS.index(50)]
+    margens = calcular_margem_seguranca(inputs.price, medianas)
+
+    saida = []
+    for i, item in enumerate(dados):
+        if not np.isfinite(inputs.price[i]):
+            continue
+        dcf = bool(np.isfinite(medianas[i]))
+        margem = round(float(margens[i]), 2) if dcf else None
+        saida.append({
+            "symbol": item.symbol,
+            "preco_atual": float(inputs.price[i]),
+            "preco_justo_dcf": round(float(medianas[i]), 2) if dcf else None,
+            "preco_justo_multiplos": fair_value_multiples(item),
+            "margem_seguranca": margem,
+            "percentis_dcf": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTIS, result["percentis"][i])} if dcf else {},
+            "probabilidade_subvalorizada": round(float(result["probabilidade_subvalorizada"][i]), 4) if dcf else None,
+            "recomendacao": recomendacao(margem),
+        })
+    return saida
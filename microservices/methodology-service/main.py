@@ -6,7 +6,6 @@ Responsável por aplicar diferentes metodologias de análise de investimentos
 import os
 import sys
 import uvicorn
-import httpx
 import json
 import time
 from fastapi import FastAPI, HTTPException, Query, Request
@@ -14,10 +13,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from prometheus_client import Counter, Histogram, generate_latest, start_http_server
 import structlog
 import redis
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, date
 from pydantic import BaseModel, Field
 from enum import Enum
+import numpy as np
+
+from shared.models.history_codec import MSGPACK_MEDIA_TYPE, decode_history_msgpack
+from shared.http_client import create_pool
+from technical_indicators import TechnicalIndicators, quote_session, trend
 
 # Configuração de logging
 structlog.configure(
@@ -65,6 +69,9 @@ def get_redis_client():
 
 redis_client = get_redis_client()
 
+# Pool HTTP para o Data Service (aberto no startup, fechado no shutdown)
+http_pool = create_pool("methodology-service")
+
 # FastAPI app
 app = FastAPI(
     title="Agente Investidor - Methodology Service",
@@ -104,6 +111,15 @@ class DadosFinanceiros(BaseModel):
     free_cash_flow: Optional[float] = None
     beta: Optional[float] = None
     peg_ratio: Optional[float] = None
+    current_price: Optional[float] = None
+    volume: Optional[float] = None
+    timestamp: Optional[datetime] = None  # Momento da cotação (Data Service, UTC)
+    # Indicadores técnicos (preenchidos para metodologias que os usam)
+    volatilidade: Optional[float] = None  # Desvio-padrão diário dos log-retornos (20 pregões)
+    liquidez: Optional[float] = None  # Volume financeiro médio diário
+    tendencia: Optional[int] = None  # +1 alta, -1 baixa, 0 lateral
+    rsi: Optional[float] = None
+    volume_medio: Optional[float] = None
 
 class AnaliseResultado(BaseModel):
     symbol: str
@@ -139,6 +155,17 @@ class ComparacaoResponse(BaseModel):
     melhor_metodologia: str
     timestamp: datetime
 
+class AnaliseLoteRequest(BaseModel):
+    symbol: str
+    metodologias: List[str]
+    dados: Optional[DadosFinanceiros] = None  # Enviados pelo chamador; sem eles, buscados no serviço de dados
+
+class AnaliseLoteResponse(BaseModel):
+    symbol: str
+    resultados: Dict[str, AnaliseResultado]
+    erros: Dict[str, str] = Field(default_factory=dict)
+    timestamp: datetime
+
 # Configuração
 DATA_SERVICE_URL = os.getenv("DATA_SERVICE_URL", "http://data-service:8002")
 
@@ -643,6 +670,7 @@ class TechnicalTrading:
     nome = "technical_trading"
     descricao = "Análise técnica baseada em padrões de preço e volume."
     indicadores = ["RSI", "MACD", "Volume", "Moving Averages", "Support/Resistance"]
+    usa_indicadores_tecnicos = True
     
     @staticmethod
     def analisar(dados: DadosFinanceiros) -> AnaliseResultado:
@@ -651,37 +679,56 @@ class TechnicalTrading:
         pontos_fracos = []
 
         # Volatilidade alta é positiva para trading
-        volatilidade = getattr(dados, 'volatilidade', 0.03)
-        if volatilidade > 0.025:
+        volatilidade = dados.volatilidade
+        if volatilidade is None:
+            pontos_fracos.append("Volatilidade indisponível")
+        elif volatilidade > 0.025:
             score += 30
             pontos_fortes.append(f"Volatilidade alta: {volatilidade*100:.2f}%")
         else:
             pontos_fracos.append(f"Volatilidade baixa: {volatilidade*100:.2f}%")
 
-        # Liquidez (simulação)
-        liquidez = getattr(dados, 'liquidez', 1e7)
-        if liquidez > 1e6:
+        # Liquidez (volume financeiro médio)
+        liquidez = dados.liquidez
+        if liquidez is None:
+            pontos_fracos.append("Liquidez indisponível")
+        elif liquidez > 1e6:
             score += 25
             pontos_fortes.append(f"Alta liquidez: R$ {liquidez:,.0f}")
         else:
             pontos_fracos.append(f"Liquidez baixa: R$ {liquidez:,.0f}")
 
-        # Tendência (simulação)
-        tendencia = getattr(dados, 'tendencia', 1)
-        if tendencia > 0:
+        # Tendência (preço vs SMA 50 confirmado pelo MACD)
+        tendencia = dados.tendencia
+        if tendencia is not None and tendencia > 0:
             score += 20
             pontos_fortes.append("Tendência de alta identificada")
+        elif tendencia is not None and tendencia < 0:
+            pontos_fracos.append("Tendência de baixa")
         else:
             pontos_fracos.append("Sem tendência clara")
 
         # Volume alto
-        volume = getattr(dados, 'volume', 1e6)
-        if volume > 5e5:
+        volume = dados.volume_medio if dados.volume_medio is not None else dados.volume
+        if volume is None:
+            pontos_fracos.append("Volume indisponível")
+        elif volume > 5e5:
             score += 15
             pontos_fortes.append(f"Volume alto: {volume:,.0f}")
         else:
             pontos_fracos.append(f"Volume baixo: {volume:,.0f}")
 
+        # Momento (RSI)
+        rsi = dados.rsi
+        if rsi is not None:
+            if rsi > 70:
+                pontos_fracos.append(f"RSI sobrecomprado: {rsi:.1f}")
+            elif rsi < 30:
+                pontos_fracos.append(f"RSI sobrevendido: {rsi:.1f}")
+            elif rsi >= 50:
+                score += 10
+                pontos_fortes.append(f"RSI com momento positivo: {rsi:.1f}")
+
         # Recomendação
         if score >= 70:
             recomendacao = RecomendacaoEnum.COMPRA
@@ -873,6 +920,14 @@ async def metrics_middleware(request, call_next):
     
     return response
 
+@app.on_event("startup")
+async def startup_event():
+    await http_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await http_pool.close()
+
 # Endpoints
 @app.get("/health")
 async def health_check():
@@ -912,13 +967,14 @@ async def analisar_acao(request: AnaliseRequest):
 
         # Buscar dados da ação
         dados = await buscar_dados_acao(request.symbol)
+        dados = await preparar_dados(dados, [request.metodologia])
         
         # Aplicar metodologia
         metodologia_classe = METODOLOGIAS[request.metodologia]
         resultado = metodologia_classe.analisar(dados)
         
         # Incrementar métrica
-        ANALYSIS_COUNT.labels(methodology=request.metodologia).inc()
+        ANALYSIS_COUNT.labels(methodology=request.metodologia, recommendation=resultado.recomendacao.value).inc()
         
         # Cache do resultado
         if redis_client:
@@ -946,16 +1002,9 @@ async def comparar_metodologias(request: ComparacaoRequest):
     try:
         # Buscar dados da ação
         dados = await buscar_dados_acao(request.symbol)
+        dados = await preparar_dados(dados, request.metodologias)
         
-        resultados = {}
-        for metodologia in request.metodologias:
-            if metodologia in METODOLOGIAS:
-                metodologia_classe = METODOLOGIAS[metodologia]
-                resultado = metodologia_classe.analisar(dados)
-                resultados[metodologia] = resultado
-                
-                # Incrementar métrica
-                ANALYSIS_COUNT.labels(methodology=metodologia).inc()
+        resultados, _ = avaliar_metodologias(dados, request.metodologias)
         
         # Encontrar melhor metodologia
         melhor_metodologia = max(resultados.keys(), 
@@ -972,6 +1021,46 @@ async def comparar_metodologias(request: ComparacaoRequest):
         logger.error(f"Erro na comparação: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analisar/lote", response_model=AnaliseLoteResponse)
+async def analisar_lote(request: AnaliseLoteRequest):
+    """Aplica várias metodologias sobre um único conjunto de dados da ação"""
+    try:
+        dados = request.dados or await buscar_dados_acao(request.symbol)
+        dados = await preparar_dados(dados, request.metodologias)
+        resultados, erros = avaliar_metodologias(dados, request.metodologias)
+        
+        return AnaliseLoteResponse(
+            symbol=request.symbol,
+            resultados=resultados,
+            erros=erros,
+            timestamp=datetime.utcnow()
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro na análise em lote: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def avaliar_metodologias(dados: DadosFinanceiros, metodologias: List[str]):
+    """Resultados por metodologia e erros das desconhecidas ou que falharam"""
+    resultados: Dict[str, AnaliseResultado] = {}
+    erros: Dict[str, str] = {}
+    for metodologia in dict.fromkeys(metodologias):
+        if metodologia not in METODOLOGIAS:
+            erros[metodologia] = f"Metodologia '{metodologia}' não encontrada"
+            continue
+        try:
+            resultados[metodologia] = METODOLOGIAS[metodologia].analisar(dados)
+        except Exception as e:
+            logger.error(f"Erro na metodologia {metodologia} para {dados.symbol}: {e}")
+            erros[metodologia] = str(e)
+            continue
+        
+        # Incrementar métrica
+        ANALYSIS_COUNT.labels(methodology=metodologia, recommendation=resultados[metodologia].recomendacao.value).inc()
+    return resultados, erros
+
 async def buscar_dados_acao(symbol: str) -> DadosFinanceiros:
     """Busca dados da ação no serviço de dados"""
     try:
@@ -984,7 +1073,7 @@ async def buscar_dados_acao(symbol: str) -> DadosFinanceiros:
                 return DadosFinanceiros(**data)
         
         # Buscar no serviço de dados
-        async with httpx.AsyncClient() as client:
+        async with http_pool.session() as client:
             response = await client.get(f"{DATA_SERVICE_URL}/stock/{symbol}")
             response.raise_for_status()
             data = response.json()
@@ -1002,6 +1091,107 @@ async def buscar_dados_acao(symbol: str) -> DadosFinanceiros:
             detail=f"Dados não encontrados para {symbol}"
         )
 
+TECHNICAL_STATE_TTL = 7 * 24 * 3600
+
+async def buscar_historico(symbol: str, period: str) -> Optional[Dict[str, np.ndarray]]:
+    """Histórico diário do serviço de dados (formato binário colunar)"""
+    try:
+        async with http_pool.session() as client:
+            response = await client.get(
+                f"{DATA_SERVICE_URL}/stock/{symbol}/history",
+                params={"period": period},
+                headers={"Accept": MSGPACK_MEDIA_TYPE}
+            )
+        if response.status_code != 200:
+            return None
+        columns = decode_history_msgpack(response.content)["columns"]
+        columns["date"] = columns["date"].astype("datetime64[D]")
+        return columns
+    except Exception as e:
+        logger.error(f"Erro ao buscar histórico para {symbol}: {e}")
+        return None
+
+async def carregar_indicadores(symbol: str) -> Optional[Tuple[TechnicalIndicators, np.datetime64]]:
+    """
+    Indicadores até o último pregão encerrado, e a data desse pregão. O estado
+    fica no Redis e é atualizado no máximo uma vez por dia, aplicando só os
+    pregões novos.
+    """
+    cache_key = f"technical_state:{symbol}"
+    today = np.datetime64(date.today(), "D")
+    state = None
+    if redis_client:
+        try:
+            cached = redis_client.get(cache_key)
+            state = json.loads(cached) if cached else None
+        except Exception as e:
+            logger.error(f"Erro ao ler estado técnico de {symbol}: {e}")
+    
+    if state and state["checked_on"] == str(today):
+        return TechnicalIndicators.from_dict(state["indicators"]), np.datetime64(state["last_date"], "D")
+    
+    indicators = None
+    if state:
+        last_date = np.datetime64(state["last_date"], "D")
+        columns = await buscar_historico(symbol, "1mo")
+        # Só dá para continuar o estado se o último pregão conhecido estiver coberto
+        if columns is not None and len(columns["date"]) and columns["date"][0] <= last_date:
+            indicators = TechnicalIndicators.from_dict(state["indicators"])
+            for i in np.flatnonzero((columns["date"] > last_date) & (columns["date"] < today)):
+                indicators.update(columns["close"][i], columns["high"][i], columns["low"][i], columns["volume"][i])
+                last_date = columns["date"][i]
+    
+    if indicators is None:
+        columns = await buscar_historico(symbol, "1y")
+        if columns is None:
+            return None
+        closed = columns["date"] < today
+        if not closed.any():
+            return None
+        indicators = TechnicalIndicators.from_history(
+            columns["close"][closed], columns["high"][closed],
+            columns["low"][closed], columns["volume"][closed]
+        )
+        last_date = columns["date"][closed][-1]
+    
+    if redis_client:
+        try:
+            redis_client.setex(cache_key, TECHNICAL_STATE_TTL, json.dumps({
+                "indicators": indicators.to_dict(),
+                "last_date": str(last_date),
+                "checked_on": str(today)
+            }))
+        except Exception as e:
+            logger.error(f"Erro ao salvar estado técnico de {symbol}: {e}")
+    return indicators, last_date
+
+async def preparar_dados(dados: DadosFinanceiros, metodologias: List[str]) -> DadosFinanceiros:
+    """Completar os dados com indicadores técnicos quando alguma metodologia os usa"""
+    if not any(getattr(METODOLOGIAS.get(m), "usa_indicadores_tecnicos", False) for m in metodologias):
+        return dados
+    
+    carregado = await carregar_indicadores(dados.symbol)
+    if carregado is None:
+        return dados
+    indicators, last_date = carregado
+    
+    # A cotação entra como barra provisória (sem alterar o estado) só se for de
+    # um pregão posterior ao último do estado; senão ela já está lá (fim de
+    # semana, antes da abertura) e contá-la de novo distorceria os indicadores
+    preco = dados.price or dados.current_price
+    if preco and quote_session(dados.timestamp) > last_date:
+        snapshot = indicators.peek(preco)
+    else:
+        snapshot = indicators.snapshot()
+    volume_medio = snapshot["volume_avg"]
+    return dados.copy(update={
+        "volatilidade": snapshot["volatility"],
+        "liquidez": volume_medio * snapshot["close"] if volume_medio is not None else None,
+        "tendencia": trend(snapshot),
+        "rsi": snapshot["rsi"],
+        "volume_medio": volume_medio
+    })
+
 if __name__ == "__main__":
     # Iniciar servidor de métricas Prometheus
     start_http_server(8000)
@@ -0,0 +1,487 @@
+"""
+Indicadores técnicos - Methodology Service
+Cada indicador tem dois modos que produzem os mesmos números:
+
+- vetorizado: a série inteira de uma vez (NumPy/pandas), para históricos;
+- incremental: estado pequeno e serializável atualizado em O(1) por barra,
+  para cotações ao vivo sem recalcular a janela.
+
+Médias exponenciais (EMA, RSI e ATR de Wilder, sinal do MACD) começam na
+média simples dos primeiros `period` valores, como nas definições clássicas.
+"""
+
+import copy
+import math
+from collections import deque
+from datetime import datetime, time as dt_time, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+MARKET_TIMEZONE = ZoneInfo("America/Sao_Paulo")
+MARKET_OPEN = dt_time(10, 0)
+
+
+# Modo vetorizado
+
+def _ewm(values, alpha: float, period: int) -> np.ndarray:
+    """Média exponencial semeada pela média simples dos primeiros `period` valores válidos"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) < period:
+        return out
+    start = valid[0] + period - 1
+    seeded = values[start:].copy()
+    seeded[0] = values[valid[0]:start + 1].mean()
+    out[start:] = pd.Series(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return out
+
+
+def _rolling(values, period: int) -> np.ndarray:
+    """Janelas deslizantes (T - period + 1, period) sem cópia"""
+    return np.lib.stride_tricks.sliding_window_view(np.asarray(values, dtype=np.float64), period)
+
+
+def _pad(values: np.ndarray, length: int) -> np.ndarray:
+    """Completar com NaN à esquerda até `length`"""
+    return np.concatenate([np.full(length - len(values), np.nan), values])
+
+
+def sma(values, period: int) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < period:
+        return np.full(len(values), np.nan)
+    return _pad(_rolling(values, period).mean(axis=1), len(values))
+
+
+def ema(values, period: int) -> np.ndarray:
+    return _ewm(values, 2 / (period + 1), period)
+
+
+def rsi(closes, period: int = 14) -> np.ndarray:
+    """RSI de Wilder (0-100)"""
+    closes = np.asarray(closes, dtype=np.float64)
+    change = np.diff(closes)
+    avg_gain = _ewm(np.maximum(change, 0), 1 / period, period)
+    avg_loss = _ewm(np.maximum(-change, 0), 1 / period, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    values[np.isnan(avg_gain)] = np.nan
+    return _pad(values, len(closes))
+
+
+def macd(closes, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    line = ema(closes, fast) - ema(closes, slow)
+    signal_line = _ewm(line, 2 / (signal + 1), signal)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+
+def bollinger(closes, period: int = 20, width: float = 2.0) -> Dict[str, np.ndarray]:
+    closes = np.asarray(closes, dtype=np.float64)
+    if len(closes) < period:
+        empty = np.full(len(closes), np.nan)
+        return {"upper": empty, "middle": empty, "lower": empty}
+    windows = _rolling(closes, period)
+    middle = _pad(windows.mean(axis=1), len(closes))
+    std = _pad(windows.std(axis=1), len(closes))
+    return {"upper": middle + width * std, "middle": middle, "lower": middle - width * std}
+
+
+def true_range(highs, lows, closes) -> np.ndarray:
+    highs, lows, closes = (np.asarray(a, dtype=np.float64) for a in (highs, lows, closes))
+    previous = np.concatenate([[np.nan], closes[:-1]])
+    ranges = np.vstack([highs - lows, np.abs(highs - previous), np.abs(lows - previous)])
+    return np.nanmax(ranges, axis=0)
+
+
+def atr(highs, lows, closes, period: int = 14) -> np.ndarray:
+    """ATR de Wilder"""
+    return _ewm(true_range(highs, lows, closes), 1 / period, period)
+
+
+def volatility(closes, period: int = 20) -> np.ndarray:
+    """Desvio-padrão amostral dos log-retornos diários na janela (fração, não anualizado)"""
+    returns = np.diff(np.log(np.asarray(closes, dtype=np.float64)))
+    if len(returns) < period:
+        return np.full(len(returns) + 1, np.nan)
+    return _pad(_rolling(returns, period).std(axis=1, ddof=1), len(returns) + 1)
+
+
+def compute_indicators(closes, highs=None, lows=None, volumes=None) -> Dict[str, np.ndarray]:
+    """Todos os indicadores para a série inteira (mesmas chaves de `TechnicalIndicators.snapshot`)"""
+    closes = np.asarray(closes, dtype=np.float64)
+    highs = closes if highs is None else highs
+    lows = closes if lows is None else lows
+    macd_lines = macd(closes)
+    bands = bollinger(closes)
+    return {
+        "close": closes,
+        "sma_20": sma(closes, 20),
+        "sma_50": sma(closes, 50),
+        "ema_12": ema(closes, 12),
+        "ema_26": ema(closes, 26),
+        "rsi": rsi(closes),
+        "macd": macd_lines["macd"],
+        "macd_signal": macd_lines["signal"],
+        "macd_histogram": macd_lines["histogram"],
+        "bollinger_upper": bands["upper"],
+        "bollinger_middle": bands["middle"],
+        "bollinger_lower": bands["lower"],
+        "atr": atr(highs, lows, closes),
+        "volatility": volatility(closes),
+        "volume_avg": np.full(len(closes), np.nan) if volumes is None else sma(volumes, 20),
+    }
+
+
+# Modo incremental
+
+class RollingWindow:
+    """Últimos `period` valores com soma e soma dos quadrados correntes"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values: Deque[float] = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.period
+
+    def update(self, value: float):
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+        if len(self.values) > self.period:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+        self.updates += 1
+        # Recalcular as somas de tempos em tempos evita acúmulo de erro
+        if self.updates >= self.period:
+            self._rebuild()
+
+    def _rebuild(self):
+        self.total = math.fsum(self.values)
+        self.total_sq = math.fsum(v * v for v in self.values)
+        self.updates = 0
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.period if self.full else None
+
+    def std(self, ddof: int = 0) -> Optional[float]:
+        if not self.full:
+            return None
+        mean = self.total / self.period
+        return math.sqrt(max(self.total_sq - self.period * mean * mean, 0.0) / (self.period - ddof))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "values": list(self.values)}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "RollingWindow":
+        window = cls(state["period"])
+        window.values = deque(state["values"])
+        window._rebuild()
+        return window
+
+    @classmethod
+    def from_series(cls, values, period: int) -> "RollingWindow":
+        values = np.asarray(values, dtype=np.float64)
+        return cls.from_dict({"period": period, "values": values[~np.isnan(values)][-period:].tolist()})
+
+
+class ExponentialAverage:
+    """Média exponencial semeada pela média simples (alpha padrão: 2 / (period + 1))"""
+
+    def __init__(self, period: int, alpha: Optional[float] = None):
+        self.period = period
+        self.alpha = 2 / (period + 1) if alpha is None else alpha
+        self.value: Optional[float] = None
+        self.seed: List[float] = []
+
+    def update(self, x: float) -> Optional[float]:
+        if self.value is not None:
+            self.value = (1 - self.alpha) * self.value + self.alpha * x
+        else:
+            self.seed.append(x)
+            if len(self.seed) == self.period:
+                self.value = sum(self.seed) / self.period
+                self.seed = []
+        return self.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "alpha": self.alpha, "value": self.value, "seed": self.seed}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "ExponentialAverage":
+        average = cls(state["period"], state["alpha"])
+        average.value = state["value"]
+        average.seed = list(state["seed"])
+        return average
+
+    @classmethod
+    def from_series(cls, values, period: int, alpha: Optional[float] = None) -> "ExponentialAverage":
+        average = cls(period, alpha)
+        values = np.asarray(values, dtype=np.float64)
+        smoothed = _ewm(values, average.alpha, period)
+        if len(smoothed) and not np.isnan(smoothed[-1]):
+            average.value = float(smoothed[-1])
+        else:
+            average.seed = values[~np.isnan(values)].tolist()
+        return average
+
+
+class RSI:
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous: Optional[float] = None
+        self.gains = ExponentialAverage(period, 1 / period)
+        self.losses = ExponentialAverage(period, 1 / period)
+
+    def update(self, close: float) -> Optional[float]:
+        if self.previous is not None:
+            change = close - self.previous
+            self.gains.update(max(change, 0.0))
+            self.losses.update(max(-change, 0.0))
+        self.previous = close
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        if self.gains.value is None:
+            return None
+        if self.losses.value == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.gains.value / self.losses.value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "previous": self.previous,
+                "gains": self.gains.to_dict(), "losses": self.losses.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "RSI":
+        indicator = cls(state["period"])
+        indicator.previous = state["previous"]
+        indicator.gains = ExponentialAverage.from_dict(state["gains"])
+        indicator.losses = ExponentialAverage.from_dict(state["losses"])
+        return indicator
+
+    @classmethod
+    def from_series(cls, closes, period: int = 14) -> "RSI":
+        indicator = cls(period)
+        closes = np.asarray(closes, dtype=np.float64)
+        change = np.diff(closes)
+        indicator.gains = ExponentialAverage.from_series(np.maximum(change, 0), period, 1 / period)
+        indicator.losses = ExponentialAverage.from_series(np.maximum(-change, 0), period, 1 / period)
+        indicator.previous = float(closes[-1]) if len(closes) else None
+        return indicator
+
+
+class MACD:
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = ExponentialAverage(fast)
+        self.slow = ExponentialAverage(slow)
+        self.signal = ExponentialAverage(signal)
+
+    def update(self, close: float):
+        self.fast.update(close)
+        self.slow.update(close)
+        if self.slow.value is not None:
+            self.signal.update(self.fast.value - self.slow.value)
+
+    @property
+    def line(self) -> Optional[float]:
+        if self.slow.value is None:
+            return None
+        return self.fast.value - self.slow.value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"fast": self.fast.to_dict(), "slow": self.slow.to_dict(), "signal": self.signal.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "MACD":
+        indicator = cls()
+        indicator.fast = ExponentialAverage.from_dict(state["fast"])
+        indicator.slow = ExponentialAverage.from_dict(state["slow"])
+        indicator.signal = ExponentialAverage.from_dict(state["signal"])
+        return indicator
+
+    @classmethod
+    def from_series(cls, closes, fast: int = 12, slow: int = 26, signal: int = 9) -> "MACD":
+        indicator = cls(fast, slow, signal)
+        indicator.fast = ExponentialAverage.from_series(closes, fast)
+        indicator.slow = ExponentialAverage.from_series(closes, slow)
+        indicator.signal = ExponentialAverage.from_series(ema(closes, fast) - ema(closes, slow), signal)
+        return indicator
+
+
+class ATR:
+    def __init__(self, period: int = 14):
+        self.previous: Optional[float] = None
+        self.average = ExponentialAverage(period, 1 / period)
+
+    def update(self, high: float, low: float, close: float) -> Optional[float]:
+        if self.previous is None:
+            value = high - low
+        else:
+            value = max(high - low, abs(high - self.previous), abs(low - self.previous))
+        self.previous = close
+        return self.average.update(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"previous": self.previous, "average": self.average.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "ATR":
+        indicator = cls()
+        indicator.previous = state["previous"]
+        indicator.average = ExponentialAverage.from_dict(state["average"])
+        return indicator
+
+    @classmethod
+    def from_series(cls, highs, lows, closes, period: int = 14) -> "ATR":
+        indicator = cls(period)
+        indicator.average = ExponentialAverage.from_series(true_range(highs, lows, closes), period, 1 / period)
+        indicator.previous = float(closes[-1]) if len(closes) else None
+        return indicator
+
+
+class TechnicalIndicators:
+    """
+    Estado incremental de todos os indicadores de um ativo (barras diárias).
+    `update` consolida uma barra; `peek` mostra os indicadores com uma barra
+    provisória (cotação ao vivo) sem alterar o estado.
+    """
+
+    def __init__(self):
+        self.sma_20 = RollingWindow(20)
+        self.sma_50 = RollingWindow(50)
+        self.rsi = RSI(14)
+        self.macd = MACD(12, 26, 9)
+        self.atr = ATR(14)
+        self.returns = RollingWindow(20)
+        self.volume = RollingWindow(20)
+        self.last_close: Optional[float] = None
+        self.bars = 0
+
+    def update(self, close: float, high: Optional[float] = None, low: Optional[float] = None,
+               volume: Optional[float] = None) -> Dict[str, Optional[float]]:
+        """Consolidar uma barra; sem máxima/mínima usa o fechamento e sem volume mantém a média"""
+        high = close if high is None else high
+        low = close if low is None else low
+        if self.last_close is not None:
+            self.returns.update(math.log(close / self.last_close))
+        self.sma_20.update(close)
+        self.sma_50.update(close)
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.atr.update(high, low, close)
+        if volume is not None:
+            self.volume.update(float(volume))
+        self.last_close = close
+        self.bars += 1
+        return self.snapshot()
+
+    def peek(self, close: float, high: Optional[float] = None, low: Optional[float] = None,
+             volume: Optional[float] = None) -> Dict[str, Optional[float]]:
+        return copy.deepcopy(self).update(close, high, low, volume)
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        middle = self.sma_20.mean()
+        std = self.sma_20.std()
+        line = self.macd.line
+        signal = self.macd.signal.value
+        return {
+            "close": self.last_close,
+            "sma_20": middle,
+            "sma_50": self.sma_50.mean(),
+            "ema_12": self.macd.fast.value,
+            "ema_26": self.macd.slow.value,
+            "rsi": self.rsi.value,
+            "macd": line,
+            "macd_signal": signal,
+            "macd_histogram": None if signal is None else line - signal,
+            "bollinger_upper": None if middle is None else middle + 2 * std,
+            "bollinger_middle": middle,
+            "bollinger_lower": None if middle is None else middle - 2 * std,
+            "atr": self.atr.average.value,
+            "volatility": self.returns.std(ddof=1),
+            "volume_avg": self.volume.mean(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sma_20": self.sma_20.to_dict(),
+            "sma_50": self.sma_50.to_dict(),
+            "rsi": self.rsi.to_dict(),
+            "macd": self.macd.to_dict(),
+            "atr": self.atr.to_dict(),
+            "returns": self.returns.to_dict(),
+            "volume": self.volume.to_dict(),
+            "last_close": self.last_close,
+            "bars": self.bars,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "TechnicalIndicators":
+        indicators = cls()
+        indicators.sma_20 = RollingWindow.from_dict(state["sma_20"])
+        indicators.sma_50 = RollingWindow.from_dict(state["sma_50"])
+        indicators.rsi = RSI.from_dict(state["rsi"])
+        indicators.macd = MACD.from_dict(state["macd"])
+        indicators.atr = ATR.from_dict(state["atr"])
+        indicators.returns = RollingWindow.from_dict(state["returns"])
+        indicators.volume = RollingWindow.from_dict(state["volume"])
+        indicators.last_close = state["last_close"]
+        indicators.bars = state["bars"]
+        return indicators
+
+    @classmethod
+    def from_history(cls, closes, highs=None, lows=None, volumes=None) -> "TechnicalIndicators":
+        """Estado semeado pelo modo vetorizado (sem laço por barra)"""
+        closes = np.asarray(closes, dtype=np.float64)
+        highs = closes if highs is None else np.asarray(highs, dtype=np.float64)
+        lows = closes if lows is None else np.asarray(lows, dtype=np.float64)
+        indicators = cls()
+        indicators.sma_20 = RollingWindow.from_series(closes, 20)
+        indicators.sma_50 = RollingWindow.from_series(closes, 50)
+        indicators.rsi = RSI.from_series(closes, 14)
+        indicators.macd = MACD.from_series(closes, 12, 26, 9)
+        indicators.atr = ATR.from_series(highs, lows, closes, 14)
+        indicators.returns = RollingWindow.from_series(np.diff(np.log(closes)), 20)
+        if volumes is not None:
+            indicators.volume = RollingWindow.from_series(volumes, 20)
+        indicators.last_close = float(closes[-1]) if len(closes) else None
+        indicators.bars = len(closes)
+        return indicators
+
+
+def trend(snapshot: Dict[str, Optional[float]]) -> Optional[int]:
+    """+1 (alta), -1 (baixa) ou 0: preço contra a SMA 50 confirmado pelo histograma do MACD"""
+    close, sma_50, histogram = snapshot["close"], snapshot["sma_50"], snapshot["macd_histogram"]
+    if close is None or sma_50 is None or histogram is None:
+        return None
+    if close > sma_50 and histogram > 0:
+        return 1
+    if close < sma_50 and histogram < 0:
+        return -1
+    return 0
+
+
+def quote_session(timestamp: Optional[datetime] = None) -> np.datetime64:
+    """
+    Pregão a que uma cotação pertence (horário da B3; sem fuso = UTC). Antes
+    da abertura e em fins de semana é o último pregão anterior; feriados não
+    são considerados.
+    """
+    timestamp = timestamp or datetime.now(timezone.utc)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    local = timestamp.astimezone(MARKET_TIMEZONE)
+    day = local.date() - timedelta(days=1) if local.time() < MARKET_OPEN else local.date()
+    return np.busday_offset(np.datetime64(day, "D"), 0, roll="backward")
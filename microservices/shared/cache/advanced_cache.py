@@ -10,6 +10,7 @@ import asyncio
 import json
 import logging
 import pickle
+import struct
 import time
 import zlib
 from datetime import datetime, timedelta
@@ -17,11 +18,14 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass, asdict
 from enum import Enum
 import hashlib
+from collections import OrderedDict
 import redis.asyncio as redis
 from prometheus_client import Counter, Histogram, Gauge
 import threading
 from concurrent.futures import ThreadPoolExecutor
 
+from .tags import AsyncTagIndex, type_tag
+
 # Métricas Prometheus
 cache_hits = Counter('cache_hits_total', 'Total cache hits', ['level', 'key_type'])
 cache_misses = Counter('cache_misses_total', 'Total cache misses', ['level', 'key_type'])
@@ -31,6 +35,9 @@ cache_items = Gauge('cache_items_total', 'Total items in cache', ['level'])
 
 logger = logging.getLogger(__name__)
 
+# Registro L2: tamanho dos metadados (4 bytes), metadados JSON e payload, em uma única chave
+L2_HEADER = struct.Struct(">I")
+
 class CacheLevel(Enum):
     L1 = "l1"  # Memória local
     L2 = "l2"  # Redis distribuído
@@ -80,7 +87,8 @@ class AdvancedCache:
         default_ttl: int = 3600,  # 1 hora
         compression_threshold: int = 1024,  # Comprimir se > 1KB
         auto_refresh_threshold: float = 0.8,  # Refresh quando 80% do TTL
-        enable_metrics: bool = True
+        enable_metrics: bool = True,
+        access_flush_interval: float = 30.0  # Gravação em lote dos acessos ao L2
     ):
         self.redis_url = redis_url
         self.l1_max_size = l1_max_size
@@ -90,8 +98,10 @@ class AdvancedCache:
         self.auto_refresh_threshold = auto_refresh_threshold
         self.enable_metrics = enable_metrics
         
-        # L1 Cache (memória)
-        self.l1_cache: Dict[str, CacheEntry] = {}
+        # L1 Cache (memória): ordem de inserção = ordem de uso (LRU no início),
+        # com o total de bytes mantido a cada inserção/remoção
+        self.l1_cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.l1_bytes = 0
         self.l1_lock = threading.RLock()
         self.l1_stats = CacheStats()
         
@@ -99,6 +109,12 @@ class AdvancedCache:
         self.redis_client: Optional[redis.Redis] = None
         self.l2_stats = CacheStats()
         
+        # Acessos ao L2 acumulados em memória e gravados em lote: leitura não vira escrita
+        self.access_flush_interval = access_flush_interval
+        self.l2_access: Dict[str, int] = {}
+        self.access_lock = threading.Lock()
+        self.access_task: Optional[asyncio.Task] = None
+        
         # Auto-refresh
         self.refresh_callbacks: Dict[str, callable] = {}
         self.refresh_executor = ThreadPoolExecutor(max_workers=4)
@@ -107,6 +123,10 @@ class AdvancedCache:
         # Configurações
         self.serialization_method = SerializationMethod.PICKLE
         
+        # Tags de invalidação do L2: membros são as chaves lógicas, cada uma
+        # expandida para a chave entry: correspondente
+        self.tag_index: Optional[AsyncTagIndex] = None
+        
         logger.info(f"AdvancedCache initialized with L1_max_size={l1_max_size}, L1_max_memory={l1_max_memory}MB")
 
     async def initialize(self):
@@ -114,6 +134,12 @@ class AdvancedCache:
         try:
             self.redis_client = redis.from_url(self.redis_url, decode_responses=False)
             await self.redis_client.ping()
+            self.tag_index = AsyncTagIndex(
+                self.redis_client,
+                prefix="cache:tags",
+                expand=self._l2_keys
+            )
+            self.access_task = asyncio.create_task(self._flush_access_periodically())
             logger.info("Redis connection established")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
@@ -121,7 +147,13 @@ class AdvancedCache:
 
     async def close(self):
         """Fecha conexões e limpa recursos"""
+        if self.access_task:
+            self.access_task.cancel()
         if self.redis_client:
+            try:
+                await self.flush_access_stats()
+            except Exception as e:
+                logger.error(f"Error flushing cache access stats: {e}")
             await self.redis_client.close()
         
         # Cancela tasks de refresh
@@ -166,32 +198,84 @@ class AdvancedCache:
         """Gera hash da chave para evitar problemas com caracteres especiais"""
         return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
 
+    def _l2_key(self, key: str) -> str:
+        """Chave Redis do registro (metadados + dados) de uma chave lógica"""
+        return f"entry:{self._generate_key_hash(key)}"
+
+    def _l2_keys(self, key: str) -> List[str]:
+        """Chaves Redis de uma chave lógica (expansão das tags)"""
+        return [self._l2_key(key)]
+
+    def _pack_l2(self, metadata: Dict[str, Any], payload: bytes) -> bytes:
+        meta = json.dumps(metadata).encode('utf-8')
+        return L2_HEADER.pack(len(meta)) + meta + payload
+
+    def _unpack_l2(self, record: bytes) -> Tuple[Dict[str, Any], bytes]:
+        (meta_size,) = L2_HEADER.unpack_from(record)
+        start = L2_HEADER.size
+        return json.loads(record[start:start + meta_size]), record[start + meta_size:]
+
+    def _decode_l2(self, record: bytes) -> Tuple[Any, bool]:
+        """Valor de um registro L2 e se ele já expirou"""
+        metadata, payload = self._unpack_l2(record)
+        if metadata.get('expires_at'):
+            if datetime.now() > datetime.fromisoformat(metadata['expires_at']):
+                return None, True
+        data = self._decompress(payload, metadata.get('is_compressed', False))
+        serialization_method = SerializationMethod(metadata.get('serialization_method', 'pickle'))
+        return self._deserialize(data, serialization_method), False
+
+    def _record_l2_access(self, entry_key: str):
+        with self.access_lock:
+            self.l2_access[entry_key] = self.l2_access.get(entry_key, 0) + 1
+
+    async def flush_access_stats(self) -> int:
+        """Grava os acessos acumulados ao L2 em um pipeline (access:<hash>, com TTL)"""
+        if not self.redis_client:
+            return 0
+        with self.access_lock:
+            pending, self.l2_access = self.l2_access, {}
+        if not pending:
+            return 0
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for entry_key, count in pending.items():
+            access_key = "access:" + entry_key.split(":", 1)[1]
+            pipe.incrby(access_key, count)
+            pipe.expire(access_key, self.default_ttl)
+        await pipe.execute()
+        return len(pending)
+
+    async def _flush_access_periodically(self):
+        while True:
+            await asyncio.sleep(self.access_flush_interval)
+            try:
+                await self.flush_access_stats()
+            except Exception as e:
+                logger.error(f"Error flushing cache access stats: {e}")
+
+    def _pop_l1(self, key: str) -> Optional[CacheEntry]:
+        """Remove a chave do L1 descontando o seu tamanho (chamar com o lock)"""
+        entry = self.l1_cache.pop(key, None)
+        if entry is not None:
+            self.l1_bytes -= entry.size_bytes
+        return entry
+
     def _evict_l1_if_needed(self):
         """Remove itens do L1 se necessário (LRU)"""
         with self.l1_lock:
-            # Verifica limite de itens
-            while len(self.l1_cache) >= self.l1_max_size:
+            while self.l1_cache and (
+                len(self.l1_cache) > self.l1_max_size or self.l1_bytes > self.l1_max_memory
+            ):
                 self._evict_lru_l1()
-            
-            # Verifica limite de memória
-            current_memory = sum(entry.size_bytes for entry in self.l1_cache.values())
-            while current_memory > self.l1_max_memory and self.l1_cache:
-                evicted_entry = self._evict_lru_l1()
-                if evicted_entry:
-                    current_memory -= evicted_entry.size_bytes
 
     def _evict_lru_l1(self) -> Optional[CacheEntry]:
-        """Remove item menos recentemente usado do L1"""
+        """Remove item menos recentemente usado do L1 (o primeiro da ordem)"""
         if not self.l1_cache:
             return None
         
-        # Encontra item menos recentemente acessado
-        lru_key = min(
-            self.l1_cache.keys(),
-            key=lambda k: self.l1_cache[k].last_accessed or self.l1_cache[k].created_at
-        )
-        
-        evicted_entry = self.l1_cache.pop(lru_key)
+        lru_key, evicted_entry = self.l1_cache.popitem(last=False)
+        self.l1_bytes -= evicted_entry.size_bytes
         self.l1_stats.evictions += 1
         
         if self.enable_metrics:
@@ -249,10 +333,11 @@ class AdvancedCache:
         value: Any,
         ttl: Optional[int] = None,
         key_type: str = "unknown",
-        refresh_callback: Optional[callable] = None
+        refresh_callback: Optional[callable] = None,
+        tags: Optional[List[str]] = None
     ) -> bool:
         """
-        Define valor no cache (L1 + L2)
+        Define valor no cache (L1 + L2), registrando a chave nas tags informadas
         """
         start_time = time.time()
         ttl = ttl or self.default_ttl
@@ -262,7 +347,7 @@ class AdvancedCache:
             await self._set_l1(key, value, ttl, key_type)
             
             # Define em L2 (Redis)
-            await self._set_l2(key, value, ttl, key_type)
+            await self._set_l2(key, value, ttl, key_type, tags)
             
             # Registra callback de refresh se fornecido
             if refresh_callback:
@@ -286,14 +371,15 @@ class AdvancedCache:
             
             # Verifica expiração
             if entry.expires_at and datetime.now() > entry.expires_at:
-                del self.l1_cache[key]
+                self._pop_l1(key)
                 self.l1_stats.evictions += 1
                 if self.enable_metrics:
                     cache_items.labels(level="l1").dec()
                     cache_size.labels(level="l1").dec(entry.size_bytes)
                 return None
             
-            # Atualiza estatísticas de acesso
+            # Atualiza estatísticas de acesso (mais recente vai para o fim)
+            self.l1_cache.move_to_end(key)
             entry.access_count += 1
             entry.last_accessed = datetime.now()
             self.l1_stats.hits += 1
@@ -306,10 +392,10 @@ class AdvancedCache:
         
         with self.l1_lock:
             # Remove entrada existente se houver
-            if key in self.l1_cache:
-                old_entry = self.l1_cache[key]
-                if self.enable_metrics:
-                    cache_size.labels(level="l1").dec(old_entry.size_bytes)
+            old_entry = self._pop_l1(key)
+            if old_entry is not None and self.enable_metrics:
+                cache_items.labels(level="l1").dec()
+                cache_size.labels(level="l1").dec(old_entry.size_bytes)
             
             # Calcula tamanho aproximado
             try:
@@ -328,6 +414,7 @@ class AdvancedCache:
             )
             
             self.l1_cache[key] = entry
+            self.l1_bytes += size_bytes
             
             # Atualiza métricas
             if self.enable_metrics:
@@ -338,47 +425,22 @@ class AdvancedCache:
             self._evict_l1_if_needed()
 
     async def _get_l2(self, key: str) -> Any:
-        """Busca valor no L2 (Redis)"""
+        """Busca valor no L2 (Redis): metadados e dados em um único GET"""
         if not self.redis_client:
             return None
         
         try:
-            # Busca metadados e dados
-            key_hash = self._generate_key_hash(key)
-            meta_key = f"meta:{key_hash}"
-            data_key = f"data:{key_hash}"
-            
-            meta_data = await self.redis_client.get(meta_key)
-            if not meta_data:
+            entry_key = self._l2_key(key)
+            record = await self.redis_client.get(entry_key)
+            if not record:
                 return None
             
-            metadata = json.loads(meta_data)
-            
-            # Verifica expiração
-            if metadata.get('expires_at'):
-                expires_at = datetime.fromisoformat(metadata['expires_at'])
-                if datetime.now() > expires_at:
-                    await self.redis_client.delete(meta_key, data_key)
-                    return None
-            
-            # Busca dados
-            data = await self.redis_client.get(data_key)
-            if not data:
+            value, expired = self._decode_l2(record)
+            if expired:
+                await self.redis_client.delete(entry_key)
                 return None
             
-            # Descomprime se necessário
-            is_compressed = metadata.get('is_compressed', False)
-            data = self._decompress(data, is_compressed)
-            
-            # Deserializa
-            serialization_method = SerializationMethod(metadata.get('serialization_method', 'pickle'))
-            value = self._deserialize(data, serialization_method)
-            
-            # Atualiza estatísticas de acesso
-            metadata['access_count'] = metadata.get('access_count', 0) + 1
-            metadata['last_accessed'] = datetime.now().isoformat()
-            await self.redis_client.set(meta_key, json.dumps(metadata))
-            
+            self._record_l2_access(entry_key)
             self.l2_stats.hits += 1
             return value
             
@@ -386,7 +448,37 @@ class AdvancedCache:
             logger.error(f"Error getting L2 cache key {key}: {e}")
             return None
 
-    async def _set_l2(self, key: str, value: Any, ttl: int = None, key_type: str = "unknown"):
+    def _queue_l2(self, pipe, key: str, value: Any, ttl: int, key_type: str,
+                  tags: Optional[List[str]] = None) -> int:
+        """Enfileira no pipeline o registro L2 da chave (e suas tags); devolve o tamanho gravado"""
+        # Serializa valor
+        data, serialization_method = self._serialize(value)
+        
+        # Comprime se necessário
+        compressed_data, is_compressed = self._compress(data)
+        compression_ratio = len(compressed_data) / len(data) if data else 1.0
+        
+        # Prepara metadados
+        metadata = {
+            'created_at': datetime.now().isoformat(),
+            'expires_at': (datetime.now() + timedelta(seconds=ttl)).isoformat(),
+            'key_type': key_type,
+            'serialization_method': serialization_method.value,
+            'is_compressed': is_compressed,
+            'compression_ratio': compression_ratio,
+            'size_bytes': len(compressed_data)
+        }
+        
+        pipe.set(self._l2_key(key), self._pack_l2(metadata, compressed_data), ex=ttl)
+        if self.tag_index:
+            # Toda chave entra na tag "all" (usada por clear) e na do seu tipo; os
+            # membros saem quando a entrada expira, então "all" só guarda chaves vivas
+            all_tags = ["all", type_tag(key_type), *(tags or [])]
+            self.tag_index.register(pipe, key, all_tags, ttl)
+        return len(compressed_data)
+
+    async def _set_l2(self, key: str, value: Any, ttl: int = None, key_type: str = "unknown",
+                      tags: Optional[List[str]] = None):
         """Define valor no L2 (Redis)"""
         if not self.redis_client:
             return
@@ -394,60 +486,123 @@ class AdvancedCache:
         ttl = ttl or self.default_ttl
         
         try:
-            # Serializa valor
-            data, serialization_method = self._serialize(value)
-            
-            # Comprime se necessário
-            compressed_data, is_compressed = self._compress(data)
-            compression_ratio = len(compressed_data) / len(data) if data else 1.0
-            
-            # Prepara metadados
-            metadata = {
-                'created_at': datetime.now().isoformat(),
-                'expires_at': (datetime.now() + timedelta(seconds=ttl)).isoformat(),
-                'key_type': key_type,
-                'serialization_method': serialization_method.value,
-                'is_compressed': is_compressed,
-                'compression_ratio': compression_ratio,
-                'size_bytes': len(compressed_data),
-                'access_count': 0
-            }
-            
-            # Salva no Redis
-            key_hash = self._generate_key_hash(key)
-            meta_key = f"meta:{key_hash}"
-            data_key = f"data:{key_hash}"
-            
             pipe = self.redis_client.pipeline()
-            pipe.set(meta_key, json.dumps(metadata), ex=ttl)
-            pipe.set(data_key, compressed_data, ex=ttl)
+            size_bytes = self._queue_l2(pipe, key, value, ttl, key_type, tags)
             await pipe.execute()
             
             # Atualiza métricas
             if self.enable_metrics:
                 cache_items.labels(level="l2").inc()
-                cache_size.labels(level="l2").inc(len(compressed_data))
+                cache_size.labels(level="l2").inc(size_bytes)
             
         except Exception as e:
             logger.error(f"Error setting L2 cache key {key}: {e}")
 
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Busca várias chaves: L1 primeiro e as restantes em um único MGET no
+        L2 (promovidas para o L1). Retorna apenas as chaves encontradas.
+        """
+        start_time = time.time()
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        
+        for key in dict.fromkeys(keys):
+            value = await self._get_l1(key)
+            if value is not None:
+                found[key] = value
+                if self.enable_metrics:
+                    cache_hits.labels(level="l1", key_type=self._get_key_type(key)).inc()
+            else:
+                missing.append(key)
+        
+        if missing and self.redis_client:
+            try:
+                entry_keys = [self._l2_key(key) for key in missing]
+                records = await self.redis_client.mget(entry_keys)
+                expired = []
+                for key, entry_key, record in zip(missing, entry_keys, records):
+                    if not record:
+                        continue
+                    try:
+                        value, is_expired = self._decode_l2(record)
+                    except Exception as e:
+                        logger.error(f"Error decoding L2 cache key {key}: {e}")
+                        continue
+                    if is_expired:
+                        expired.append(entry_key)
+                        continue
+                    
+                    found[key] = value
+                    self._record_l2_access(entry_key)
+                    self.l2_stats.hits += 1
+                    await self._set_l1(key, value)
+                    if self.enable_metrics:
+                        cache_hits.labels(level="l2", key_type=self._get_key_type(key)).inc()
+                
+                if expired:
+                    await self.redis_client.delete(*expired)
+                    
+            except Exception as e:
+                logger.error(f"Error getting {len(missing)} L2 cache keys: {e}")
+        
+        if self.enable_metrics:
+            for key in missing:
+                if key not in found:
+                    cache_misses.labels(level="l2", key_type=self._get_key_type(key)).inc()
+            cache_operations.labels(operation="get_many", level="both").observe(time.time() - start_time)
+        
+        return found
+
+    async def set_many(
+        self,
+        items: Dict[str, Any],
+        ttl: Optional[int] = None,
+        key_type: str = "unknown",
+        tags: Optional[List[str]] = None
+    ) -> bool:
+        """Define várias chaves no L1 e no L2 (um único pipeline no Redis)"""
+        start_time = time.time()
+        ttl = ttl or self.default_ttl
+        
+        try:
+            for key, value in items.items():
+                await self._set_l1(key, value, ttl, key_type)
+            
+            if self.redis_client and items:
+                pipe = self.redis_client.pipeline()
+                size_bytes = sum(
+                    self._queue_l2(pipe, key, value, ttl, key_type, tags) for key, value in items.items()
+                )
+                await pipe.execute()
+                
+                if self.enable_metrics:
+                    cache_items.labels(level="l2").inc(len(items))
+                    cache_size.labels(level="l2").inc(size_bytes)
+            
+            if self.enable_metrics:
+                cache_operations.labels(operation="set_many", level="both").observe(time.time() - start_time)
+            
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error setting {len(items)} cache keys: {e}")
+            return False
+
     async def delete(self, key: str) -> bool:
         """Remove chave do cache (L1 + L2)"""
         try:
             # Remove do L1
             with self.l1_lock:
-                if key in self.l1_cache:
-                    entry = self.l1_cache.pop(key)
+                entry = self._pop_l1(key)
+                if entry is not None:
                     if self.enable_metrics:
                         cache_items.labels(level="l1").dec()
                         cache_size.labels(level="l1").dec(entry.size_bytes)
             
             # Remove do L2
             if self.redis_client:
-                key_hash = self._generate_key_hash(key)
-                meta_key = f"meta:{key_hash}"
-                data_key = f"data:{key_hash}"
-                await self.redis_client.delete(meta_key, data_key)
+                await self.redis_client.delete(self._l2_key(key))
             
             # Remove callback de refresh
             self.refresh_callbacks.pop(key, None)
@@ -476,22 +631,19 @@ class AdvancedCache:
                         keys_to_remove.append(key)
                 
                 for key in keys_to_remove:
-                    entry = self.l1_cache.pop(key)
+                    entry = self._pop_l1(key)
                     if self.enable_metrics:
                         cache_items.labels(level="l1").dec()
                         cache_size.labels(level="l1").dec(entry.size_bytes)
                     cleared_count += 1
             
-            # Limpa L2 (Redis)
-            if self.redis_client and pattern != "*":
-                # Para padrões específicos, busca chaves correspondentes
-                keys = await self.redis_client.keys(f"*{pattern}*")
-                if keys:
-                    await self.redis_client.delete(*keys)
-                    cleared_count += len(keys) // 2  # meta + data keys
-            elif self.redis_client and pattern == "*":
-                # Limpa tudo
-                await self.redis_client.flushdb()
+            # Limpa L2 (Redis) pelas tags, sem KEYS/FLUSHDB (o Redis é compartilhado)
+            if self.tag_index:
+                if pattern == "*":
+                    deleted = await self.tag_index.invalidate("all")
+                else:
+                    deleted = await self.tag_index.invalidate_matching("all", f"*{pattern}*")
+                cleared_count += deleted
             
             return cleared_count
             
@@ -499,6 +651,16 @@ class AdvancedCache:
             logger.error(f"Error clearing cache with pattern {pattern}: {e}")
             return 0
 
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Remove do L2 todas as chaves registradas nas tags (o L1 expira pelo TTL)"""
+        if not self.tag_index:
+            return 0
+        try:
+            return await self.tag_index.invalidate(*tags)
+        except Exception as e:
+            logger.error(f"Error invalidating cache tags {tags}: {e}")
+            return 0
+
     async def _check_auto_refresh(self, key: str, entry: CacheEntry):
         """Verifica se deve fazer auto-refresh do valor"""
         if key not in self.refresh_callbacks:
@@ -554,7 +716,7 @@ class AdvancedCache:
     async def get_stats(self) -> Dict[str, Any]:
         """Retorna estatísticas detalhadas do cache"""
         with self.l1_lock:
-            l1_size_bytes = sum(entry.size_bytes for entry in self.l1_cache.values())
+            l1_size_bytes = self.l1_bytes
             l1_item_count = len(self.l1_cache)
         
         # Estatísticas L2 (Redis)
@@ -600,9 +762,17 @@ async def get(key: str, default: Any = None) -> Any:
     """Função de conveniência para buscar no cache"""
     return await cache.get(key, default)
 
-async def set(key: str, value: Any, ttl: Optional[int] = None, key_type: str = "unknown", refresh_callback: Optional[callable] = None) -> bool:
+async def set(key: str, value: Any, ttl: Optional[int] = None, key_type: str = "unknown", refresh_callback: Optional[callable] = None, tags: Optional[List[str]] = None) -> bool:
     """Função de conveniência para definir no cache"""
-    return await cache.set(key, value, ttl, key_type, refresh_callback)
+    return await cache.set(key, value, ttl, key_type, refresh_callback, tags)
+
+async def get_many(keys: List[str]) -> Dict[str, Any]:
+    """Função de conveniência para buscar várias chaves no cache"""
+    return await cache.get_many(keys)
+
+async def set_many(items: Dict[str, Any], ttl: Optional[int] = None, key_type: str = "unknown", tags: Optional[List[str]] = None) -> bool:
+    """Função de conveniência para definir várias chaves no cache"""
+    return await cache.set_many(items, ttl, key_type, tags)
 
 async def delete(key: str) -> bool:
     """Função de conveniência para deletar do cache"""
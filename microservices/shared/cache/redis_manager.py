@@ -13,6 +13,8 @@ from dataclasses import dataclass
 from enum import Enum
 import structlog
 
+from .tags import TagIndex
+
 logger = structlog.get_logger()
 
 class CacheLevel(Enum):
@@ -76,6 +78,14 @@ class RedisManager:
         
         return self.connections[db]
     
+    def _tag_index(self) -> TagIndex:
+        """Índice de tags de invalidação (toda chave entra na tag do seu namespace)"""
+        return TagIndex(self.get_connection())
+    
+    @staticmethod
+    def _namespace_tag(namespace: str) -> str:
+        return f"namespace:{namespace}"
+    
     def _generate_key(self, namespace: str, key: str, params: Dict = None) -> str:
         """Gerar chave de cache com namespace e parâmetros"""
         if params:
@@ -122,8 +132,9 @@ class RedisManager:
         return gzip.decompress(compressed).decode()
     
     def set(self, namespace: str, key: str, value: Any, 
-            config: CacheConfig = None, params: Dict = None) -> bool:
-        """Definir valor no cache"""
+            config: CacheConfig = None, params: Dict = None,
+            tags: List[str] = None) -> bool:
+        """Definir valor no cache (registrando a chave no namespace e nas tags extras)"""
         try:
             config = config or self.default_config
             cache_key = self._generate_key(namespace, key, params)
@@ -164,6 +175,7 @@ class RedisManager:
             pipe.hset(cache_key, "value", serialized_value)
             pipe.hset(cache_key, "metadata", json.dumps(metadata))
             pipe.expire(cache_key, config.ttl)
+            self._tag_index().register(pipe, cache_key, [self._namespace_tag(namespace), *(tags or [])], config.ttl)
             pipe.execute()
             
             self.stats["sets"] += 1
@@ -268,23 +280,36 @@ class RedisManager:
             return False
     
     def invalidate_pattern(self, namespace: str, pattern: str = "*") -> int:
-        """Invalidar cache por padrão"""
+        """Invalidar cache por padrão (varre apenas as chaves do namespace, sem KEYS)"""
         try:
-            redis_conn = self.get_connection()
-            full_pattern = f"{namespace}:{pattern}"
-            
-            keys = redis_conn.keys(full_pattern)
-            if keys:
-                deleted = redis_conn.delete(*keys)
-                self.stats["invalidations"] += deleted
-                logger.info("Cache pattern invalidated", pattern=full_pattern, deleted=deleted)
-                return deleted
-            return 0
+            tag_index = self._tag_index()
+            namespace_tag = self._namespace_tag(namespace)
+            
+            if pattern == "*":
+                deleted = tag_index.invalidate(namespace_tag)
+            else:
+                deleted = tag_index.invalidate_matching(namespace_tag, f"{namespace}:{pattern}")
+            
+            self.stats["invalidations"] += deleted
+            logger.info("Cache pattern invalidated", namespace=namespace, pattern=pattern, deleted=deleted)
+            return deleted
             
         except Exception as e:
             logger.error("Cache pattern invalidation failed", pattern=pattern, error=str(e))
             return 0
     
+    def invalidate_tags(self, *tags: str) -> int:
+        """Invalidar todas as chaves registradas nas tags"""
+        try:
+            deleted = self._tag_index().invalidate(*tags)
+            self.stats["invalidations"] += deleted
+            logger.info("Cache tags invalidated", tags=list(tags), deleted=deleted)
+            return deleted
+            
+        except Exception as e:
+            logger.error("Cache tag invalidation failed", tags=list(tags), error=str(e))
+            return 0
+    
     def warm_cache(self, namespace: str, key: str, value_generator: Callable, 
                    config: CacheConfig = None, params: Dict = None) -> bool:
         """Aquecer cache com valor gerado"""
@@ -5,7 +5,8 @@ from .service_client import (
     call_service,
     validate_user_token,
     get_stock_data,
-    analyze_stock
+    analyze_stock,
+    analyze_stock_methodologies
 )
 
 __all__ = [
@@ -15,6 +16,7 @@ __all__ = [
     "call_service",
     "validate_user_token",
     "get_stock_data",
-    "analyze_stock"
+    "analyze_stock",
+    "analyze_stock_methodologies"
 ]
 
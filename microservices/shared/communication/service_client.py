@@ -6,6 +6,7 @@ Responsável por comunicação HTTP síncrona com circuit breaker e retry
 import asyncio
 import httpx
 import json
+import os
 import time
 from typing import Dict, Any, Optional, List
 from enum import Enum
@@ -13,8 +14,13 @@ from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import structlog
 
+from ..http_client import HTTPClientPool, PoolConfig
+
 logger = structlog.get_logger()
 
+# Metodologias por chamada a /analisar/lote (lotes maiores são divididos em chamadas concorrentes)
+METHODOLOGY_BATCH_SIZE = int(os.getenv("METHODOLOGY_BATCH_SIZE", "10"))
+
 class CircuitState(Enum):
     CLOSED = "closed"
     OPEN = "open"
@@ -43,11 +49,17 @@ class ServiceClient:
     def __init__(self):
         self.services: Dict[str, ServiceConfig] = {}
         self.circuit_breakers: Dict[str, CircuitBreakerState] = {}
-        self.client = httpx.AsyncClient()
+        # Conexões reaproveitadas (keep-alive) entre todas as chamadas
+        self.pool = HTTPClientPool("service-client", PoolConfig.from_env(max_keepalive_connections=50))
         
         # Configurar serviços conhecidos
         self._setup_default_services()
     
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente compartilhado do pool (nunca guardado: o pool o recria após close())"""
+        return self.pool.client
+    
     def _setup_default_services(self):
         """Configura serviços padrão"""
         self.register_service(ServiceConfig(
@@ -173,63 +185,65 @@ class ServiceClient:
         
         last_exception = None
         
-        for attempt in range(config.retries + 1):
-            try:
-                logger.info(f"Requisição {method} {url} (tentativa {attempt + 1})")
-                
-                if method.upper() == "GET":
-                    response = await self.client.get(
-                        url,
-                        headers=request_headers,
-                        timeout=request_timeout
-                    )
-                elif method.upper() == "POST":
-                    response = await self.client.post(
-                        url,
-                        json=data,
-                        headers=request_headers,
-                        timeout=request_timeout
-                    )
-                elif method.upper() == "PUT":
-                    response = await self.client.put(
-                        url,
-                        json=data,
-                        headers=request_headers,
-                        timeout=request_timeout
-                    )
-                elif method.upper() == "DELETE":
-                    response = await self.client.delete(
-                        url,
-                        headers=request_headers,
-                        timeout=request_timeout
-                    )
-                else:
-                    raise Exception(f"Método HTTP {method} não suportado")
-                
-                # Verificar status da resposta
-                if response.status_code >= 400:
-                    raise httpx.HTTPStatusError(
-                        f"HTTP {response.status_code}",
-                        request=response.request,
-                        response=response
-                    )
-                
-                # Sucesso
-                self._record_success(service_name)
-                
+        # session(): cliente compartilhado no loop dono do pool, temporário nos demais
+        async with self.pool.session() as client:
+            for attempt in range(config.retries + 1):
                 try:
-                    return response.json()
-                except:
-                    return {"status": "success", "data": response.text}
-                
-            except Exception as e:
-                last_exception = e
-                logger.warning(f"Falha na requisição {method} {url}: {e}")
-                
-                if attempt < config.retries:
-                    await asyncio.sleep(config.retry_delay * (attempt + 1))
-                else:
-                    self._record_failure(service_name)
+                    logger.info(f"Requisição {method} {url} (tentativa {attempt + 1})")
+                    
+                    if method.upper() == "GET":
+                        response = await client.get(
+                            url,
+                            headers=request_headers,
+                            timeout=request_timeout
+                        )
+                    elif method.upper() == "POST":
+                        response = await client.post(
+                            url,
+                            json=data,
+                            headers=request_headers,
+                            timeout=request_timeout
+                        )
+                    elif method.upper() == "PUT":
+                        response = await client.put(
+                            url,
+                            json=data,
+                            headers=request_headers,
+                            timeout=request_timeout
+                        )
+                    elif method.upper() == "DELETE":
+                        response = await client.delete(
+                            url,
+                            headers=request_headers,
+                            timeout=request_timeout
+                        )
+                    else:
+                        raise Exception(f"Método HTTP {method} não suportado")
+                    
+                    # Verificar status da resposta
+                    if response.status_code >= 400:
+                        raise httpx.HTTPStatusError(
+                            f"HTTP {response.status_code}",
+                            request=response.request,
+                            response=response
+                        )
+                    
+                    # Sucesso
+                    self._record_success(service_name)
+                    
+                    try:
+                        return response.json()
+                    except:
+                        return {"status": "success", "data": response.text}
+                    
+                except Exception as e:
+                    last_exception = e
+                    logger.warning(f"Falha na requisição {method} {url}: {e}")
+                    
+                    if attempt < config.retries:
+                        await asyncio.sleep(config.retry_delay * (attempt + 1))
+                    else:
+                        self._record_failure(service_name)
         
         raise last_exception
     
@@ -269,6 +283,34 @@ class ServiceClient:
         }
         return await self.post("methodology-service", "/analyze", data=payload)
     
+    async def analyze_with_methodologies(self, symbol: str, methodologies: List[str], data: Dict[str, Any],
+                                         batch_size: int = METHODOLOGY_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Analisa ação com várias metodologias sobre um único payload de dados.
+        Uma chamada por lote de `batch_size` metodologias, todas concorrentes;
+        falha de um lote vira erro das metodologias dele.
+        """
+        methodologies = list(dict.fromkeys(methodologies))
+        batches = [methodologies[i:i + batch_size] for i in range(0, len(methodologies), batch_size)]
+        responses = await asyncio.gather(*(
+            self.post("methodology-service", "/analisar/lote", data={
+                "symbol": symbol,
+                "metodologias": batch,
+                "dados": data
+            })
+            for batch in batches
+        ), return_exceptions=True)
+        
+        resultados: Dict[str, Any] = {}
+        erros: Dict[str, str] = {}
+        for batch, response in zip(batches, responses):
+            if isinstance(response, Exception):
+                erros.update({methodology: str(response) for methodology in batch})
+                continue
+            resultados.update(response.get("resultados", {}))
+            erros.update(response.get("erros", {}))
+        return {"symbol": symbol, "resultados": resultados, "erros": erros}
+    
     async def get_financial_analysis(self, symbol: str, indicators: List[str]) -> Dict[str, Any]:
         """Obtém análise financeira completa"""
         payload = {
@@ -304,7 +346,7 @@ class ServiceClient:
     
     async def close(self):
         """Fecha cliente HTTP"""
-        await self.client.aclose()
+        await self.pool.close()
 
 # Instância global do cliente
 service_client = ServiceClient()
@@ -326,3 +368,7 @@ async def analyze_stock(symbol: str, methodology: str, data: Dict[str, Any]) ->
     """Analisa ação com metodologia"""
     return await service_client.analyze_with_methodology(symbol, methodology, data)
 
+async def analyze_stock_methodologies(symbol: str, methodologies: List[str], data: Dict[str, Any]) -> Dict[str, Any]:
+    """Analisa ação com várias metodologias (chamadas em lote)"""
+    return await service_client.analyze_with_methodologies(symbol, methodologies, data)
+
@@ -0,0 +1,8 @@
+from .pool import HTTPClientPool, PoolConfig, create_pool, HTTP2_AVAILABLE
+
+__all__ = [
+    "HTTPClientPool",
+    "PoolConfig",
+    "create_pool",
+    "HTTP2_AVAILABLE"
+]
@@ -1,4 +1,4 @@
-from .kafka_client import KafkaClient, Topics, MessageSchemas, kafka_client, send_message, consume_messages
+from .kafka_client import KafkaClient, Topics, MessageSchemas, kafka_client, send_message, consume_messages, enrich_message
 
 __all__ = [
     "KafkaClient",
@@ -6,6 +6,7 @@ __all__ = [
     "MessageSchemas",
     "kafka_client",
     "send_message",
-    "consume_messages"
+    "consume_messages",
+    "enrich_message"
 ]
 
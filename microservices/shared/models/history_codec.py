@@ -0,0 +1,45 @@
+"""
+Decodificação do histórico colunar do Data Service
+Converte as respostas msgpack/JSON colunares de `/stock/{symbol}/history`
+diretamente em arrays NumPy, sem parsing por linha.
+"""
+
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def decode_history_msgpack(body: bytes) -> Dict[str, Any]:
+    """Decodificar payload msgpack: retorna metadados e `columns` como arrays NumPy"""
+    if msgpack is None:
+        raise RuntimeError("msgpack não está instalado")
+
+    payload = msgpack.unpackb(body, raw=False)
+    dtypes = payload["dtypes"]
+    columns = {
+        name: np.frombuffer(buffer, dtype=dtypes[name])
+        for name, buffer in payload["columns"].items()
+    }
+    columns["date"] = columns["date"].view("datetime64[ns]")
+    payload["columns"] = columns
+    return payload
+
+
+def decode_history_columnar(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Converter resposta JSON colunar (`format=columnar`) em arrays NumPy"""
+    raw = payload["columns"]
+    columns = {
+        name: np.asarray(raw[name], dtype=np.float64)
+        for name in ("open", "high", "low", "close")
+    }
+    columns["volume"] = np.asarray(raw["volume"], dtype=np.int64)
+    columns["date"] = pd.to_datetime(raw["date"], utc=True).as_unit("ns").asi8.view("datetime64[ns]")
+    return {**payload, "columns": columns}
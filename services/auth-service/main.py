@@ -19,6 +19,7 @@ import jwt
 from passlib.context import CryptContext
 import redis
 import json
+import hashlib
 
 # Configuração de logging
 structlog.configure(
@@ -52,6 +53,10 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
+# Serviços validam tokens localmente; revogações são avisadas por pub/sub
+REVOCATION_CHANNEL = "auth:token_revoked"
+REVOKED_KEY_PREFIX = "revoked_token:"
+
 # Redis connection with retry logic
 def get_redis_client():
     try:
@@ -155,6 +160,16 @@ def verify_token(token: str):
     except jwt.PyJWTError:
         return None
 
+def revoke_token(token: str):
+    """Revogar o token até a sua expiração e avisar os serviços que o validam localmente"""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    remaining = int(payload["exp"] - time.time())
+    if remaining <= 0:
+        return
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    redis_client.setex(f"{REVOKED_KEY_PREFIX}{digest}", remaining, 1)
+    redis_client.publish(REVOCATION_CHANNEL, json.dumps({"digest": digest, "exp": payload["exp"]}))
+
 # Middleware para métricas
 @app.middleware("http")
 async def metrics_middleware(request, call_next):
@@ -254,7 +269,7 @@ async def login(user_credentials: UserLogin):
         # Criar tokens
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user["email"]}, expires_delta=access_token_expires
+            data={"sub": user["email"], "user_id": user["id"]}, expires_delta=access_token_expires
         )
         refresh_token = create_refresh_token(data={"sub": user["email"]})
         
@@ -300,7 +315,7 @@ async def refresh_token(refresh_token: str):
         # Criar novos tokens
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         new_access_token = create_access_token(
-            data={"sub": user["email"]}, expires_delta=access_token_expires
+            data={"sub": user["email"], "user_id": user["id"]}, expires_delta=access_token_expires
         )
         new_refresh_token = create_refresh_token(data={"sub": user["email"]})
         
@@ -331,6 +346,11 @@ async def validate_token(credentials: HTTPAuthorizationCredentials = Depends(sec
             TOKEN_VALIDATIONS.labels(status="invalid").inc()
             raise HTTPException(status_code=401, detail="Invalid token")
         
+        digest = hashlib.sha256(credentials.credentials.encode()).hexdigest()
+        if redis_client and redis_client.exists(f"{REVOKED_KEY_PREFIX}{digest}"):
+            TOKEN_VALIDATIONS.labels(status="revoked").inc()
+            raise HTTPException(status_code=401, detail="Token revoked")
+        
         user = fake_users_db.get(token_data.email)
         if not user:
             TOKEN_VALIDATIONS.labels(status="user_not_found").inc()
@@ -363,8 +383,9 @@ async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
         
         user = fake_users_db.get(token_data.email)
         if user:
-            # Remover refresh token do Redis
+            # Remover refresh token do Redis e revogar o access token
             redis_client.delete(f"refresh_token:{user['id']}")
+            revoke_token(credentials.credentials)
             logger.info("User logged out", email=user["email"], user_id=user["id"])
         
         return {"message": "Logged out successfully"}
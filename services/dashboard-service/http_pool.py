@@ -0,0 +1,184 @@
+"""
+Pool de conexões HTTP para chamadas entre serviços
+Um `httpx.AsyncClient` de longa duração por serviço, com keep-alive, limites
+ajustáveis por ambiente e HTTP/2 opcional (pacote `h2`). O cliente nasce no
+startup, fecha no shutdown e exporta métricas de uso do pool.
+
+Uso: `async with pool.session() as client:` no lugar de
+`async with httpx.AsyncClient() as client:`. Dentro do event loop dono do
+pool a sessão devolve o cliente compartilhado; em outro loop (ex.: threads
+de consumidores Kafka com `asyncio.run`) devolve um cliente temporário.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+import structlog
+from prometheus_client import Counter, Gauge, Histogram
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = structlog.get_logger()
+
+# Métricas Prometheus
+HTTP_POOL_CONNECTIONS = Gauge('http_client_pool_connections', 'Pooled connections', ['pool', 'state'])
+HTTP_POOL_UTILIZATION = Gauge('http_client_pool_utilization', 'Active connections / max connections', ['pool'])
+HTTP_POOL_IN_FLIGHT = Gauge('http_client_in_flight_requests', 'Requests waiting for a response', ['pool'])
+HTTP_POOL_REQUESTS = Counter('http_client_requests_total', 'Outbound requests', ['pool', 'host', 'outcome'])
+HTTP_POOL_DURATION = Histogram('http_client_request_duration_seconds', 'Outbound request duration', ['pool', 'host'])
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+@dataclass
+class PoolConfig:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 10.0
+    connect_timeout: float = 5.0
+    http2: bool = False
+
+    @classmethod
+    def from_env(cls, prefix: str = "HTTP_POOL_", **defaults) -> "PoolConfig":
+        """Valores de `defaults` (ou do dataclass) sobrescritos por HTTP_POOL_* do ambiente"""
+        base = cls(**defaults)
+        return cls(
+            max_connections=int(os.getenv(f"{prefix}MAX_CONNECTIONS", base.max_connections)),
+            max_keepalive_connections=int(os.getenv(f"{prefix}MAX_KEEPALIVE", base.max_keepalive_connections)),
+            keepalive_expiry=float(os.getenv(f"{prefix}KEEPALIVE_EXPIRY", base.keepalive_expiry)),
+            timeout=float(os.getenv(f"{prefix}TIMEOUT", base.timeout)),
+            connect_timeout=float(os.getenv(f"{prefix}CONNECT_TIMEOUT", base.connect_timeout)),
+            http2=_env_bool(f"{prefix}HTTP2", base.http2),
+        )
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Transporte que mede requisições e atualiza as métricas do pool"""
+
+    def __init__(self, pool: "HTTPClientPool", transport: httpx.AsyncHTTPTransport):
+        self.pool = pool
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        in_flight = HTTP_POOL_IN_FLIGHT.labels(pool=self.pool.name)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            HTTP_POOL_REQUESTS.labels(pool=self.pool.name, host=host, outcome="error").inc()
+            raise
+        finally:
+            in_flight.dec()
+            HTTP_POOL_DURATION.labels(pool=self.pool.name, host=host).observe(time.perf_counter() - start)
+            self.pool.update_metrics()
+        HTTP_POOL_REQUESTS.labels(pool=self.pool.name, host=host, outcome=f"{response.status_code // 100}xx").inc()
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class HTTPClientPool:
+    """Cliente HTTP compartilhado de um serviço, ligado ao event loop que o criou"""
+
+    def __init__(self, name: str, config: Optional[PoolConfig] = None):
+        self.name = name
+        self.config = config or PoolConfig.from_env()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        if self.config.http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but h2 is not installed, using HTTP/1.1", pool=name)
+
+    def _build(self, instrumented: bool) -> httpx.AsyncClient:
+        config = self.config
+        transport = httpx.AsyncHTTPTransport(
+            http2=config.http2 and HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            retries=1,  # Refaz apenas falhas de conexão (ex.: keep-alive fechado pelo servidor)
+        )
+        if instrumented:
+            self._transport = transport
+        return httpx.AsyncClient(
+            transport=_InstrumentedTransport(self, transport) if instrumented else transport,
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Cliente compartilhado (criado sob demanda)"""
+        if self._client is None:
+            self._client = self._build(instrumented=True)
+        return self._client
+
+    async def start(self):
+        """Ligar o cliente compartilhado ao event loop atual (startup da aplicação)"""
+        if self._loop is None:
+            self.client
+            self._loop = asyncio.get_running_loop()
+            logger.info("HTTP client pool started", pool=self.name, http2=self.config.http2 and HTTP2_AVAILABLE,
+                        max_connections=self.config.max_connections)
+
+    async def close(self):
+        """Fechar as conexões do pool (shutdown da aplicação)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._transport = None
+            self._loop = None
+            self.update_metrics()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[httpx.AsyncClient]:
+        """Cliente compartilhado no loop dono do pool; temporário nos demais"""
+        if self._loop is None:
+            await self.start()
+        if asyncio.get_running_loop() is self._loop:
+            yield self.client
+        else:
+            async with self._build(instrumented=False) as client:
+                yield client
+
+    def utilization(self) -> Dict[str, int]:
+        """Conexões ativas e ociosas no pool (0 se ainda não iniciado)"""
+        active = idle = 0
+        try:
+            connections = self._transport._pool.connections if self._transport else []
+            for connection in connections:
+                if connection.is_idle():
+                    idle += 1
+                else:
+                    active += 1
+        except AttributeError:
+            pass
+        return {"active": active, "idle": idle, "max": self.config.max_connections}
+
+    def update_metrics(self):
+        usage = self.utilization()
+        HTTP_POOL_CONNECTIONS.labels(pool=self.name, state="active").set(usage["active"])
+        HTTP_POOL_CONNECTIONS.labels(pool=self.name, state="idle").set(usage["idle"])
+        HTTP_POOL_UTILIZATION.labels(pool=self.name).set(usage["active"] / usage["max"])
+
+
+def create_pool(name: str, **defaults) -> HTTPClientPool:
+    """Pool de um serviço com os padrões informados, ajustáveis por HTTP_POOL_*"""
+    return HTTPClientPool(name, PoolConfig.from_env(**defaults))
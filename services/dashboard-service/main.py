@@ -13,12 +13,13 @@ import structlog
 import time
 import redis
 import json
-import httpx
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 import uuid
 
+from http_pool import create_pool
+
 # Configuração de logging
 structlog.configure(
     processors=[
@@ -52,6 +53,9 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
+# Pool HTTP para os demais serviços (aberto no startup, fechado no shutdown)
+http_pool = create_pool("dashboard-service", timeout=10.0)
+
 # FastAPI app
 app = FastAPI(
     title="Agente Investidor - Dashboard Service",
@@ -142,7 +146,7 @@ def get_cached_data(key: str) -> Optional[Any]:
 async def fetch_data_from_service(service_url: str, endpoint: str) -> Optional[Dict[str, Any]]:
     """Buscar dados de outros serviços"""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with http_pool.session() as client:
             response = await client.get(f"{service_url}{endpoint}")
             if response.status_code == 200:
                 return response.json()
@@ -168,6 +172,14 @@ async def metrics_middleware(request, call_next):
     
     return response
 
+@app.on_event("startup")
+async def startup_event():
+    await http_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await http_pool.close()
+
 # Health check
 @app.get("/health")
 async def health_check():
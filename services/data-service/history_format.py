@@ -0,0 +1,134 @@
+"""
+Formatos de resposta do histórico - Data Service
+Conversão vetorizada da série histórica para linhas JSON, colunas JSON,
+msgpack binário ou Arrow IPC, negociados pelo header `Accept`.
+
+Formato binário (msgpack): mapa com `symbol`, `period`, `timestamp`, `length`,
+`dtypes` e `columns`, onde cada coluna é um buffer little-endian
+(`date` em int64 nanossegundos UTC, preços em float64, volume em int64),
+decodificável com `numpy.frombuffer` sem parsing por linha.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+JSON_MEDIA_TYPE = "application/json"
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+BINARY_DTYPES = {
+    "date": "<i8",
+    "open": "<f8",
+    "high": "<f8",
+    "low": "<f8",
+    "close": "<f8",
+    "volume": "<i8",
+}
+
+
+def negotiate_media_type(accept: Optional[str]) -> Optional[str]:
+    """
+    Escolher o formato de resposta a partir do header Accept. q=0 significa
+    "não aceito"; None quando o cliente recusou todos os formatos, inclusive
+    o JSON padrão.
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    # Respeita a ordem e os pesos q= informados pelo cliente
+    candidates = []
+    refused = set()
+    for position, part in enumerate(accept.split(",")):
+        fields = [f.strip() for f in part.split(";")]
+        media_type = fields[0].lower()
+        quality = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            refused.add(media_type)
+            continue
+        candidates.append((-quality, position, media_type))
+
+    for _, _, media_type in sorted(candidates):
+        if media_type == MSGPACK_MEDIA_TYPE and msgpack is not None:
+            return MSGPACK_MEDIA_TYPE
+        if media_type == ARROW_MEDIA_TYPE and pa is not None:
+            return ARROW_MEDIA_TYPE
+        if media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            return JSON_MEDIA_TYPE
+
+    # Nenhum formato pedido disponível: JSON, a menos que tenha sido recusado
+    if refused & {JSON_MEDIA_TYPE, "application/*", "*/*"}:
+        return None
+    return JSON_MEDIA_TYPE
+
+
+def to_columns(frame: pd.DataFrame) -> Dict[str, List[Any]]:
+    """Colunas paralelas (listas Python) prontas para JSON"""
+    columns = {"date": frame.index.tolist()}
+    for name in PRICE_COLUMNS:
+        columns[name] = frame[name].to_numpy(dtype=np.float64).tolist()
+    columns["volume"] = frame["volume"].to_numpy(dtype=np.int64).tolist()
+    return columns
+
+
+def to_rows(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Linhas no formato legado (lista de dicts), montadas a partir das colunas"""
+    columns = to_columns(frame)
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def _epoch_ns(frame: pd.DataFrame) -> np.ndarray:
+    return pd.to_datetime(frame.index, utc=True).as_unit("ns").asi8
+
+
+def encode_msgpack(frame: pd.DataFrame, meta: Dict[str, Any]) -> bytes:
+    """Serializar a série em msgpack com colunas como buffers binários"""
+    arrays = {"date": _epoch_ns(frame)}
+    for name in PRICE_COLUMNS + ["volume"]:
+        arrays[name] = frame[name].to_numpy()
+
+    columns = {
+        name: np.ascontiguousarray(arrays[name], dtype=dtype).tobytes()
+        for name, dtype in BINARY_DTYPES.items()
+    }
+    payload = {
+        **meta,
+        "length": len(frame),
+        "dtypes": BINARY_DTYPES,
+        "columns": columns,
+    }
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def encode_arrow(frame: pd.DataFrame, meta: Dict[str, Any]) -> bytes:
+    """Serializar a série como stream Arrow IPC"""
+    table = pa.table({
+        "date": pa.array(_epoch_ns(frame), type=pa.timestamp("ns", tz="UTC")),
+        **{name: pa.array(frame[name].to_numpy(dtype=np.float64)) for name in PRICE_COLUMNS},
+        "volume": pa.array(frame["volume"].to_numpy(dtype=np.int64)),
+    })
+    table = table.replace_schema_metadata({k: str(v) for k, v in meta.items()})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,242 @@
+"""
+Histórico canônico por ação - Data Service
+Mantém uma única série histórica por símbolo no Redis, estendida apenas com
+as barras que faltam, e serve cada `period` como um recorte dessa série.
+O yfinance devolve preços ajustados: se um desdobramento ou provento
+reajustar a série, a barra encerrada relida pela cauda não bate com a
+guardada e a série inteira é buscada de novo.
+"""
+
+import json
+import math
+import time
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import pandas as pd
+import structlog
+from prometheus_client import Counter
+
+from cache_tags import TagIndex, symbol_tag, type_tag
+
+logger = structlog.get_logger()
+
+# Métricas Prometheus
+HISTORY_FETCHES = Counter('history_fetches_total', 'Upstream history fetches', ['kind'])
+HISTORY_BARS_FETCHED = Counter('history_bars_fetched_total', 'Bars downloaded from upstream', ['kind'])
+
+COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# Períodos aceitos pelo endpoint e a janela de calendário que cada um cobre.
+# 1d/5d são contados em pregões, então buscamos uma margem de calendário
+# e recortamos as últimas N barras.
+PERIOD_DAYS = {
+    "1d": 7,
+    "5d": 12,
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827,
+    "10y": 3653,
+}
+PERIOD_BARS = {"1d": 1, "5d": 5}
+SUPPORTED_PERIODS = set(PERIOD_DAYS) | {"ytd", "max"}
+
+# fetcher(symbol, start, end) -> DataFrame no formato do yfinance
+# (índice de datas, colunas Open/High/Low/Close/Volume). start=None = "max".
+HistoryFetcher = Callable[[str, Optional[date], Optional[date]], Awaitable[pd.DataFrame]]
+
+
+def period_start(period: str, today: Optional[date] = None) -> Optional[date]:
+    """Primeira data de calendário necessária para servir o período (None = max)"""
+    today = today or date.today()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return date(today.year, 1, 1)
+    return today - timedelta(days=PERIOD_DAYS[period])
+
+
+def normalize_frame(hist: pd.DataFrame) -> pd.DataFrame:
+    """Converter DataFrame do yfinance para o formato canônico"""
+    if hist is None or hist.empty:
+        return pd.DataFrame(columns=COLUMNS, index=pd.Index([], name="date"))
+
+    frame = hist.rename(columns=str.lower)[COLUMNS].copy()
+    frame.index = pd.Index([ts.isoformat() for ts in frame.index], name="date")
+    return frame
+
+
+def merge_frames(base: pd.DataFrame, extra: pd.DataFrame) -> pd.DataFrame:
+    """Mesclar barras novas na série canônica (a barra mais recente vence)"""
+    if base.empty:
+        merged = extra
+    elif extra.empty:
+        return base
+    else:
+        merged = pd.concat([base, extra])
+
+    # A chave de ordenação/deduplicação é o dia (YYYY-MM-DD): o offset do fuso
+    # muda com horário de verão e não deve gerar barras duplicadas.
+    day = merged.index.str.slice(0, 10)
+    merged = merged[~day.duplicated(keep="last")]
+    return merged.iloc[merged.index.str.slice(0, 10).argsort(kind="stable")]
+
+
+def series_readjusted(base: pd.DataFrame, tail: pd.DataFrame, bar: str) -> bool:
+    """A barra encerrada `bar`, relida na cauda, mudou de fechamento (série reajustada)"""
+    reread = tail[tail.index.str.slice(0, 10) == bar[:10]]
+    if reread.empty:
+        return False
+    return not math.isclose(float(base.loc[bar, "close"]), float(reread["close"].iloc[-1]), rel_tol=1e-6)
+
+
+class HistoryStore:
+    """
+    Série histórica canônica por símbolo.
+
+    O registro no Redis guarda as colunas da série e a cobertura já buscada
+    (`covered_from`), de modo que:
+    - um período mais longo busca apenas o trecho inicial que falta;
+    - após `refresh_interval`, busca-se apenas a cauda desde a penúltima
+      barra; se o fechamento dela mudou, a série foi reajustada e é
+      buscada inteira de novo.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        fetcher: HistoryFetcher,
+        refresh_interval: int = 3600,
+        ttl: int = 7 * 24 * 3600,
+        key_prefix: str = "history:canonical",
+        tag_index: Optional[TagIndex] = None
+    ):
+        self.redis_client = redis_client
+        self.fetcher = fetcher
+        self.refresh_interval = refresh_interval
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self.tag_index = tag_index
+
+    def _key(self, symbol: str) -> str:
+        return f"{self.key_prefix}:{symbol.upper()}"
+
+    def _load(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Carregar registro canônico do Redis"""
+        if not self.redis_client:
+            return None
+        try:
+            raw = self.redis_client.get(self._key(symbol))
+            if not raw:
+                return None
+            record = json.loads(raw)
+            columns = record.pop("columns")
+            record["frame"] = pd.DataFrame(
+                {name: columns[name] for name in COLUMNS},
+                index=pd.Index(columns["date"], name="date")
+            )
+            return record
+        except Exception as e:
+            logger.error("History load failed", symbol=symbol, error=str(e))
+            return None
+
+    def _save(self, symbol: str, record: Dict[str, Any]):
+        """Persistir registro canônico no Redis"""
+        if not self.redis_client:
+            return
+        try:
+            frame = record["frame"]
+            columns = {"date": frame.index.tolist()}
+            for name in COLUMNS:
+                columns[name] = frame[name].tolist()
+            payload = {k: v for k, v in record.items() if k != "frame"}
+            payload["columns"] = columns
+            if self.tag_index:
+                tags = [symbol_tag(symbol), type_tag("history")]
+                self.tag_index.set(self._key(symbol), json.dumps(payload), self.ttl, tags)
+            else:
+                self.redis_client.setex(self._key(symbol), self.ttl, json.dumps(payload))
+        except Exception as e:
+            logger.error("History save failed", symbol=symbol, error=str(e))
+
+    async def _fetch(self, symbol: str, kind: str, start: Optional[date], end: Optional[date] = None) -> pd.DataFrame:
+        HISTORY_FETCHES.labels(kind=kind).inc()
+        frame = normalize_frame(await self.fetcher(symbol, start, end))
+        HISTORY_BARS_FETCHED.labels(kind=kind).inc(len(frame))
+        logger.debug("History fetched", symbol=symbol, kind=kind, bars=len(frame))
+        return frame
+
+    async def get_frame(self, symbol: str, period: str) -> pd.DataFrame:
+        """Obter a série canônica garantindo cobertura e frescor para o período"""
+        symbol = symbol.upper()
+        today = date.today()
+        needed_from = period_start(period, today)
+        record = self._load(symbol)
+        changed = False
+
+        if record is None:
+            frame = await self._fetch(symbol, "full", needed_from)
+            record = {
+                "covered_from": needed_from.isoformat() if needed_from else None,
+                "updated_at": time.time(),
+                "frame": frame,
+            }
+            changed = True
+        else:
+            covered_from = record.get("covered_from")
+
+            # Trecho inicial que falta (período mais longo que o já coberto)
+            if covered_from is not None and (needed_from is None or needed_from.isoformat() < covered_from):
+                end = date.fromisoformat(covered_from)
+                head = await self._fetch(symbol, "head", needed_from, end)
+                record["frame"] = merge_frames(head, record["frame"])
+                record["covered_from"] = needed_from.isoformat() if needed_from else None
+                changed = True
+
+            # Cauda desde a penúltima barra: a última pode ser parcial e a
+            # penúltima, já encerrada, serve de âncora do ajuste
+            if time.time() - record.get("updated_at", 0) >= self.refresh_interval:
+                frame = record["frame"]
+                covered_from = date.fromisoformat(record["covered_from"]) if record["covered_from"] else None
+                anchor = frame.index[-2] if len(frame) >= 2 else None
+                if frame.empty:
+                    tail_start = covered_from
+                else:
+                    tail_start = date.fromisoformat((anchor or frame.index[-1])[:10])
+                tail = await self._fetch(symbol, "tail", tail_start)
+                if anchor is not None and series_readjusted(frame, tail, anchor):
+                    logger.info("History readjusted upstream, refetching", symbol=symbol, bar=anchor[:10])
+                    record["frame"] = await self._fetch(symbol, "full", covered_from)
+                else:
+                    record["frame"] = merge_frames(frame, tail)
+                record["updated_at"] = time.time()
+                changed = True
+
+        if changed:
+            self._save(symbol, record)
+
+        return record["frame"]
+
+    async def get_history(self, symbol: str, period: str) -> pd.DataFrame:
+        """Recorte da série canônica correspondente ao período"""
+        frame = await self.get_frame(symbol, period)
+        return slice_period(frame, period)
+
+    def invalidate(self, symbol: str) -> int:
+        """Descartar a série canônica de um símbolo"""
+        if not self.redis_client:
+            return 0
+        return self.redis_client.delete(self._key(symbol))
+
+
+def slice_period(frame: pd.DataFrame, period: str, today: Optional[date] = None) -> pd.DataFrame:
+    """Recortar a série canônica para um período"""
+    if frame.empty or period == "max":
+        return frame
+    if period in PERIOD_BARS:
+        return frame.iloc[-PERIOD_BARS[period]:]
+    start = period_start(period, today).isoformat()
+    return frame[frame.index.str.slice(0, 10) >= start]
@@ -6,24 +6,39 @@ Responsável por integração com APIs externas, cache e normalização de dados
 import os
 import uvicorn
 import yfinance as yf
-import pandas as pd
-import numpy as np
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from prometheus_client import Counter, Histogram, generate_latest
 from prometheus_client import start_http_server
 import structlog
 import time
 import redis
 import json
-import httpx
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import asyncio
+import threading
 from asyncio_throttle import Throttler
 import sys
 sys.path.append('/app/microservices')
+from cache_tags import TagIndex, symbol_tag, type_tag
+from history_store import HistoryStore, SUPPORTED_PERIODS
+from providers import BrapiProvider, HedgedMarketData, YahooFinanceProvider
+from streaming import QuoteStreamHub
+from negative_cache import NegativeLookupFilter
+from prewarm import CacheWarmer, DecayingCounter, RateBudget, WarmTarget
+from search_index import DEFAULT_SYMBOLS, SymbolSearchIndex
+from history_format import (
+    ARROW_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    encode_arrow,
+    encode_msgpack,
+    negotiate_media_type,
+    to_columns,
+    to_rows
+)
 # Importações de cache (com fallback se não disponível)
 try:
     from shared.cache.advanced_cache import cache_hits, cache_misses
@@ -56,7 +71,6 @@ logger = structlog.get_logger()
 # Métricas Prometheus
 REQUEST_COUNT = Counter('data_requests_total', 'Total requests', ['method', 'endpoint', 'status'])
 REQUEST_DURATION = Histogram('data_request_duration_seconds', 'Request duration')
-API_CALLS = Counter('external_api_calls_total', 'External API calls', ['provider', 'status'])
 # Remover as definições duplicadas
 # CACHE_HITS = Counter('cache_hits_total', 'Cache hits', ['type'])
 # CACHE_MISSES = Counter('cache_misses_total', 'Cache misses', ['type'])
@@ -81,6 +95,9 @@ def get_redis_client():
 
 redis_client = get_redis_client()
 
+# Tags de invalidação (symbol:<SÍMBOLO>, type:<tipo>) das chaves de cache
+cache_tags = TagIndex(redis_client)
+
 # Rate limiting
 throttler = Throttler(rate_limit=100, period=60)  # 100 requests per minute
 
@@ -112,6 +129,7 @@ class StockData(BaseModel):
     market_cap: Optional[float] = None
     pe_ratio: Optional[float] = None
     dividend_yield: Optional[float] = None
+    sector: Optional[str] = None
     timestamp: datetime
 
 class HistoricalData(BaseModel):
@@ -136,10 +154,13 @@ def get_cache_key(prefix: str, symbol: str, **kwargs) -> str:
         key_parts.append(f"{k}:{v}")
     return ":".join(key_parts)
 
-def cache_data(key: str, data: Any, ttl: int = 300):
-    """Salvar dados no cache"""
+def quote_tags(symbol: str) -> List[str]:
+    return [symbol_tag(symbol), type_tag("quote")]
+
+def cache_data(key: str, data: Any, ttl: int = 300, tags: List[str] = ()):
+    """Salvar dados no cache, registrando a chave nas tags de invalidação"""
     try:
-        redis_client.setex(key, ttl, json.dumps(data, default=str))
+        cache_tags.set(key, json.dumps(data, default=str), ttl, tags)
     except Exception as e:
         logger.error("Cache save failed", key=key, error=str(e))
 
@@ -158,40 +179,214 @@ def get_cached_data(key: str) -> Optional[Any]:
         cache_misses.labels(level="l2", key_type="redis").inc()
         return None
 
+# Provedores de dados: Yahoo Finance como primário e brapi (B3) como
+# secundário opcional, com requisições hedged entre os dois
+market_data = HedgedMarketData(
+    YahooFinanceProvider(throttler),
+    BrapiProvider(os.getenv("BRAPI_TOKEN")) if os.getenv("BRAPI_TOKEN") else None,
+    hedge_percentile=float(os.getenv("HEDGE_PERCENTILE", "95")),
+    max_delay=float(os.getenv("HEDGE_MAX_DELAY_SECONDS", "5"))
+)
+
+# Cache negativo (Bloom com decaimento, compartilhado via Redis) de símbolos
+# que o provedor não encontrou
+negative_lookups = NegativeLookupFilter(
+    redis_client,
+    window=int(os.getenv("NEGATIVE_CACHE_WINDOW_SECONDS", "3600"))
+)
+
+def is_known_invalid(symbol: str) -> bool:
+    """Símbolo rejeitado recentemente pelo provedor (sem consultar o provedor)"""
+    # Símbolos do universo importado nunca são rejeitados
+    return negative_lookups.rejects(symbol, known_valid=symbol.upper() in search_index.entries)
+
 async def fetch_yahoo_finance_data(symbol: str) -> Optional[Dict]:
-    """Buscar dados do Yahoo Finance"""
+    """Buscar cotação atual (primário com hedge para o secundário)"""
+    if is_known_invalid(symbol):
+        return None
     try:
-        async with throttler:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            hist = ticker.history(period="1d")
-            
-            if hist.empty:
-                return None
-            
-            current_price = hist['Close'].iloc[-1]
-            previous_close = info.get('previousClose', current_price)
-            
-            API_CALLS.labels(provider="yahoo_finance", status="success").inc()
-            
-            return {
-                "symbol": symbol.upper(),
-                "name": info.get('longName', symbol),
-                "current_price": float(current_price),
-                "previous_close": float(previous_close),
-                "change": float(current_price - previous_close),
-                "change_percent": float((current_price - previous_close) / previous_close * 100),
-                "volume": int(hist['Volume'].iloc[-1]),
-                "market_cap": info.get('marketCap'),
-                "pe_ratio": info.get('trailingPE'),
-                "dividend_yield": info.get('dividendYield'),
-                "timestamp": datetime.utcnow()
-            }
-            
+        data = await market_data.get_quote(symbol)
     except Exception as e:
-        logger.error("Yahoo Finance API failed", symbol=symbol, error=str(e))
-        API_CALLS.labels(provider="yahoo_finance", status="error").inc()
+        logger.error("Market data quote failed", symbol=symbol, error=str(e))
+        return None
+    
+    # Apenas "não encontrado" entra no cache negativo; falhas do provedor não
+    if data is None:
+        negative_lookups.add(symbol)
+    return data
+
+async def fetch_stock_quotes(symbols: List[str]) -> Dict[str, Dict]:
+    """Cotações de vários símbolos: um MGET no cache e busca concorrente das faltantes"""
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    
+    quotes = {}
+    try:
+        cached = redis_client.mget([get_cache_key("stock", symbol) for symbol in symbols])
+    except Exception as e:
+        logger.error("Cache batch read failed", error=str(e))
+        cached = [None] * len(symbols)
+    
+    missing = []
+    for symbol, raw in zip(symbols, cached):
+        if raw:
+            cache_hits.labels(level="l2", key_type="redis").inc()
+            quotes[symbol] = json.loads(raw)
+        else:
+            cache_misses.labels(level="l2", key_type="redis").inc()
+            missing.append(symbol)
+    
+    quotes.update(await refresh_stock_quotes(missing))
+    return quotes
+
+async def refresh_stock_quotes(symbols: List[str]) -> Dict[str, Dict]:
+    """Buscar cotações no provedor (concorrentemente) e regravar o cache"""
+    quotes = {}
+    fetched = await asyncio.gather(*(fetch_yahoo_finance_data(symbol) for symbol in symbols))
+    for symbol, data in zip(symbols, fetched):
+        if data:
+            cache_data(get_cache_key("stock", symbol), data, ttl=300, tags=quote_tags(symbol))
+            # Mesmo formato das entradas vindas do cache (timestamp como string)
+            quotes[symbol] = json.loads(json.dumps(data, default=str))
+    
+    return quotes
+
+# Principais índices de mercado
+MARKET_INDICES = {
+    "^BVSP": "Ibovespa",
+    "^GSPC": "S&P 500",
+    "^DJI": "Dow Jones",
+    "^IXIC": "NASDAQ"
+}
+
+async def refresh_market_index(symbol: str) -> Optional[Dict]:
+    """Buscar um índice no provedor e regravar o cache"""
+    # Últimos pregões (margem de calendário para fins de semana/feriados)
+    hist = await market_data.get_history(symbol, date.today() - timedelta(days=7), None)
+    if hist.empty:
         return None
+    
+    current_value = hist['Close'].iloc[-1]
+    previous_value = hist['Close'].iloc[-2] if len(hist) > 1 else current_value
+    
+    data = {
+        "symbol": symbol,
+        "name": MARKET_INDICES.get(symbol, symbol),
+        "value": float(current_value),
+        "change": float(current_value - previous_value),
+        "change_percent": float((current_value - previous_value) / previous_value * 100),
+        "timestamp": datetime.utcnow()
+    }
+    
+    cache_data(get_cache_key("index", symbol), data, ttl=300, tags=[symbol_tag(symbol), type_tag("index")])
+    return data
+
+async def refresh_market_indices(symbols: List[str]):
+    for symbol in symbols:
+        try:
+            await refresh_market_index(symbol)
+        except Exception as e:
+            logger.error("Failed to refresh index", symbol=symbol, error=str(e))
+
+# Histórico canônico por símbolo, estendido incrementalmente
+history_store = HistoryStore(
+    redis_client,
+    market_data.get_history,
+    refresh_interval=int(os.getenv("HISTORY_REFRESH_SECONDS", "3600")),
+    tag_index=cache_tags
+)
+
+# Streaming de cotações: um poller compartilhado para todos os assinantes. Cada
+# tick é um único download em lote no provedor (não o cache de 300s), com
+# orçamento próprio para não disputar o throttler com as requisições
+# interativas; o intervalo é esticado para caber no orçamento
+STREAM_BUDGET_PER_MINUTE = int(os.getenv("STREAM_BUDGET_PER_MINUTE", "12"))
+stream_budget = RateBudget(STREAM_BUDGET_PER_MINUTE)
+
+async def stream_stock_quotes(symbols: List[str]) -> Dict[str, Dict]:
+    """Cotações do tick: um download em lote, mesclado à cotação completa em cache"""
+    if not stream_budget.take(1):
+        return {}
+    fresh = await market_data.get_quotes(symbols)
+    try:
+        cached = redis_client.mget([get_cache_key("stock", symbol) for symbol in fresh])
+    except Exception as e:
+        logger.error("Cache batch read failed", error=str(e))
+        cached = [None] * len(fresh)
+    
+    quotes = {}
+    for (symbol, data), raw in zip(fresh.items(), cached):
+        data = {**(json.loads(raw) if raw else {"name": symbol}), **data}
+        cache_data(get_cache_key("stock", symbol), data, ttl=300, tags=quote_tags(symbol))
+        # Mesmo formato das entradas vindas do cache (timestamp como string)
+        quotes[symbol] = json.loads(json.dumps(data, default=str))
+    return quotes
+
+quote_stream = QuoteStreamHub(
+    stream_stock_quotes,
+    interval=max(float(os.getenv("STREAM_INTERVAL_SECONDS", "5")), 60.0 / max(STREAM_BUDGET_PER_MINUTE, 1))
+)
+
+# Pré-aquecimento: frequência de acesso com decaimento e renovação em
+# background dos símbolos mais quentes e dos índices antes de expirarem
+access_counter = DecayingCounter(half_life=float(os.getenv("PREWARM_HALF_LIFE_SECONDS", "1800")))
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "20"))
+cache_warmer = CacheWarmer(
+    redis_client,
+    # Fração do limite do throttler (100/min) reservada ao warmer
+    RateBudget(int(os.getenv("PREWARM_BUDGET_PER_MINUTE", "30"))),
+    lead=float(os.getenv("PREWARM_LEAD_SECONDS", "60")),
+    interval=float(os.getenv("PREWARM_INTERVAL_SECONDS", "15"))
+)
+cache_warmer.add_target(WarmTarget(
+    "indices",
+    lambda: list(MARKET_INDICES),
+    lambda symbol: get_cache_key("index", symbol),
+    refresh_market_indices
+))
+cache_warmer.add_target(WarmTarget(
+    "quotes",
+    lambda: access_counter.top(PREWARM_TOP_N),
+    lambda symbol: get_cache_key("stock", symbol),
+    refresh_stock_quotes
+))
+
+# Índice de busca sobre o universo de ações (importado via src/database/import_acoes.py)
+SYMBOL_UNIVERSE_KEY = "symbols:universe"
+SYMBOL_IMPORT_CHANNEL = "symbols:imported"
+search_index = SymbolSearchIndex()
+
+def index_symbols(items: List[Dict[str, Any]]):
+    """Adicionar ao índice símbolos no formato de Acao.to_dict()"""
+    search_index.add_many(
+        (item["symbol"], item.get("nome"), item.get("bolsa"))
+        for item in items
+        if item.get("symbol")
+    )
+
+def load_symbol_universe():
+    """Carregar o universo completo de ações do Redis"""
+    search_index.add_many((symbol, name, "B3") for symbol, name in DEFAULT_SYMBOLS.items())
+    try:
+        universe = redis_client.hgetall(SYMBOL_UNIVERSE_KEY)
+        index_symbols([json.loads(raw) for raw in universe.values()])
+        logger.info("Symbol universe loaded", symbols=len(search_index))
+    except Exception as e:
+        logger.error("Symbol universe load failed", error=str(e))
+
+def listen_symbol_imports():
+    """Atualizar o índice incrementalmente a cada importação de ações"""
+    try:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(SYMBOL_IMPORT_CHANNEL)
+        for message in pubsub.listen():
+            try:
+                index_symbols(json.loads(message["data"]))
+            except Exception as e:
+                logger.error("Invalid symbol import message", error=str(e))
+    except Exception as e:
+        logger.error("Symbol import listener stopped", error=str(e))
 
 # Middleware para métricas
 @app.middleware("http")
@@ -228,7 +423,8 @@ async def health_check():
             "dependencies": {
                 "redis": "healthy",
                 "yahoo_finance": "healthy" if not test_data.empty else "degraded"
-            }
+            },
+            "providers": market_data.stats()
         }
     except Exception as e:
         logger.error("Health check failed", error=str(e))
@@ -249,6 +445,7 @@ async def get_stock_data(symbol: str):
         cached_data = get_cached_data(cache_key)
         
         if cached_data:
+            access_counter.record(symbol)
             return StockData(**cached_data)
         
         # Buscar dados do Yahoo Finance
@@ -257,7 +454,9 @@ async def get_stock_data(symbol: str):
             raise HTTPException(status_code=404, detail=f"Stock {symbol} not found")
         
         # Salvar no cache (5 minutos)
-        cache_data(cache_key, data, ttl=300)
+        cache_data(cache_key, data, ttl=300, tags=quote_tags(symbol))
+        # Só símbolos que existem entram no ranking do pré-aquecimento
+        access_counter.record(symbol)
         
         return StockData(**data)
         
@@ -271,27 +470,11 @@ async def get_stock_data(symbol: str):
 async def get_multiple_stocks(symbols: str = Query(..., description="Comma-separated stock symbols")):
     """Obter dados de múltiplas ações"""
     try:
-        symbol_list = [s.strip().upper() for s in symbols.split(",")]
-        results = []
-        
-        for symbol in symbol_list:
-            try:
-                # Verificar cache
-                cache_key = get_cache_key("stock", symbol)
-                cached_data = get_cached_data(cache_key)
-                
-                if cached_data:
-                    results.append(StockData(**cached_data))
-                else:
-                    # Buscar dados
-                    data = await fetch_yahoo_finance_data(symbol)
-                    if data:
-                        cache_data(cache_key, data, ttl=300)
-                        results.append(StockData(**data))
-                        
-            except Exception as e:
-                logger.error("Failed to fetch stock", symbol=symbol, error=str(e))
-                continue
+        symbol_list = [s.strip().upper() for s in symbols.split(",") if s.strip()]
+        quotes = await fetch_stock_quotes(symbol_list)
+        for symbol in quotes:
+            access_counter.record(symbol)
+        results = [StockData(**quotes[symbol]) for symbol in symbol_list if symbol in quotes]
         
         return {"stocks": results, "total": len(results)}
         
@@ -302,98 +485,78 @@ async def get_multiple_stocks(symbols: str = Query(..., description="Comma-separ
 @app.get("/stock/{symbol}/history", response_model=HistoricalData)
 async def get_stock_history(
     symbol: str,
-    period: str = Query("1mo", description="Period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max")
+    request: Request,
+    period: str = Query("1mo", description="Period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max"),
+    format: str = Query("rows", description="JSON layout: rows or columnar")
 ):
-    """Obter dados históricos de uma ação"""
+    """
+    Obter dados históricos de uma ação
+    
+    Accept: application/x-msgpack ou application/vnd.apache.arrow.stream
+    retornam a série em formato binário colunar.
+    """
+    if period not in SUPPORTED_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported period: {period}")
+    if format not in ("rows", "columnar"):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    # 406 antes de buscar o histórico: não gasta chamada upstream com uma resposta recusada
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail="None of the accepted media types is available")
+    
+    if is_known_invalid(symbol):
+        raise HTTPException(status_code=404, detail=f"No historical data for {symbol}")
+    
     try:
-        # Verificar cache
-        cache_key = get_cache_key("history", symbol, period=period)
-        cached_data = get_cached_data(cache_key)
+        # Recorte da série canônica (busca apenas as barras que faltam)
+        hist = await history_store.get_history(symbol, period)
         
-        if cached_data:
-            return HistoricalData(**cached_data)
+        if hist.empty:
+            raise HTTPException(status_code=404, detail=f"No historical data for {symbol}")
         
-        # Buscar dados históricos
-        async with throttler:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
-            
-            if hist.empty:
-                raise HTTPException(status_code=404, detail=f"No historical data for {symbol}")
-            
-            # Converter para formato JSON
-            hist_data = []
-            for date, row in hist.iterrows():
-                hist_data.append({
-                    "date": date.isoformat(),
-                    "open": float(row['Open']),
-                    "high": float(row['High']),
-                    "low": float(row['Low']),
-                    "close": float(row['Close']),
-                    "volume": int(row['Volume'])
-                })
-            
-            data = {
-                "symbol": symbol.upper(),
-                "data": hist_data,
-                "period": period,
-                "timestamp": datetime.utcnow()
-            }
-            
-            # Cache por 1 hora para dados históricos
-            cache_data(cache_key, data, ttl=3600)
-            
-            API_CALLS.labels(provider="yahoo_finance", status="success").inc()
-            
-            return HistoricalData(**data)
+        meta = {
+            "symbol": symbol.upper(),
+            "period": period,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+        if media_type == MSGPACK_MEDIA_TYPE:
+            return Response(content=encode_msgpack(hist, meta), media_type=media_type)
+        if media_type == ARROW_MEDIA_TYPE:
+            return Response(content=encode_arrow(hist, meta), media_type=media_type)
+        
+        if format == "columnar":
+            return JSONResponse({**meta, "columns": to_columns(hist)})
+        
+        data = {
+            **meta,
+            "data": to_rows(hist)
+        }
+        
+        return HistoricalData(**data)
             
     except HTTPException:
         raise
     except Exception as e:
         logger.error("Get stock history failed", symbol=symbol, error=str(e))
-        API_CALLS.labels(provider="yahoo_finance", status="error").inc()
         raise HTTPException(status_code=500, detail="Failed to fetch historical data")
 
 @app.get("/market/indices")
 async def get_market_indices():
     """Obter dados dos principais índices de mercado"""
     try:
-        indices = {
-            "^BVSP": "Ibovespa",
-            "^GSPC": "S&P 500",
-            "^DJI": "Dow Jones",
-            "^IXIC": "NASDAQ"
-        }
-        
         results = []
         
-        for symbol, name in indices.items():
+        for symbol in MARKET_INDICES:
             try:
-                cache_key = get_cache_key("index", symbol)
-                cached_data = get_cached_data(cache_key)
+                cached_data = get_cached_data(get_cache_key("index", symbol))
                 
                 if cached_data:
                     results.append(MarketIndex(**cached_data))
                 else:
-                    async with throttler:
-                        ticker = yf.Ticker(symbol)
-                        hist = ticker.history(period="2d")
-                        
-                        if not hist.empty:
-                            current_value = hist['Close'].iloc[-1]
-                            previous_value = hist['Close'].iloc[-2] if len(hist) > 1 else current_value
-                            
-                            data = {
-                                "symbol": symbol,
-                                "name": name,
-                                "value": float(current_value),
-                                "change": float(current_value - previous_value),
-                                "change_percent": float((current_value - previous_value) / previous_value * 100),
-                                "timestamp": datetime.utcnow()
-                            }
-                            
-                            cache_data(cache_key, data, ttl=300)
-                            results.append(MarketIndex(**data))
+                    data = await refresh_market_index(symbol)
+                    if data:
+                        results.append(MarketIndex(**data))
                             
             except Exception as e:
                 logger.error("Failed to fetch index", symbol=symbol, error=str(e))
@@ -406,67 +569,83 @@ async def get_market_indices():
         raise HTTPException(status_code=500, detail="Failed to fetch market indices")
 
 @app.get("/search/{query}")
-async def search_stocks(query: str):
-    """Buscar ações por nome ou símbolo"""
+async def search_stocks(query: str, limit: int = Query(10, ge=1, le=50)):
+    """Buscar ações por nome ou símbolo (prefixo, trigramas e sem acentos)"""
     try:
-        # Cache de busca
-        cache_key = get_cache_key("search", query.lower())
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
-        # Busca simples - em produção, usar API de busca mais robusta
-        # Por enquanto, retornar algumas ações brasileiras conhecidas
-        brazilian_stocks = {
-            "PETR4": "Petrobras",
-            "VALE3": "Vale",
-            "ITUB4": "Itaú Unibanco",
-            "BBDC4": "Bradesco",
-            "ABEV3": "Ambev",
-            "WEGE3": "WEG",
-            "MGLU3": "Magazine Luiza",
-            "VVAR3": "Via Varejo",
-            "JBSS3": "JBS",
-            "SUZB3": "Suzano"
-        }
-        
-        results = []
-        query_lower = query.lower()
-        
-        for symbol, name in brazilian_stocks.items():
-            if (query_lower in symbol.lower() or 
-                query_lower in name.lower()):
-                results.append({
-                    "symbol": symbol,
-                    "name": name,
-                    "exchange": "B3"
-                })
-        
-        data = {"results": results, "query": query}
-        cache_data(cache_key, data, ttl=3600)  # Cache por 1 hora
-        
-        return data
+        results = search_index.search(query, limit=limit)
+        return {"results": results, "query": query, "total": len(results)}
         
     except Exception as e:
         logger.error("Stock search failed", query=query, error=str(e))
         raise HTTPException(status_code=500, detail="Search failed")
 
+@app.websocket("/stream/quotes")
+async def stream_quotes_ws(websocket: WebSocket):
+    """
+    Streaming de cotações via WebSocket
+    
+    Mensagens do cliente: {"action": "subscribe" | "unsubscribe", "symbols": [...]}
+    Mensagens do servidor: {"type": "snapshot" | "delta", "quotes": {...}}
+    """
+    await websocket.accept()
+    subscription = quote_stream.subscribe(
+        websocket.query_params.get("symbols", "").split(",")
+    )
+    
+    async def sender():
+        async for message in subscription.messages():
+            await websocket.send_text(json.dumps(message, default=str))
+    
+    sender_task = asyncio.create_task(sender())
+    try:
+        while True:
+            command = await websocket.receive_json()
+            symbols = command.get("symbols") or []
+            if command.get("action") == "subscribe":
+                quote_stream.add_symbols(subscription, symbols)
+            elif command.get("action") == "unsubscribe":
+                quote_stream.remove_symbols(subscription, symbols)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error("Quote stream websocket failed", error=str(e))
+    finally:
+        sender_task.cancel()
+        quote_stream.unsubscribe(subscription)
+
+@app.get("/stream/quotes/sse")
+async def stream_quotes_sse(
+    request: Request,
+    symbols: str = Query(..., description="Comma-separated stock symbols")
+):
+    """Streaming de cotações via Server-Sent Events"""
+    subscription = quote_stream.subscribe(symbols.split(","))
+    
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message, default=str)}\n\n"
+        finally:
+            quote_stream.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.delete("/cache/{symbol}")
 async def clear_cache(symbol: str):
-    """Limpar cache de uma ação específica"""
+    """Limpar cache de uma ação específica (todas as chaves com a tag do símbolo)"""
     try:
-        patterns = [
-            get_cache_key("stock", symbol),
-            get_cache_key("history", symbol, period="*"),
-            get_cache_key("index", symbol)
-        ]
-        
-        cleared = 0
-        for pattern in patterns:
-            keys = redis_client.keys(pattern)
-            if keys:
-                cleared += redis_client.delete(*keys)
+        # A série canônica é removida pela chave direta também (registros anteriores às tags)
+        cleared = history_store.invalidate(symbol)
+        cleared += cache_tags.invalidate(symbol_tag(symbol))
         
         return {"message": f"Cleared {cleared} cache entries for {symbol}"}
         
@@ -474,6 +653,22 @@ async def clear_cache(symbol: str):
         logger.error("Cache clear failed", symbol=symbol, error=str(e))
         raise HTTPException(status_code=500, detail="Failed to clear cache")
 
+@app.on_event("startup")
+async def startup_event():
+    """Eventos de inicialização"""
+    load_symbol_universe()
+    threading.Thread(target=listen_symbol_imports, daemon=True).start()
+    if os.getenv("PREWARM_ENABLED", "true").lower() == "true":
+        cache_warmer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Eventos de encerramento"""
+    await quote_stream.close()
+    await cache_warmer.close()
+    if isinstance(market_data.secondary, BrapiProvider):
+        await market_data.secondary.close()
+
 if __name__ == "__main__":
     # Iniciar servidor de métricas Prometheus
     start_http_server(8000)
@@ -0,0 +1,137 @@
+"""
+Cache negativo de símbolos - Data Service
+Filtro de Bloom com decaimento temporal guardado em bitmaps do Redis
+(compartilhado entre réplicas) com os símbolos que o provedor não encontrou.
+Cada geração cobre uma janela de tempo e expira sozinha, de modo que um
+símbolo inválido é esquecido após `generations` janelas sem novas falhas.
+"""
+
+import hashlib
+import math
+import time
+from typing import List, Optional
+
+import structlog
+from prometheus_client import Counter, Gauge
+
+logger = structlog.get_logger()
+
+# Métricas Prometheus
+NEGATIVE_REJECTIONS = Counter('negative_lookup_rejections_total', 'Lookups rejected by the negative cache')
+NEGATIVE_ADDITIONS = Counter('negative_lookup_additions_total', 'Symbols added to the negative cache')
+NEGATIVE_FALSE_POSITIVES = Counter(
+    'negative_lookup_false_positives_total',
+    'Negative cache hits for symbols known to be valid'
+)
+NEGATIVE_FPR = Gauge('negative_lookup_false_positive_rate', 'Estimated false positive rate of the negative cache')
+
+
+def bloom_parameters(capacity: int, error_rate: float):
+    """Tamanho do bitmap (m) e número de hashes (k) para n itens e taxa p"""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class NegativeLookupFilter:
+    """Filtro de Bloom em gerações rotativas no Redis"""
+
+    def __init__(
+        self,
+        redis_client,
+        capacity: int = 100_000,
+        error_rate: float = 0.001,
+        window: int = 3600,
+        generations: int = 2,
+        key_prefix: str = "negative:bloom"
+    ):
+        self.redis_client = redis_client
+        self.bits, self.hashes = bloom_parameters(capacity, error_rate)
+        self.window = window
+        self.generations = generations
+        self.key_prefix = key_prefix
+
+    def _key(self, generation: int) -> str:
+        return f"{self.key_prefix}:{generation}"
+
+    def _generations(self, now: Optional[float] = None) -> List[int]:
+        """Geração atual primeiro, seguida das anteriores ainda válidas"""
+        current = int((time.time() if now is None else now) // self.window)
+        return [current - i for i in range(self.generations)]
+
+    def _positions(self, symbol: str) -> List[int]:
+        # Double hashing (Kirsch-Mitzenmacher) sobre um único digest
+        digest = hashlib.blake2b(symbol.upper().encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, symbol: str, now: Optional[float] = None):
+        """Registrar um símbolo que o provedor não encontrou"""
+        if not self.redis_client:
+            return
+        try:
+            key = self._key(self._generations(now)[0])
+            pipe = self.redis_client.pipeline(transaction=False)
+            for position in self._positions(symbol):
+                pipe.setbit(key, position, 1)
+            # A geração vive enquanto participar das consultas
+            pipe.expire(key, self.window * self.generations)
+            pipe.execute()
+            NEGATIVE_ADDITIONS.inc()
+            self.update_false_positive_rate(now)
+        except Exception as e:
+            logger.error("Negative cache add failed", symbol=symbol, error=str(e))
+
+    def might_contain(self, symbol: str, now: Optional[float] = None) -> bool:
+        """True se o símbolo falhou recentemente (sujeito a falsos positivos)"""
+        if not self.redis_client:
+            return False
+        try:
+            positions = self._positions(symbol)
+            generations = self._generations(now)
+            pipe = self.redis_client.pipeline(transaction=False)
+            for generation in generations:
+                key = self._key(generation)
+                for position in positions:
+                    pipe.getbit(key, position)
+            bits = pipe.execute()
+        except Exception as e:
+            # Sem Redis o filtro não bloqueia nada
+            logger.error("Negative cache lookup failed", symbol=symbol, error=str(e))
+            return False
+
+        return any(
+            all(bits[i * self.hashes:(i + 1) * self.hashes])
+            for i in range(len(generations))
+        )
+
+    def rejects(self, symbol: str, known_valid: bool = False, now: Optional[float] = None) -> bool:
+        """
+        Decidir se a consulta deve ser rejeitada antes do provedor.
+        Um acerto para símbolo sabidamente válido é um falso positivo observado.
+        """
+        if not self.might_contain(symbol, now):
+            return False
+        if known_valid:
+            NEGATIVE_FALSE_POSITIVES.inc()
+            return False
+        NEGATIVE_REJECTIONS.inc()
+        return True
+
+    def estimated_false_positive_rate(self, now: Optional[float] = None) -> float:
+        """Taxa estimada pela ocupação dos bitmaps: 1 - Π(1 - fill^k) sobre as gerações"""
+        if not self.redis_client:
+            return 0.0
+        pipe = self.redis_client.pipeline(transaction=False)
+        for generation in self._generations(now):
+            pipe.bitcount(self._key(generation))
+        miss = 1.0
+        for set_bits in pipe.execute():
+            miss *= 1.0 - (min(set_bits, self.bits) / self.bits) ** self.hashes
+        return 1.0 - miss
+
+    def update_false_positive_rate(self, now: Optional[float] = None) -> float:
+        rate = self.estimated_false_positive_rate(now)
+        NEGATIVE_FPR.set(rate)
+        return rate
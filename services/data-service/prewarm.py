@@ -0,0 +1,216 @@
+"""
+Pré-aquecimento de cache - Data Service
+Conta a frequência de acesso por símbolo com decaimento exponencial e, em
+background, renova as chaves dos símbolos mais quentes (e dos índices) antes
+que expirem, além de aquecer tudo na abertura do pregão. O warmer consome no
+máximo uma fração do orçamento de chamadas ao provedor externo.
+"""
+
+import asyncio
+import heapq
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+import structlog
+from prometheus_client import Counter, Gauge
+
+logger = structlog.get_logger()
+
+# Métricas Prometheus
+PREWARM_REFRESHES = Counter('cache_prewarm_refreshes_total', 'Cache entries refreshed by the pre-warmer', ['target', 'reason'])
+PREWARM_DEFERRED = Counter('cache_prewarm_deferred_total', 'Refreshes deferred by the pre-warm rate budget', ['target'])
+PREWARM_HOT_SYMBOLS = Gauge('cache_prewarm_hot_symbols', 'Symbols tracked by the access-frequency counter')
+
+MARKET_TIMEZONE = ZoneInfo("America/Sao_Paulo")
+MARKET_OPEN = dt_time(10, 0)  # Abertura do pregão da B3
+
+
+class DecayingCounter:
+    """Frequência de acesso com meia-vida: acessos antigos pesam cada vez menos"""
+
+    def __init__(self, half_life: float = 1800.0, min_score: float = 0.05):
+        self.decay = math.log(2) / half_life
+        self.min_score = min_score
+        self.scores: Dict[str, Tuple[float, float]] = {}  # símbolo -> (score, instante)
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def _decayed(self, score: float, at: float, now: float) -> float:
+        return score * math.exp(-self.decay * (now - at))
+
+    def record(self, symbol: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        symbol = symbol.upper()
+        score, at = self.scores.get(symbol, (0.0, now))
+        self.scores[symbol] = (self._decayed(score, at, now) + 1.0, now)
+
+    def score(self, symbol: str, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        score, at = self.scores.get(symbol.upper(), (0.0, now))
+        return self._decayed(score, at, now)
+
+    def top(self, n: int, now: Optional[float] = None) -> List[str]:
+        """Os N símbolos mais quentes (descarta os que esfriaram abaixo de min_score)"""
+        now = time.time() if now is None else now
+        current = {symbol: self._decayed(score, at, now) for symbol, (score, at) in self.scores.items()}
+        for symbol, score in current.items():
+            if score < self.min_score:
+                del self.scores[symbol]
+        PREWARM_HOT_SYMBOLS.set(len(self.scores))
+        hottest = heapq.nlargest(n, ((score, symbol) for symbol, score in current.items() if score >= self.min_score))
+        return [symbol for _, symbol in hottest]
+
+
+class RateBudget:
+    """Janela deslizante de chamadas permitidas (fração do limite do provedor)"""
+
+    def __init__(self, rate: int, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self.calls: Deque[float] = deque()
+
+    def take(self, wanted: int, now: Optional[float] = None) -> int:
+        """Reservar até `wanted` chamadas; retorna quantas foram concedidas"""
+        now = time.monotonic() if now is None else now
+        while self.calls and now - self.calls[0] >= self.period:
+            self.calls.popleft()
+        granted = max(0, min(wanted, self.rate - len(self.calls)))
+        self.calls.extend([now] * granted)
+        return granted
+
+
+@dataclass
+class WarmTarget:
+    """Conjunto de chaves mantidas quentes pelo warmer"""
+    name: str
+    symbols: Callable[[], List[str]]
+    cache_key: Callable[[str], str]
+    refresh: Callable[[List[str]], Awaitable[Any]]
+
+
+class CacheWarmer:
+    """
+    Renova em background as chaves dos alvos cujo TTL restante é menor que
+    `lead` segundos (ou todas, na abertura do mercado), na ordem dos alvos e
+    dentro do orçamento de chamadas.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        budget: RateBudget,
+        lead: float = 60.0,
+        interval: float = 15.0,
+        market_open: dt_time = MARKET_OPEN
+    ):
+        self.redis_client = redis_client
+        self.budget = budget
+        self.lead = lead
+        self.interval = interval
+        self.market_open = market_open
+        self.targets: List[WarmTarget] = []
+        self.last_open_warm: Optional[str] = None
+        self.deferred = 0  # Chaves adiadas pelo orçamento no último ciclo
+        # Aquecimento de abertura em curso: dia e chaves já renovadas por alvo
+        self._open_day: Optional[str] = None
+        self._open_warmed: Dict[str, Set[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add_target(self, target: WarmTarget):
+        self.targets.append(target)
+
+    def _due(self, target: WarmTarget, symbols: List[str]) -> List[str]:
+        """Símbolos cuja chave expira em menos de `lead` segundos (ou já expirou)"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for symbol in symbols:
+            pipe.ttl(target.cache_key(symbol))
+        # TTL -2: chave inexistente; -1: sem expiração
+        return [s for s, ttl in zip(symbols, pipe.execute()) if ttl == -2 or 0 <= ttl < self.lead]
+
+    def market_open_due(self, now: Optional[datetime] = None) -> bool:
+        """Primeiro ciclo após a abertura em dia útil"""
+        now = now or datetime.now(MARKET_TIMEZONE)
+        today = now.date().isoformat()
+        return now.weekday() < 5 and now.time() >= self.market_open and self.last_open_warm != today
+
+    async def warm_once(self, force: bool = False) -> Dict[str, int]:
+        """Um ciclo de aquecimento; retorna quantas chaves foram renovadas por alvo"""
+        if not self.redis_client:
+            return {}
+
+        refreshed = {}
+        self.deferred = 0
+        for target in self.targets:
+            symbols = target.symbols()
+            if not symbols:
+                continue
+            if force:
+                # Retomada da abertura: não repete o que já foi renovado hoje
+                warmed = self._open_warmed.setdefault(target.name, set())
+                due = [s for s in symbols if s not in warmed]
+            else:
+                due = self._due(target, symbols)
+            if not due:
+                continue
+
+            granted = self.budget.take(len(due))
+            if granted < len(due):
+                self.deferred += len(due) - granted
+                PREWARM_DEFERRED.labels(target=target.name).inc(len(due) - granted)
+            due = due[:granted]  # Alvos e símbolos já vêm em ordem de prioridade
+            if not due:
+                continue
+
+            await target.refresh(due)
+            if force:
+                warmed.update(due)
+            reason = "market_open" if force else "expiring"
+            PREWARM_REFRESHES.labels(target=target.name, reason=reason).inc(len(due))
+            refreshed[target.name] = len(due)
+
+        return refreshed
+
+    async def cycle(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Um ciclo do loop. O aquecimento da abertura só conta como feito quando
+        nada foi adiado pelo orçamento; até lá os ciclos seguintes o retomam.
+        """
+        now = now or datetime.now(MARKET_TIMEZONE)
+        force = self.market_open_due(now)
+        today = now.date().isoformat()
+        if force and self._open_day != today:
+            self._open_day = today
+            self._open_warmed = {}
+
+        refreshed = await self.warm_once(force=force)
+        if force:
+            logger.info("Market open cache warm-up", refreshed=refreshed, deferred=self.deferred)
+            if not self.deferred:
+                self.last_open_warm = today
+                self._open_warmed = {}
+        return refreshed
+
+    async def _run(self):
+        while True:
+            try:
+                await self.cycle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Cache pre-warm cycle failed", error=str(e))
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
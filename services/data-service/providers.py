@@ -0,0 +1,404 @@
+"""
+Provedores de dados de mercado - Data Service
+Abstração de provedores (Yahoo Finance, brapi) com requisições "hedged":
+o secundário só é acionado quando o primário passa do seu p95 de latência
+ou falha, e vence quem responder primeiro.
+"""
+
+import asyncio
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+import structlog
+from prometheus_client import Counter, Histogram
+
+logger = structlog.get_logger()
+
+# Métricas Prometheus
+API_CALLS = Counter('external_api_calls_total', 'External API calls', ['provider', 'status'])
+PROVIDER_LATENCY = Histogram(
+    'market_data_provider_latency_seconds',
+    'Market data provider latency',
+    ['provider', 'operation'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+)
+PROVIDER_ERRORS = Counter('market_data_provider_errors_total', 'Market data provider errors', ['provider', 'operation'])
+HEDGED_REQUESTS = Counter('market_data_hedged_requests_total', 'Hedged requests', ['operation', 'reason', 'winner'])
+
+
+class MarketDataProvider:
+    """Interface de um provedor de dados de mercado"""
+
+    name = "base"
+
+    async def get_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Cotação atual (None se o símbolo não existe no provedor)"""
+        raise NotImplementedError
+
+    async def get_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Preço, fechamento anterior, variação e volume de vários símbolos (padrão: uma cotação por símbolo)"""
+        quotes = await asyncio.gather(*(self.get_quote(symbol) for symbol in symbols))
+        return {symbol.upper(): quote for symbol, quote in zip(symbols, quotes) if quote}
+
+    async def get_history(self, symbol: str, start: Optional[date], end: Optional[date]) -> pd.DataFrame:
+        """Barras diárias com colunas Open/High/Low/Close/Volume (start=None = todo o histórico)"""
+        raise NotImplementedError
+
+
+class YahooFinanceProvider(MarketDataProvider):
+    """Provedor Yahoo Finance (yfinance), executado fora do event loop"""
+
+    name = "yahoo_finance"
+
+    def __init__(self, throttler):
+        self.throttler = throttler
+
+    async def _run(self, func, *args):
+        async with self.throttler:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, func, *args)
+
+    @staticmethod
+    def _quote(symbol: str) -> Optional[Dict[str, Any]]:
+        import yfinance as yf
+
+        ticker = yf.Ticker(symbol)
+        info = ticker.info
+        hist = ticker.history(period="1d")
+
+        if hist.empty:
+            return None
+
+        current_price = hist['Close'].iloc[-1]
+        previous_close = info.get('previousClose', current_price)
+
+        return {
+            "symbol": symbol.upper(),
+            "name": info.get('longName', symbol),
+            "current_price": float(current_price),
+            "previous_close": float(previous_close),
+            "change": float(current_price - previous_close),
+            "change_percent": float((current_price - previous_close) / previous_close * 100),
+            "volume": int(hist['Volume'].iloc[-1]),
+            "market_cap": info.get('marketCap'),
+            "pe_ratio": info.get('trailingPE'),
+            "dividend_yield": info.get('dividendYield'),
+            "sector": info.get('sector'),
+            "timestamp": datetime.utcnow()
+        }
+
+    @staticmethod
+    def _quotes(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Últimos pregões de todos os símbolos em um único download (sem `info`)"""
+        import yfinance as yf
+
+        frame = yf.download(symbols, period="5d", interval="1d", group_by="ticker",
+                            auto_adjust=False, progress=False, threads=False)
+        quotes = {}
+        for symbol in symbols:
+            if isinstance(frame.columns, pd.MultiIndex):
+                if symbol not in frame.columns.get_level_values(0):
+                    continue
+                bars = frame[symbol]
+            else:
+                bars = frame
+            bars = bars.dropna(subset=["Close"])
+            if bars.empty:
+                continue
+
+            current_price = float(bars["Close"].iloc[-1])
+            previous_close = float(bars["Close"].iloc[-2]) if len(bars) > 1 else current_price
+            quotes[symbol.upper()] = {
+                "symbol": symbol.upper(),
+                "current_price": current_price,
+                "previous_close": previous_close,
+                "change": current_price - previous_close,
+                "change_percent": (current_price - previous_close) / previous_close * 100 if previous_close else 0.0,
+                "volume": int(bars["Volume"].iloc[-1]),
+                "timestamp": datetime.utcnow()
+            }
+        return quotes
+
+    @staticmethod
+    def _history(symbol: str, start: Optional[date], end: Optional[date]) -> pd.DataFrame:
+        import yfinance as yf
+
+        ticker = yf.Ticker(symbol)
+        if start is None:
+            return ticker.history(period="max")
+        return ticker.history(start=start, end=end)
+
+    async def get_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self._quote, symbol)
+
+    async def get_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        # Um único slot do throttler para o lote inteiro
+        return await self._run(self._quotes, symbols)
+
+    async def get_history(self, symbol: str, start: Optional[date], end: Optional[date]) -> pd.DataFrame:
+        return await self._run(self._history, symbol, start, end)
+
+
+class BrapiProvider(MarketDataProvider):
+    """Provedor brapi.dev (ações da B3), usado como fonte secundária"""
+
+    name = "brapi"
+
+    # Ranges aceitos pela API e a janela de calendário que cobrem
+    RANGES = [("5d", 7), ("1mo", 31), ("3mo", 92), ("6mo", 183), ("1y", 366),
+              ("2y", 731), ("5y", 1827), ("10y", 3653)]
+
+    def __init__(self, token: str, base_url: str = "https://brapi.dev/api", timeout: float = 10.0):
+        self.token = token
+        self.base_url = base_url
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    @staticmethod
+    def _ticker(symbol: str) -> Optional[str]:
+        symbol = symbol.upper()
+        if symbol.endswith(".SA"):
+            return symbol[:-3]
+        if symbol.startswith("^"):
+            return symbol
+        return None  # brapi não cobre ações fora da B3
+
+    async def _quote_request(self, ticker: str, params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        response = await self.client.get(
+            f"{self.base_url}/quote/{ticker}",
+            params={**params, "token": self.token}
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        results = response.json().get("results") or []
+        return results[0] if results else None
+
+    async def get_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        ticker = self._ticker(symbol)
+        if not ticker:
+            return None
+
+        result = await self._quote_request(ticker, {})
+        if not result or result.get("regularMarketPrice") is None:
+            return None
+
+        current_price = float(result["regularMarketPrice"])
+        previous_close = float(result.get("regularMarketPreviousClose") or current_price)
+
+        return {
+            "symbol": symbol.upper(),
+            "name": result.get("longName") or symbol,
+            "current_price": current_price,
+            "previous_close": previous_close,
+            "change": current_price - previous_close,
+            "change_percent": (current_price - previous_close) / previous_close * 100,
+            "volume": int(result.get("regularMarketVolume") or 0),
+            "market_cap": result.get("marketCap"),
+            "pe_ratio": result.get("priceEarnings"),
+            "dividend_yield": None,
+            "timestamp": datetime.utcnow()
+        }
+
+    async def get_history(self, symbol: str, start: Optional[date], end: Optional[date]) -> pd.DataFrame:
+        ticker = self._ticker(symbol)
+        if not ticker:
+            return pd.DataFrame()
+
+        span = (date.today() - start).days if start else None
+        range_ = "max"
+        if span is not None:
+            range_ = next((name for name, days in self.RANGES if days >= span), "max")
+
+        result = await self._quote_request(ticker, {"range": range_, "interval": "1d"})
+        bars = (result or {}).get("historicalDataPrice") or []
+        if not bars:
+            return pd.DataFrame()
+
+        index = (
+            pd.to_datetime([bar["date"] for bar in bars], unit="s", utc=True)
+            .tz_convert("America/Sao_Paulo")
+            .normalize()
+        )
+        hist = pd.DataFrame({
+            "Open": [bar.get("open") for bar in bars],
+            "High": [bar.get("high") for bar in bars],
+            "Low": [bar.get("low") for bar in bars],
+            "Close": [bar.get("close") for bar in bars],
+            "Volume": [bar.get("volume") or 0 for bar in bars],
+        }, index=index).dropna()
+
+        day = hist.index.strftime("%Y-%m-%d")
+        mask = np.ones(len(hist), dtype=bool)
+        if start:
+            mask &= day >= start.isoformat()
+        if end:
+            mask &= day < end.isoformat()
+        return hist[mask]
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class LatencyWindow:
+    """Janela deslizante de latências para estimar percentis"""
+
+    def __init__(self, size: int = 200):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        return float(np.percentile(np.fromiter(self.samples, dtype=float), q))
+
+
+class HedgedMarketData:
+    """
+    Fachada primário/secundário com requisições hedged.
+
+    - Dispara o primário; se ele não responder até o seu p95 recente
+      (limitado a [min_delay, max_delay]), dispara o secundário e usa a
+      primeira resposta válida.
+    - Se o primário falhar ou não encontrar o símbolo, o secundário é
+      acionado imediatamente (failover).
+    """
+
+    def __init__(
+        self,
+        primary: MarketDataProvider,
+        secondary: Optional[MarketDataProvider] = None,
+        hedge_percentile: float = 95.0,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.05,
+        max_delay: float = 5.0,
+        min_samples: int = 20
+    ):
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_percentile = hedge_percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.latencies: Dict[str, LatencyWindow] = {}
+
+    def _window(self, provider: MarketDataProvider, operation: str) -> LatencyWindow:
+        key = f"{provider.name}:{operation}"
+        if key not in self.latencies:
+            self.latencies[key] = LatencyWindow()
+        return self.latencies[key]
+
+    def hedge_delay(self, operation: str) -> float:
+        """Atraso antes de acionar o secundário (p95 adaptativo do primário)"""
+        window = self._window(self.primary, operation)
+        if len(window.samples) < self.min_samples:
+            return self.initial_delay
+        delay = window.percentile(self.hedge_percentile)
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    async def _timed(self, provider: MarketDataProvider, operation: str, *args):
+        start_time = time.perf_counter()
+        try:
+            result = await getattr(provider, operation)(*args)
+        except asyncio.CancelledError:
+            if provider is self.primary:
+                # Perdeu para o hedge: o tempo até o cancelamento é um piso da
+                # latência. Sem ele a janela só veria as respostas rápidas e o
+                # p95 (o atraso do hedge) cairia a cada hedge
+                self._window(provider, operation).observe(time.perf_counter() - start_time)
+            raise
+        except Exception as e:
+            PROVIDER_ERRORS.labels(provider=provider.name, operation=operation).inc()
+            API_CALLS.labels(provider=provider.name, status="error").inc()
+            logger.warning("Market data provider failed", provider=provider.name, operation=operation, error=str(e))
+            raise
+
+        duration = time.perf_counter() - start_time
+        PROVIDER_LATENCY.labels(provider=provider.name, operation=operation).observe(duration)
+        API_CALLS.labels(provider=provider.name, status="success").inc()
+        self._window(provider, operation).observe(duration)
+        return result
+
+    @staticmethod
+    def _is_valid(result: Any) -> bool:
+        if result is None:
+            return False
+        if isinstance(result, pd.DataFrame):
+            return not result.empty
+        return True
+
+    async def _call(self, operation: str, *args):
+        tasks = {asyncio.create_task(self._timed(self.primary, operation, *args)): self.primary}
+        reason = None
+
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(operation))
+        if not done:
+            reason = "slow"
+        else:
+            task = done.pop()
+            if not task.exception() and self._is_valid(task.result()):
+                return task.result()
+            reason = "failed"
+
+        if self.secondary is None:
+            if reason == "slow":
+                return await next(iter(tasks))
+            return next(iter(tasks)).result()
+
+        tasks[asyncio.create_task(self._timed(self.secondary, operation, *args))] = self.secondary
+        pending = {t for t in tasks if not t.done()}
+        fallback = None
+        last_error = None
+
+        # Considera também o primário já concluído (falha) na lista de resultados
+        finished = [t for t in tasks if t.done()]
+        while True:
+            for task in finished:
+                if task.exception():
+                    last_error = task.exception()
+                    continue
+                result = task.result()
+                if self._is_valid(result):
+                    for other in pending:
+                        other.cancel()
+                    HEDGED_REQUESTS.labels(operation=operation, reason=reason, winner=tasks[task].name).inc()
+                    return result
+                fallback = result
+
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finished = list(done)
+
+        HEDGED_REQUESTS.labels(operation=operation, reason=reason, winner="none").inc()
+        if fallback is not None or last_error is None:
+            return fallback
+        raise last_error
+
+    async def get_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return await self._call("get_quote", symbol)
+
+    async def get_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Lote só no primário (sem hedge: o secundário não tem download em lote)"""
+        return await self._timed(self.primary, "get_quotes", symbols)
+
+    async def get_history(self, symbol: str, start: Optional[date], end: Optional[date]) -> pd.DataFrame:
+        return await self._call("get_history", symbol, start, end)
+
+    def stats(self) -> Dict[str, Any]:
+        """Percentis de latência por provedor e operação"""
+        return {
+            key: {
+                "samples": len(window.samples),
+                "p50": window.percentile(50),
+                "p95": window.percentile(95),
+            }
+            for key, window in self.latencies.items()
+        }
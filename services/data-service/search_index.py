@@ -0,0 +1,187 @@
+"""
+Índice de busca de ações - Data Service
+Índice em memória sobre o universo de `Acao` com busca por prefixo,
+trigramas e sem acentos, com a mesma semântica do `pg_trgm` do Postgres
+(trigramas por palavra com padding e similaridade de Jaccard, limiar 0.3).
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TRGM_THRESHOLD = 0.3  # pg_trgm.similarity_threshold padrão
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Ações conhecidas usadas enquanto o universo não é importado
+DEFAULT_SYMBOLS = {
+    "PETR4.SA": "Petrobras",
+    "VALE3.SA": "Vale",
+    "ITUB4.SA": "Itaú Unibanco",
+    "BBDC4.SA": "Bradesco",
+    "ABEV3.SA": "Ambev",
+    "WEGE3.SA": "WEG",
+    "MGLU3.SA": "Magazine Luiza",
+    "VVAR3.SA": "Via Varejo",
+    "JBSS3.SA": "JBS",
+    "SUZB3.SA": "Suzano"
+}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas sem acentos (equivalente a lower(unaccent(text)))"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def words(text: str) -> List[str]:
+    return _WORD_RE.findall(normalize(text))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigramas no estilo pg_trgm: cada palavra com dois espaços antes e um depois"""
+    result = set()
+    for word in words(text):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(a: str, b: str) -> float:
+    """similarity() do pg_trgm"""
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    shared = len(ta & tb)
+    return shared / (len(ta) + len(tb) - shared)
+
+
+class SymbolSearchIndex:
+    """
+    Índice de símbolos e nomes de empresas.
+
+    Ranking: símbolo exato > prefixo do símbolo > prefixo de palavra do nome
+    > similaridade de trigramas (acima do limiar do pg_trgm).
+    """
+
+    def __init__(self, threshold: float = TRGM_THRESHOLD):
+        self.threshold = threshold
+        self.entries: Dict[str, Dict[str, Optional[str]]] = {}
+        self._postings: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self._field_trigrams: Dict[Tuple[str, str], Set[str]] = {}
+        self._prefix_keys: List[Tuple[str, str, str]] = []  # (token, campo, símbolo)
+        self._name_words: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _base(symbol: str) -> str:
+        """Símbolo sem sufixo de bolsa (PETR4.SA -> PETR4)"""
+        return symbol.split(".")[0]
+
+    def _fields(self, symbol: str, name: Optional[str]) -> Dict[str, str]:
+        return {"symbol": self._base(symbol), "name": name or ""}
+
+    def add(self, symbol: str, name: Optional[str] = None, exchange: Optional[str] = None):
+        """Inserir ou atualizar um símbolo"""
+        symbol = symbol.strip().upper()
+        with self._lock:
+            self.remove(symbol)
+            self.entries[symbol] = {"symbol": symbol, "name": name or symbol, "exchange": exchange}
+            self._name_words[symbol] = set(words(name or ""))
+
+            for field, text in self._fields(symbol, name).items():
+                grams = trigrams(text)
+                self._field_trigrams[(symbol, field)] = grams
+                for gram in grams:
+                    self._postings[gram].add((symbol, field))
+                for token in set(words(text)):
+                    bisect.insort(self._prefix_keys, (token, field, symbol))
+
+    def add_many(self, items: Iterable[Tuple[str, Optional[str], Optional[str]]]):
+        for symbol, name, exchange in items:
+            self.add(symbol, name, exchange)
+
+    def remove(self, symbol: str):
+        symbol = symbol.strip().upper()
+        with self._lock:
+            entry = self.entries.pop(symbol, None)
+            if entry is None:
+                return
+            self._name_words.pop(symbol, None)
+            for field, text in self._fields(symbol, entry["name"]).items():
+                for gram in self._field_trigrams.pop((symbol, field), ()):
+                    postings = self._postings.get(gram)
+                    if postings is not None:
+                        postings.discard((symbol, field))
+                        if not postings:
+                            del self._postings[gram]
+                for token in set(words(text)):
+                    key = (token, field, symbol)
+                    i = bisect.bisect_left(self._prefix_keys, key)
+                    if i < len(self._prefix_keys) and self._prefix_keys[i] == key:
+                        del self._prefix_keys[i]
+
+    def _prefix_matches(self, prefix: str) -> List[Tuple[str, str, str]]:
+        i = bisect.bisect_left(self._prefix_keys, (prefix,))
+        matches = []
+        while i < len(self._prefix_keys) and self._prefix_keys[i][0].startswith(prefix):
+            matches.append(self._prefix_keys[i])
+            i += 1
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Buscar por símbolo ou nome, ordenado por relevância"""
+        query_words = words(query)
+        if not query_words:
+            return []
+        compact = "".join(query_words)
+
+        with self._lock:
+            # (camada, score) por símbolo; maior é melhor
+            ranked: Dict[str, Tuple[int, float]] = {}
+
+            def offer(symbol: str, tier: int, score: float):
+                current = ranked.get(symbol)
+                if current is None or (tier, score) > current:
+                    ranked[symbol] = (tier, score)
+
+            # Prefixo do símbolo (e símbolo exato)
+            for token, field, symbol in self._prefix_matches(compact):
+                if field == "symbol":
+                    offer(symbol, 3 if token == compact else 2, len(compact) / len(token))
+
+            # Prefixo de palavra do nome: a última palavra da consulta é prefixo,
+            # as anteriores precisam existir no nome
+            last = query_words[-1]
+            previous = query_words[:-1]
+            for token, field, symbol in self._prefix_matches(last):
+                if field == "name" and all(w in self._name_words[symbol] for w in previous):
+                    offer(symbol, 1, len(last) / len(token))
+
+            # Similaridade de trigramas: só altera o resultado se ainda não há
+            # `limit` símbolos nas camadas de prefixo (que sempre vencem)
+            query_grams = trigrams(query)
+            if len(ranked) < limit and len(compact) >= 3:
+                shared: Dict[Tuple[str, str], int] = defaultdict(int)
+                for gram in query_grams:
+                    for key in self._postings.get(gram, ()):
+                        shared[key] += 1
+                for key, count in shared.items():
+                    score = count / (len(query_grams) + len(self._field_trigrams[key]) - count)
+                    if score >= self.threshold:
+                        offer(key[0], 0, score)
+
+            ordered = heapq.nsmallest(
+                limit, ranked.items(), key=lambda item: (-item[1][0], -item[1][1], item[0])
+            )
+            return [
+                {**self.entries[symbol], "score": round(tier + score, 4)}
+                for symbol, (tier, score) in ordered
+            ]
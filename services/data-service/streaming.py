@@ -0,0 +1,172 @@
+"""
+Streaming de cotações - Data Service
+Um único poller por processo busca, a cada tick, todos os símbolos assinados
+em lote e distribui aos clientes apenas as cotações que mudaram (deltas).
+A carga cresce com o número de símbolos distintos, não com o de clientes.
+"""
+
+import asyncio
+import itertools
+from collections import Counter as SymbolCounter
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import structlog
+from prometheus_client import Counter, Gauge
+
+logger = structlog.get_logger()
+
+# Métricas Prometheus
+STREAM_SUBSCRIBERS = Gauge('quote_stream_subscribers', 'Active quote stream subscribers')
+STREAM_SYMBOLS = Gauge('quote_stream_symbols', 'Distinct symbols being streamed')
+STREAM_TICKS = Counter('quote_stream_ticks_total', 'Quote poller ticks')
+STREAM_DELTAS = Counter('quote_stream_deltas_total', 'Quote deltas fanned out to subscribers')
+STREAM_DROPPED = Counter('quote_stream_dropped_messages_total', 'Messages dropped for slow subscribers')
+
+# Campos comparados entre ticks
+QUOTE_FIELDS = ("current_price", "previous_close", "change", "change_percent", "volume")
+
+# fetcher(symbols) -> {symbol: cotação}
+QuoteFetcher = Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+
+
+def quote_delta(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos da cotação que mudaram desde o último tick"""
+    if previous is None:
+        return {field: current.get(field) for field in QUOTE_FIELDS}
+    return {
+        field: current.get(field)
+        for field in QUOTE_FIELDS
+        if current.get(field) != previous.get(field)
+    }
+
+
+class Subscription:
+    """Assinatura de um cliente: conjunto de símbolos e fila de mensagens"""
+
+    def __init__(self, subscription_id: int, max_queue: int):
+        self.id = subscription_id
+        self.symbols: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    def push(self, message: Dict[str, Any]):
+        """Enfileirar sem bloquear o poller; clientes lentos perdem as mensagens mais antigas"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            STREAM_DROPPED.inc()
+        self.queue.put_nowait(message)
+
+    async def messages(self):
+        while True:
+            yield await self.queue.get()
+
+
+class QuoteStreamHub:
+    """Hub de assinaturas com poller compartilhado"""
+
+    def __init__(self, fetcher: QuoteFetcher, interval: float = 5.0, max_queue: int = 100):
+        self.fetcher = fetcher
+        self.interval = interval
+        self.max_queue = max_queue
+        self.subscriptions: Dict[int, Subscription] = {}
+        self.symbol_refs: SymbolCounter = SymbolCounter()
+        self.snapshot: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def symbols(self) -> List[str]:
+        return sorted(self.symbol_refs)
+
+    def subscribe(self, symbols: Iterable[str] = ()) -> Subscription:
+        """Criar assinatura (inicia o poller se necessário)"""
+        subscription = Subscription(next(self._ids), self.max_queue)
+        self.subscriptions[subscription.id] = subscription
+        STREAM_SUBSCRIBERS.set(len(self.subscriptions))
+        self.add_symbols(subscription, symbols)
+        self._ensure_poller()
+        return subscription
+
+    def add_symbols(self, subscription: Subscription, symbols: Iterable[str]):
+        """Adicionar símbolos e enviar o último estado conhecido deles"""
+        added = {s.strip().upper() for s in symbols if s.strip()} - subscription.symbols
+        subscription.symbols |= added
+        self.symbol_refs.update(added)
+        STREAM_SYMBOLS.set(len(self.symbol_refs))
+
+        known = {s: self.snapshot[s] for s in added if s in self.snapshot}
+        if known:
+            subscription.push(self._message("snapshot", known))
+
+    def remove_symbols(self, subscription: Subscription, symbols: Iterable[str]):
+        removed = {s.strip().upper() for s in symbols} & subscription.symbols
+        subscription.symbols -= removed
+        self.symbol_refs.subtract(removed)
+        for symbol in removed:
+            if self.symbol_refs[symbol] <= 0:
+                del self.symbol_refs[symbol]
+                self.snapshot.pop(symbol, None)
+        STREAM_SYMBOLS.set(len(self.symbol_refs))
+
+    def unsubscribe(self, subscription: Subscription):
+        """Encerrar assinatura (o poller para quando não há mais assinantes)"""
+        self.remove_symbols(subscription, list(subscription.symbols))
+        self.subscriptions.pop(subscription.id, None)
+        STREAM_SUBSCRIBERS.set(len(self.subscriptions))
+        if not self.subscriptions and self._task:
+            self._task.cancel()
+            self._task = None
+
+    @staticmethod
+    def _message(message_type: str, quotes: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "type": message_type,
+            "quotes": quotes,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def _ensure_poller(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self.subscriptions:
+            try:
+                await self.poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Quote stream tick failed", error=str(e))
+            await asyncio.sleep(self.interval)
+
+    async def poll_once(self):
+        """Um tick: busca em lote dos símbolos assinados e fan-out dos deltas"""
+        symbols = self.symbols
+        if not symbols:
+            return
+
+        STREAM_TICKS.inc()
+        quotes = await self.fetcher(symbols)
+
+        deltas = {}
+        for symbol, quote in quotes.items():
+            if symbol not in self.symbol_refs or not quote:
+                continue
+            delta = quote_delta(self.snapshot.get(symbol), quote)
+            self.snapshot[symbol] = quote
+            if delta:
+                deltas[symbol] = delta
+
+        if not deltas:
+            return
+
+        for subscription in list(self.subscriptions.values()):
+            changed = {s: deltas[s] for s in subscription.symbols if s in deltas}
+            if changed:
+                subscription.push(self._message("delta", changed))
+                STREAM_DELTAS.inc(len(changed))
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
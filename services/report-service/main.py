@@ -14,7 +14,6 @@ import structlog
 import time
 import redis
 import json
-import httpx
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
@@ -30,6 +29,8 @@ import tempfile
 import asyncio
 from enum import Enum
 
+from http_pool import create_pool
+
 # Configuração de logging
 structlog.configure(
     processors=[
@@ -63,6 +64,9 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
+# Pool HTTP para os demais serviços (aberto no startup, fechado no shutdown)
+http_pool = create_pool("report-service", timeout=30.0)
+
 # FastAPI app
 app = FastAPI(
     title="Agente Investidor - Report Service",
@@ -161,7 +165,7 @@ def get_cached_data(key: str) -> Optional[Any]:
 async def fetch_data_from_service(service_url: str, endpoint: str) -> Optional[Dict[str, Any]]:
     """Buscar dados de outros serviços"""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with http_pool.session() as client:
             response = await client.get(f"{service_url}{endpoint}")
             if response.status_code == 200:
                 return response.json()
@@ -418,6 +422,14 @@ async def metrics_middleware(request, call_next):
     
     return response
 
+@app.on_event("startup")
+async def startup_event():
+    await http_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await http_pool.close()
+
 # Health check
 @app.get("/health")
 async def health_check():
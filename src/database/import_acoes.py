@@ -1,4 +1,5 @@
 import os
+import json
 import yfinance as yf
 from src.models.acao import db, Acao
 from flask import Flask
@@ -11,6 +12,31 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
 db.init_app(app)
 
+# Canal usado pelo data-service para atualizar o índice de busca
+SYMBOL_UNIVERSE_KEY = 'symbols:universe'
+SYMBOL_IMPORT_CHANNEL = 'symbols:imported'
+
+def publicar_acoes(acoes):
+    """Publica as ações importadas no Redis (universo + aviso de importação)"""
+    try:
+        import redis
+        client = redis.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', '6379')),
+            db=1,  # DB do data-service
+            decode_responses=True
+        )
+        dados = [acao.to_dict() for acao in acoes]
+        if not dados:
+            return
+        pipe = client.pipeline()
+        pipe.hset(SYMBOL_UNIVERSE_KEY, mapping={d['symbol']: json.dumps(d) for d in dados})
+        pipe.publish(SYMBOL_IMPORT_CHANNEL, json.dumps(dados))
+        pipe.execute()
+        print(f'{len(dados)} ações publicadas para o índice de busca.')
+    except Exception as e:
+        print(f'Não foi possível publicar ações no Redis: {e}')
+
 # Função para importar ações da B3
 def importar_acoes_b3():
     print('Importando ações da B3...')
@@ -31,6 +57,7 @@ def importar_acoes_b3():
                 acao = Acao(symbol=symbol, nome=nome, bolsa='B3')
                 db.session.add(acao)
     db.session.commit()
+    publicar_acoes(Acao.query.filter_by(bolsa='B3').all())
     print('Ações da B3 importadas.')
 
 # Função para importar ações dos EUA (NYSE/NASDAQ)
@@ -50,6 +77,7 @@ def importar_acoes_usa():
                 acao = Acao(symbol=symbol, nome=nome, bolsa='NYSE/NASDAQ')
                 db.session.add(acao)
     db.session.commit()
+    publicar_acoes(Acao.query.filter_by(bolsa='NYSE/NASDAQ').all())
     print('Ações dos EUA importadas.')
 
 if __name__ == '__main__':
@@ -0,0 +1,242 @@
+"""
+Testes unitários do cache hierárquico: L1 (LRU) e leituras/escritas no L2
+"""
+
+import asyncio
+import time
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'shared'))
+
+from cache.advanced_cache import AdvancedCache
+
+
+def l1_cache(**kwargs):
+    """Cache só com L1 (sem Redis)"""
+    return AdvancedCache(enable_metrics=False, **kwargs)
+
+
+class RoundTripPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        self.redis.log.append("pipeline")
+        return [getattr(self.redis, f"_{name}")(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class RoundTripRedis:
+    """Redis assíncrono em memória que conta as idas ao servidor"""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+        self.log = []
+
+    def _trip(self, command):
+        self.round_trips += 1
+        self.log.append(command)
+
+    def _set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def _incrby(self, key, amount):
+        self.data[key] = self.data.get(key, 0) + amount
+
+    def _expire(self, key, ttl):
+        pass
+
+    async def get(self, key):
+        self._trip("get")
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        self._trip("mget")
+        return [self.data.get(key) for key in keys]
+
+    async def delete(self, *keys):
+        self._trip("delete")
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return RoundTripPipeline(self)
+
+
+def l2_cache(**kwargs):
+    cache = AdvancedCache(enable_metrics=False, **kwargs)
+    cache.redis_client = RoundTripRedis()
+    return cache
+
+
+def drop_l1(cache):
+    cache.l1_cache.clear()
+    cache.l1_bytes = 0
+    cache.redis_client.round_trips = 0
+    cache.redis_client.log = []
+
+
+class TestL1LRU:
+    """Testes da eviction LRU e da contagem de bytes"""
+
+    def test_evicts_least_recently_used(self):
+        cache = l1_cache(l1_max_size=3)
+
+        async def scenario():
+            for key in ("a", "b", "c"):
+                await cache.set(key, key)
+            await cache.get("a")  # "b" passa a ser o menos usado
+            await cache.set("d", "d")
+
+        asyncio.run(scenario())
+
+        assert list(cache.l1_cache) == ["c", "a", "d"]
+        assert cache.l1_stats.evictions == 1
+
+    def test_keeps_max_size_items(self):
+        cache = l1_cache(l1_max_size=10)
+
+        async def scenario():
+            for i in range(25):
+                await cache.set(f"k{i}", i)
+
+        asyncio.run(scenario())
+
+        assert list(cache.l1_cache) == [f"k{i}" for i in range(15, 25)]
+
+    def test_running_byte_count(self):
+        cache = l1_cache(l1_max_size=100)
+
+        async def scenario():
+            await cache.set("a", "x" * 100)
+            await cache.set("b", "y" * 200)
+            await cache.set("a", "z" * 10)  # Substituição desconta o tamanho antigo
+            await cache.delete("b")
+            await cache.set("c", [1, 2, 3])
+            await cache.clear("c")
+            return await cache.get_stats()
+
+        stats = asyncio.run(scenario())
+
+        assert cache.l1_bytes == sum(entry.size_bytes for entry in cache.l1_cache.values())
+        assert stats["l1"]["size_bytes"] == cache.l1_bytes
+        assert list(cache.l1_cache) == ["a"]
+
+    def test_memory_limit(self):
+        cache = l1_cache(l1_max_size=1000, l1_max_memory=2000)
+
+        async def scenario():
+            for i in range(20):
+                await cache.set(f"k{i}", "x" * 300)
+
+        asyncio.run(scenario())
+
+        assert cache.l1_bytes <= 2000
+        assert cache.l1_bytes == sum(entry.size_bytes for entry in cache.l1_cache.values())
+        assert "k19" in cache.l1_cache and "k0" not in cache.l1_cache
+
+
+class TestL1Benchmark:
+    """Micro-benchmark: custo por operação não cresce com o tamanho do L1"""
+
+    @staticmethod
+    def per_operation(size: int, operations: int = 2000) -> float:
+        cache = l1_cache(l1_max_size=size, l1_max_memory=1 << 40)
+
+        async def scenario():
+            for i in range(size):
+                await cache._set_l1(f"k{i}", i)
+            started = time.perf_counter()
+            # Cada set expulsa o LRU; cada get promove uma chave
+            for i in range(operations):
+                await cache._set_l1(f"n{i}", i)
+                await cache._get_l1(f"k{size - 1 - i}")
+            return (time.perf_counter() - started) / operations
+
+        return asyncio.run(scenario())
+
+    def test_flat_cost_up_to_100k_entries(self):
+        small = min(self.per_operation(1_000) for _ in range(3))
+        large = min(self.per_operation(100_000) for _ in range(3))
+
+        # Com varredura O(n) o L1 de 100k seria ~100x mais lento
+        assert large < 3 * small
+
+
+class TestL2RoundTrips:
+    """Testes do registro L2 único e das operações em lote"""
+
+    def test_hit_is_a_single_read(self):
+        cache = l2_cache()
+
+        async def scenario():
+            await cache.set("stock:PETR4", {"price": 10.0})
+            drop_l1(cache)
+            return await cache.get("stock:PETR4")
+
+        assert asyncio.run(scenario()) == {"price": 10.0}
+        assert cache.redis_client.log == ["get"]
+
+    def test_compressed_value_roundtrip(self):
+        cache = l2_cache(compression_threshold=64)
+        value = {"history": list(range(500))}
+
+        async def scenario():
+            await cache.set("stock:VALE3", value)
+            drop_l1(cache)
+            return await cache.get("stock:VALE3")
+
+        assert asyncio.run(scenario()) == value
+        metadata, _ = cache._unpack_l2(cache.redis_client.data[cache._l2_key("stock:VALE3")])
+        assert metadata["is_compressed"]
+
+    def test_access_counts_are_flushed_in_batch(self):
+        cache = l2_cache()
+
+        async def scenario():
+            await cache.set("a", 1)
+            await cache.set("b", 2)
+            for key in ("a", "a", "b"):
+                cache.l1_cache.clear()
+                await cache.get(key)
+            drop_l1(cache)
+            return await cache.flush_access_stats()
+
+        assert asyncio.run(scenario()) == 2
+        assert cache.redis_client.log == ["pipeline"]
+        assert cache.redis_client.data["access:" + cache._generate_key_hash("a")] == 2
+        assert cache.l2_access == {}
+
+    def test_get_many_and_set_many(self):
+        cache = l2_cache()
+        items = {f"stock:S{i}": i for i in range(3)}
+
+        async def scenario():
+            await cache.set_many(items, ttl=60)
+            writes = cache.redis_client.round_trips
+            drop_l1(cache)
+            first = await cache.get_many([*items, "stock:MISSING", "stock:S0"])
+            reads = cache.redis_client.round_trips
+            second = await cache.get_many(list(items))
+            return writes, first, reads, second
+
+        writes, first, reads, second = asyncio.run(scenario())
+
+        assert writes == 1 and reads == 1
+        assert first == items and second == items
+        assert cache.redis_client.round_trips == 1  # Segunda leitura toda no L1
+
+    def test_expired_record_is_removed(self):
+        cache = l2_cache()
+        entry_key = cache._l2_key("stock:OLD")
+        cache.redis_client.data[entry_key] = cache._pack_l2(
+            {"expires_at": "2000-01-01T00:00:00", "serialization_method": "pickle"}, b"\x80\x04K\x01."
+        )
+
+        assert asyncio.run(cache.get_many(["stock:OLD"])) == {}
+        assert entry_key not in cache.redis_client.data
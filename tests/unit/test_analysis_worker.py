@@ -0,0 +1,213 @@
+"""
+Testes unitários do worker Kafka assíncrono do Analysis Service
+"""
+
+import asyncio
+import sys
+import os
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from analysis_worker import AnalysisWorker, OffsetTracker, WorkerConfig
+
+
+class FakeFuture:
+    def __init__(self, error=None):
+        self.error = error
+
+    def get(self, timeout=None):
+        if self.error:
+            raise self.error
+
+
+class FakeProducer:
+    def __init__(self, failures=0):
+        self.sent = []
+        self.flushes = 0
+        self.failures = failures
+
+    def send(self, topic, value=None, key=None):
+        if self.failures:
+            self.failures -= 1
+            return FakeFuture(RuntimeError("broker unavailable"))
+        self.sent.append((topic, value, key))
+        return FakeFuture()
+
+    def flush(self, timeout=None):
+        self.flushes += 1
+
+
+class FakeConsumer:
+    """Entrega as mensagens em um único poll e registra pausas e commits"""
+
+    def __init__(self, records):
+        self.records = records
+        self.commits = []
+        self.paused_partitions = set()
+        self.closed = False
+
+    def poll(self, timeout_ms=0, max_records=None):
+        if self.paused_partitions or not self.records:
+            return {}
+        batches = {}
+        for record in self.records[:max_records]:
+            batches.setdefault(record.partition, []).append(record)
+        self.records = self.records[max_records:]
+        return batches
+
+    def assignment(self):
+        return {0, 1}
+
+    def pause(self, *partitions):
+        self.paused_partitions.update(partitions)
+
+    def resume(self, *partitions):
+        self.paused_partitions.difference_update(partitions)
+
+    def paused(self):
+        return set(self.paused_partitions)
+
+    def commit(self, offsets):
+        self.commits.append({tp: meta.offset for tp, meta in offsets.items()})
+
+    def close(self):
+        self.closed = True
+
+
+def record(offset, symbol, partition=0, **extra):
+    value = {"symbol": symbol, "request_id": f"r{offset}", **extra}
+    return SimpleNamespace(topic="analysis.requested", partition=partition, offset=offset, key=symbol, value=value)
+
+
+def run_worker(consumer, producer, handler, until, config=None, on_error=None):
+    async def run():
+        worker = AnalysisWorker(lambda: consumer, lambda: producer, handler, on_error=on_error,
+                                config=config or WorkerConfig(poll_timeout_ms=1, linger_ms=1, retry_backoff=0.001))
+        worker.start()
+        for _ in range(2000):
+            if until(worker):
+                break
+            await asyncio.sleep(0.001)
+        await worker.stop(timeout=5)
+        return worker
+
+    return asyncio.run(run())
+
+
+class TestOffsetTracker:
+    """Testes do controle de offsets comitáveis"""
+
+    def test_commits_only_contiguous_prefix(self):
+        tracker = OffsetTracker()
+        for offset in (10, 11, 12):
+            tracker.track("tp", offset)
+
+        tracker.complete("tp", 11)
+        assert tracker.drain() == {}
+
+        tracker.complete("tp", 10)
+        assert tracker.drain() == {"tp": 12}
+        assert tracker.in_flight == 1
+
+    def test_forget_revoked_partition(self):
+        tracker = OffsetTracker()
+        tracker.track("tp", 1)
+        tracker.track("tp", 2)
+        tracker.complete("tp", 2)
+        tracker.forget(["tp"])
+        tracker.complete("tp", 1)
+
+        assert tracker.in_flight == 0
+        assert tracker.drain() == {}
+
+
+class TestAnalysisWorker:
+    """Testes do processamento concorrente"""
+
+    def test_processes_concurrently_and_commits_after_publish(self):
+        records = [record(i, f"S{i}", partition=i % 2) for i in range(20)]
+        consumer, producer = FakeConsumer(records), FakeProducer()
+        active = {"now": 0, "max": 0}
+
+        async def handler(message):
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            return [("analysis.completed", {"request_id": message["request_id"]}, message["symbol"])]
+
+        run_worker(consumer, producer, handler, lambda worker: len(producer.sent) == 20)
+
+        assert active["max"] > 1
+        assert len(producer.sent) == 20
+        committed = {}
+        for commit in consumer.commits:
+            committed.update(commit)
+        assert committed == {0: 19, 1: 20}
+        assert consumer.closed
+
+    def test_preserves_order_per_symbol(self):
+        records = [record(i, "PETR4" if i % 2 else "VALE3") for i in range(10)]
+        consumer, producer = FakeConsumer(records), FakeProducer()
+        processed = []
+
+        async def handler(message):
+            # Mensagens mais antigas demoram mais: sem ordenação, chegariam depois
+            await asyncio.sleep(0.02 / (int(message["request_id"][1:]) + 1))
+            processed.append(message["request_id"])
+            return [("analysis.completed", message, message["symbol"])]
+
+        run_worker(consumer, producer, handler, lambda worker: len(producer.sent) == 10)
+
+        for symbol in ("PETR4", "VALE3"):
+            ids = [value["request_id"] for _, value, key in producer.sent if key == symbol]
+            assert ids == sorted(ids, key=lambda request_id: int(request_id[1:]))
+
+    def test_failures_publish_error_event(self):
+        consumer, producer = FakeConsumer([record(0, "XPTO")]), FakeProducer()
+
+        async def handler(message):
+            raise ValueError("boom")
+
+        run_worker(
+            consumer, producer, handler, lambda worker: producer.sent,
+            on_error=lambda message, error: [("analysis.failed", {"error": str(error)}, message["symbol"])]
+        )
+
+        assert producer.sent == [("analysis.failed", {"error": "boom"}, "XPTO")]
+        assert consumer.commits == [{0: 1}]
+
+    def test_publish_is_retried_before_commit(self):
+        consumer, producer = FakeConsumer([record(0, "PETR4")]), FakeProducer(failures=2)
+
+        async def handler(message):
+            return [("analysis.completed", message, message["symbol"])]
+
+        run_worker(consumer, producer, handler, lambda worker: producer.sent)
+
+        assert len(producer.sent) == 1
+        assert consumer.commits == [{0: 1}]
+
+    def test_backpressure_pauses_consumption(self):
+        records = [record(i, f"S{i}") for i in range(6)]
+        consumer, producer = FakeConsumer(records), FakeProducer()
+        release = asyncio.Event()
+        paused = []
+
+        async def handler(message):
+            await release.wait()
+            return []
+
+        def until(worker):
+            if worker.paused:
+                paused.append(worker.tracker.in_flight)
+                release.set()
+            return consumer.commits and not worker.tracker.in_flight
+
+        config = WorkerConfig(max_in_flight=4, max_poll_records=2, poll_timeout_ms=1, linger_ms=1)
+        worker = run_worker(consumer, producer, handler, until, config=config)
+
+        assert paused and paused[0] >= 4
+        assert not worker.paused
+        assert consumer.commits[-1] == {0: 6}
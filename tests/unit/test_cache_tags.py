@@ -0,0 +1,240 @@
+"""
+Testes unitários da invalidação de cache por tags
+"""
+
+import fnmatch
+import time
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'shared'))
+
+from cache.advanced_cache import AdvancedCache
+from cache.redis_manager import RedisManager
+from cache.tags import AsyncTagIndex, TagIndex, symbol_tag, type_tag
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        results = [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+class FakeRedis:
+    """Redis em memória sem KEYS/FLUSHDB: qualquer uso desses comandos falha"""
+
+    def __init__(self):
+        self.data = {}
+        self.sets = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        return True
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+        self.ttls[key] = ttl
+        return True
+
+    def hset(self, key, field, value):
+        self.data.setdefault(key, {})[field] = value
+        return 1
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+        return True
+
+    def zadd(self, key, mapping):
+        self.sets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.sets.get(key, {}).pop(member, None)
+        return len(members)
+
+    def zremrangebyscore(self, key, min, max):
+        members = self.sets.get(key, {})
+        expired = [member for member, score in members.items() if score <= float(max)]
+        return self.zrem(key, *expired)
+
+    def zscan_iter(self, key, match=None, count=None):
+        for member, score in list(self.sets.get(key, {}).items()):
+            if match is None or fnmatch.fnmatchcase(member, match):
+                yield member, score
+
+    def unlink(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self.data.pop(key, None) is not None or self.sets.pop(key, None) is not None:
+                deleted += 1
+        return deleted
+
+    delete = unlink
+
+
+class AsyncFakeRedis(FakeRedis):
+    class AsyncPipeline(FakePipeline):
+        async def execute(self):
+            # Os comandos enfileirados executam a versão síncrona do fake
+            results = [getattr(FakeRedis, name)(self.redis, *args, **kwargs) for name, args, kwargs in self.commands]
+            self.commands = []
+            return results
+
+    def pipeline(self, transaction=True):
+        return self.AsyncPipeline(self)
+
+    async def zremrangebyscore(self, key, min, max):
+        return FakeRedis.zremrangebyscore(self, key, min, max)
+
+    async def zscan_iter(self, key, match=None, count=None):
+        for item in list(FakeRedis.zscan_iter(self, key, match, count)):
+            yield item
+
+    async def unlink(self, *keys):
+        return FakeRedis.unlink(self, *keys)
+
+
+class TestTagIndex:
+    """Testes do índice de tags"""
+
+    def test_invalidate_removes_only_tagged_keys(self):
+        """Invalidar uma tag remove suas chaves e preserva as demais"""
+        redis = FakeRedis()
+        tags = TagIndex(redis)
+        tags.set("stock:PETR4.SA", "1", 300, [symbol_tag("petr4.sa"), type_tag("quote")])
+        tags.set("history:canonical:PETR4.SA", "2", 600, [symbol_tag("PETR4.SA"), type_tag("history")])
+        tags.set("stock:VALE3.SA", "3", 300, [symbol_tag("VALE3.SA"), type_tag("quote")])
+
+        assert tags.invalidate(symbol_tag("PETR4.SA")) == 2
+        assert set(redis.data) == {"stock:VALE3.SA"}
+        assert "tags:symbol:PETR4.SA" not in redis.sets
+
+    def test_invalidation_in_batches(self):
+        """Tags grandes são removidas em vários lotes"""
+        redis = FakeRedis()
+        tags = TagIndex(redis, batch_size=7)
+        for i in range(50):
+            tags.set(f"stock:S{i}", "x", 300, [type_tag("quote")])
+
+        assert tags.invalidate(type_tag("quote")) == 50
+        assert redis.data == {}
+
+    def test_tag_ttl_outlives_members(self):
+        """O ZSET da tag nunca expira antes das chaves registradas"""
+        redis = FakeRedis()
+        tags = TagIndex(redis, tag_ttl=60)
+        tags.set("history:canonical:X", "x", 3600, [type_tag("history")])
+
+        assert redis.ttls["tags:type:history"] == 3600
+
+    def test_invalidate_matching(self):
+        """Invalidação por padrão percorre apenas os membros da tag"""
+        redis = FakeRedis()
+        tags = TagIndex(redis)
+        tags.set("ns:a:1", "x", 60, ["ns"])
+        tags.set("ns:b:1", "x", 60, ["ns"])
+
+        assert tags.invalidate_matching("ns", "ns:a:*") == 1
+        assert set(redis.data) == {"ns:b:1"}
+        assert set(redis.sets["tags:ns"]) == {"ns:b:1"}
+
+    def test_expired_members_are_pruned(self):
+        """Membros cujas chaves já expiraram saem da tag na escrita seguinte"""
+        redis = FakeRedis()
+        tags = TagIndex(redis)
+        for i in range(20):
+            tags.set(f"stock:S{i}", "x", 60, [type_tag("quote")])
+        # Simula a passagem do TTL das chaves antigas
+        redis.sets["tags:type:quote"] = {member: time.time() - 1 for member in redis.sets["tags:type:quote"]}
+        redis.data.clear()
+
+        tags.set("stock:NEW", "x", 60, [type_tag("quote")])
+
+        assert set(redis.sets["tags:type:quote"]) == {"stock:NEW"}
+        assert redis.sets["tags:type:quote"]["stock:NEW"] > time.time()
+
+
+class TestRedisManagerTags:
+    """Testes do RedisManager com invalidação por tags"""
+
+    def make_manager(self):
+        manager = RedisManager(host="localhost", port=6379)
+        manager.connections[0] = FakeRedis()
+        return manager
+
+    def test_invalidate_pattern_without_keys(self):
+        """invalidate_pattern usa a tag do namespace (o fake não implementa KEYS)"""
+        manager = self.make_manager()
+        manager.set("analysis", "PETR4", {"score": 1})
+        manager.set("analysis", "VALE3", {"score": 2})
+        manager.set("quotes", "PETR4", {"price": 10})
+
+        assert manager.invalidate_pattern("analysis", "PETR*") == 1
+        assert manager.invalidate_pattern("analysis") == 1
+        assert set(manager.connections[0].data) == {"quotes:PETR4"}
+
+    def test_invalidate_tags(self):
+        """Tags extras informadas no set permitem invalidação entre namespaces"""
+        manager = self.make_manager()
+        manager.set("analysis", "PETR4", {"score": 1}, tags=[symbol_tag("PETR4")])
+        manager.set("quotes", "PETR4", {"price": 10}, tags=[symbol_tag("PETR4")])
+        manager.set("quotes", "VALE3", {"price": 20}, tags=[symbol_tag("VALE3")])
+
+        assert manager.invalidate_tags(symbol_tag("PETR4")) == 2
+        assert set(manager.connections[0].data) == {"quotes:VALE3"}
+
+
+class TestAdvancedCacheTags:
+    """Testes do AdvancedCache com invalidação por tags"""
+
+    def make_cache(self):
+        cache = AdvancedCache(enable_metrics=False)
+        cache.redis_client = AsyncFakeRedis()
+        cache.tag_index = AsyncTagIndex(cache.redis_client, prefix="cache:tags", expand=cache._l2_keys)
+        return cache
+
+    @pytest.mark.asyncio
+    async def test_clear_pattern_and_all(self):
+        """clear() remove do L2 pelas tags, sem FLUSHDB no Redis compartilhado"""
+        cache = self.make_cache()
+        await cache.set("stock:PETR4", 1)
+        await cache.set("stock:VALE3", 2)
+        await cache.set("analysis:PETR4", 3)
+        cache.redis_client.data["outro:servico"] = "preservado"
+
+        assert await cache.clear("PETR4") == 4  # 2 no L1 + 2 no L2
+        assert len(cache.redis_client.data) == 2  # Registro de VALE3 + chave alheia
+
+        await cache.clear("*")
+        assert cache.redis_client.data == {"outro:servico": "preservado"}
+
+    @pytest.mark.asyncio
+    async def test_invalidate_tags(self):
+        """Chaves com a mesma tag são invalidadas juntas"""
+        cache = self.make_cache()
+        await cache.set("stock:PETR4", 1, tags=[symbol_tag("PETR4")])
+        await cache.set("analysis:PETR4", 2, tags=[symbol_tag("PETR4")])
+        await cache.set("stock:VALE3", 3, tags=[symbol_tag("VALE3")])
+
+        assert await cache.invalidate_tags(symbol_tag("PETR4")) == 2
+        assert len(cache.redis_client.data) == 1  # Registro de VALE3
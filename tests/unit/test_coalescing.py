@@ -0,0 +1,111 @@
+"""
+Testes unitários da coalescência de requisições do Analysis Service
+"""
+
+import asyncio
+import sys
+import os
+from prometheus_client import REGISTRY
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from coalescing import Coalescer
+
+
+def counter(name, coalescer, type=""):
+    return REGISTRY.get_sample_value(name, {"coalescer": coalescer, "type": type}) or 0
+
+
+class TestCoalescer:
+    """Testes do compartilhamento de resultados"""
+
+    def test_concurrent_duplicates_compute_once(self):
+        coalescer = Coalescer("test-concurrent")
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"score": 80}
+
+        async def run():
+            return await asyncio.gather(*(coalescer.run(("PETR4", "indicators", "v1"), compute) for _ in range(5)))
+
+        resultados = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert all(resultado is resultados[0] for resultado in resultados)
+        assert counter("analysis_coalesced_duplicates_total", "test-concurrent") == 4
+        assert counter("analysis_coalesced_results_total", "test-concurrent") == 1
+
+    def test_window_reuses_then_expires(self):
+        coalescer = Coalescer("test-window", window=0.05)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return len(calls)
+
+        async def run():
+            first = await coalescer.run("VALE3", compute)
+            second = await coalescer.run("VALE3", compute)
+            await asyncio.sleep(0.06)
+            third = await coalescer.run("VALE3", compute)
+            return first, second, third
+
+        assert asyncio.run(run()) == (1, 1, 2)
+
+    def test_different_versions_are_not_coalesced(self):
+        coalescer = Coalescer("test-versions")
+
+        async def run():
+            first = await coalescer.run(("ITUB4", "risk", "v1"), lambda: asyncio.sleep(0, result="a"))
+            second = await coalescer.run(("ITUB4", "risk", "v2"), lambda: asyncio.sleep(0, result="b"))
+            return first, second
+
+        assert asyncio.run(run()) == ("a", "b")
+
+    def test_failures_propagate_and_are_not_kept(self):
+        coalescer = Coalescer("test-failures")
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise RuntimeError("data service down")
+
+        async def run():
+            resultados = await asyncio.gather(coalescer.run("BBAS3", failing), coalescer.run("BBAS3", failing),
+                                              return_exceptions=True)
+            assert len(coalescer) == 0
+            return resultados
+
+        resultados = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert all(isinstance(resultado, RuntimeError) for resultado in resultados)
+
+    def test_none_is_not_kept(self):
+        coalescer = Coalescer("test-none")
+        calls = []
+
+        async def missing():
+            calls.append(1)
+            return None
+
+        async def run():
+            await coalescer.run("XPTO", missing)
+            await coalescer.run("XPTO", missing)
+
+        asyncio.run(run())
+        assert len(calls) == 2
+
+    def test_expired_entries_are_pruned(self):
+        coalescer = Coalescer("test-prune", window=0, max_entries=2)
+
+        async def run():
+            for symbol in ("A", "B", "C", "D"):
+                await coalescer.run(symbol, lambda: asyncio.sleep(0, result=symbol))
+
+        asyncio.run(run())
+        assert len(coalescer) <= 3
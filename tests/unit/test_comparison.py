@@ -0,0 +1,69 @@
+"""
+Testes unitários da comparação entre ações do Analysis Service
+"""
+
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from comparison import chunked, indicator_values, rank_values
+
+
+class TestRankValues:
+    """Testes do ranking vetorizado"""
+
+    def test_ranking_and_percentiles(self):
+        """Ordem decrescente, percentil 100 para o maior valor"""
+        resultado = rank_values({"A": 10.0, "B": 30.0, "C": 20.0, "D": 40.0})
+        ranking = resultado["ranking"]
+
+        assert [item["symbol"] for item in ranking] == ["D", "B", "C", "A"]
+        assert [item["posicao"] for item in ranking] == [1, 2, 3, 4]
+        assert [item["percentil"] for item in ranking] == [100.0, 75.0, 50.0, 25.0]
+        assert resultado["estatisticas"]["media"] == pytest.approx(25.0)
+        assert resultado["estatisticas"]["mediana"] == pytest.approx(25.0)
+
+    def test_ties_share_percentile(self):
+        ranking = rank_values({"A": 5.0, "B": 5.0, "C": 1.0})["ranking"]
+
+        assert ranking[0]["percentil"] == ranking[1]["percentil"] == pytest.approx(250 / 3)
+
+    def test_sector_statistics(self):
+        """Estatísticas e percentis calculados dentro de cada setor"""
+        resultado = rank_values(
+            {"PETR4": 8.0, "PRIO3": 12.0, "ITUB4": 9.0, "XPTO": 1.0},
+            {"PETR4": "Energia", "PRIO3": "Energia", "ITUB4": "Financeiro"}
+        )
+        setores = resultado["estatisticas_setor"]
+        por_symbol = {item["symbol"]: item for item in resultado["ranking"]}
+
+        assert setores["Energia"]["media"] == pytest.approx(10.0)
+        assert setores["Financeiro"]["quantidade"] == 1
+        assert setores["Financeiro"]["desvio_padrao"] is None
+        assert por_symbol["PETR4"]["percentil_setor"] == pytest.approx(50.0)
+        assert por_symbol["XPTO"]["setor"] == "N/A"
+
+    def test_non_finite_values_are_dropped(self):
+        resultado = rank_values({"A": float("nan"), "B": 2.0})
+
+        assert [item["symbol"] for item in resultado["ranking"]] == ["B"]
+        assert resultado["ranking"][0]["zscore"] == 0.0
+
+
+class TestHelpers:
+    """Testes dos auxiliares"""
+
+    def test_indicator_values(self):
+        dados = {
+            "A": SimpleNamespace(pe_ratio=10.0),
+            "B": SimpleNamespace(pe_ratio=None),
+            "C": SimpleNamespace(pe_ratio=7),
+        }
+
+        assert indicator_values(dados, "PE Ratio") == {"A": 10.0, "C": 7.0}
+
+    def test_chunked(self):
+        assert chunked(["A", "B", "C"], 2) == [["A", "B"], ["C"]]
@@ -0,0 +1,169 @@
+"""
+Testes unitários da correlação do universo e do agrupamento do Analysis Service
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+import correlation
+from correlation import (
+    RollingCorrelation, UniverseCorrelation, block_rows, clustering_limit, condensed_distance,
+    correlation_distance, hierarchical_clusters, least_correlated
+)
+
+
+def retornos(seed=0, dias=300, ativos=12):
+    """Três fatores: ativos do mesmo fator são fortemente correlacionados"""
+    rng = np.random.default_rng(seed)
+    fatores = rng.normal(0, 0.01, (dias, 3))
+    return fatores[:, np.arange(ativos) % 3] + rng.normal(0, 0.003, (dias, ativos))
+
+
+class TestRollingCorrelation:
+    """Testes da janela móvel"""
+
+    def test_matches_numpy_over_the_window(self):
+        dados = retornos()
+        rolling = RollingCorrelation(dados.shape[1], window=100, memory_budget_mb=0.0001)
+        rolling.extend(dados)
+
+        assert rolling.block == 1
+        np.testing.assert_allclose(rolling.correlation(), np.corrcoef(dados[-100:], rowvar=False), atol=1e-5)
+
+    def test_rows_subset(self):
+        dados = retornos(1)
+        rolling = RollingCorrelation(dados.shape[1], window=250)
+        rolling.extend(dados)
+
+        np.testing.assert_allclose(rolling.correlation([4, 1]), rolling.correlation()[[4, 1]])
+
+    def test_constant_asset_has_zero_correlation(self):
+        dados = retornos(2, ativos=4)
+        dados[:, 3] = 0.0
+        rolling = RollingCorrelation(4, window=50)
+        rolling.extend(dados)
+
+        matriz = rolling.correlation()
+        assert np.all(matriz[3] == 0) and np.all(matriz[:, 3] == 0)
+        assert matriz[0, 0] == 1.0
+
+    def test_block_rows_respects_budget(self):
+        assert block_rows(5000, 64) * 3 * 5000 * 8 <= 64 * 1024 ** 2
+        assert block_rows(10, 64) == 10
+
+
+class TestUniverseCorrelation:
+    """Testes da atualização por pregão"""
+
+    def fechamentos(self, dias=120):
+        precos = 100 * np.exp(np.cumsum(retornos(3, dias=dias, ativos=6), axis=0))
+        return pd.DataFrame(precos, index=pd.bdate_range("2024-01-01", periods=dias),
+                            columns=[f"S{i}" for i in range(6)])
+
+    def test_incremental_matches_full_rebuild(self):
+        closes = self.fechamentos()
+        estado = UniverseCorrelation.from_closes(closes.iloc[:100], window=60)
+
+        assert estado.can_chain(closes.iloc[90:])
+        assert estado.apply_closes(closes.iloc[90:]) == 20
+        completo = UniverseCorrelation.from_closes(closes, window=60)
+        np.testing.assert_allclose(estado.matrix(), completo.matrix(), atol=1e-5)
+        assert estado.last_date == closes.index[-1]
+
+    def test_partial_bar_of_today_is_ignored(self):
+        """A barra de hoje (ainda em negociação) não vira último pregão"""
+        closes = self.fechamentos(dias=80)
+        hoje = pd.Timestamp.today().normalize()
+        closes.index = pd.bdate_range(end=hoje - pd.Timedelta(days=1), periods=79).append(pd.DatetimeIndex([hoje]))
+        estado = UniverseCorrelation.from_closes(closes.iloc[:70], window=60)
+
+        assert estado.apply_closes(closes) == 9
+        assert estado.last_date == closes.index[-2]
+        np.testing.assert_allclose(estado.last_closes, closes.iloc[-2].to_numpy())
+
+    def test_gap_cannot_be_chained(self):
+        closes = self.fechamentos()
+        estado = UniverseCorrelation.from_closes(closes.iloc[:100], window=60)
+
+        assert not estado.can_chain(closes.iloc[105:])
+
+    def test_sparse_symbols_are_dropped(self):
+        closes = self.fechamentos()
+        closes.iloc[:80, 5] = np.nan
+        estado = UniverseCorrelation.from_closes(closes, window=100)
+
+        assert estado.symbols == ["S0", "S1", "S2", "S3", "S4"]
+        assert estado.indices(["S1", "S5"]) == ([1], ["S5"])
+
+
+class TestClustering:
+    """Testes do agrupamento e da busca por diversificação"""
+
+    def test_recovers_factor_groups(self):
+        matriz = np.corrcoef(retornos(), rowvar=False)
+
+        labels = hierarchical_clusters(matriz, n_clusters=3)
+
+        grupos = {frozenset(np.flatnonzero(labels == label)) for label in np.unique(labels)}
+        assert grupos == {frozenset(range(k, 12, 3)) for k in range(3)}
+
+    def test_threshold_cut(self):
+        matriz = np.corrcoef(retornos(), rowvar=False)
+
+        assert len(np.unique(hierarchical_clusters(matriz, threshold=0.3))) == 3
+        assert len(np.unique(hierarchical_clusters(matriz, threshold=0.01))) == 12
+
+    def test_numpy_fallback(self, monkeypatch):
+        monkeypatch.setattr(correlation, "linkage", None)
+        matriz = np.corrcoef(retornos(4), rowvar=False)
+
+        labels = hierarchical_clusters(matriz, n_clusters=3)
+        assert len(np.unique(labels)) == 3
+        assert labels[0] == labels[3] == labels[6]
+
+    def test_numpy_fallback_is_capped(self, monkeypatch):
+        monkeypatch.setattr(correlation, "linkage", None)
+
+        assert clustering_limit(3000) == correlation.NUMPY_LINKAGE_MAX
+        with pytest.raises(ValueError):
+            hierarchical_clusters(np.eye(correlation.NUMPY_LINKAGE_MAX + 1))
+
+    def test_condensed_distance_by_blocks(self):
+        dados = retornos(2)
+        rolling = RollingCorrelation(dados.shape[1], window=250, memory_budget_mb=0.0001)
+        rolling.extend(dados)
+
+        condensado = condensed_distance(rolling.correlation, rolling.n_assets, block=5)
+
+        quadrada = correlation_distance(rolling.correlation())
+        np.testing.assert_allclose(condensado, quadrada[np.triu_indices(rolling.n_assets, 1)], atol=1e-6)
+
+    def test_universe_clusters_and_mean_correlation(self):
+        dados = retornos(5)
+        rolling = RollingCorrelation(dados.shape[1], window=250, memory_budget_mb=0.0001)
+        rolling.extend(dados)
+        estado = UniverseCorrelation([f"S{i}" for i in range(12)], rolling, pd.Timestamp("2024-01-01"), np.ones(12))
+
+        labels = estado.clusters(n_clusters=3)
+
+        assert {frozenset(np.flatnonzero(labels == label)) for label in np.unique(labels)} == \
+            {frozenset(range(k, 12, 3)) for k in range(3)}
+        grupo = [0, 3, 6, 9]
+        bloco = rolling.correlation()[np.ix_(grupo, grupo)].astype(np.float64)
+        assert estado.mean_correlation(grupo) == pytest.approx((bloco.sum() - 4) / 12, abs=1e-6)
+        assert estado.mean_correlation([2]) == 1.0
+
+    def test_least_correlated(self):
+        matriz = np.corrcoef(retornos(), rowvar=False)
+
+        sugestoes = least_correlated(matriz[[0, 3]], np.array([0.5, 0.5]), exclude=[0, 3], top_n=4)
+
+        indices = [i for i, _, _ in sugestoes]
+        assert not {0, 3, 6, 9} & set(indices)
+        assert [media for _, media, _ in sugestoes] == sorted(media for _, media, _ in sugestoes)
+        assert sugestoes[0][1] == pytest.approx(matriz[[0, 3], indices[0]].mean())
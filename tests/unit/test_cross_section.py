@@ -0,0 +1,101 @@
+"""
+Testes unitários dos ranks transversais dos indicadores do Analysis Service
+"""
+
+import numpy as np
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from cross_section import CrossSectionIndex
+
+
+def midrank_pct(coluna, valor):
+    coluna = coluna[~np.isnan(coluna)]
+    return ((coluna < valor).sum() + (coluna <= valor).sum()) / (2 * len(coluna)) * 100
+
+
+class TestCrossSectionIndex:
+    """Testes do índice de percentis e z-scores"""
+
+    def build(self):
+        index = CrossSectionIndex(["P/L", "ROE"])
+        index.load([
+            ("A", "Energia", np.array([5.0, 20.0])),
+            ("B", "Energia", np.array([10.0, np.nan])),
+            ("C", "Financeiro", np.array([15.0, 10.0])),
+            ("D", "Financeiro", np.array([20.0, 30.0])),
+        ])
+        return index
+
+    def test_percentiles_and_zscores(self):
+        ranks = self.build().lookup("C")
+
+        assert ranks["P/L"]["percentil"] == pytest.approx(62.5)
+        valores = np.array([5.0, 10.0, 15.0, 20.0])
+        assert ranks["P/L"]["z_score"] == pytest.approx((15 - valores.mean()) / valores.std(), abs=0.01)
+        assert ranks["P/L"]["percentil_setor"] == pytest.approx(25.0)
+        assert ranks["P/L"]["z_score_setor"] == pytest.approx(-1.0)
+
+    def test_missing_indicator_is_omitted(self):
+        index = self.build()
+
+        assert set(index.lookup("B")) == {"P/L"}
+        assert index.lookup("Z") is None
+
+    def test_incremental_update_is_exact_for_the_updated_row(self):
+        index = self.build()
+        index.stale_fraction = 10  # Sem reconstrução automática
+
+        assert index.update("B", "Financeiro", np.array([25.0, 40.0]))
+        ranks = index.lookup("B")
+
+        assert ranks["P/L"]["percentil"] == pytest.approx(87.5)
+        assert ranks["ROE"]["percentil_setor"] == pytest.approx(5 / 6 * 100, abs=0.01)
+        assert index.stale == 1
+        assert not index.update("B", "Financeiro", np.array([25.0, 40.0]))
+
+    def test_incremental_matches_rebuild(self):
+        rng = np.random.default_rng(0)
+        index = CrossSectionIndex(["X", "Y", "Z"], stale_fraction=10, capacity=4)
+        for _ in range(300):
+            valores = rng.normal(10, 5, 3)
+            valores[rng.random(3) < 0.1] = np.nan
+            index.update(f"S{rng.integers(60)}", ["A", "B"][rng.integers(2)], valores)
+
+        symbol = f"S{rng.integers(60)}"
+        index.update(symbol, "A", np.array([10.0, 2.0, 30.0]))
+        antes = index.lookup(symbol)
+        index.rebuild()
+
+        assert index.lookup(symbol) == antes
+        n = len(index)
+        assert midrank_pct(index.values[:n, 0], 10.0) == pytest.approx(antes["X"]["percentil"], abs=0.01)
+
+    def test_stale_rows_trigger_rebuild(self):
+        index = self.build()
+        index.stale_fraction = 0.25
+
+        index.update("E", "Energia", np.array([1.0, 1.0]))
+        assert index.stale == 1
+        index.update("F", "Energia", np.array([2.0, 2.0]))
+
+        assert index.stale == 0
+        assert index.lookup("A")["P/L"]["percentil"] == pytest.approx(midrank_pct(index.values[:6, 0], 5.0), abs=0.01)
+
+    def test_no_sector_ranks_without_sector(self):
+        """Ações sem setor só recebem os ranks do universo"""
+        index = CrossSectionIndex(["P/L"], stale_fraction=10)
+        index.load([("A", None, np.array([5.0])), ("B", None, np.array([10.0])), ("C", "Energia", np.array([15.0]))])
+
+        ranks = index.lookup("A")["P/L"]
+        assert ranks["percentil"] == pytest.approx(100 / 6, abs=0.01)
+        assert ranks["percentil_setor"] is None and ranks["z_score_setor"] is None
+        assert index.summary()["setores"] == 1
+
+        index.update("A", "Energia", np.array([5.0]))
+        assert index.lookup("A")["P/L"]["percentil_setor"] == pytest.approx(25.0)
+        index.update("C", None, np.array([15.0]))
+        assert index.lookup("C")["P/L"]["percentil_setor"] is None
@@ -0,0 +1,99 @@
+"""
+Testes unitários dos formatos colunar/binário do histórico
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'services', 'data-service'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'shared'))
+
+import history_format
+from history_format import (
+    ARROW_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    encode_msgpack,
+    negotiate_media_type,
+    to_columns,
+    to_rows
+)
+from history_store import normalize_frame
+from models.history_codec import decode_history_columnar, decode_history_msgpack
+
+
+@pytest.fixture
+def frame():
+    index = pd.bdate_range("2024-01-01", periods=10, tz="America/Sao_Paulo")
+    hist = pd.DataFrame({
+        "Open": np.arange(10, dtype=float),
+        "High": np.arange(10, dtype=float) + 1,
+        "Low": np.arange(10, dtype=float) - 1,
+        "Close": np.arange(10, dtype=float) + 0.5,
+        "Volume": np.arange(10) * 100,
+    }, index=index)
+    return normalize_frame(hist)
+
+
+class TestHistoryFormat:
+    """Testes para serialização do histórico"""
+
+    def test_negotiation(self):
+        assert negotiate_media_type(None) == JSON_MEDIA_TYPE
+        assert negotiate_media_type("application/x-msgpack") == MSGPACK_MEDIA_TYPE
+        assert negotiate_media_type("application/json;q=0.5, application/x-msgpack") == MSGPACK_MEDIA_TYPE
+        assert negotiate_media_type("text/html, */*;q=0.1") == JSON_MEDIA_TYPE
+
+    def test_negotiate_q_zero_is_not_acceptable(self):
+        """q=0 exclui o formato em vez de só rebaixá-lo"""
+        assert negotiate_media_type("application/x-msgpack;q=0") == JSON_MEDIA_TYPE
+        assert negotiate_media_type("application/x-msgpack;q=0, application/json;q=0.1") == JSON_MEDIA_TYPE
+        assert negotiate_media_type("application/json;q=0, application/x-msgpack;q=0.2") == MSGPACK_MEDIA_TYPE
+        assert negotiate_media_type("*/*;q=0") is None
+        assert negotiate_media_type("application/json;q=0, text/html") is None
+
+    def test_arrow_needs_pyarrow(self, monkeypatch):
+        """Sem pyarrow o Arrow não é oferecido e a negociação cai no JSON"""
+        monkeypatch.setattr(history_format, "pa", None)
+
+        assert negotiate_media_type(ARROW_MEDIA_TYPE) == JSON_MEDIA_TYPE
+
+    def test_rows_match_columns(self, frame):
+        columns = to_columns(frame)
+        rows = to_rows(frame)
+
+        assert len(rows) == len(columns["close"]) == 10
+        assert rows[3] == {name: values[3] for name, values in columns.items()}
+        assert isinstance(rows[0]["volume"], int)
+
+    def test_msgpack_roundtrip(self, frame):
+        body = encode_msgpack(frame, {"symbol": "PETR4.SA", "period": "1mo"})
+
+        decoded = decode_history_msgpack(body)
+
+        assert decoded["symbol"] == "PETR4.SA"
+        np.testing.assert_array_equal(decoded["columns"]["close"], frame["close"].to_numpy())
+        assert decoded["columns"]["volume"].dtype == np.int64
+        assert decoded["columns"]["date"][0] == np.datetime64("2024-01-01T03:00:00", "ns")
+
+    def test_columnar_json_decodes_like_msgpack(self, frame):
+        payload = {"symbol": "PETR4.SA", "columns": to_columns(frame)}
+        binary = decode_history_msgpack(encode_msgpack(frame, {"symbol": "PETR4.SA"}))
+
+        decoded = decode_history_columnar(payload)
+
+        np.testing.assert_array_equal(decoded["columns"]["date"], binary["columns"]["date"])
+        np.testing.assert_array_equal(decoded["columns"]["high"], binary["columns"]["high"])
+
+    def test_arrow_stream(self, frame):
+        pa = pytest.importorskip("pyarrow")
+        from history_format import encode_arrow
+
+        assert negotiate_media_type(ARROW_MEDIA_TYPE) == ARROW_MEDIA_TYPE
+        table = pa.ipc.open_stream(encode_arrow(frame, {"symbol": "PETR4.SA"})).read_all()
+
+        assert table.num_rows == 10
+        assert table.schema.metadata[b"symbol"] == b"PETR4.SA"
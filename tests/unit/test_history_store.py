@@ -0,0 +1,124 @@
+"""
+Testes unitários do histórico canônico do Data Service
+"""
+
+import pytest
+import pandas as pd
+from datetime import date, timedelta
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'services', 'data-service'))
+
+from history_store import HistoryStore, merge_frames, normalize_frame, slice_period
+
+
+class FakeRedis:
+    """Redis em memória com a interface usada pelo HistoryStore"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+
+def make_bars(start: date, end: date, close: float = 10.0) -> pd.DataFrame:
+    """Barras diárias no formato retornado pelo yfinance"""
+    index = pd.bdate_range(start, end, tz="America/Sao_Paulo")
+    return pd.DataFrame({
+        "Open": close, "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000
+    }, index=index)
+
+
+class RecordingFetcher:
+    def __init__(self):
+        self.calls = []
+        self.close = 10.0
+
+    async def __call__(self, symbol, start, end):
+        self.calls.append((start, end))
+        last = end - timedelta(days=1) if end else date.today()
+        first = start or date.today() - timedelta(days=3650)
+        return make_bars(first, last, close=self.close)
+
+
+class TestHistoryStore:
+    """Testes para a série histórica canônica"""
+
+    @pytest.mark.asyncio
+    async def test_longer_period_fetches_only_missing_head(self):
+        fetcher = RecordingFetcher()
+        store = HistoryStore(FakeRedis(), fetcher)
+
+        one_year = await store.get_history("petr4.sa", "1y")
+        five_years = await store.get_history("PETR4.SA", "5y")
+
+        assert len(fetcher.calls) == 2
+        head_start, head_end = fetcher.calls[1]
+        assert head_end == date.today() - timedelta(days=366)
+        assert len(five_years) > len(one_year)
+        assert five_years.index.is_unique
+
+    @pytest.mark.asyncio
+    async def test_shorter_period_is_served_from_canonical(self):
+        fetcher = RecordingFetcher()
+        store = HistoryStore(FakeRedis(), fetcher)
+
+        await store.get_history("VALE3.SA", "1y")
+        month = await store.get_history("VALE3.SA", "1mo")
+        week = await store.get_history("VALE3.SA", "5d")
+
+        assert len(fetcher.calls) == 1
+        assert len(week) == 5
+        assert month.index[0][:10] >= (date.today() - timedelta(days=31)).isoformat()
+
+    @pytest.mark.asyncio
+    async def test_stale_series_fetches_only_tail(self):
+        fetcher = RecordingFetcher()
+        store = HistoryStore(FakeRedis(), fetcher, refresh_interval=0)
+
+        frame = await store.get_history("ITUB4.SA", "1y")
+        await store.get_history("ITUB4.SA", "1y")
+
+        tail_start, tail_end = fetcher.calls[1]
+        assert tail_start == date.fromisoformat(frame.index[-2][:10])
+        assert tail_end is None
+        assert len(fetcher.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_readjusted_series_is_refetched_in_full(self):
+        fetcher = RecordingFetcher()
+        store = HistoryStore(FakeRedis(), fetcher, refresh_interval=0)
+
+        await store.get_history("BBAS3.SA", "1y")
+        fetcher.close = 5.0  # Desdobramento: o histórico ajustado muda por inteiro
+        frame = await store.get_history("BBAS3.SA", "1y")
+
+        assert len(fetcher.calls) == 3
+        assert fetcher.calls[2] == (date.today() - timedelta(days=366), None)
+        assert set(frame["close"]) == {5.0}
+
+    def test_merge_keeps_latest_bar_per_day(self):
+        base = normalize_frame(make_bars(date(2024, 1, 1), date(2024, 1, 5), close=10.0))
+        tail = normalize_frame(make_bars(date(2024, 1, 5), date(2024, 1, 9), close=12.0))
+
+        merged = merge_frames(base, tail)
+
+        assert len(merged) == 7
+        assert merged.loc[merged.index[4], "close"] == 12.0
+        assert list(merged.index) == sorted(merged.index)
+
+    def test_slice_ytd(self):
+        frame = normalize_frame(make_bars(date(2023, 12, 1), date(2024, 2, 1)))
+
+        ytd = slice_period(frame, "ytd", today=date(2024, 2, 1))
+
+        assert ytd.index[0].startswith("2024-01-01")
@@ -0,0 +1,97 @@
+"""
+Testes unitários do pool HTTP compartilhado entre serviços
+"""
+
+import asyncio
+import pytest
+import httpx
+import sys
+import os
+from prometheus_client import REGISTRY
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from microservices.shared.http_client import HTTPClientPool, PoolConfig
+
+
+def mock_pool(name, handler=None):
+    """Pool cujo transporte de rede é substituído por um MockTransport"""
+    pool = HTTPClientPool(name, PoolConfig())
+    handler = handler or (lambda request: httpx.Response(200, json={"ok": True}))
+    pool.client._transport.transport = httpx.MockTransport(handler)
+    return pool
+
+
+class TestHTTPClientPool:
+    """Testes do ciclo de vida e das métricas"""
+
+    def test_session_reuses_client_in_owner_loop(self):
+        pool = mock_pool("test-reuse")
+
+        async def run():
+            await pool.start()
+            async with pool.session() as first, pool.session() as second:
+                shared = first is second is pool.client
+            await pool.close()
+            return shared
+
+        assert asyncio.run(run())
+
+    def test_other_loop_gets_temporary_client(self):
+        """Threads com asyncio.run não compartilham conexões do loop principal"""
+        pool = mock_pool("test-threads")
+
+        async def owner():
+            await pool.start()
+            return pool.client
+
+        async def foreign():
+            async with pool.session() as client:
+                return client
+
+        shared = asyncio.run(owner())
+        assert asyncio.run(foreign()) is not shared
+
+    def test_request_metrics(self):
+        pool = mock_pool("test-metrics")
+
+        async def run():
+            async with pool.session() as client:
+                response = await client.get("http://data-service:8002/stock/PETR4.SA")
+            await pool.close()
+            return response
+
+        response = asyncio.run(run())
+        assert response.json() == {"ok": True}
+        assert REGISTRY.get_sample_value(
+            "http_client_requests_total",
+            {"pool": "test-metrics", "host": "data-service", "outcome": "2xx"}
+        ) == 1
+        assert REGISTRY.get_sample_value("http_client_in_flight_requests", {"pool": "test-metrics"}) == 0
+
+    def test_errors_are_counted(self):
+        def failing(request):
+            raise httpx.ConnectError("refused")
+
+        pool = mock_pool("test-errors", failing)
+
+        async def run():
+            async with pool.session() as client:
+                await client.get("http://report-service:8008/health")
+
+        with pytest.raises(httpx.ConnectError):
+            asyncio.run(run())
+
+        assert REGISTRY.get_sample_value(
+            "http_client_requests_total",
+            {"pool": "test-errors", "host": "report-service", "outcome": "error"}
+        ) == 1
+
+    def test_config_from_env(self, monkeypatch):
+        monkeypatch.setenv("HTTP_POOL_MAX_CONNECTIONS", "7")
+        monkeypatch.setenv("HTTP_POOL_HTTP2", "true")
+        config = PoolConfig.from_env(timeout=30.0)
+
+        assert config.max_connections == 7
+        assert config.http2 is True
+        assert config.timeout == 30.0
@@ -0,0 +1,81 @@
+"""
+Testes unitários da tabela de faixas dos indicadores do Analysis Service
+"""
+
+import pytest
+import numpy as np
+import sys
+import os
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from indicator_bands import BAND_TABLE, INDICATOR_BANDS, MENSAGENS, IndicatorBand, BandTable, mensagem, resumo
+
+
+def dados(**campos):
+    base = {band.campo: None for band in INDICATOR_BANDS}
+    return SimpleNamespace(symbol=campos.pop("symbol", "TEST"), **{**base, **campos})
+
+
+class TestBandTable:
+    """Testes da avaliação vetorizada"""
+
+    def test_every_message_id_has_text(self):
+        ids = {mensagem_id for band in INDICATOR_BANDS for mensagem_id in band.mensagens}
+        assert ids <= set(MENSAGENS)
+
+    @pytest.mark.parametrize("roe, esperado", [(25, "roe.excelente"), (20, "roe.bom"), (15.5, "roe.bom"), (10, "roe.baixo")])
+    def test_upper_exclusive_bands(self, roe, esperado):
+        """ROE > 20 é excelente; exatamente 20 ainda é bom"""
+        resultado = BAND_TABLE.interpret([dados(roe=roe)])[0]
+
+        assert resultado["indicadores"][0]["mensagem_id"] == esperado
+
+    @pytest.mark.parametrize("pe, esperado", [(9.9, "pe.muito_baixo"), (10, "pe.baixo"), (24, "pe.razoavel"), (40, "pe.muito_alto")])
+    def test_lower_exclusive_bands(self, pe, esperado):
+        """P/E < 10 é muito baixo; exatamente 10 já é baixo"""
+        resultado = BAND_TABLE.interpret([dados(pe_ratio=pe)])[0]
+
+        assert resultado["indicadores"][0]["mensagem_id"] == esperado
+
+    def test_batch_matches_single(self):
+        """Uma avaliação para várias ações dá o mesmo resultado que uma por vez"""
+        rng = np.random.default_rng(1)
+        lote = [
+            dados(symbol=f"S{i}", roe=rng.uniform(0, 30), pe_ratio=rng.uniform(1, 50),
+                  current_ratio=rng.uniform(0.5, 3), payout_ratio=rng.uniform(0, 100))
+            for i in range(50)
+        ]
+        juntos = BAND_TABLE.interpret(lote)
+
+        for item, resultado in zip(lote, juntos):
+            assert BAND_TABLE.interpret([item])[0] == resultado
+
+    def test_score_geral_is_mean_of_present_indicators(self):
+        resultado = BAND_TABLE.interpret([dados(roe=25, debt_to_equity=2.0, dividend_yield=float("nan"))])[0]
+
+        assert [ind["nome"] for ind in resultado["indicadores"]] == ["ROE", "Debt/Equity"]
+        assert resultado["score_geral"] == pytest.approx((90 + 25) / 2)
+
+    def test_missing_and_zero_values_are_skipped(self):
+        resultado = BAND_TABLE.interpret([dados(roe=0)])[0]
+
+        assert resultado == {"indicadores": [], "score_geral": 0.0}
+
+    def test_inconsistent_table_is_rejected(self):
+        with pytest.raises(ValueError):
+            BandTable([IndicatorBand("X", "x", "valuation", (1, 2), (10, 20), ("a", "b"))])
+
+
+class TestMessages:
+    """Testes da resolução de textos"""
+
+    def test_resumo(self):
+        assert resumo(85) == "Empresa com indicadores fundamentalistas excelentes"
+        assert resumo(60) == "Empresa com indicadores fundamentalistas razoáveis"
+        assert resumo(0) == "Empresa com indicadores fundamentalistas fracos"
+
+    def test_mensagem(self):
+        assert mensagem("roe.excelente").startswith("Excelente")
+        assert mensagem("desconhecida") == "desconhecida"
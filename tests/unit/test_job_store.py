@@ -0,0 +1,134 @@
+"""
+Testes unitários do status dos jobs assíncronos do Analysis Service
+"""
+
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from job_store import COMPLETED, FAILED, PROCESSING, QUEUED, JobStore
+
+
+class FakeRedis:
+    """Subconjunto em memória dos comandos usados pelo JobStore (decode_responses=True)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def expire(self, key, ttl):
+        pass
+
+    def sadd(self, key, member):
+        self.data.setdefault(key, set()).add(member)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class TestJobStore:
+    """Testes do ciclo de vida dos jobs"""
+
+    def test_lifecycle(self):
+        store = JobStore(FakeRedis())
+        slot, shared = store.submit("r1", "PETR4", "indicators", "u1")
+
+        assert not shared
+        assert store.get("r1")["status"] == QUEUED
+        store.start(slot)
+        assert store.get("r1")["status"] == PROCESSING
+        store.complete(slot, {"score_geral": 70.0}, "PETR4", "indicators")
+
+        job = store.get("r1")
+        assert job["status"] == COMPLETED
+        assert job["result"] == {"score_geral": 70.0}
+
+    def test_identical_requests_share_the_slot(self):
+        store = JobStore(FakeRedis())
+        slot, _ = store.submit("r1", "PETR4", "indicators", "u1")
+        outro, shared = store.submit("r2", "petr4", "indicators", "u2")
+
+        assert shared and outro == slot
+        assert {p["request_id"] for p in store.requests(slot)} == {"r1", "r2"}
+
+        store.fail(slot, "Financial data not found", "PETR4", "indicators")
+        assert store.get("r2")["status"] == FAILED
+        assert store.get("r2")["error"] == "Financial data not found"
+
+    def test_finished_slot_is_not_reused(self):
+        store = JobStore(FakeRedis())
+        slot, _ = store.submit("r1", "PETR4", "indicators", "u1")
+        store.complete(slot, {}, "PETR4", "indicators")
+
+        novo, shared = store.submit("r2", "PETR4", "indicators", "u1")
+        assert not shared and novo != slot
+        assert store.submit("r3", "PETR4", "valuation", "u1")[1] is False
+
+    def test_unknown_job(self):
+        assert JobStore(FakeRedis()).get("nope") is None
+
+
+class TestLongPolling:
+    """Testes da espera pelo resultado"""
+
+    def test_wakes_up_when_completed(self):
+        store = JobStore(FakeRedis())
+        slot, _ = store.submit("r1", "PETR4", "indicators", "u1")
+
+        async def scenario():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.02, store.complete, slot, {"ok": True}, "PETR4", "indicators")
+            started = loop.time()
+            job = await store.wait("r1", timeout=5)
+            return job, loop.time() - started
+
+        job, elapsed = asyncio.run(scenario())
+
+        assert job["status"] == COMPLETED
+        assert elapsed < 1
+        assert not store._waiters
+
+    def test_timeout_returns_current_status(self):
+        store = JobStore(FakeRedis())
+        store.submit("r1", "PETR4", "indicators", "u1")
+
+        job = asyncio.run(store.wait("r1", timeout=0.1))
+
+        assert job["status"] == QUEUED
@@ -0,0 +1,66 @@
+"""
+Testes unitários da chamada em lote de metodologias do cliente de serviços
+"""
+
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from microservices.shared.communication import ServiceClient
+
+
+def fake_post(calls, fail_with=None):
+    async def post(service_name, endpoint, data=None, headers=None):
+        calls.append((service_name, endpoint, data))
+        if fail_with and fail_with in data["metodologias"]:
+            raise RuntimeError("methodology-service unavailable")
+        return {
+            "resultados": {m: {"score": 60} for m in data["metodologias"] if m != "desconhecida"},
+            "erros": {m: "not found" for m in data["metodologias"] if m == "desconhecida"}
+        }
+    return post
+
+
+class TestAnalyzeWithMethodologies:
+    """Testes da divisão em lotes e da junção dos resultados"""
+
+    def test_single_call_with_shared_payload(self):
+        client = ServiceClient()
+        calls = []
+        client.post = fake_post(calls)
+        dados = {"symbol": "PETR4", "pe_ratio": 8.0}
+
+        resultado = asyncio.run(client.analyze_with_methodologies(
+            "PETR4", ["warren_buffett", "peter_lynch", "warren_buffett"], dados
+        ))
+
+        assert len(calls) == 1
+        assert calls[0][1] == "/analisar/lote"
+        assert calls[0][2] == {"symbol": "PETR4", "metodologias": ["warren_buffett", "peter_lynch"], "dados": dados}
+        assert set(resultado["resultados"]) == {"warren_buffett", "peter_lynch"}
+
+    def test_large_batches_are_split(self):
+        client = ServiceClient()
+        calls = []
+        client.post = fake_post(calls)
+        metodologias = [f"m{i}" for i in range(7)] + ["desconhecida"]
+
+        resultado = asyncio.run(client.analyze_with_methodologies("VALE3", metodologias, {}, batch_size=3))
+
+        assert [len(call[2]["metodologias"]) for call in calls] == [3, 3, 2]
+        assert len(resultado["resultados"]) == 7
+        assert resultado["erros"] == {"desconhecida": "not found"}
+
+    def test_failed_batch_becomes_errors(self):
+        client = ServiceClient()
+        calls = []
+        client.post = fake_post(calls, fail_with="m3")
+
+        resultado = asyncio.run(client.analyze_with_methodologies(
+            "ITUB4", ["m0", "m1", "m2", "m3"], {}, batch_size=2
+        ))
+
+        assert set(resultado["resultados"]) == {"m0", "m1"}
+        assert set(resultado["erros"]) == {"m2", "m3"}
@@ -0,0 +1,113 @@
+"""
+Testes unitários do cache negativo de símbolos do Data Service
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'services', 'data-service'))
+
+from negative_cache import NegativeLookupFilter, bloom_parameters
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.commands.append((name, args))
+            return self
+        return command
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args) for name, args in self.commands]
+
+
+class FakeRedis:
+    """Bitmaps em memória (conjuntos de posições ligadas)"""
+
+    def __init__(self):
+        self.bitmaps = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def setbit(self, key, offset, value):
+        self.bitmaps.setdefault(key, set()).add(offset)
+        return 0
+
+    def getbit(self, key, offset):
+        return int(offset in self.bitmaps.get(key, ()))
+
+    def bitcount(self, key):
+        return len(self.bitmaps.get(key, ()))
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+        return True
+
+
+class TestNegativeLookupFilter:
+    """Testes do filtro de Bloom com gerações"""
+
+    def test_bloom_parameters(self):
+        """Dimensionamento clássico: ~9.6 bits por item e 7 hashes para p=1%"""
+        bits, hashes = bloom_parameters(1000, 0.01)
+        assert bits == 9586
+        assert hashes == 7
+
+    def test_add_and_lookup(self):
+        """Símbolos registrados são reconhecidos; os demais não"""
+        bloom = NegativeLookupFilter(FakeRedis(), capacity=1000, error_rate=0.001)
+        bloom.add("xpto3.sa", now=0)
+
+        assert bloom.might_contain("XPTO3.SA", now=10)
+        assert not bloom.might_contain("PETR4.SA", now=10)
+
+    def test_generations_decay(self):
+        """Um símbolo é esquecido depois de `generations` janelas"""
+        bloom = NegativeLookupFilter(FakeRedis(), capacity=1000, window=100, generations=2)
+        bloom.add("XPTO3.SA", now=50)
+
+        assert bloom.might_contain("XPTO3.SA", now=150)
+        assert not bloom.might_contain("XPTO3.SA", now=250)
+
+    def test_generation_expiry(self):
+        """Cada geração expira no Redis após deixar de ser consultada"""
+        redis = FakeRedis()
+        bloom = NegativeLookupFilter(redis, capacity=1000, window=100, generations=3)
+        bloom.add("XPTO3.SA", now=0)
+
+        assert redis.ttls == {"negative:bloom:0": 300}
+
+    def test_known_valid_symbols_are_not_rejected(self):
+        """Acertos para símbolos válidos não bloqueiam a consulta"""
+        bloom = NegativeLookupFilter(FakeRedis(), capacity=1000)
+        bloom.add("XPTO3.SA")
+
+        assert bloom.rejects("XPTO3.SA")
+        assert not bloom.rejects("XPTO3.SA", known_valid=True)
+        assert not bloom.rejects("VALE3.SA")
+
+    def test_false_positive_rate(self):
+        """A taxa estimada fica próxima da taxa observada e do alvo"""
+        bloom = NegativeLookupFilter(FakeRedis(), capacity=2000, error_rate=0.01)
+        for i in range(2000):
+            bloom.add(f"BAD{i}", now=0)
+
+        estimated = bloom.estimated_false_positive_rate(now=0)
+        observed = sum(bloom.might_contain(f"GOOD{i}", now=0) for i in range(5000)) / 5000
+
+        assert estimated == pytest.approx(0.01, abs=0.005)
+        assert observed == pytest.approx(estimated, abs=0.01)
+
+    def test_without_redis(self):
+        """Sem Redis o filtro não rejeita nada"""
+        bloom = NegativeLookupFilter(None)
+        bloom.add("XPTO3.SA")
+
+        assert not bloom.rejects("XPTO3.SA")
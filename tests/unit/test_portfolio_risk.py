@@ -0,0 +1,107 @@
+"""
+Testes unitários do risco de carteira do Analysis Service
+"""
+
+import pytest
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from portfolio_risk import RollingCovariance, history_period, new_returns, normalize_weights, portfolio_risk
+
+
+def ledoit_wolf(returns):
+    """Ledoit-Wolf direto (alvo μI) para conferência"""
+    n, p = returns.shape
+    centered = returns - returns.mean(axis=0)
+    cov = centered.T @ centered / n
+    mu = np.trace(cov) / p
+    delta = np.sum((cov - mu * np.eye(p)) ** 2) / p
+    beta = sum(np.sum((np.outer(y, y) - cov) ** 2) for y in centered) / (n * n) / p
+    shrinkage = min(beta, delta) / delta
+    return (1 - shrinkage) * cov + shrinkage * mu * np.eye(p), shrinkage
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(11)
+    factor = rng.normal(0, 0.01, size=(300, 1))
+    return factor + rng.normal(0.0003, 0.015, size=(300, 4))
+
+
+class TestRollingCovariance:
+    """Testes da covariância incremental"""
+
+    def test_shrinkage_matches_direct_formula(self, returns):
+        """As estatísticas suficientes reproduzem o Ledoit-Wolf direto"""
+        rolling = RollingCovariance(4, window=300)
+        rolling.extend(returns)
+        shrunk, shrinkage = rolling.shrunk_covariance()
+        expected, expected_shrinkage = ledoit_wolf(returns)
+
+        assert shrinkage == pytest.approx(expected_shrinkage)
+        assert shrunk == pytest.approx(expected, abs=1e-12)
+
+    def test_incremental_update_matches_rebuild(self, returns):
+        """Deslizar a janela pregão a pregão equivale a recalcular do zero"""
+        rolling = RollingCovariance(4, window=100)
+        rolling.extend(returns[:250])
+
+        fresh = RollingCovariance(4, window=100)
+        fresh.extend(returns[150:250])
+
+        assert len(rolling) == 100
+        assert rolling.covariance() == pytest.approx(fresh.covariance(), abs=1e-15)
+        assert rolling.shrunk_covariance()[1] == pytest.approx(fresh.shrunk_covariance()[1])
+
+    def test_serialization_roundtrip(self, returns):
+        """O estado em cache continua recebendo pregões novos"""
+        rolling = RollingCovariance(4, window=120)
+        rolling.extend(returns[:200])
+        restored = RollingCovariance.from_dict(rolling.to_dict())
+        rolling.append(returns[200])
+        restored.append(returns[200])
+
+        assert restored.covariance() == pytest.approx(rolling.covariance())
+        assert restored.mean() == pytest.approx(rolling.mean())
+
+    def test_new_returns_chain_from_last_close(self):
+        """Barras novas encadeiam a partir do último fechamento conhecido"""
+        closes = np.array([[11.0, 20.0], [12.1, 19.0]])
+        chained = new_returns(closes, np.array([10.0, 20.0]))
+
+        assert chained == pytest.approx(np.log([[1.1, 1.0], [1.1, 0.95]]))
+
+    def test_history_period(self):
+        assert history_period(60) == "6mo"
+        assert history_period(252) == "2y"
+        assert history_period(1260) == "10y"
+
+
+class TestPortfolioRisk:
+    """Testes da decomposição de risco"""
+
+    def test_component_var_sums_to_portfolio_var(self, returns):
+        """Euler: VaR por componente soma o VaR; contribuições somam 100%"""
+        rolling = RollingCovariance(4)
+        rolling.extend(returns)
+        covariance, _ = rolling.shrunk_covariance()
+        risk = portfolio_risk(normalize_weights([4, 3, 2, 1]), covariance, rolling.mean())
+
+        assert risk["component_var"].sum() == pytest.approx(risk["var"])
+        assert risk["risk_contribution_pct"].sum() == pytest.approx(100.0)
+        assert risk["diversification_ratio"] > 1.0
+
+    def test_single_asset_has_no_diversification(self):
+        covariance = np.array([[0.0004]])
+        risk = portfolio_risk(np.array([1.0]), covariance, np.zeros(1))
+
+        assert risk["volatility_daily"] == pytest.approx(2.0)
+        assert risk["diversification_ratio"] == pytest.approx(1.0)
+
+    def test_normalize_weights(self):
+        assert normalize_weights([30, 70]) == pytest.approx([0.3, 0.7])
+        with pytest.raises(ValueError):
+            normalize_weights([0, 0])
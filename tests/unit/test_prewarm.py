@@ -0,0 +1,159 @@
+"""
+Testes unitários do pré-aquecimento de cache do Data Service
+"""
+
+import pytest
+from datetime import datetime
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'services', 'data-service'))
+
+from prewarm import MARKET_TIMEZONE, CacheWarmer, DecayingCounter, RateBudget, WarmTarget
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.keys = []
+
+    def ttl(self, key):
+        self.keys.append(key)
+
+    def execute(self):
+        return [self.redis.ttls.get(key, -2) for key in self.keys]
+
+
+class FakeRedis:
+    def __init__(self, ttls):
+        self.ttls = ttls
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class RecordingRefresh:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, symbols):
+        self.calls.append(list(symbols))
+
+
+def make_target(name, symbols, refresh):
+    return WarmTarget(name, lambda: symbols, lambda symbol: f"{name}:{symbol}", refresh)
+
+
+class TestDecayingCounter:
+    """Testes do contador de frequência com decaimento"""
+
+    def test_half_life(self):
+        """Após uma meia-vida o score cai pela metade"""
+        counter = DecayingCounter(half_life=100)
+        counter.record("petr4.sa", now=0)
+        counter.record("PETR4.SA", now=0)
+
+        assert counter.score("PETR4.SA", now=100) == pytest.approx(1.0)
+
+    def test_recent_accesses_outrank_old_bursts(self):
+        """Um pico antigo perde para acessos recentes"""
+        counter = DecayingCounter(half_life=300)
+        for _ in range(10):
+            counter.record("OLD", now=0)
+        for _ in range(3):
+            counter.record("NEW", now=600)
+
+        assert counter.top(2, now=600) == ["NEW", "OLD"]
+
+    def test_cold_symbols_are_pruned(self):
+        """Símbolos que esfriaram saem do contador"""
+        counter = DecayingCounter(half_life=10, min_score=0.5)
+        counter.record("COLD", now=0)
+        counter.record("HOT", now=100)
+
+        assert counter.top(5, now=100) == ["HOT"]
+        assert len(counter) == 1
+
+
+class TestRateBudget:
+    """Testes do orçamento de chamadas"""
+
+    def test_budget_window(self):
+        """Concede até o limite na janela e libera após o período"""
+        budget = RateBudget(rate=5, period=60)
+
+        assert budget.take(3, now=0) == 3
+        assert budget.take(3, now=10) == 2
+        assert budget.take(1, now=30) == 0
+        assert budget.take(4, now=61) == 3
+
+
+class TestCacheWarmer:
+    """Testes do warmer"""
+
+    @pytest.mark.asyncio
+    async def test_refreshes_only_expiring_keys(self):
+        """Renova chaves ausentes ou perto de expirar, em ordem de prioridade"""
+        redis = FakeRedis({"quotes:A": 10, "quotes:B": 250, "quotes:D": -1})
+        refresh = RecordingRefresh()
+        warmer = CacheWarmer(redis, RateBudget(100), lead=60)
+        warmer.add_target(make_target("quotes", ["A", "B", "C", "D"], refresh))
+
+        assert await warmer.warm_once() == {"quotes": 2}
+        assert refresh.calls == [["A", "C"]]
+
+    @pytest.mark.asyncio
+    async def test_budget_limits_refreshes(self):
+        """O orçamento é consumido pelos primeiros alvos (índices antes das cotações)"""
+        redis = FakeRedis({})
+        indices, quotes = RecordingRefresh(), RecordingRefresh()
+        warmer = CacheWarmer(redis, RateBudget(3), lead=60)
+        warmer.add_target(make_target("indices", ["^BVSP", "^GSPC"], indices))
+        warmer.add_target(make_target("quotes", ["A", "B", "C"], quotes))
+
+        await warmer.warm_once()
+        assert indices.calls == [["^BVSP", "^GSPC"]]
+        assert quotes.calls == [["A"]]
+
+        await warmer.warm_once()
+        assert quotes.calls == [["A"]]
+
+    @pytest.mark.asyncio
+    async def test_force_refreshes_everything(self):
+        """Na abertura do mercado todas as chaves são renovadas"""
+        redis = FakeRedis({"quotes:A": 290, "quotes:B": 290})
+        refresh = RecordingRefresh()
+        warmer = CacheWarmer(redis, RateBudget(100), lead=60)
+        warmer.add_target(make_target("quotes", ["A", "B"], refresh))
+
+        await warmer.warm_once(force=True)
+        assert refresh.calls == [["A", "B"]]
+
+    @pytest.mark.asyncio
+    async def test_open_warm_resumes_until_nothing_is_deferred(self):
+        """Abertura adiada pelo orçamento: o ciclo seguinte retoma só o que faltou"""
+        refresh = RecordingRefresh()
+        warmer = CacheWarmer(FakeRedis({}), RateBudget(1), lead=60)
+        warmer.add_target(make_target("quotes", ["A", "B"], refresh))
+        monday_open = datetime(2025, 7, 14, 10, 0, tzinfo=MARKET_TIMEZONE)
+
+        await warmer.cycle(monday_open)
+        assert warmer.last_open_warm is None
+        assert warmer.market_open_due(monday_open)
+
+        warmer.budget = RateBudget(1)
+        await warmer.cycle(monday_open)
+        assert refresh.calls == [["A"], ["B"]]
+        assert warmer.last_open_warm == "2025-07-14"
+
+    def test_market_open_due(self):
+        """Aquecimento de abertura: uma vez por dia útil, após as 10h"""
+        warmer = CacheWarmer(FakeRedis({}), RateBudget(1))
+        monday_open = datetime(2025, 7, 14, 10, 0, tzinfo=MARKET_TIMEZONE)
+
+        assert not warmer.market_open_due(datetime(2025, 7, 14, 9, 59, tzinfo=MARKET_TIMEZONE))
+        assert warmer.market_open_due(monday_open)
+        assert not warmer.market_open_due(datetime(2025, 7, 12, 10, 30, tzinfo=MARKET_TIMEZONE))
+
+        warmer.last_open_warm = "2025-07-14"
+        assert not warmer.market_open_due(monday_open)
@@ -0,0 +1,151 @@
+"""
+Testes unitários dos provedores de dados com requisições hedged
+"""
+
+import pytest
+import asyncio
+import time
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'services', 'data-service'))
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from providers import HedgedMarketData, MarketDataProvider, YahooFinanceProvider
+
+
+class StubProvider(MarketDataProvider):
+    """Provedor local com latência e resposta configuráveis"""
+
+    def __init__(self, name, delay=0.0, result=None, error=None):
+        self.name = name
+        self.delay = delay
+        self.result = result if result is not None else {"symbol": "PETR4.SA", "source": name}
+        self.error = error
+        self.calls = 0
+
+    async def get_quote(self, symbol):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class TestHedgedMarketData:
+    """Testes para a fachada primário/secundário"""
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_does_not_hedge(self):
+        primary = StubProvider("primary", delay=0.0)
+        secondary = StubProvider("secondary")
+        market_data = HedgedMarketData(primary, secondary, initial_delay=0.5)
+
+        result = await market_data.get_quote("PETR4.SA")
+
+        assert result["source"] == "primary"
+        assert secondary.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged(self):
+        primary = StubProvider("primary", delay=1.0)
+        secondary = StubProvider("secondary", delay=0.01)
+        market_data = HedgedMarketData(primary, secondary, initial_delay=0.05)
+
+        start = time.perf_counter()
+        result = await market_data.get_quote("PETR4.SA")
+
+        assert result["source"] == "secondary"
+        assert time.perf_counter() - start < 0.5
+
+    @pytest.mark.asyncio
+    async def test_primary_error_fails_over_immediately(self):
+        primary = StubProvider("primary", error=RuntimeError("boom"))
+        secondary = StubProvider("secondary")
+        market_data = HedgedMarketData(primary, secondary, initial_delay=5.0)
+
+        start = time.perf_counter()
+        result = await market_data.get_quote("PETR4.SA")
+
+        assert result["source"] == "secondary"
+        assert time.perf_counter() - start < 1.0
+
+    @pytest.mark.asyncio
+    async def test_both_fail_raises(self):
+        market_data = HedgedMarketData(
+            StubProvider("primary", error=RuntimeError("primary down")),
+            StubProvider("secondary", error=RuntimeError("secondary down"))
+        )
+
+        with pytest.raises(RuntimeError):
+            await market_data.get_quote("PETR4.SA")
+
+    @pytest.mark.asyncio
+    async def test_hedge_delay_adapts_to_primary_p95(self):
+        primary = StubProvider("primary", delay=0.0)
+        market_data = HedgedMarketData(primary, min_samples=5, min_delay=0.0, initial_delay=3.0)
+
+        assert market_data.hedge_delay("get_quote") == 3.0
+        for _ in range(5):
+            await market_data.get_quote("PETR4.SA")
+
+        assert market_data.hedge_delay("get_quote") < 0.05
+        assert market_data.stats()["primary:get_quote"]["samples"] == 5
+
+    @pytest.mark.asyncio
+    async def test_cancelled_primary_still_records_latency(self):
+        primary = StubProvider("primary", delay=1.0)
+        secondary = StubProvider("secondary", delay=0.0)
+        market_data = HedgedMarketData(primary, secondary, initial_delay=0.05)
+
+        await market_data.get_quote("PETR4.SA")
+        await asyncio.sleep(0)
+
+        amostras = market_data.latencies["primary:get_quote"].samples
+        assert len(amostras) == 1
+        assert amostras[0] >= 0.05
+
+
+class NoThrottle:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class TestBatchQuotes:
+    """Testes das cotações em lote (streaming)"""
+
+    @pytest.mark.asyncio
+    async def test_default_batch_uses_single_quotes(self):
+        primary = StubProvider("primary")
+
+        quotes = await HedgedMarketData(primary).get_quotes(["petr4.sa", "VALE3.SA"])
+
+        assert set(quotes) == {"PETR4.SA", "VALE3.SA"}
+        assert primary.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_yahoo_batch_is_one_download(self, monkeypatch):
+        downloads = []
+        index = pd.date_range("2024-01-01", periods=3)
+        columns = pd.MultiIndex.from_product([["PETR4.SA", "VALE3.SA"], ["Close", "Volume"]])
+        frame = pd.DataFrame([[10.0, 100, 50.0, 10], [11.0, 200, np.nan, np.nan], [12.0, 300, 55.0, 30]],
+                             index=index, columns=columns)
+
+        def download(symbols, **kwargs):
+            downloads.append(list(symbols))
+            return frame
+
+        monkeypatch.setitem(sys.modules, "yfinance", SimpleNamespace(download=download))
+        quotes = await YahooFinanceProvider(NoThrottle()).get_quotes(["PETR4.SA", "VALE3.SA", "XXXX3.SA"])
+
+        assert downloads == [["PETR4.SA", "VALE3.SA", "XXXX3.SA"]]
+        assert quotes["PETR4.SA"]["current_price"] == 12.0 and quotes["PETR4.SA"]["previous_close"] == 11.0
+        assert quotes["VALE3.SA"]["change_percent"] == pytest.approx(10.0)
+        assert "XXXX3.SA" not in quotes
@@ -0,0 +1,98 @@
+"""
+Testes unitários do streaming de cotações do Data Service
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'services', 'data-service'))
+
+from streaming import QuoteStreamHub, quote_delta
+
+
+class StubQuotes:
+    """Fonte de cotações local que registra cada lote buscado"""
+
+    def __init__(self):
+        self.prices = {}
+        self.batches = []
+
+    async def __call__(self, symbols):
+        self.batches.append(list(symbols))
+        return {
+            s: {"symbol": s, "current_price": self.prices.get(s, 10.0), "volume": 100}
+            for s in symbols
+        }
+
+
+def drain(subscription):
+    messages = []
+    while not subscription.queue.empty():
+        messages.append(subscription.queue.get_nowait())
+    return messages
+
+
+class TestQuoteStreamHub:
+    """Testes para o hub de streaming"""
+
+    @pytest.mark.asyncio
+    async def test_single_batch_per_tick_for_distinct_symbols(self):
+        fetcher = StubQuotes()
+        hub = QuoteStreamHub(fetcher, interval=3600)
+        subscribers = [hub.subscribe(["petr4.sa", "VALE3.SA"]) for _ in range(50)]
+
+        await hub.poll_once()
+
+        assert fetcher.batches[-1] == ["PETR4.SA", "VALE3.SA"]
+        assert all(len(drain(s)) == 1 for s in subscribers)
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_only_changed_quotes_are_sent(self):
+        fetcher = StubQuotes()
+        hub = QuoteStreamHub(fetcher, interval=3600)
+        petr = hub.subscribe(["PETR4.SA"])
+        vale = hub.subscribe(["VALE3.SA"])
+        await hub.poll_once()
+        drain(petr), drain(vale)
+
+        fetcher.prices["PETR4.SA"] = 11.0
+        await hub.poll_once()
+
+        [message] = drain(petr)
+        assert message["type"] == "delta"
+        assert message["quotes"] == {"PETR4.SA": {"current_price": 11.0}}
+        assert drain(vale) == []
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_new_subscriber_receives_snapshot(self):
+        hub = QuoteStreamHub(StubQuotes(), interval=3600)
+        hub.subscribe(["PETR4.SA"])
+        await hub.poll_once()
+
+        late = hub.subscribe(["PETR4.SA"])
+
+        [message] = drain(late)
+        assert message["type"] == "snapshot"
+        assert message["quotes"]["PETR4.SA"]["current_price"] == 10.0
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_releases_symbols(self):
+        hub = QuoteStreamHub(StubQuotes(), interval=3600)
+        first = hub.subscribe(["PETR4.SA", "VALE3.SA"])
+        second = hub.subscribe(["PETR4.SA"])
+
+        hub.unsubscribe(first)
+
+        assert hub.symbols == ["PETR4.SA"]
+        hub.unsubscribe(second)
+        assert hub.symbols == []
+
+    def test_quote_delta(self):
+        previous = {"current_price": 10.0, "volume": 100}
+        current = {"current_price": 10.0, "volume": 150}
+
+        assert quote_delta(previous, current) == {"volume": 150}
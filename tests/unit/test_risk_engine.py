@@ -0,0 +1,123 @@
+"""
+Testes unitários do motor de risco vetorizado do Analysis Service
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from risk_engine import RiskEngine, align_closes, benchmark_for, finished_sessions, log_returns
+
+
+def prices_from_returns(returns, start=100.0):
+    """Série de preços a partir de log-retornos (T,) ou (T, N)"""
+    returns = np.asarray(returns)
+    first = np.full((1,) + returns.shape[1:], 0.0)
+    return start * np.exp(np.cumsum(np.concatenate([first, returns]), axis=0))
+
+
+@pytest.fixture
+def gaussian_prices():
+    rng = np.random.default_rng(7)
+    returns = rng.normal(0.0005, 0.02, size=(2000, 3))
+    return prices_from_returns(returns)
+
+
+class TestRiskEngine:
+    """Testes das métricas de risco"""
+
+    def test_log_returns_match_loop(self):
+        """Log-retornos vetorizados equivalem ao cálculo por laço"""
+        prices = [10.0, 11.0, 10.5, 12.0]
+        expected = [np.log(prices[i] / prices[i - 1]) for i in range(1, len(prices))]
+
+        assert log_returns(prices) == pytest.approx(expected)
+
+    def test_var_models_agree_on_gaussian_returns(self, gaussian_prices):
+        """Histórico, paramétrico e Monte Carlo convergem para retornos normais"""
+        metrics = RiskEngine(seed=1, simulations=50_000).compute(gaussian_prices)
+
+        assert metrics["var_parametric"] == pytest.approx(metrics["var_historical"], rel=0.1)
+        assert metrics["var_monte_carlo"] == pytest.approx(metrics["var_parametric"], rel=0.1)
+        assert np.all(metrics["cvar_historical"] > metrics["var_historical"])
+        assert np.all(metrics["cvar_monte_carlo"] > metrics["var_monte_carlo"])
+        assert metrics["volatility"] == pytest.approx(np.full(3, 0.02 * np.sqrt(252) * 100), rel=0.05)
+
+    def test_historical_var_matches_percentile_of_simple_returns(self, gaussian_prices):
+        """VaR histórico é o quantil dos retornos simples, como perda positiva em %"""
+        metrics = RiskEngine(seed=1).compute(gaussian_prices[:, 0])
+        simple = np.diff(gaussian_prices[:, 0]) / gaussian_prices[:-1, 0]
+
+        assert metrics["var_historical"][0] == pytest.approx(-np.percentile(simple, 5) * 100, rel=1e-3)
+
+    def test_fat_tails_raise_monte_carlo_cvar(self):
+        """Inovações t capturam caudas pesadas melhor que a normal"""
+        rng = np.random.default_rng(3)
+        returns = rng.standard_t(3, size=(5000, 1)) * 0.01
+        metrics = RiskEngine(seed=2, simulations=50_000).compute(prices_from_returns(returns))
+
+        normal_cvar = RiskEngine(seed=2).parametric_var(np.zeros(1), np.full(1, returns.std())) * 2.063 / 1.645
+        assert metrics["cvar_monte_carlo"][0] > normal_cvar[0]
+
+    def test_max_drawdown(self):
+        """Maior queda desde o topo anterior"""
+        metrics = RiskEngine(seed=1).compute([100.0, 120.0, 90.0, 130.0, 110.0])
+
+        assert metrics["max_drawdown"][0] == pytest.approx(25.0)
+
+    def test_beta_against_benchmark(self):
+        """Beta exato para um ativo que dobra os retornos do benchmark"""
+        rng = np.random.default_rng(5)
+        bench_returns = rng.normal(0, 0.01, size=500)
+        asset_returns = np.column_stack([2 * bench_returns, -0.5 * bench_returns])
+        metrics = RiskEngine(seed=1).compute(prices_from_returns(asset_returns), prices_from_returns(bench_returns))
+
+        assert metrics["beta"] == pytest.approx([2.0, -0.5])
+
+    def test_batch_matches_single(self, gaussian_prices):
+        """O lote é a mesma conta que cada ação isolada"""
+        engine = RiskEngine(seed=1)
+        batch = engine.compute(gaussian_prices)
+        for i in range(gaussian_prices.shape[1]):
+            single = engine.compute(gaussian_prices[:, i])
+            for name in ("var_historical", "var_parametric", "cvar_historical", "max_drawdown", "sharpe", "sortino"):
+                assert batch[name][i] == pytest.approx(single[name][0])
+
+    def test_sortino_ignores_upside_volatility(self):
+        """Volatilidade só de alta não penaliza o Sortino"""
+        returns = np.array([[0.01], [0.05], [0.01], [0.06], [0.01], [-0.005]] * 20)
+        metrics = RiskEngine(seed=1).compute(prices_from_returns(returns))
+
+        assert metrics["sortino"][0] > metrics["sharpe"][0]
+
+    def test_requires_history(self):
+        with pytest.raises(ValueError):
+            RiskEngine().compute([10.0, 11.0])
+
+
+class TestRiskInputs:
+    """Testes dos auxiliares de entrada"""
+
+    def test_benchmark_for(self):
+        assert benchmark_for(["PETR4.SA", "VALE3.SA"]) == "^BVSP"
+        assert benchmark_for(["PETR4.SA", "AAPL"]) == "^GSPC"
+
+    def test_align_closes(self):
+        """Apenas pregões comuns a todos os ativos"""
+        a = pd.Series([1.0, 2.0, 3.0], index=pd.to_datetime(["2025-01-02", "2025-01-03", "2025-01-06"]))
+        b = pd.Series([5.0, 6.0], index=pd.to_datetime(["2025-01-03", "2025-01-06"]))
+        aligned = align_closes({"A": a, "B": b})
+
+        assert list(aligned.columns) == ["A", "B"]
+        assert aligned["A"].tolist() == [2.0, 3.0]
+
+    def test_finished_sessions(self):
+        """A barra parcial de hoje fica de fora"""
+        closes = pd.DataFrame({"A": [10.0, 11.0, 11.5]}, index=pd.to_datetime(["2024-03-07", "2024-03-08", "2024-03-11"]))
+
+        assert list(finished_sessions(closes, pd.Timestamp("2024-03-11 14:30")).index) == list(closes.index[:2])
+        assert len(finished_sessions(closes, pd.Timestamp("2024-03-12"))) == 3
@@ -0,0 +1,70 @@
+"""
+Testes unitários do índice de busca de ações
+"""
+
+import pytest
+import time
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'services', 'data-service'))
+
+from search_index import DEFAULT_SYMBOLS, SymbolSearchIndex, similarity, trigrams
+
+
+@pytest.fixture
+def index():
+    index = SymbolSearchIndex()
+    index.add_many((symbol, name, "B3") for symbol, name in DEFAULT_SYMBOLS.items())
+    index.add("ITSA4.SA", "Itaúsa", "B3")
+    index.add("AAPL", "Apple Inc.", "NYSE/NASDAQ")
+    return index
+
+
+class TestSymbolSearchIndex:
+    """Testes para o índice de busca"""
+
+    def test_pg_trgm_trigrams(self):
+        # SELECT show_trgm('cat') = {"  c"," ca","at ","cat"}
+        assert trigrams("cat") == {"  c", " ca", "cat", "at "}
+        # SELECT similarity('word', 'two words') = 0.363636
+        assert similarity("word", "two words") == pytest.approx(0.363636, abs=1e-6)
+
+    def test_exact_symbol_ranks_first(self, index):
+        results = index.search("petr4")
+
+        assert results[0]["symbol"] == "PETR4.SA"
+        assert results[0]["name"] == "Petrobras"
+
+    def test_symbol_prefix(self, index):
+        symbols = [r["symbol"] for r in index.search("IT")]
+
+        assert {"ITUB4.SA", "ITSA4.SA"} <= set(symbols)
+
+    def test_accent_insensitive_name_prefix(self, index):
+        assert index.search("itau")[0]["symbol"] == "ITUB4.SA"
+        assert index.search("itaú unib")[0]["symbol"] == "ITUB4.SA"
+
+    def test_typo_matches_by_trigram(self, index):
+        assert index.search("petrobas")[0]["symbol"] == "PETR4.SA"
+
+    def test_incremental_update_and_remove(self, index):
+        index.add("PETR4.SA", "Petróleo Brasileiro", "B3")
+        assert index.search("petroleo")[0]["symbol"] == "PETR4.SA"
+        assert len(index) == 12
+        assert index.search("petr4")[0]["name"] == "Petróleo Brasileiro"
+
+        index.remove("PETR4.SA")
+        assert index.search("petr4") == []
+
+    def test_autocomplete_latency(self):
+        index = SymbolSearchIndex()
+        index.add_many((f"SYM{i}.SA", f"Empresa {i} Participações", "B3") for i in range(5000))
+        index.add_many((symbol, name, "B3") for symbol, name in DEFAULT_SYMBOLS.items())
+
+        start = time.perf_counter()
+        for _ in range(100):
+            index.search("vale")
+        elapsed = (time.perf_counter() - start) / 100
+
+        assert elapsed < 0.001
@@ -0,0 +1,131 @@
+"""
+Testes unitários dos agregados setoriais incrementais do Analysis Service
+"""
+
+import numpy as np
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from sector_aggregates import QuantileSketch, SectorAggregates
+
+
+class TestQuantileSketch:
+    """Testes do sketch de quantis"""
+
+    def test_relative_error_bound(self):
+        rng = np.random.default_rng(0)
+        valores = np.concatenate([rng.lognormal(2, 1, 5000), -rng.lognormal(1, 1, 1000), np.zeros(10)])
+        sketch = QuantileSketch(0.01)
+        for valor in valores:
+            sketch.add(float(valor))
+
+        for q in (0.05, 0.25, 0.5, 0.75, 0.95):
+            exato = np.quantile(valores, q, method="lower")
+            assert sketch.quantile(q) == pytest.approx(exato, rel=0.03)
+
+    def test_remove_restores_previous_state(self):
+        sketch = QuantileSketch()
+        for valor in (1.0, 2.0, 3.0):
+            sketch.add(valor)
+        sketch.add(100.0)
+        sketch.remove(100.0)
+
+        assert sketch.count == 3
+        assert max(sketch.positive) == sketch._key(3.0)
+        assert sketch.quantile(0.5) == pytest.approx(2.0, rel=0.02)
+
+    def test_empty(self):
+        assert QuantileSketch().quantile(0.5) is None
+
+
+class TestSectorAggregates:
+    """Testes da atualização incremental"""
+
+    def build(self):
+        aggregates = SectorAggregates(["ROE", "P/E"], top_n=2)
+        aggregates.update("PETR4", "Energia", np.array([20.0, 5.0]), 80.0)
+        aggregates.update("PRIO3", "Energia", np.array([10.0, np.nan]), 60.0)
+        aggregates.update("ITUB4", "Financeiro", np.array([18.0, 8.0]), 70.0)
+        return aggregates
+
+    def test_means_and_best_companies(self):
+        resumo = self.build().summary("Energia")
+
+        assert resumo["indicadores_medios"] == {"ROE": pytest.approx(15.0), "P/E": pytest.approx(5.0)}
+        assert resumo["symbols"] == ["PETR4", "PRIO3"]
+        assert [item["symbol"] for item in resumo["melhores_empresas"]] == ["PETR4", "PRIO3"]
+
+    def test_update_replaces_previous_contribution(self):
+        aggregates = self.build()
+        aggregates.update("PRIO3", "Energia", np.array([30.0, 6.0]), 90.0)
+
+        resumo = aggregates.summary("Energia")
+        assert resumo["indicadores_medios"]["ROE"] == pytest.approx(25.0)
+        assert resumo["indicadores_medios"]["P/E"] == pytest.approx(5.5)
+        assert resumo["melhores_empresas"][0] == {"symbol": "PRIO3", "score_geral": 90.0}
+
+    def test_sector_change_moves_the_stock(self):
+        aggregates = self.build()
+        aggregates.update("ITUB4", "Energia", np.array([18.0, 8.0]), 70.0)
+
+        assert aggregates.sectors() == {"Energia": 3}
+        assert aggregates.summary("Financeiro") is None
+        assert aggregates.sector_of("ITUB4") == "Energia"
+
+    def test_unchanged_data_is_a_no_op(self):
+        aggregates = self.build()
+
+        assert not aggregates.update("PRIO3", "Energia", np.array([10.0, np.nan]), 60.0)
+
+    def test_matches_full_recomputation(self):
+        """Depois de muitas atualizações, as médias batem com o recálculo do zero"""
+        rng = np.random.default_rng(1)
+        aggregates = SectorAggregates(["A", "B"])
+        atuais = {}
+        for _ in range(500):
+            symbol = f"S{rng.integers(40)}"
+            setor = ["X", "Y", "Z"][rng.integers(3)]
+            valores = rng.normal(10, 3, 2)
+            aggregates.update(symbol, setor, valores, float(rng.uniform(0, 100)))
+            atuais[symbol] = (setor, valores)
+
+        for setor in ("X", "Y", "Z"):
+            membros = np.array([valores for s, valores in atuais.values() if s == setor])
+            if len(membros):
+                assert aggregates.mean(setor, "A") == pytest.approx(membros[:, 0].mean())
+
+    def test_roundtrip(self):
+        aggregates = self.build()
+        restaurado = SectorAggregates.from_dict(aggregates.to_dict(), top_n=2)
+
+        assert restaurado.summary("Energia") == aggregates.summary("Energia")
+
+    def test_pending_changes_until_saved(self):
+        """Só as contribuições alteradas desde a última gravação são escritas"""
+        aggregates = self.build()
+        aggregates.mark_saved(aggregates.pending())
+        aggregates.update("PRIO3", "Energia", np.array([30.0, 6.0]), 90.0)
+        aggregates.remove("ITUB4")
+
+        assert aggregates.pending() == {"PRIO3": ["Energia", [30.0, 6.0], 90.0], "ITUB4": None}
+        aggregates.mark_saved(["PRIO3", "ITUB4"])
+        assert aggregates.pending() == {}
+
+    def test_merge_keeps_unsaved_local_changes(self):
+        """Registros de outra réplica não sobrescrevem alterações locais pendentes"""
+        aggregates = self.build()
+        aggregates.mark_saved(aggregates.pending())
+        aggregates.update("PRIO3", "Energia", np.array([30.0, 6.0]), 90.0)
+
+        changed = aggregates.merge({
+            "PRIO3": ["Energia", [1.0, 1.0], 1.0],
+            "VALE3": ["Materiais", [12.0, None], 50.0],
+        })
+
+        assert changed == ["VALE3"]
+        assert aggregates.sector_of("VALE3") == "Materiais"
+        assert aggregates.mean("Energia", "ROE") == pytest.approx(25.0)
+        assert set(aggregates.pending()) == {"PRIO3"}
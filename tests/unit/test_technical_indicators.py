@@ -0,0 +1,110 @@
+"""
+Testes unitários dos indicadores técnicos do Methodology Service
+"""
+
+import json
+import pytest
+import numpy as np
+from datetime import datetime
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'methodology-service'))
+
+from technical_indicators import (
+    MARKET_TIMEZONE, TechnicalIndicators, compute_indicators, ema, quote_session, rsi, sma, trend, true_range
+)
+
+
+@pytest.fixture
+def bars():
+    rng = np.random.default_rng(0)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, 300)))
+    highs = closes * (1 + rng.uniform(0, 0.02, 300))
+    lows = closes * (1 - rng.uniform(0, 0.02, 300))
+    volumes = rng.integers(100_000, 1_000_000, 300).astype(float)
+    return closes, highs, lows, volumes
+
+
+class TestVectorized:
+    """Testes do modo vetorizado"""
+
+    def test_sma_and_ema(self):
+        values = np.arange(1.0, 11.0)
+
+        assert sma(values, 3)[-1] == pytest.approx(9.0)
+        assert np.isnan(sma(values, 3)[1])
+        # EMA semeada pela média simples: 2.0, depois 2 + 0.5 * (4 - 2)
+        assert ema(values, 3)[2:4] == pytest.approx([2.0, 3.0])
+
+    def test_rsi_bounds(self):
+        """Só altas dão RSI 100; só quedas dão 0"""
+        assert rsi(np.arange(1.0, 30.0))[-1] == pytest.approx(100.0)
+        assert rsi(np.arange(30.0, 1.0, -1))[-1] == pytest.approx(0.0)
+
+    def test_true_range_uses_previous_close(self):
+        ranges = true_range([10.0, 12.0], [9.0, 11.0], [9.5, 11.5])
+
+        assert ranges.tolist() == [1.0, 2.5]
+
+
+class TestIncremental:
+    """Testes do modo incremental"""
+
+    @pytest.mark.parametrize("split", [0, 10, 40, 200])
+    def test_incremental_matches_vectorized(self, bars, split):
+        """Semear com parte do histórico e seguir barra a barra reproduz a série inteira"""
+        closes, highs, lows, volumes = bars
+        indicators = TechnicalIndicators.from_history(closes[:split], highs[:split], lows[:split], volumes[:split])
+        for i in range(split, len(closes)):
+            snapshot = indicators.update(closes[i], highs[i], lows[i], volumes[i])
+
+        expected = compute_indicators(closes, highs, lows, volumes)
+        for name, series in expected.items():
+            assert snapshot[name] == pytest.approx(series[-1], rel=1e-9), name
+
+    def test_state_roundtrip(self, bars):
+        """O estado serializado continua recebendo barras"""
+        closes, highs, lows, volumes = bars
+        indicators = TechnicalIndicators.from_history(closes[:250], highs[:250], lows[:250], volumes[:250])
+        restored = TechnicalIndicators.from_dict(json.loads(json.dumps(indicators.to_dict())))
+
+        expected = indicators.update(closes[250], highs[250], lows[250], volumes[250])
+        snapshot = restored.update(closes[250], highs[250], lows[250], volumes[250])
+        for name, value in expected.items():
+            assert snapshot[name] == pytest.approx(value, rel=1e-9), name
+
+    def test_peek_does_not_change_state(self, bars):
+        """Cotação ao vivo é uma barra provisória"""
+        closes = bars[0]
+        indicators = TechnicalIndicators.from_history(closes)
+        before = indicators.snapshot()
+        preview = indicators.peek(closes[-1] * 1.05)
+
+        assert indicators.snapshot() == before
+        assert preview["close"] == pytest.approx(closes[-1] * 1.05)
+        assert preview["rsi"] > before["rsi"]
+
+    def test_short_history_has_no_values(self):
+        snapshot = TechnicalIndicators.from_history([10.0, 11.0]).snapshot()
+
+        assert snapshot["sma_20"] is None
+        assert snapshot["rsi"] is None
+        assert trend(snapshot) is None
+
+    def test_trend(self):
+        """Alta com preço acima da SMA 50 e histograma do MACD positivo"""
+        indicators = TechnicalIndicators.from_history(np.linspace(10, 20, 120) ** 1.2)
+
+        assert trend(indicators.snapshot()) == 1
+
+    def test_quote_session(self):
+        """Fim de semana e antes da abertura contam como o último pregão"""
+        sexta = np.datetime64("2025-07-11")
+
+        assert quote_session(datetime(2025, 7, 11, 14, 0, tzinfo=MARKET_TIMEZONE)) == sexta
+        assert quote_session(datetime(2025, 7, 12, 14, 0, tzinfo=MARKET_TIMEZONE)) == sexta
+        assert quote_session(datetime(2025, 7, 14, 9, 30, tzinfo=MARKET_TIMEZONE)) == sexta
+        # Sem fuso é UTC: 12:00 UTC são 09:00 na B3, 14:00 UTC já é pregão
+        assert quote_session(datetime(2025, 7, 14, 12, 0)) == sexta
+        assert quote_session(datetime(2025, 7, 14, 14, 0)) == np.datetime64("2025-07-14")
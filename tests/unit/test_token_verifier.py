@@ -0,0 +1,151 @@
+"""
+Testes unitários da verificação local de tokens do Analysis Service
+"""
+
+import asyncio
+import json
+import time
+import pytest
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+import token_verifier
+from token_verifier import REVOKED_KEY_PREFIX, TokenVerifier, token_digest
+
+
+class FakeRedis:
+    def __init__(self, revoked=(), down_for=0):
+        self.revoked = set(revoked)
+        self.lookups = 0
+        self.down_for = down_for  # Tentativas de assinatura que falham
+        self.subscriptions = 0
+
+    def exists(self, key):
+        self.lookups += 1
+        return key in self.revoked
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return self
+
+    def subscribe(self, **handlers):
+        self.subscriptions += 1
+        if self.subscriptions <= self.down_for:
+            raise ConnectionError("Redis indisponível")
+
+    def run_in_thread(self, sleep_time=None, daemon=False):
+        return self
+
+    def stop(self):
+        pass
+
+
+def remote_verifier(monkeypatch, responses, **kwargs):
+    """Verificador sem PyJWT, validando no Auth Service simulado"""
+    monkeypatch.setattr(token_verifier, "JWT_AVAILABLE", False)
+    calls = []
+
+    async def validate(token):
+        calls.append(token)
+        return responses[token]
+
+    return TokenVerifier(remote_validate=validate, **kwargs), calls
+
+
+VALID = {"valid": True, "user": {"id": "1", "email": "test@example.com"}}
+
+
+class TestTokenVerifier:
+    """Testes do cache e da revogação"""
+
+    def test_positive_cache_avoids_round_trips(self, monkeypatch):
+        verifier, calls = remote_verifier(monkeypatch, {"t1": VALID})
+
+        async def run():
+            return [await verifier.verify("t1") for _ in range(5)]
+
+        resultados = asyncio.run(run())
+
+        assert calls == ["t1"]
+        assert all(resultado.valid and resultado.user_id == "1" for resultado in resultados)
+
+    def test_negative_cache_expires(self, monkeypatch):
+        verifier, calls = remote_verifier(monkeypatch, {"bad": {"valid": False}}, negative_ttl=0.01)
+
+        async def run():
+            first = await verifier.verify("bad")
+            await verifier.verify("bad")
+            await asyncio.sleep(0.02)
+            await verifier.verify("bad")
+            return first
+
+        assert not asyncio.run(run()).valid
+        assert calls == ["bad", "bad"]
+
+    def test_revocation_message_invalidates_cached_token(self, monkeypatch):
+        verifier, _ = remote_verifier(monkeypatch, {"t1": VALID})
+
+        async def run():
+            before = await verifier.verify("t1")
+            verifier._handle_revocation({"data": json.dumps({"digest": token_digest("t1"), "exp": time.time() + 60})})
+            return before, await verifier.verify("t1")
+
+        before, after = asyncio.run(run())
+        assert before.valid and not after.valid
+
+    def test_previously_revoked_token_is_rejected(self, monkeypatch):
+        redis = FakeRedis([f"{REVOKED_KEY_PREFIX}{token_digest('t1')}"])
+        verifier, _ = remote_verifier(monkeypatch, {"t1": VALID}, redis_client=redis)
+
+        async def run():
+            return await verifier.verify("t1"), await verifier.verify("t1")
+
+        first, second = asyncio.run(run())
+        assert not first.valid and not second.valid
+        assert redis.lookups == 1
+
+    def test_local_signature_verification(self):
+        jwt = pytest.importorskip("jwt")
+        verifier = TokenVerifier(key="segredo", redis_client=FakeRedis())
+        exp = int(time.time()) + 600
+        token = jwt.encode({"sub": "test@example.com", "user_id": "7", "exp": exp}, "segredo", algorithm="HS256")
+        forged = jwt.encode({"sub": "test@example.com", "exp": exp}, "outra", algorithm="HS256")
+
+        async def run():
+            return await verifier.verify(token), await verifier.verify(forged)
+
+        valid, invalid = asyncio.run(run())
+        assert valid.valid and valid.user_id == "7" and valid.expires_at == exp
+        assert not invalid.valid
+
+    def test_without_key_falls_back_to_remote(self, monkeypatch):
+        """Sem chave explícita não há validação local com segredo padrão"""
+        monkeypatch.delenv("JWT_PUBLIC_KEY", raising=False)
+        monkeypatch.delenv("SECRET_KEY", raising=False)
+        monkeypatch.setattr(token_verifier, "JWT_AVAILABLE", True)
+        calls = []
+
+        async def validate(token):
+            calls.append(token)
+            return VALID
+
+        verifier = TokenVerifier(remote_validate=validate)
+
+        assert verifier.key is None and not verifier.local
+        assert asyncio.run(verifier.verify("t1")).valid
+        assert calls == ["t1"]
+
+    def test_start_retries_until_redis_is_up(self):
+        """Redis fora no início: a assinatura é refeita em background"""
+        redis = FakeRedis(down_for=2)
+        verifier = TokenVerifier(redis_client=redis, retry_interval=0.01)
+
+        async def run():
+            verifier.start()
+            assert verifier._listener is None
+            await asyncio.wait_for(verifier._retry_task, 1)
+
+        asyncio.run(run())
+        assert verifier._listener is redis and redis.subscriptions == 3
+        verifier.stop()
@@ -0,0 +1,101 @@
+"""
+Testes unitários do valuation por DCF Monte Carlo do Analysis Service
+"""
+
+import numpy as np
+import pytest
+import sys
+import os
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'microservices', 'analysis-service'))
+
+from valuation import (
+    DCFAssumptions, DCFEngine, DCFInputs, calcular_margem_seguranca, fair_value_multiples, value_stocks
+)
+
+
+def acao(symbol="TEST", **campos):
+    base = dict(current_price=100.0, market_cap=None, free_cash_flow=None, pe_ratio=10.0, ps_ratio=None,
+                pb_ratio=None, ev_ebitda=None, earnings_growth=None, revenue_growth=None, beta=1.0)
+    return SimpleNamespace(symbol=symbol, **{**base, **campos})
+
+
+class TestDCFEngine:
+    """Testes da simulação vetorizada"""
+
+    def test_deterministic_case_matches_closed_form(self):
+        """Sem incerteza e com crescimento igual à perpetuidade vira uma perpetuidade crescente"""
+        assumptions = DCFAssumptions(simulations=100, growth_sd=0, margin_sd=0, discount_sd=0,
+                                     default_growth=0.03, terminal_growth=0.03)
+        engine = DCFEngine(assumptions, seed=1)
+        inputs = DCFInputs.from_dados([acao(symbol="XYZ", pe_ratio=10.0)], assumptions)
+
+        valor = engine.value(inputs)["percentis"][0, 2]
+
+        taxa = 0.04 + 1.0 * assumptions.equity_risk_premium
+        assert valor == pytest.approx(10.0 * 1.03 / (taxa - 0.03))
+
+    def test_percentiles_are_ordered(self):
+        engine = DCFEngine(DCFAssumptions(simulations=2000), seed=3)
+        inputs = DCFInputs.from_dados([acao(earnings_growth=12.0)], engine.assumptions)
+
+        percentis = engine.value(inputs)["percentis"][0]
+
+        assert np.all(np.diff(percentis) > 0)
+
+    def test_chunked_batch_matches_single_chunk(self):
+        """O orçamento de memória só muda o tamanho dos blocos, não o resultado"""
+        lote = [acao(symbol=f"S{i}", pe_ratio=5.0 + i, beta=0.5 + i / 10) for i in range(12)]
+        pequeno = DCFEngine(DCFAssumptions(simulations=500, memory_budget_mb=0.2), seed=7)
+        grande = DCFEngine(DCFAssumptions(simulations=500, memory_budget_mb=64), seed=7)
+
+        assert pequeno.chunk_size() < len(lote) <= grande.chunk_size()
+        a = pequeno.value(DCFInputs.from_dados(lote, pequeno.assumptions))["percentis"]
+        b = grande.value(DCFInputs.from_dados(lote, grande.assumptions))["percentis"]
+        np.testing.assert_allclose(a, b)
+
+    def test_stocks_without_cash_flow_are_not_valued(self):
+        inputs = DCFInputs.from_dados([acao(pe_ratio=None), acao(pe_ratio=-5.0)], DCFAssumptions())
+
+        assert not inputs.valid().any()
+
+    def test_concurrent_calls_use_independent_generators(self):
+        """Chamadas em threads (asyncio.to_thread) não disputam o mesmo gerador"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        engine = DCFEngine(DCFAssumptions(simulations=500), seed=5)
+        inputs = DCFInputs.from_dados([acao()], engine.assumptions)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            resultados = list(executor.map(lambda _: engine.value(inputs)["percentis"][0], range(16)))
+
+        sequencial = DCFEngine(DCFAssumptions(simulations=500), seed=5)
+        esperados = [sequencial.value(inputs)["percentis"][0] for _ in range(16)]
+        # Cada chamada recebe um filho distinto da semente: o conjunto é reprodutível
+        assert sorted(map(tuple, resultados)) == sorted(map(tuple, esperados))
+        assert len(set(map(tuple, resultados))) == 16
+
+
+class TestValueStocks:
+    """Testes da montagem do resultado"""
+
+    def test_margin_of_safety_uses_dcf_median(self):
+        resultado = value_stocks([acao(pe_ratio=5.0)], DCFEngine(DCFAssumptions(simulations=1000), seed=2))[0]
+
+        esperado = (resultado["preco_justo_dcf"] - 100.0) / resultado["preco_justo_dcf"] * 100
+        assert resultado["margem_seguranca"] == pytest.approx(esperado, abs=0.05)
+        assert resultado["recomendacao"] == "COMPRA"
+        assert resultado["percentis_dcf"]["p5"] < resultado["percentis_dcf"]["p95"]
+
+    def test_missing_price_is_skipped(self):
+        resultados = value_stocks([acao(current_price=None), acao(symbol="OK")], DCFEngine(seed=1))
+
+        assert [item["symbol"] for item in resultados] == ["OK"]
+
+    def test_multiples(self):
+        assert fair_value_multiples(acao(pe_ratio=10.0, pb_ratio=3.0)) == pytest.approx((150.0 + 50.0) / 2)
+        assert fair_value_multiples(acao(pe_ratio=None)) is None
+
+    def test_calcular_margem_seguranca(self):
+        assert calcular_margem_seguranca(80.0, 100.0) == pytest.approx(20.0)
+        assert calcular_margem_seguranca(80.0, -5.0) == 0.0